@@ -0,0 +1,68 @@
+"""usage ledger
+
+Revision ID: 0b5e7d3f9a61
+Revises: f2a6d8c13b47
+Create Date: 2026-10-18 20:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '0b5e7d3f9a61'
+down_revision = 'f2a6d8c13b47'
+branch_labels = None
+depends_on = None
+
+# 基础表尚未创建时由之后autogenerate生成的迁移建立
+_PARENT_TABLES = {"users", "ai_model_configs", "video_projects"}
+
+
+def upgrade() -> None:
+    tables = set(sa.inspect(op.get_bind()).get_table_names())
+    if not _PARENT_TABLES <= tables or "usage_ledger" in tables:
+        return
+    op.create_table(
+        "usage_ledger",
+        sa.Column("record_id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("usage_date", sa.Date(), nullable=False),
+        sa.Column(
+            "user_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("users.user_id", ondelete="CASCADE"),
+            nullable=False
+        ),
+        sa.Column(
+            "config_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("ai_model_configs.config_id", ondelete="SET NULL"),
+            nullable=True
+        ),
+        sa.Column(
+            "project_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("video_projects.project_id", ondelete="SET NULL"),
+            nullable=True
+        ),
+        sa.Column("operation", sa.String(length=50), nullable=False),
+        sa.Column("vendor", sa.String(length=50), nullable=False),
+        sa.Column("model_name", sa.String(length=100), nullable=False),
+        sa.Column("request_count", sa.Integer(), nullable=False),
+        sa.Column("cached_count", sa.Integer(), nullable=False),
+        sa.Column("retry_count", sa.Integer(), nullable=False),
+        sa.Column("prompt_tokens", sa.BigInteger(), nullable=False),
+        sa.Column("completion_tokens", sa.BigInteger(), nullable=False),
+        sa.Column("total_tokens", sa.BigInteger(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_usage_ledger_user_config_date", "usage_ledger", ["user_id", "config_id", "usage_date"])
+    op.create_index("ix_usage_ledger_user_project_date", "usage_ledger", ["user_id", "project_id", "usage_date"])
+
+
+def downgrade() -> None:
+    if "usage_ledger" in sa.inspect(op.get_bind()).get_table_names():
+        op.drop_index("ix_usage_ledger_user_project_date", table_name="usage_ledger")
+        op.drop_index("ix_usage_ledger_user_config_date", table_name="usage_ledger")
+        op.drop_table("usage_ledger")
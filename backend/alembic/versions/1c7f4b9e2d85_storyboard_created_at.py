@@ -0,0 +1,39 @@
+"""storyboard created_at
+
+Revision ID: 1c7f4b9e2d85
+Revises: 0b5e7d3f9a61
+Create Date: 2026-10-18 20:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1c7f4b9e2d85'
+down_revision = '0b5e7d3f9a61'
+branch_labels = None
+depends_on = None
+
+# 分镜的创建时间(生成接口返回);表尚未创建时由之后autogenerate生成的迁移建立
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if "storyboards" not in inspector.get_table_names():
+        return
+    if "created_at" in {column["name"] for column in inspector.get_columns("storyboards")}:
+        return
+    # 已有分镜取迁移时间;批量模式兼容不支持带非常量默认值ADD COLUMN的数据库
+    with op.batch_alter_table("storyboards") as batch:
+        batch.add_column(sa.Column(
+            "created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True
+        ))
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if "storyboards" not in inspector.get_table_names():
+        return
+    if "created_at" in {column["name"] for column in inspector.get_columns("storyboards")}:
+        op.drop_column("storyboards", "created_at")
@@ -0,0 +1,95 @@
+"""script delta storage and version counter
+
+Revision ID: 2f8d6a1c4e90
+Revises:
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '2f8d6a1c4e90'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# 脚本按"快照 + 行级增量"保存,项目行上保存脚本版本号计数器;
+# 表尚未创建时由之后autogenerate生成的迁移建立
+_scripts = sa.table(
+    "scripts",
+    sa.column("project_id"),
+    sa.column("version", sa.Integer),
+    sa.column("content", sa.Text),
+    sa.column("content_length", sa.Integer),
+)
+_projects = sa.table(
+    "video_projects",
+    sa.column("project_id"),
+    sa.column("script_version_seq", sa.Integer),
+)
+
+
+def _columns(inspector, table: str) -> set:
+    return {column["name"] for column in inspector.get_columns(table)}
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    tables = set(inspector.get_table_names())
+    
+    if "scripts" in tables:
+        existing = _columns(inspector, "scripts")
+        with op.batch_alter_table("scripts") as batch:
+            if "delta" not in existing:
+                batch.add_column(sa.Column("delta", sa.Text(), nullable=True))
+            if "base_script_id" not in existing:
+                batch.add_column(sa.Column("base_script_id", postgresql.UUID(as_uuid=True), nullable=True))
+                batch.create_foreign_key("fk_scripts_base_script_id", "scripts", ["base_script_id"], ["script_id"])
+                batch.create_index("ix_scripts_base_script_id", ["base_script_id"])
+            if "content_length" not in existing:
+                batch.add_column(sa.Column("content_length", sa.Integer(), nullable=True))
+            batch.alter_column("content", existing_type=sa.Text(), nullable=True)
+        if "content_length" not in existing:
+            # 已有版本都是完整快照
+            op.execute(_scripts.update().values(content_length=sa.func.length(_scripts.c.content)))
+    
+    if "video_projects" in tables and "script_version_seq" not in _columns(inspector, "video_projects"):
+        op.add_column("video_projects", sa.Column(
+            "script_version_seq", sa.Integer(), server_default="0", nullable=False
+        ))
+        if "scripts" in tables:
+            max_version = sa.select(sa.func.coalesce(sa.func.max(_scripts.c.version), 0)).where(
+                _scripts.c.project_id == _projects.c.project_id
+            ).scalar_subquery()
+            op.execute(_projects.update().values(script_version_seq=max_version))
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    tables = set(inspector.get_table_names())
+    
+    if "video_projects" in tables and "script_version_seq" in _columns(inspector, "video_projects"):
+        op.drop_column("video_projects", "script_version_seq")
+    
+    if "scripts" in tables:
+        existing = _columns(inspector, "scripts")
+        if "delta" in existing:
+            # 增量版本还原为完整内容需要应用代码,降级前须确认没有增量版本
+            pending = bind.execute(sa.text("SELECT count(*) FROM scripts WHERE delta IS NOT NULL")).scalar()
+            if pending:
+                raise RuntimeError(f"有{pending}个脚本版本以增量保存,降级前需先还原为完整内容")
+        with op.batch_alter_table("scripts") as batch:
+            if "content_length" in existing:
+                batch.drop_column("content_length")
+            if "base_script_id" in existing:
+                batch.drop_index("ix_scripts_base_script_id")
+                batch.drop_constraint("fk_scripts_base_script_id", type_="foreignkey")
+                batch.drop_column("base_script_id")
+            if "delta" in existing:
+                batch.drop_column("delta")
+            batch.alter_column("content", existing_type=sa.Text(), nullable=False)
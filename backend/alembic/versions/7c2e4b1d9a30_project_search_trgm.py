@@ -0,0 +1,45 @@
+"""project search trigram indexes
+
+Revision ID: 7c2e4b1d9a30
+Revises: 2f8d6a1c4e90
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c2e4b1d9a30'
+down_revision = '2f8d6a1c4e90'
+branch_labels = None
+depends_on = None
+
+# 与模型中声明的索引一致;表尚未创建时由之后autogenerate生成的迁移建立
+_INDEXES = (
+    ("video_projects", "ix_video_projects_name_trgm", "project_name gin_trgm_ops"),
+    ("video_projects", "ix_video_projects_synopsis_trgm", "story_synopsis gin_trgm_ops"),
+    ("scripts", "ix_scripts_text_trgm", "coalesce(content, delta) gin_trgm_ops"),
+)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        return
+    
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    
+    tables = set(sa.inspect(bind).get_table_names())
+    for table, name, expression in _INDEXES:
+        if table not in tables:
+            continue
+        op.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin ({expression})")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    
+    for _, name, _ in _INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
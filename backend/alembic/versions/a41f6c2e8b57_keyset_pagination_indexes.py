@@ -0,0 +1,49 @@
+"""keyset pagination indexes
+
+Revision ID: a41f6c2e8b57
+Revises: 7c2e4b1d9a30
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a41f6c2e8b57'
+down_revision = '7c2e4b1d9a30'
+branch_labels = None
+depends_on = None
+
+# 与模型中声明的索引一致;表尚未创建时由之后autogenerate生成的迁移建立
+_INDEXES = (
+    ("video_projects", "ix_video_projects_user_updated", ["user_id", "updated_at", "project_id"]),
+    ("scripts", "ix_scripts_project_version", ["project_id", "version", "script_id"]),
+    ("storyboards", "ix_storyboards_script_sequence", ["script_id", "shot_number", "storyboard_id"]),
+)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    tables = set(sa.inspect(bind).get_table_names())
+    for table, name, columns in _INDEXES:
+        if table not in tables:
+            continue
+        if bind.dialect.name == "postgresql":
+            # 在线建索引,不阻塞列表和写入
+            with op.get_context().autocommit_block():
+                op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({', '.join(columns)})")
+        else:
+            op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    tables = set(sa.inspect(bind).get_table_names())
+    for table, name, _ in _INDEXES:
+        if table not in tables:
+            continue
+        if bind.dialect.name == "postgresql":
+            op.execute(f"DROP INDEX IF EXISTS {name}")
+        else:
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,43 @@
+"""storyboard source columns
+
+Revision ID: b3d58e1f4c72
+Revises: a41f6c2e8b57
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3d58e1f4c72'
+down_revision = 'a41f6c2e8b57'
+branch_labels = None
+depends_on = None
+
+# 分镜的来源单元(增量生成据此判断分镜是否需要重新生成);表尚未创建时由之后autogenerate生成的迁移建立
+_COLUMNS = (
+    ("source_index", sa.Integer()),
+    ("source_hash", sa.String(length=64)),
+    ("source_span", sa.Integer()),
+)
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if "storyboards" not in inspector.get_table_names():
+        return
+    existing = {column["name"] for column in inspector.get_columns("storyboards")}
+    for name, type_ in _COLUMNS:
+        if name not in existing:
+            op.add_column("storyboards", sa.Column(name, type_, nullable=True))
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if "storyboards" not in inspector.get_table_names():
+        return
+    existing = {column["name"] for column in inspector.get_columns("storyboards")}
+    for name, _ in reversed(_COLUMNS):
+        if name in existing:
+            op.drop_column("storyboards", name)
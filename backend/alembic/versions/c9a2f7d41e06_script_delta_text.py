@@ -0,0 +1,65 @@
+"""script delta plain text for search
+
+Revision ID: c9a2f7d41e06
+Revises: b3d58e1f4c72
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c9a2f7d41e06'
+down_revision = 'b3d58e1f4c72'
+branch_labels = None
+depends_on = None
+
+_INDEX = "ix_scripts_text_trgm"
+
+_scripts = sa.table(
+    "scripts",
+    sa.column("script_id"),
+    sa.column("delta", sa.Text),
+    sa.column("delta_text", sa.Text),
+)
+
+
+def _inserted_text(delta: str) -> str:
+    # 与app.utils.text_delta.inserted_text一致(迁移不依赖应用代码)
+    return "".join(op for op in json.loads(delta) if isinstance(op, str))
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if "scripts" not in inspector.get_table_names():
+        return
+    
+    op.add_column("scripts", sa.Column("delta_text", sa.Text(), nullable=True))
+    rows = bind.execute(sa.select(_scripts.c.script_id, _scripts.c.delta).where(_scripts.c.delta.isnot(None)))
+    for script_id, delta in rows.all():
+        bind.execute(
+            _scripts.update().where(_scripts.c.script_id == script_id).values(delta_text=_inserted_text(delta))
+        )
+    
+    if bind.dialect.name == "postgresql":
+        # 搜索表达式由coalesce(content, delta)改为coalesce(content, delta_text)
+        op.execute(f"DROP INDEX IF EXISTS {_INDEX}")
+        op.execute(f"CREATE INDEX IF NOT EXISTS {_INDEX} ON scripts USING gin (coalesce(content, delta_text) gin_trgm_ops)")
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if "scripts" not in inspector.get_table_names():
+        return
+    if "delta_text" not in {column["name"] for column in inspector.get_columns("scripts")}:
+        return
+    
+    if bind.dialect.name == "postgresql":
+        op.execute(f"DROP INDEX IF EXISTS {_INDEX}")
+        op.execute(f"CREATE INDEX IF NOT EXISTS {_INDEX} ON scripts USING gin (coalesce(content, delta) gin_trgm_ops)")
+    op.drop_column("scripts", "delta_text")
@@ -0,0 +1,40 @@
+"""model config updated_at
+
+Revision ID: d4b8e2a7c519
+Revises: c9a2f7d41e06
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4b8e2a7c519'
+down_revision = 'c9a2f7d41e06'
+branch_labels = None
+depends_on = None
+
+# 模型配置的修改时间(适配器注册表按配置ID和updated_at判断缓存的适配器是否过期);
+# 表尚未创建时由之后autogenerate生成的迁移建立
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if "ai_model_configs" not in inspector.get_table_names():
+        return
+    if "updated_at" in {column["name"] for column in inspector.get_columns("ai_model_configs")}:
+        return
+    # 已有配置取迁移时间;批量模式兼容不支持带非常量默认值ADD COLUMN的数据库
+    with op.batch_alter_table("ai_model_configs") as batch:
+        batch.add_column(sa.Column(
+            "updated_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True
+        ))
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if "ai_model_configs" not in inspector.get_table_names():
+        return
+    if "updated_at" in {column["name"] for column in inspector.get_columns("ai_model_configs")}:
+        op.drop_column("ai_model_configs", "updated_at")
@@ -0,0 +1,46 @@
+"""model routing groups
+
+Revision ID: e7c3a9f05d28
+Revises: d4b8e2a7c519
+Create Date: 2026-10-18 20:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7c3a9f05d28'
+down_revision = 'd4b8e2a7c519'
+branch_labels = None
+depends_on = None
+
+# 基础表尚未创建时由之后autogenerate生成的迁移建立
+
+
+def upgrade() -> None:
+    tables = set(sa.inspect(op.get_bind()).get_table_names())
+    if "users" not in tables or "model_routing_groups" in tables:
+        return
+    op.create_table(
+        "model_routing_groups",
+        sa.Column("group_id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column(
+            "user_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("users.user_id", ondelete="CASCADE"),
+            nullable=False
+        ),
+        sa.Column("group_name", sa.String(length=100), nullable=False),
+        sa.Column("member_config_ids", postgresql.JSONB(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_model_routing_groups_user_id", "model_routing_groups", ["user_id"])
+
+
+def downgrade() -> None:
+    if "model_routing_groups" in sa.inspect(op.get_bind()).get_table_names():
+        op.drop_index("ix_model_routing_groups_user_id", table_name="model_routing_groups")
+        op.drop_table("model_routing_groups")
@@ -0,0 +1,38 @@
+"""task batch id
+
+Revision ID: f2a6d8c13b47
+Revises: e7c3a9f05d28
+Create Date: 2026-10-18 20:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2a6d8c13b47'
+down_revision = 'e7c3a9f05d28'
+branch_labels = None
+depends_on = None
+
+# 批量生成脚本的批次ID;表尚未创建时由之后autogenerate生成的迁移建立
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if "tasks" not in inspector.get_table_names():
+        return
+    if "batch_id" in {column["name"] for column in inspector.get_columns("tasks")}:
+        return
+    op.add_column("tasks", sa.Column("batch_id", postgresql.UUID(as_uuid=True), nullable=True))
+    op.create_index("ix_tasks_batch_id", "tasks", ["batch_id"])
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if "tasks" not in inspector.get_table_names():
+        return
+    if "batch_id" in {column["name"] for column in inspector.get_columns("tasks")}:
+        op.drop_index("ix_tasks_batch_id", table_name="tasks")
+        op.drop_column("tasks", "batch_id")
@@ -13,10 +13,14 @@ from app.api.schemas.model_config import (
     ModelConfigUpdate,
     ModelConfigResponse,
     ModelConfigTest,
-    ModelConfigTestResponse
+    ModelConfigTestResponse,
+    ModelConfigTestAll,
+    ModelConfigHealthResponse
 )
 from app.models.user import User
+from app.services.config_health_service import ConfigHealthService
 from app.services.model_config_service import ModelConfigService
+from app.services.ai_adapters.cache import llm_response_cache
 
 router = APIRouter(prefix="/model-configs", tags=["model-configs"])
 
@@ -90,6 +94,42 @@ def get_model_configs(
         )
 
 
+@router.get("/cache/stats")
+def get_response_cache_stats(
+    current_user: User = Depends(get_current_user)
+):
+    """获取大模型响应缓存的命中统计(当前进程)"""
+    return llm_response_cache.stats()
+
+
+@router.post("/test-all", response_model=List[ModelConfigHealthResponse])
+async def test_all_model_configs(
+    test_data: ModelConfigTestAll,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    批量测试当前用户的模型配置
+    
+    缓存中有新鲜验证结果的配置直接返回缓存,其余配置并发验证(单个配置超时CONFIG_HEALTH_TIMEOUT秒)
+    
+    - **config_ids**: 要测试的配置ID(可选,默认全部)
+    - **force**: 忽略缓存重新验证(可选)
+    """
+    configs = ModelConfigService.get_configs(db=db, user_id=current_user.user_id)
+    if test_data.config_ids is not None:
+        wanted = set(test_data.config_ids)
+        configs = [config for config in configs if config.config_id in wanted]
+    
+    try:
+        return await ConfigHealthService.acheck_configs(configs, force=test_data.force)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"测试配置失败: {str(e)}"
+        )
+
+
 @router.get("/{config_id}", response_model=ModelConfigResponse)
 def get_model_config(
     config_id: UUID,
@@ -179,11 +219,13 @@ def delete_model_config(
             detail="配置不存在"
         )
     
+    ConfigHealthService.invalidate(config_id)
+    
     return None
 
 
 @router.post("/{config_id}/test", response_model=ModelConfigTestResponse)
-def test_model_config(
+async def test_model_config(
     config_id: UUID,
     test_data: ModelConfigTest,
     db: Session = Depends(get_db),
@@ -192,8 +234,11 @@ def test_model_config(
     """
     测试模型配置
     
+    验证结果会缓存,缓存新鲜时直接返回(cached为true)
+    
     - **config_id**: 配置ID
     - **test_prompt**: 测试提示词(可选,默认为"测试")
+    - **force**: 忽略缓存重新验证(可选)
     """
     # 获取配置
     config = ModelConfigService.get_config(
@@ -210,11 +255,8 @@ def test_model_config(
     
     # 测试配置
     try:
-        result = ModelConfigService.test_config(
-            config=config,
-            test_prompt=test_data.test_prompt
-        )
-        return result
+        results = await ConfigHealthService.acheck_configs([config], force=test_data.force)
+        return results[0]
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -3,17 +3,20 @@
 """
 from typing import List
 from uuid import UUID
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Response, status, Query
 from sqlalchemy.orm import Session
 
 from app.api.deps import get_db, get_current_user
 from app.api.schemas.project import (
     ProjectCreate,
     ProjectUpdate,
-    ProjectResponse
+    ProjectResponse,
+    ProjectDashboardResponse
 )
 from app.models.user import User
+from app.services.dashboard_service import DashboardService
 from app.services.project_service import ProjectService
+from app.utils.pagination import NEXT_CURSOR_HEADER
 
 router = APIRouter(prefix="/projects", tags=["projects"])
 
@@ -47,8 +50,10 @@ def create_project(
 
 @router.get("", response_model=List[ProjectResponse])
 def get_projects(
+    response: Response,
     status_filter: str | None = Query(None, alias="status", description="按状态筛选"),
     search: str | None = Query(None, description="搜索关键词"),
+    cursor: str | None = Query(None, description="分页游标(上一页响应头X-Next-Cursor)"),
     skip: int = Query(0, ge=0, description="跳过条数"),
     limit: int = Query(50, ge=1, le=100, description="限制条数"),
     db: Session = Depends(get_db),
@@ -59,19 +64,29 @@ def get_projects(
     
     - **status**: 按状态筛选(draft/processing/completed/failed)
     - **search**: 搜索关键词
-    - **skip**: 跳过条数
+    - **cursor**: 分页游标;还有下一页时响应头X-Next-Cursor返回下一页的游标(搜索时不返回,使用skip分页)
+    - **skip**: 跳过条数,不能与cursor同时使用(返回400)。不搜索时按偏移取页,响应头同样返回下一页游标,
+      之后的页建议改用cursor
     - **limit**: 限制条数(最大100)
     """
     try:
-        projects = ProjectService.get_projects(
+        page = ProjectService.get_projects(
             db=db,
             user_id=current_user.user_id,
             status=status_filter,
             search=search,
             skip=skip,
-            limit=limit
+            limit=limit,
+            cursor=cursor
+        )
+        if page.next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = page.next_cursor
+        return page.items
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
         )
-        return projects
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -178,23 +193,40 @@ def get_project_stats(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """获取项目统计信息"""
+    """获取项目统计信息(各状态项目数,取自看板统计)"""
     try:
-        total = ProjectService.count_projects(db, current_user.user_id)
-        draft = ProjectService.count_projects(db, current_user.user_id, status="draft")
-        processing = ProjectService.count_projects(db, current_user.user_id, status="processing")
-        completed = ProjectService.count_projects(db, current_user.user_id, status="completed")
-        failed = ProjectService.count_projects(db, current_user.user_id, status="failed")
+        dashboard = DashboardService.get_dashboard(db, current_user.user_id)
+        by_status = dashboard["projects_by_status"]
         
         return {
-            "total": total,
-            "draft": draft,
-            "processing": processing,
-            "completed": completed,
-            "failed": failed
+            "total": dashboard["projects_total"],
+            "draft": by_status.get("draft", 0),
+            "processing": by_status.get("processing", 0),
+            "completed": by_status.get("completed", 0),
+            "failed": by_status.get("failed", 0)
         }
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"获取统计信息失败: {str(e)}"
         )
+
+
+@router.get("/stats/dashboard", response_model=ProjectDashboardResponse)
+def get_project_dashboard(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    获取项目看板统计
+    
+    各状态项目数、排队/执行中/失败任务数、分镜总数和总时长、素材占用空间,由一次分组查询得到并按用户缓存,
+    项目、任务、分镜或素材写入后失效
+    """
+    try:
+        return DashboardService.get_dashboard(db, current_user.user_id)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"获取看板统计失败: {str(e)}"
+        )
@@ -0,0 +1,166 @@
+"""
+模型路由组API路由
+提供路由组的增删改查和路由统计查询
+"""
+from typing import List
+from uuid import UUID
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+
+from app.api.deps import get_db, get_current_user
+from app.api.schemas.routing_group import (
+    RoutingGroupCreate,
+    RoutingGroupUpdate,
+    RoutingGroupResponse,
+    RoutingGroupStatsResponse
+)
+from app.models.user import User
+from app.services.routing_group_service import RoutingGroupService
+
+router = APIRouter(prefix="/routing-groups", tags=["routing-groups"])
+
+
+@router.post("", response_model=RoutingGroupResponse, status_code=status.HTTP_201_CREATED)
+def create_routing_group(
+    group_data: RoutingGroupCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    创建路由组
+    
+    - **group_name**: 路由组名称
+    - **member_config_ids**: 成员模型配置ID,按优先级排列(仅支持文本模型)
+    """
+    try:
+        return RoutingGroupService.create_group(
+            db=db,
+            user_id=current_user.user_id,
+            group_name=group_data.group_name,
+            member_config_ids=group_data.member_config_ids
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"创建路由组失败: {str(e)}"
+        )
+
+
+@router.get("", response_model=List[RoutingGroupResponse])
+def get_routing_groups(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """获取当前用户的所有路由组"""
+    return RoutingGroupService.get_groups(db=db, user_id=current_user.user_id)
+
+
+@router.get("/{group_id}", response_model=RoutingGroupResponse)
+def get_routing_group(
+    group_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    获取指定的路由组
+    
+    - **group_id**: 路由组ID
+    """
+    group = RoutingGroupService.get_group(db=db, group_id=group_id, user_id=current_user.user_id)
+    
+    if not group:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="路由组不存在"
+        )
+    
+    return group
+
+
+@router.get("/{group_id}/stats", response_model=RoutingGroupStatsResponse)
+def get_routing_group_stats(
+    group_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    获取路由组成员的当前排序和统计(当前进程)
+    
+    每个成员包含预估代价、EWMA延迟、p95延迟、错误率、熔断状态和排序原因,
+    排在第一位的成员即下一次调用的首选
+    """
+    group = RoutingGroupService.get_group(db=db, group_id=group_id, user_id=current_user.user_id)
+    
+    if not group:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="路由组不存在"
+        )
+    
+    return RoutingGroupStatsResponse(
+        group_id=group.group_id,
+        group_name=group.group_name,
+        members=RoutingGroupService.get_route_stats(db, group)
+    )
+
+
+@router.put("/{group_id}", response_model=RoutingGroupResponse)
+def update_routing_group(
+    group_id: UUID,
+    group_data: RoutingGroupUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    更新路由组
+    
+    - **group_id**: 路由组ID
+    - 其他字段同创建接口(仅更新提供的字段)
+    """
+    try:
+        group = RoutingGroupService.update_group(
+            db=db,
+            group_id=group_id,
+            user_id=current_user.user_id,
+            **group_data.model_dump(exclude_unset=True)
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    if not group:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="路由组不存在"
+        )
+    
+    return group
+
+
+@router.delete("/{group_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_routing_group(
+    group_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    删除路由组
+    
+    - **group_id**: 路由组ID
+    """
+    success = RoutingGroupService.delete_group(db=db, group_id=group_id, user_id=current_user.user_id)
+    
+    if not success:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="路由组不存在"
+        )
+    
+    return None
@@ -1,26 +1,32 @@
 """
 脚本管理API路由
 """
-from typing import List
+from typing import List, Optional, Union
 from uuid import UUID
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
 
 from app.api.deps import get_db, get_current_user
 from app.api.schemas.script import (
+    ScriptBatchGenerateRequest,
+    ScriptBatchResponse,
     ScriptGenerateRequest,
     ScriptGenerateResponse,
+    ScriptDiffResponse,
     ScriptResponse,
+    ScriptSummary,
     ScriptUpdate
 )
 from app.models.user import User
+from app.services.script_batch_service import ScriptBatchService
 from app.services.script_service import ScriptService
+from app.utils.pagination import NEXT_CURSOR_HEADER
 
 router = APIRouter(prefix="/scripts", tags=["scripts"])
 
 
 @router.post("/generate", response_model=ScriptGenerateResponse, status_code=status.HTTP_201_CREATED)
-def generate_script(
+async def generate_script(
     project_id: UUID,
     request: ScriptGenerateRequest,
     db: Session = Depends(get_db),
@@ -32,12 +38,13 @@ def generate_script(
     - **project_id**: 项目ID(查询参数)
     - **story_outline**: 故事梗概
     - **model_config_id**: 使用的AI模型配置ID
+    - **routing_group_id**: 使用的模型路由组ID(可选,指定时在组内成员间自动选择和故障切换)
     - **system_prompt**: 自定义系统提示词(可选)
     - **temperature**: 温度参数(0.0-2.0,默认0.7)
     - **max_tokens**: 最大生成长度(500-8000,默认4000)
     """
     try:
-        result = ScriptService.generate_script(
+        result = await ScriptService.agenerate_script(
             db=db,
             user_id=current_user.user_id,
             project_id=project_id,
@@ -45,7 +52,9 @@ def generate_script(
             model_config_id=request.model_config_id,
             system_prompt=request.system_prompt,
             temperature=request.temperature,
-            max_tokens=request.max_tokens
+            max_tokens=request.max_tokens,
+            use_cache=request.use_cache,
+            routing_group_id=request.routing_group_id
         )
         
         script = result["script"]
@@ -69,24 +78,109 @@ def generate_script(
         )
 
 
-@router.get("/project/{project_id}", response_model=List[ScriptResponse])
+@router.post(
+    "/generate/batch",
+    response_model=ScriptBatchResponse,
+    response_model_exclude_none=True,
+    status_code=status.HTTP_202_ACCEPTED
+)
+def generate_scripts_batch(
+    request: ScriptBatchGenerateRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    批量生成视频脚本
+    
+    所有条目作为一个批次交给后台任务并发生成,每个厂商(或路由组)同时执行的任务数受
+    SCRIPT_BATCH_VENDOR_CONCURRENCY限制。立即返回批次ID,通过GET /scripts/batches/{batch_id}查询进度
+    
+    - **items**: 生成条目,每条包含project_id、story_outline、model_config_id或routing_group_id,
+      以及可选的system_prompt、temperature、max_tokens、use_cache
+    """
+    try:
+        return ScriptBatchService.create_batch(
+            db=db,
+            user_id=current_user.user_id,
+            items=[item.model_dump() for item in request.items]
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"创建批量生成任务失败: {str(e)}"
+        )
+
+
+@router.get("/batches/{batch_id}", response_model=ScriptBatchResponse, response_model_exclude_none=True)
+def get_script_batch(
+    batch_id: UUID,
+    include_items: bool = Query(False, description="是否返回每个条目的状态"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    查询批量生成进度
+    
+    - **batch_id**: 批次ID
+    - **include_items**: 是否返回每个条目的状态和生成的脚本ID(默认只返回汇总)
+    """
+    batch = ScriptBatchService.get_batch(
+        db=db,
+        batch_id=batch_id,
+        user_id=current_user.user_id,
+        include_items=include_items
+    )
+    
+    if not batch:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="批次不存在"
+        )
+    
+    return batch
+
+
+@router.get("/project/{project_id}", response_model=List[Union[ScriptResponse, ScriptSummary]])
 def get_scripts_by_project(
     project_id: UUID,
+    response: Response,
+    include_content: bool = Query(True, description="是否返回脚本内容,为false时只返回版本元数据"),
+    cursor: Optional[str] = Query(None, description="分页游标(上一页响应头X-Next-Cursor)"),
+    limit: Optional[int] = Query(None, ge=1, le=100, description="每页条数,不指定时返回全部版本"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
-    获取项目的所有脚本版本
+    获取项目的脚本版本(按版本号倒序)
     
     - **project_id**: 项目ID
+    - **include_content**: 是否返回脚本内容(默认true);版本列表只需元数据时传false,不读取和还原内容
+    - **cursor**: 分页游标;还有下一页时响应头X-Next-Cursor返回下一页的游标
+    - **limit**: 每页条数(最大100),不指定时返回全部版本
     """
     try:
-        scripts = ScriptService.get_scripts_by_project(
+        page = ScriptService.get_scripts_by_project(
             db=db,
             project_id=project_id,
-            user_id=current_user.user_id
+            user_id=current_user.user_id,
+            include_content=include_content,
+            cursor=cursor,
+            limit=limit
+        )
+        if page.next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = page.next_cursor
+        schema = ScriptResponse if include_content else ScriptSummary
+        return [schema.model_validate(script) for script in page.items]
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
         )
-        return scripts
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -120,6 +214,43 @@ def get_script(
     return script
 
 
+@router.get(
+    "/{script_id}/diff/{other_script_id}",
+    response_model=ScriptDiffResponse,
+    response_model_by_alias=True,
+    response_model_exclude_none=True
+)
+def diff_scripts(
+    script_id: UUID,
+    other_script_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    比较两个脚本版本
+    
+    在服务端计算段落/行级差异并按两侧内容摘要缓存,返回紧凑补丁:未改动的段落只返回下标范围,
+    新增/删除的段落返回全文,改动的段落返回行级差异
+    
+    - **script_id**: 原版本脚本ID
+    - **other_script_id**: 新版本脚本ID
+    """
+    diff = ScriptService.diff_scripts(
+        db=db,
+        script_id=script_id,
+        other_script_id=other_script_id,
+        user_id=current_user.user_id
+    )
+    
+    if not diff:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="脚本不存在"
+        )
+    
+    return diff
+
+
 @router.put("/{script_id}", response_model=ScriptResponse)
 def update_script(
     script_id: UUID,
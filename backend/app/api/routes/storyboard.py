@@ -1,9 +1,11 @@
 """
 分镜头管理API路由
 """
-from typing import List
+import json
+from typing import List, Any, AsyncIterator, Dict, Optional
 from uuid import UUID
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
 from app.api.deps import get_db, get_current_user
@@ -16,12 +18,13 @@ from app.api.schemas.storyboard import (
 )
 from app.models.user import User
 from app.services.storyboard_service import StoryboardService
+from app.utils.pagination import NEXT_CURSOR_HEADER
 
 router = APIRouter(prefix="/storyboards", tags=["storyboards"])
 
 
 @router.post("/generate", response_model=StoryboardGenerateResponse, status_code=status.HTTP_201_CREATED)
-def generate_storyboards(
+async def generate_storyboards(
     request: StoryboardGenerateRequest,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -31,19 +34,26 @@ def generate_storyboards(
     
     - **script_id**: 脚本ID
     - **model_config_id**: 使用的AI模型配置ID
+    - **routing_group_id**: 使用的模型路由组ID(可选,指定时在组内成员间自动选择和故障切换)
     - **system_prompt**: 自定义系统提示词(可选)
     - **temperature**: 温度参数(0.0-2.0,默认0.7)
     - **max_tokens**: 最大生成长度(500-6000,默认3000)
+    - **chunked**: 长脚本按场景分段并发生成(默认false)
+    - **incremental**: 只为内容变化的场景重新生成分镜(默认false)
     """
     try:
-        result = StoryboardService.generate_storyboards(
+        result = await StoryboardService.agenerate_storyboards(
             db=db,
             user_id=current_user.user_id,
             script_id=request.script_id,
             model_config_id=request.model_config_id,
             system_prompt=request.system_prompt,
             temperature=request.temperature,
-            max_tokens=request.max_tokens
+            max_tokens=request.max_tokens,
+            use_cache=request.use_cache,
+            chunked=request.chunked,
+            routing_group_id=request.routing_group_id,
+            incremental=request.incremental
         )
         
         storyboards_data = [
@@ -59,7 +69,8 @@ def generate_storyboards(
         return StoryboardGenerateResponse(
             storyboards=storyboards_data,
             count=result["count"],
-            usage=result["usage"]
+            usage=result["usage"],
+            incremental=result.get("incremental")
         )
     except ValueError as e:
         raise HTTPException(
@@ -73,24 +84,81 @@ def generate_storyboards(
         )
 
 
+async def _sse_events(events: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[str]:
+    """将分镜事件编码为Server-Sent Events格式"""
+    async for event in events:
+        data = json.dumps(event["data"], ensure_ascii=False)
+        yield f"event: {event['event']}\ndata: {data}\n\n"
+
+
+@router.post("/generate/stream")
+def stream_generate_storyboards(
+    request: StoryboardGenerateRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    流式生成分镜头剧本(Server-Sent Events)
+    
+    请求参数同 /generate(流式生成不使用响应缓存)。每解析出一个分镜立即写入并推送一个`storyboard`事件,
+    全部完成后提交并推送`done`事件;失败时推送`error`事件,与客户端断开时一样回滚,原有分镜保持不变
+    """
+    try:
+        events = StoryboardService.stream_generate_storyboards(
+            db=db,
+            user_id=current_user.user_id,
+            script_id=request.script_id,
+            model_config_id=request.model_config_id,
+            system_prompt=request.system_prompt,
+            temperature=request.temperature,
+            max_tokens=request.max_tokens,
+            routing_group_id=request.routing_group_id
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    return StreamingResponse(
+        _sse_events(events),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/script/{script_id}", response_model=List[StoryboardResponse])
 def get_storyboards_by_script(
     script_id: UUID,
+    response: Response,
+    cursor: Optional[str] = Query(None, description="分页游标(上一页响应头X-Next-Cursor)"),
+    limit: Optional[int] = Query(None, ge=1, le=500, description="每页条数,不指定时返回全部分镜"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
-    获取脚本的所有分镜
+    获取脚本的分镜(按序号排列)
     
     - **script_id**: 脚本ID
+    - **cursor**: 分页游标;还有下一页时响应头X-Next-Cursor返回下一页的游标
+    - **limit**: 每页条数(最大500),不指定时返回全部分镜
     """
     try:
-        storyboards = StoryboardService.get_storyboards_by_script(
+        page = StoryboardService.get_storyboards_by_script(
             db=db,
             script_id=script_id,
-            user_id=current_user.user_id
+            user_id=current_user.user_id,
+            cursor=cursor,
+            limit=limit
+        )
+        if page.next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = page.next_cursor
+        return page.items
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
         )
-        return storyboards
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -0,0 +1,64 @@
+"""
+Token用量API路由
+提供按模型配置、按项目的每日用量汇总
+
+用量在各进程内缓冲后批量写入,最近USAGE_FLUSH_INTERVAL秒内的调用可能尚未计入
+"""
+from datetime import date
+from typing import List, Optional
+from uuid import UUID
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+
+from app.api.deps import get_db, get_current_user
+from app.api.schemas.usage import ConfigDailyUsage, ProjectDailyUsage
+from app.models.user import User
+from app.services.usage_service import UsageService
+
+router = APIRouter(prefix="/usage", tags=["usage"])
+
+
+def _check_date_range(start_date: Optional[date], end_date: Optional[date]):
+    if start_date and end_date and start_date > end_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="开始日期不能晚于结束日期"
+        )
+
+
+@router.get("/daily/configs", response_model=List[ConfigDailyUsage])
+def get_daily_usage_by_config(
+    start_date: Optional[date] = Query(None, description="开始日期(含)"),
+    end_date: Optional[date] = Query(None, description="结束日期(含)"),
+    config_id: Optional[UUID] = Query(None, description="只查询指定模型配置"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """按天汇总每个模型配置的Token用量"""
+    _check_date_range(start_date, end_date)
+    return UsageService.get_daily_usage_by_config(
+        db=db,
+        user_id=current_user.user_id,
+        start_date=start_date,
+        end_date=end_date,
+        config_id=config_id
+    )
+
+
+@router.get("/daily/projects", response_model=List[ProjectDailyUsage])
+def get_daily_usage_by_project(
+    start_date: Optional[date] = Query(None, description="开始日期(含)"),
+    end_date: Optional[date] = Query(None, description="结束日期(含)"),
+    project_id: Optional[UUID] = Query(None, description="只查询指定项目"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """按天汇总每个项目的Token用量"""
+    _check_date_range(start_date, end_date)
+    return UsageService.get_daily_usage_by_project(
+        db=db,
+        user_id=current_user.user_id,
+        start_date=start_date,
+        end_date=end_date,
+        project_id=project_id
+    )
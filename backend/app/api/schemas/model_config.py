@@ -2,7 +2,7 @@
 模型配置相关的Pydantic模式
 """
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from datetime import datetime
 import uuid
 
@@ -50,3 +50,28 @@ class ModelConfigTest(BaseModel):
     """测试模型配置"""
     config_id: uuid.UUID
     test_prompt: str = "测试连接"
+    force: bool = Field(False, description="忽略缓存的验证结果,重新验证")
+
+
+class ModelConfigTestResponse(BaseModel):
+    """模型配置测试结果"""
+    success: bool
+    message: Optional[str] = None
+    error: Optional[str] = None
+    vendor: Optional[str] = None
+    model: Optional[str] = None
+    latency_ms: Optional[float] = None
+    checked_at: Optional[datetime] = None
+    cached: bool = False  # 是否为缓存的验证结果
+
+
+class ModelConfigTestAll(BaseModel):
+    """批量测试模型配置"""
+    config_ids: Optional[List[uuid.UUID]] = Field(None, description="要测试的配置,默认当前用户的全部配置")
+    force: bool = Field(False, description="忽略缓存的验证结果,重新验证")
+
+
+class ModelConfigHealthResponse(ModelConfigTestResponse):
+    """单个配置的健康状态"""
+    config_id: uuid.UUID
+    config_name: str
@@ -3,7 +3,7 @@
 """
 import uuid
 from datetime import datetime
-from typing import Optional
+from typing import Dict, Optional
 from pydantic import BaseModel, Field
 
 
@@ -32,3 +32,15 @@ class ProjectResponse(BaseModel):
     
     class Config:
         from_attributes = True
+
+
+class ProjectDashboardResponse(BaseModel):
+    """项目看板统计响应"""
+    projects_total: int = Field(..., description="项目总数")
+    projects_by_status: Dict[str, int] = Field(..., description="各状态项目数")
+    tasks_pending: int = Field(..., description="排队中的任务数")
+    tasks_running: int = Field(..., description="执行中的任务数")
+    tasks_failed: int = Field(..., description="失败的任务数")
+    storyboards_total: int = Field(..., description="分镜总数")
+    storyboards_duration: float = Field(..., description="分镜总时长(秒)")
+    storage_bytes: int = Field(..., description="角色图、场景图和视频片段占用空间(字节)")
@@ -0,0 +1,38 @@
+"""
+模型路由组相关的Pydantic模式
+"""
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+import uuid
+
+
+class RoutingGroupCreate(BaseModel):
+    """创建路由组"""
+    group_name: str = Field(..., min_length=1, max_length=100)
+    member_config_ids: List[uuid.UUID] = Field(..., min_length=1, description="成员模型配置ID(按优先级排列)")
+
+
+class RoutingGroupUpdate(BaseModel):
+    """更新路由组"""
+    group_name: Optional[str] = Field(None, min_length=1, max_length=100)
+    member_config_ids: Optional[List[uuid.UUID]] = Field(None, min_length=1)
+
+
+class RoutingGroupResponse(BaseModel):
+    """路由组响应"""
+    group_id: uuid.UUID
+    user_id: uuid.UUID
+    group_name: str
+    member_config_ids: List[uuid.UUID]
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+
+class RoutingGroupStatsResponse(BaseModel):
+    """路由统计响应"""
+    group_id: uuid.UUID
+    group_name: str
+    members: List[Dict[str, Any]]
@@ -3,7 +3,7 @@
 """
 import uuid
 from datetime import datetime
-from typing import Optional
+from typing import Any, List, Optional
 from pydantic import BaseModel, Field
 
 
@@ -35,16 +35,37 @@ class ScriptResponse(BaseModel):
         from_attributes = True
 
 
+class ScriptSummary(BaseModel):
+    """脚本版本元数据(不含内容)"""
+    script_id: uuid.UUID
+    project_id: uuid.UUID
+    version: int
+    is_final: bool
+    content_length: Optional[int] = Field(None, description="内容字符数")
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+
 class ScriptGenerateRequest(BaseModel):
     """脚本生成请求"""
     story_outline: str = Field(..., min_length=10, description="故事梗概")
-    model_config_id: uuid.UUID = Field(..., description="使用的AI模型配置ID")
+    model_config_id: Optional[uuid.UUID] = Field(None, description="使用的AI模型配置ID")
+    routing_group_id: Optional[uuid.UUID] = Field(
+        None,
+        description="使用的模型路由组ID(指定时忽略model_config_id)"
+    )
     system_prompt: Optional[str] = Field(
         None, 
         description="自定义系统提示词"
     )
     temperature: float = Field(0.7, ge=0.0, le=2.0, description="温度参数")
     max_tokens: int = Field(4000, ge=500, le=8000, description="最大生成长度")
+    use_cache: Optional[bool] = Field(
+        None,
+        description="是否使用响应缓存(默认取模型配置parameters.cache_enabled)"
+    )
 
 
 class ScriptGenerateResponse(BaseModel):
@@ -54,3 +75,85 @@ class ScriptGenerateResponse(BaseModel):
     version: int
     usage: dict
     created_at: datetime
+
+
+class ScriptDiffSide(BaseModel):
+    """差异一侧的脚本版本"""
+    script_id: uuid.UUID
+    version: int
+
+
+class ScriptDiffStats(BaseModel):
+    """差异统计"""
+    paragraphs_added: int
+    paragraphs_removed: int
+    paragraphs_changed: int
+    lines_added: int
+    lines_removed: int
+
+
+class ScriptDiffHunk(BaseModel):
+    """差异块,a/b为两侧段落下标范围(左闭右开)"""
+    op: str = Field(..., description="equal/insert/delete/replace")
+    a: List[int]
+    b: List[int]
+    paragraphs: Optional[List[str]] = Field(None, description="insert/delete的段落")
+    lines: Optional[List[List[Any]]] = Field(
+        None,
+        description='replace的行级差异: ["=", 行数] / ["-", 删除行] / ["+", 新增行]'
+    )
+
+
+class ScriptDiffResponse(BaseModel):
+    """脚本版本差异响应"""
+    from_: ScriptDiffSide = Field(..., alias="from")
+    to: ScriptDiffSide
+    stats: ScriptDiffStats
+    hunks: List[ScriptDiffHunk]
+    cached: bool = False
+    
+    class Config:
+        populate_by_name = True
+
+
+class ScriptBatchItem(BaseModel):
+    """批量生成条目"""
+    project_id: uuid.UUID = Field(..., description="项目ID")
+    story_outline: str = Field(..., min_length=10, description="故事梗概")
+    model_config_id: Optional[uuid.UUID] = Field(None, description="使用的AI模型配置ID")
+    routing_group_id: Optional[uuid.UUID] = Field(
+        None,
+        description="使用的模型路由组ID(指定时忽略model_config_id)"
+    )
+    system_prompt: Optional[str] = Field(None, description="自定义系统提示词")
+    temperature: float = Field(0.7, ge=0.0, le=2.0, description="温度参数")
+    max_tokens: int = Field(4000, ge=500, le=8000, description="最大生成长度")
+    use_cache: Optional[bool] = Field(None, description="是否使用响应缓存")
+
+
+class ScriptBatchGenerateRequest(BaseModel):
+    """批量脚本生成请求"""
+    items: List[ScriptBatchItem] = Field(..., min_length=1, description="生成条目")
+
+
+class ScriptBatchItemStatus(BaseModel):
+    """批量生成条目状态"""
+    task_id: uuid.UUID
+    project_id: uuid.UUID
+    status: str
+    progress: int
+    script_id: Optional[uuid.UUID] = None
+    error_message: Optional[str] = None
+
+
+class ScriptBatchResponse(BaseModel):
+    """批量生成进度"""
+    batch_id: uuid.UUID
+    total: int
+    pending: int
+    processing: int
+    completed: int
+    failed: int
+    progress: int = Field(..., description="整体进度(0-100)")
+    done: bool
+    items: Optional[List[ScriptBatchItemStatus]] = None
@@ -38,10 +38,26 @@ class StoryboardResponse(BaseModel):
 class StoryboardGenerateRequest(BaseModel):
     """分镜生成请求"""
     script_id: uuid.UUID = Field(..., description="脚本ID")
-    model_config_id: uuid.UUID = Field(..., description="使用的AI模型配置ID")
+    model_config_id: Optional[uuid.UUID] = Field(None, description="使用的AI模型配置ID")
+    routing_group_id: Optional[uuid.UUID] = Field(
+        None,
+        description="使用的模型路由组ID(指定时忽略model_config_id)"
+    )
     system_prompt: Optional[str] = Field(None, description="自定义系统提示词")
     temperature: float = Field(0.7, ge=0.0, le=2.0, description="温度参数")
     max_tokens: int = Field(3000, ge=500, le=6000, description="最大生成长度")
+    use_cache: Optional[bool] = Field(
+        None,
+        description="是否使用响应缓存(默认取模型配置parameters.cache_enabled)"
+    )
+    chunked: bool = Field(
+        False,
+        description="长脚本按场景分段并发生成,max_tokens作用于每个片段"
+    )
+    incremental: bool = Field(
+        False,
+        description="增量生成:只为脚本中内容变化的场景重新生成分镜,未变化的分镜及其视频片段保留"
+    )
 
 
 class StoryboardGenerateResponse(BaseModel):
@@ -49,3 +65,4 @@ class StoryboardGenerateResponse(BaseModel):
     storyboards: list[dict]
     count: int
     usage: dict
+    incremental: Optional[dict] = None  # 增量生成统计(units/regenerated_units/kept/created/removed)
@@ -0,0 +1,33 @@
+"""
+Token用量相关的Pydantic模式
+"""
+from pydantic import BaseModel
+from typing import Optional
+from datetime import date
+import uuid
+
+
+class UsageCounters(BaseModel):
+    """用量计数"""
+    request_count: int
+    cached_count: int
+    retry_count: int
+    prompt_tokens: int
+    completion_tokens: int
+    total_tokens: int
+
+
+class ConfigDailyUsage(UsageCounters):
+    """模型配置的单日用量"""
+    usage_date: date
+    config_id: Optional[uuid.UUID] = None  # 配置已删除时为空
+    config_name: Optional[str] = None
+    vendor: str
+    model_name: str
+
+
+class ProjectDailyUsage(UsageCounters):
+    """项目的单日用量"""
+    usage_date: date
+    project_id: Optional[uuid.UUID] = None  # 项目已删除时为空
+    project_name: Optional[str] = None
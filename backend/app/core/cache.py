@@ -0,0 +1,164 @@
+"""
+两级缓存(进程内LRU + Redis)
+
+进程内LRU提供微秒级命中,Redis层在多个API进程和Celery worker之间共享并带TTL。
+Redis不可用时自动降级为仅进程内缓存,不影响主流程
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import redis
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_redis_client: Optional[redis.Redis] = None
+_redis_lock = threading.Lock()
+
+
+def get_redis() -> redis.Redis:
+    """获取进程内共享的Redis客户端(连接池复用)"""
+    global _redis_client
+    if _redis_client is None:
+        with _redis_lock:
+            if _redis_client is None:
+                _redis_client = redis.Redis.from_url(
+                    settings.REDIS_URL,
+                    socket_timeout=1.0,
+                    socket_connect_timeout=1.0
+                )
+    return _redis_client
+
+
+class TwoTierCache:
+    """两级缓存"""
+    
+    def __init__(self, namespace: str, max_entries: int = 1024, ttl: int = 3600):
+        """
+        初始化缓存
+        
+        Args:
+            namespace: Redis键前缀
+            max_entries: 进程内LRU最大条目数
+            ttl: 过期时间(秒),同时作用于两级缓存
+        """
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._local: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"local_hits": 0, "redis_hits": 0, "misses": 0, "sets": 0, "redis_errors": 0}
+    
+    def _redis_key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+    
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+    
+    def _get_local(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.time():
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+            return value
+    
+    def _set_local(self, key: str, value: Any, ttl: int):
+        with self._lock:
+            self._local[key] = (value, time.time() + ttl)
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+    
+    def get(self, key: str) -> Optional[Any]:
+        """
+        读取缓存
+        
+        Args:
+            key: 缓存键
+        
+        Returns:
+            缓存值,未命中时返回None
+        """
+        value = self._get_local(key)
+        if value is not None:
+            self._count("local_hits")
+            return value
+        
+        try:
+            raw = get_redis().get(self._redis_key(key))
+        except redis.RedisError as e:
+            self._count("redis_errors")
+            logger.warning("读取Redis缓存失败: %s", e)
+            raw = None
+        
+        if raw is not None:
+            value = json.loads(raw)
+            self._set_local(key, value, self.ttl)
+            self._count("redis_hits")
+            return value
+        
+        self._count("misses")
+        return None
+    
+    def set(self, key: str, value: Any, ttl: Optional[int] = None):
+        """
+        写入缓存(值需可JSON序列化)
+        
+        Args:
+            key: 缓存键
+            value: 缓存值
+            ttl: 过期时间(秒),默认使用实例配置
+        """
+        ttl = ttl or self.ttl
+        self._set_local(key, value, ttl)
+        self._count("sets")
+        try:
+            get_redis().set(self._redis_key(key), json.dumps(value, ensure_ascii=False), ex=ttl)
+        except redis.RedisError as e:
+            self._count("redis_errors")
+            logger.warning("写入Redis缓存失败: %s", e)
+    
+    def delete(self, key: str):
+        """删除缓存"""
+        with self._lock:
+            self._local.pop(key, None)
+        try:
+            get_redis().delete(self._redis_key(key))
+        except redis.RedisError as e:
+            self._count("redis_errors")
+            logger.warning("删除Redis缓存失败: %s", e)
+    
+    async def aget(self, key: str) -> Optional[Any]:
+        """异步读取缓存(进程内命中时不切换线程)"""
+        value = self._get_local(key)
+        if value is not None:
+            self._count("local_hits")
+            return value
+        return await asyncio.to_thread(self.get, key)
+    
+    async def aset(self, key: str, value: Any, ttl: Optional[int] = None):
+        """异步写入缓存"""
+        await asyncio.to_thread(self.set, key, value, ttl)
+    
+    def stats(self) -> Dict[str, Any]:
+        """获取命中统计"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["local_entries"] = len(self._local)
+        lookups = stats["local_hits"] + stats["redis_hits"] + stats["misses"]
+        stats["hit_rate"] = (
+            round((stats["local_hits"] + stats["redis_hits"]) / lookups, 4) if lookups else 0.0
+        )
+        return stats
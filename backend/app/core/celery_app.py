@@ -2,6 +2,7 @@
 Celery配置和初始化
 """
 from celery import Celery
+from celery.signals import worker_process_shutdown
 from app.core.config import settings
 
 # 创建Celery应用
@@ -23,7 +24,28 @@ celery_app.conf.update(
     task_soft_time_limit=3300,  # 55分钟软超时
     worker_prefetch_multiplier=1,
     worker_max_tasks_per_child=1000,
+    beat_schedule={
+        # 定时刷新活跃模型配置的健康状态
+        "probe-model-configs": {
+            "task": "tasks.probe_model_configs",
+            "schedule": float(settings.CONFIG_HEALTH_PROBE_INTERVAL),
+        },
+    },
 )
 
 # 自动发现任务
 celery_app.autodiscover_tasks(["app.tasks"])
+
+
+@worker_process_shutdown.connect
+def close_http_clients(**kwargs):
+    """worker进程退出时关闭共享的厂商HTTP连接池"""
+    from app.services.ai_adapters.http_client import close_sync_clients
+    close_sync_clients()
+
+
+@worker_process_shutdown.connect
+def flush_usage_ledger(**kwargs):
+    """worker进程退出时写入缓冲中的用量"""
+    from app.services.usage_service import usage_ledger
+    usage_ledger.flush()
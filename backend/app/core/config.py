@@ -2,7 +2,7 @@
 核心配置模块
 """
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Dict, List
 import json
 
 
@@ -63,6 +63,94 @@ class Settings(BaseSettings):
     STORAGE_PATH: str = "./storage"
     MAX_UPLOAD_SIZE: int = 524288000  # 500MB
     
+    # AI厂商HTTP连接池配置
+    HTTP_MAX_CONNECTIONS: int = 500
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 100
+    HTTP_CONNECT_TIMEOUT: float = 10.0
+    HTTP2_ENABLED: bool = True  # 需安装h2,未安装时自动使用HTTP/1.1
+    LLM_READ_TIMEOUT: float = 300.0  # 长文本生成可能持续数分钟
+    ADAPTER_CACHE_SIZE: int = 256  # 进程内缓存的适配器实例数
+    
+    # AI厂商限流(按厂商+API Key,可在模型配置parameters中覆盖)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_DEFAULT_QPS: float = 5.0
+    RATE_LIMIT_BURST: int = 10
+    RATE_LIMIT_MAX_CONCURRENCY: int = 16  # AIMD并发窗口上限
+    RATE_LIMIT_MIN_CONCURRENCY: int = 1
+    RATE_LIMIT_MAX_WAIT: float = 300.0  # 排队超过该时长(秒)才返回错误
+    
+    # 文本生成重试与对冲
+    LLM_RETRY_MAX_ATTEMPTS: int = 3  # 含首次请求
+    LLM_RETRY_BASE_DELAY: float = 1.0
+    LLM_RETRY_MAX_DELAY: float = 20.0
+    LLM_HEDGE_ENABLED: bool = False
+    LLM_HEDGE_MIN_DELAY: float = 2.0  # 对冲等待时间不低于该值(秒)
+    LLM_HEDGE_MIN_SAMPLES: int = 20  # 延迟样本不足时不对冲
+    
+    # 多厂商路由组
+    ROUTER_ATTEMPT_TIMEOUT: float = 180.0  # 单个成员超过该时长(秒)未返回即切换
+    ROUTER_DEFAULT_LATENCY: float = 10.0  # 无统计数据时的预估延迟(秒)
+    ROUTER_ERROR_PENALTY: float = 4.0  # 错误率对预估代价的放大系数
+    ROUTER_FAILURE_THRESHOLD: int = 3  # 连续失败次数达到后熔断
+    ROUTER_CIRCUIT_COOLDOWN: float = 30.0  # 熔断时长(秒)
+    
+    # 长脚本分段生成分镜
+    STORYBOARD_CHUNK_CHARS: int = 2000  # 单个片段的最大字符数
+    STORYBOARD_CHUNK_CONCURRENCY: int = 4  # 同步调用时的并发片段数
+    
+    # 人物形象/场景图批量生成
+    IMAGE_MAX_BATCH_SIZE: int = 4  # 单次厂商调用的最大图像数(num_images)
+    IMAGE_BATCH_CONCURRENCY: int = 2  # 同时进行的厂商调用数
+    
+    # 视频生成任务集中轮询
+    VIDEO_POLL_EXPECTED_SECONDS: float = 120.0  # 5秒视频的预计生成耗时(秒),更长的视频按时长放大
+    VIDEO_POLL_MIN_INTERVAL: float = 3.0  # 接近预计完成时的轮询间隔(秒)
+    VIDEO_POLL_MAX_INTERVAL: float = 60.0  # 最大轮询间隔(秒)
+    VIDEO_POLL_MAX_WAIT: float = 1800.0  # 超过该时长(秒)未完成视为超时
+    VIDEO_POLL_BATCH_SIZE: int = 100  # 单批取出的到期任务数
+    VIDEO_POLL_CONCURRENCY: int = 20  # 同时进行的状态查询数
+    VIDEO_POLL_CLAIM_LEASE: float = 120.0  # 取出任务的租约(秒),轮询器退出后到期重新取出
+    VIDEO_POLL_TICK: float = 1.0  # 空闲时检查到期任务的最长间隔(秒)
+    
+    # Token用量台账
+    USAGE_LEDGER_ENABLED: bool = True
+    USAGE_FLUSH_INTERVAL: float = 5.0  # 定时批量写入间隔(秒)
+    USAGE_FLUSH_MAX_RECORDS: int = 200  # 缓冲区累计记录数达到后立即写入
+    
+    # 模型配置健康检查
+    CONFIG_HEALTH_TTL: int = 600  # 验证成功结果的缓存时间(秒)
+    CONFIG_HEALTH_FAILURE_TTL: int = 60  # 验证失败结果的缓存时间(秒)
+    CONFIG_HEALTH_TIMEOUT: float = 20.0  # 单个配置的验证超时(秒)
+    CONFIG_HEALTH_CONCURRENCY: int = 8  # 批量验证时同时进行的验证数
+    CONFIG_HEALTH_PROBE_INTERVAL: int = 300  # 后台探测周期(秒)
+    CONFIG_HEALTH_PROBE_BATCH: int = 50  # 单轮探测的最大配置数
+    CONFIG_HEALTH_PROBE_CONCURRENCY: int = 2  # 后台探测同时进行的验证数
+    CONFIG_HEALTH_ACTIVE_DAYS: int = 7  # 近期有用量或修改过的配置才参与后台探测
+    
+    # 脚本版本增量存储
+    SCRIPT_SNAPSHOT_INTERVAL: int = 10  # 每个完整快照之后最多保存的增量版本数
+    SCRIPT_DELTA_MAX_RATIO: float = 0.5  # 增量超过完整内容长度的该比例时改存完整快照
+    SCRIPT_CONTENT_CACHE_TTL: int = 3600  # 还原后脚本内容的缓存时间(秒)
+    SCRIPT_DIFF_CACHE_TTL: int = 86400  # 版本差异的缓存时间(秒),按内容摘要缓存
+    
+    # 批量脚本生成
+    SCRIPT_BATCH_MAX_ITEMS: int = 100  # 单个批次的最大条目数
+    SCRIPT_BATCH_VENDOR_CONCURRENCY: int = 4  # 每个厂商(或路由组)同时执行的批量生成任务数
+    SCRIPT_BATCH_VENDOR_LIMITS_JSON: str = '{}'  # 按厂商覆盖并发数,如{"tongyi": 8, "baidu": 2}
+    SCRIPT_BATCH_SLOT_LEASE: int = 900  # 执行名额的租约(秒),worker异常退出后到期自动释放
+    SCRIPT_BATCH_RETRY_DELAY: float = 5.0  # 没有执行名额时重新排队的间隔(秒)
+    
+    @property
+    def SCRIPT_BATCH_VENDOR_LIMITS(self) -> Dict[str, int]:
+        return json.loads(self.SCRIPT_BATCH_VENDOR_LIMITS_JSON)
+    
+    # 项目看板
+    DASHBOARD_CACHE_TTL: int = 300  # 看板统计的缓存时间(秒),相关数据写入后立即失效
+    
+    # 大模型响应缓存
+    LLM_CACHE_TTL: int = 86400  # 秒
+    LLM_CACHE_MAX_ENTRIES: int = 1024
+    
     # CORS配置
     BACKEND_CORS_ORIGINS: str = '["http://localhost:3000", "http://localhost:5173"]'
     
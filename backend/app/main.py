@@ -4,7 +4,10 @@ FastAPI主应用
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
-from app.api.routes import auth, model_config, script, project, storyboard
+from app.api.routes import auth, model_config, routing_group, script, project, storyboard, usage
+from app.services.ai_adapters.http_client import aclose_async_client, close_sync_clients
+from app.services.usage_service import usage_ledger
+from app.utils.pagination import NEXT_CURSOR_HEADER
 
 # 创建FastAPI应用
 app = FastAPI(
@@ -20,14 +23,25 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 # 注册路由
 app.include_router(auth.router, prefix="/api")
 app.include_router(model_config.router, prefix="/api")
+app.include_router(routing_group.router, prefix="/api")
 app.include_router(script.router, prefix="/api")
 app.include_router(project.router, prefix="/api")
 app.include_router(storyboard.router, prefix="/api")
+app.include_router(usage.router, prefix="/api")
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    """关闭共享的AI厂商HTTP连接池,写入缓冲中的用量"""
+    await aclose_async_client()
+    close_sync_clients()
+    usage_ledger.flush()
 
 
 @app.get("/")
@@ -2,7 +2,7 @@
 导出所有数据模型
 """
 from app.models.user import User
-from app.models.ai_model import AIModelConfig
+from app.models.ai_model import AIModelConfig, ModelRoutingGroup
 from app.models.project import (
     VideoProject,
     Script,
@@ -14,10 +14,12 @@ from app.models.project import (
     VideoSegment,
     Task
 )
+from app.models.usage import UsageRecord
 
 __all__ = [
     "User",
     "AIModelConfig",
+    "ModelRoutingGroup",
     "VideoProject",
     "Script",
     "Character",
@@ -26,5 +28,6 @@ __all__ = [
     "SceneImage",
     "Storyboard",
     "VideoSegment",
-    "Task"
+    "Task",
+    "UsageRecord"
 ]
@@ -24,9 +24,28 @@ class AIModelConfig(Base):
     user_prompt_template = Column(Text, nullable=True)
     parameters = Column(JSONB, default={}, nullable=False)  # temperature等参数
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
     # 关系
     user = relationship("User", backref="model_configs")
     
     def __repr__(self):
         return f"<AIModelConfig(name='{self.config_name}', vendor='{self.vendor}', model='{self.model_name}')>"
+
+
+class ModelRoutingGroup(Base):
+    """模型路由组表(多个文本模型配置互为备份)"""
+    __tablename__ = "model_routing_groups"
+    
+    group_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(UUID(as_uuid=True), ForeignKey('users.user_id', ondelete='CASCADE'), nullable=False, index=True)
+    group_name = Column(String(100), nullable=False)
+    member_config_ids = Column(JSONB, default=[], nullable=False)  # 按优先级排列的config_id列表
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    # 关系
+    user = relationship("User", backref="routing_groups")
+    
+    def __repr__(self):
+        return f"<ModelRoutingGroup(name='{self.group_name}', members={len(self.member_config_ids or [])})>"
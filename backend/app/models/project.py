@@ -1,10 +1,10 @@
 """
 视频项目相关模型
 """
-from sqlalchemy import Column, String, Text, Integer, Float, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, String, Text, Integer, Float, Boolean, DateTime, ForeignKey, Index
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, synonym
 import uuid
 from app.core.database import Base
 
@@ -17,14 +17,23 @@ class VideoProject(Base):
     user_id = Column(UUID(as_uuid=True), ForeignKey('users.user_id', ondelete='CASCADE'), nullable=False, index=True)
     project_name = Column(String(200), nullable=False)
     story_synopsis = Column(Text, nullable=True)
+    description = synonym("story_synopsis")  # 接口中使用的名称
     status = Column(String(50), default='draft', nullable=False, index=True)  # draft/in_progress/completed
     workflow_graph = Column(JSONB, default={}, nullable=False)
+    script_version_seq = Column(Integer, default=0, server_default='0', nullable=False)  # 已分配的最大脚本版本号
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
     # 关系
     user = relationship("User", backref="projects")
     
+    # 项目列表游标分页的组合索引;项目搜索使用的pg_trgm索引(扩展由alembic迁移创建)
+    __table_args__ = (
+        Index("ix_video_projects_user_updated", user_id, updated_at, project_id),
+        Index("ix_video_projects_name_trgm", project_name, postgresql_using="gin", postgresql_ops={"project_name": "gin_trgm_ops"}),
+        Index("ix_video_projects_synopsis_trgm", story_synopsis, postgresql_using="gin", postgresql_ops={"story_synopsis": "gin_trgm_ops"}),
+    )
+    
     def __repr__(self):
         return f"<VideoProject(name='{self.project_name}', status='{self.status}')>"
 
@@ -36,8 +45,15 @@ class Script(Base):
     script_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     project_id = Column(UUID(as_uuid=True), ForeignKey('video_projects.project_id', ondelete='CASCADE'), nullable=False, index=True)
     version = Column(Integer, nullable=False, default=1)
-    content = Column(Text, nullable=False)
+    # 完整快照保存在content中;增量版本的content为空,delta为相对base_script的行级增量,
+    # 由ScriptService.load_contents还原
+    content = Column(Text, nullable=True)
+    delta = Column(Text, nullable=True)
+    delta_text = Column(Text, nullable=True)  # 增量版本插入的文本(纯文本,供全文搜索)
+    base_script_id = Column(UUID(as_uuid=True), ForeignKey('scripts.script_id'), nullable=True, index=True)
+    content_length = Column(Integer, nullable=True)  # 完整内容字符数
     is_approved = Column(Boolean, default=False, nullable=False)
+    is_final = synonym("is_approved")  # 服务和接口中使用的名称
     generated_by_config = Column(UUID(as_uuid=True), ForeignKey('ai_model_configs.config_id', ondelete='SET NULL'), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
@@ -45,6 +61,18 @@ class Script(Base):
     project = relationship("VideoProject", backref="scripts")
     model_config = relationship("AIModelConfig")
     
+    # 版本列表游标分页的组合索引;脚本全文搜索:快照取content,增量版本取插入的文本
+    # (沿用的行在同一项目的快照中)
+    __table_args__ = (
+        Index("ix_scripts_project_version", project_id, version, script_id),
+        Index(
+            "ix_scripts_text_trgm",
+            func.coalesce(content, delta_text).label("script_text"),
+            postgresql_using="gin",
+            postgresql_ops={"script_text": "gin_trgm_ops"}
+        ),
+    )
+    
     def __repr__(self):
         return f"<Script(project_id='{self.project_id}', version={self.version})>"
 
@@ -133,19 +161,30 @@ class Storyboard(Base):
     
     storyboard_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     script_id = Column(UUID(as_uuid=True), ForeignKey('scripts.script_id', ondelete='CASCADE'), nullable=False, index=True)
-    shot_number = Column(Integer, nullable=False)
+    # 属性名与服务层/接口保持一致,数据库列名沿用设计文档中的shot_number/description
+    sequence_number = Column("shot_number", Integer, nullable=False)
     duration = Column(Float, nullable=False)
-    description = Column(Text, nullable=False)
+    content = Column("description", Text, nullable=False)
     camera_angle = Column(String(50), nullable=True)
     scene_id = Column(UUID(as_uuid=True), ForeignKey('scenes.scene_id', ondelete='SET NULL'), nullable=True)
     character_ids = Column(JSONB, default=[], nullable=False)
+    # 生成时记录分镜来源的脚本单元,脚本修改后据此判断分镜是否需要重新生成;手动添加的分镜没有来源
+    source_index = Column(Integer, nullable=True)  # 来源单元在脚本中的序号(多个单元时为第一个)
+    source_hash = Column(String(64), nullable=True)  # 来源单元内容的指纹
+    source_span = Column(Integer, nullable=True)  # 来源单元的个数(分段/整篇生成时一组分镜对应多个单元),为空时为1
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # 关系
     script = relationship("Script", backref="storyboards")
     scene = relationship("Scene")
     
+    # 分镜列表游标分页的组合索引
+    __table_args__ = (
+        Index("ix_storyboards_script_sequence", script_id, sequence_number, storyboard_id),
+    )
+    
     def __repr__(self):
-        return f"<Storyboard(shot_number={self.shot_number})>"
+        return f"<Storyboard(sequence_number={self.sequence_number})>"
 
 
 class VideoSegment(Base):
@@ -179,6 +218,7 @@ class Task(Base):
     project_id = Column(UUID(as_uuid=True), ForeignKey('video_projects.project_id', ondelete='CASCADE'), nullable=False, index=True)
     task_type = Column(String(50), nullable=False, index=True)  # script/character/scene/video
     celery_task_id = Column(String(255), nullable=True, index=True)
+    batch_id = Column(UUID(as_uuid=True), nullable=True, index=True)  # 批量生成的批次ID
     status = Column(String(50), default='pending', nullable=False, index=True)  # pending/running/success/failed
     progress = Column(Integer, default=0, nullable=False)  # 0-100
     error_message = Column(Text, nullable=True)
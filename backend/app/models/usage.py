@@ -0,0 +1,42 @@
+"""
+Token用量台账模型
+"""
+from sqlalchemy import Column, String, Integer, BigInteger, Date, DateTime, ForeignKey, Index
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+import uuid
+from app.core.database import Base
+
+
+class UsageRecord(Base):
+    """
+    Token用量台账表
+    
+    每行是一个刷写周期内同一(日期, 用户, 模型配置, 项目, 操作)的聚合用量,
+    按天汇总时对同一维度的多行求和
+    """
+    __tablename__ = "usage_ledger"
+    
+    record_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    usage_date = Column(Date, nullable=False)
+    user_id = Column(UUID(as_uuid=True), ForeignKey('users.user_id', ondelete='CASCADE'), nullable=False)
+    config_id = Column(UUID(as_uuid=True), ForeignKey('ai_model_configs.config_id', ondelete='SET NULL'), nullable=True)
+    project_id = Column(UUID(as_uuid=True), ForeignKey('video_projects.project_id', ondelete='SET NULL'), nullable=True)
+    operation = Column(String(50), nullable=False)  # script/storyboard等
+    vendor = Column(String(50), nullable=False)
+    model_name = Column(String(100), nullable=False)
+    request_count = Column(Integer, default=0, nullable=False)
+    cached_count = Column(Integer, default=0, nullable=False)  # 命中响应缓存的请求数
+    retry_count = Column(Integer, default=0, nullable=False)
+    prompt_tokens = Column(BigInteger, default=0, nullable=False)
+    completion_tokens = Column(BigInteger, default=0, nullable=False)
+    total_tokens = Column(BigInteger, default=0, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        Index("ix_usage_ledger_user_config_date", "user_id", "config_id", "usage_date"),
+        Index("ix_usage_ledger_user_project_date", "user_id", "project_id", "usage_date"),
+    )
+    
+    def __repr__(self):
+        return f"<UsageRecord(date='{self.usage_date}', vendor='{self.vendor}', total_tokens={self.total_tokens})>"
@@ -1,14 +1,35 @@
 """
 百度文心一言适配器
 """
-from typing import Dict, Any, Optional
+import time
+from typing import Dict, Any, Optional, AsyncIterator, Iterator, Tuple
 import qianfan
 from app.services.ai_adapters.base import TextModelAdapter
+from app.services.ai_adapters.cache import cached_generation
+from app.services.ai_adapters.http_client import get_async_client, aiter_sse_data
+from app.services.ai_adapters.rate_limit import rate_limited
+from app.services.ai_adapters.retry import with_retry
 
 
 class BaiduAdapter(TextModelAdapter):
     """百度文心适配器"""
     
+    vendor = "baidu"
+    
+    DEFAULT_API_BASE = "https://aip.baidubce.com"
+    
+    # 模型名称 -> 千帆对话接口路径
+    MODEL_ENDPOINTS = {
+        "ERNIE-Bot-turbo": "eb-instant",
+        "ERNIE-Bot": "completions",
+        "ERNIE-Bot-4": "completions_pro",
+        "ERNIE-Speed-8K": "ernie_speed",
+        "ERNIE-Lite-8K": "ernie-lite-8k",
+    }
+    
+    # (api_key, secret_key) -> (access_token, 过期时间戳),进程内共享
+    _access_tokens: Dict[Tuple[str, str], Tuple[str, float]] = {}
+    
     def __init__(self, api_key: str, secret_key: str, model_name: str = "ERNIE-Bot-turbo", **kwargs):
         super().__init__(api_key, **kwargs)
         self.secret_key = secret_key
@@ -32,6 +53,9 @@ class BaiduAdapter(TextModelAdapter):
         """生成内容"""
         return self.generate_text(prompt, **params)
     
+    @cached_generation
+    @with_retry
+    @rate_limited
     def generate_text(
         self,
         prompt: str,
@@ -42,10 +66,7 @@ class BaiduAdapter(TextModelAdapter):
     ) -> Dict[str, Any]:
         """生成文本"""
         try:
-            messages = []
-            if system_prompt:
-                messages.append({"role": "system", "content": system_prompt})
-            messages.append({"role": "user", "content": prompt})
+            messages = self._build_messages(prompt, system_prompt)
             
             response = self.client.do(
                 model=self.model_name,
@@ -66,6 +87,153 @@ class BaiduAdapter(TextModelAdapter):
                     "total_tokens": response.get("usage", {}).get("total_tokens", 0)
                 }
             }
-                
+        
+        except Exception as e:
+            return self.handle_error(e)
+    
+    @rate_limited
+    def stream_generate(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 2000,
+        **kwargs
+    ) -> Iterator[str]:
+        """流式生成文本"""
+        responses = self.client.do(
+            model=self.model_name,
+            messages=self._build_messages(prompt, system_prompt),
+            api_key=self.api_key,
+            secret_key=self.secret_key,
+            temperature=temperature,
+            max_output_tokens=max_tokens,
+            stream=True,
+            **kwargs
+        )
+        
+        for response in responses:
+            if response.get("result"):
+                yield response["result"]
+    
+    @property
+    def _api_base(self) -> str:
+        return (self.api_endpoint or self.DEFAULT_API_BASE).rstrip("/")
+    
+    async def _aget_access_token(self) -> str:
+        """获取access_token(提前5分钟刷新)"""
+        cache_key = (self.api_key, self.secret_key)
+        cached = self._access_tokens.get(cache_key)
+        if cached and cached[1] > time.time():
+            return cached[0]
+        
+        client = get_async_client()
+        response = await client.post(
+            f"{self._api_base}/oauth/2.0/token",
+            params={
+                "grant_type": "client_credentials",
+                "client_id": self.api_key,
+                "client_secret": self.secret_key
+            }
+        )
+        data = response.json()
+        if "access_token" not in data:
+            raise RuntimeError(f"获取access_token失败: {data.get('error_description', data)}")
+        
+        expires_at = time.time() + data.get("expires_in", 2592000) - 300
+        self._access_tokens[cache_key] = (data["access_token"], expires_at)
+        return data["access_token"]
+    
+    async def _achat_url(self) -> str:
+        endpoint = self.MODEL_ENDPOINTS.get(self.model_name, self.model_name.lower())
+        access_token = await self._aget_access_token()
+        return (
+            f"{self._api_base}/rpc/2.0/ai_custom/v1/wenxinworkshop/chat/{endpoint}"
+            f"?access_token={access_token}"
+        )
+    
+    @staticmethod
+    def _build_payload(
+        prompt: str,
+        system_prompt: Optional[str],
+        temperature: float,
+        max_tokens: int,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """构建千帆HTTP请求体(系统提示词通过system字段传递)"""
+        payload = {
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": temperature,
+            "max_output_tokens": max_tokens,
+            **kwargs
+        }
+        if system_prompt:
+            payload["system"] = system_prompt
+        return payload
+    
+    @cached_generation
+    @with_retry
+    @rate_limited
+    async def agenerate_text(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 2000,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """异步生成文本"""
+        try:
+            client = get_async_client()
+            response = await client.post(
+                await self._achat_url(),
+                json=self._build_payload(prompt, system_prompt, temperature, max_tokens, **kwargs)
+            )
+            data = response.json()
+            
+            # 千帆在HTTP 200中通过error_code返回业务错误
+            if response.status_code == 200 and "error_code" not in data:
+                usage = data.get("usage", {})
+                return {
+                    "success": True,
+                    "text": data["result"],
+                    "usage": {
+                        "prompt_tokens": usage.get("prompt_tokens", 0),
+                        "completion_tokens": usage.get("completion_tokens", 0),
+                        "total_tokens": usage.get("total_tokens", 0)
+                    }
+                }
+            else:
+                return {
+                    "success": False,
+                    "error": f"API返回错误: {data.get('error_code')} - {data.get('error_msg')}",
+                    "status_code": response.status_code
+                }
+        
         except Exception as e:
             return self.handle_error(e)
+    
+    @rate_limited
+    async def astream_generate(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 2000,
+        **kwargs
+    ) -> AsyncIterator[str]:
+        """异步流式生成文本"""
+        payload = self._build_payload(prompt, system_prompt, temperature, max_tokens, **kwargs)
+        payload["stream"] = True
+        
+        client = get_async_client()
+        async with client.stream("POST", await self._achat_url(), json=payload) as response:
+            if response.status_code != 200:
+                await response.aread()
+                raise RuntimeError(f"API返回错误: {response.status_code} - {response.text}")
+            
+            async for event in aiter_sse_data(response):
+                if "error_code" in event:
+                    raise RuntimeError(f"API返回错误: {event['error_code']} - {event.get('error_msg')}")
+                if event.get("result"):
+                    yield event["result"]
@@ -1,13 +1,20 @@
 """
 AI模型适配器基类
 """
+import asyncio
+import os
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional, Iterator
+from typing import Dict, Any, Optional, Iterator, AsyncIterator, Callable
+
+from app.utils.image_stream import ImageSource, open_image_source, save_base64_image
 
 
 class BaseModelAdapter(ABC):
     """AI模型适配器基类"""
     
+    # 厂商标识,与AIModelConfig.vendor一致
+    vendor: str = ""
+    
     def __init__(self, api_key: str, api_endpoint: Optional[str] = None, **kwargs):
         """
         初始化适配器
@@ -39,19 +46,34 @@ class BaseModelAdapter(ABC):
         Args:
             prompt: 提示词
             **params: 生成参数
-            
+        
         Returns:
             Dict: 生成结果
         """
         pass
     
+    async def agenerate(self, prompt: str, **params) -> Dict[str, Any]:
+        """
+        异步生成内容
+        
+        默认在线程池中执行同步的generate,子类可覆盖为原生异步实现
+        
+        Args:
+            prompt: 提示词
+            **params: 生成参数
+        
+        Returns:
+            Dict: 生成结果
+        """
+        return await asyncio.to_thread(self.generate, prompt, **params)
+    
     def handle_error(self, error: Exception) -> Dict[str, Any]:
         """
         处理错误
         
         Args:
             error: 异常对象
-            
+        
         Returns:
             Dict: 错误响应
         """
@@ -83,12 +105,21 @@ class TextModelAdapter(BaseModelAdapter):
             temperature: 温度参数
             max_tokens: 最大token数
             **kwargs: 其他参数
-            
+        
         Returns:
             Dict: 生成结果 {"text": str, "usage": dict}
         """
         pass
     
+    @staticmethod
+    def _build_messages(prompt: str, system_prompt: Optional[str] = None) -> list:
+        """构建对话消息列表"""
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.append({"role": "user", "content": prompt})
+        return messages
+    
     def stream_generate(self, prompt: str, **params) -> Iterator[str]:
         """
         流式生成(可选实现)
@@ -96,11 +127,61 @@ class TextModelAdapter(BaseModelAdapter):
         Args:
             prompt: 提示词
             **params: 生成参数
-            
+        
         Yields:
             str: 生成的文本片段
         """
         raise NotImplementedError("Stream generation not supported")
+    
+    async def agenerate(self, prompt: str, **params) -> Dict[str, Any]:
+        """异步生成内容"""
+        return await self.agenerate_text(prompt, **params)
+    
+    async def agenerate_text(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 2000,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """
+        异步生成文本
+        
+        默认在线程池中执行generate_text,子类应覆盖为基于共享异步HTTP客户端的原生实现,
+        避免长时间占用线程池
+        
+        Args:
+            prompt: 用户提示词
+            system_prompt: 系统提示词
+            temperature: 温度参数
+            max_tokens: 最大token数
+            **kwargs: 其他参数
+        
+        Returns:
+            Dict: 生成结果 {"text": str, "usage": dict}
+        """
+        return await asyncio.to_thread(
+            self.generate_text,
+            prompt,
+            system_prompt=system_prompt,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            **kwargs
+        )
+    
+    def astream_generate(self, prompt: str, **params) -> AsyncIterator[str]:
+        """
+        异步流式生成(可选实现)
+        
+        Args:
+            prompt: 提示词
+            **params: 生成参数
+        
+        Yields:
+            str: 生成的文本片段
+        """
+        raise NotImplementedError("Async stream generation not supported")
 
 
 class ImageModelAdapter(BaseModelAdapter):
@@ -124,12 +205,61 @@ class ImageModelAdapter(BaseModelAdapter):
             height: 图像高度
             num_images: 生成数量
             **kwargs: 其他参数
-            
+        
         Returns:
             Dict: 生成结果 {"images": [{"url": str, "b64": str}]}
         """
         pass
     
+    def generate_images_to_disk(
+        self,
+        prompt: str,
+        path_for: Callable[[int, str], str],
+        width: int = 1024,
+        height: int = 1024,
+        num_images: int = 1,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """
+        生成图像并保存到磁盘
+        
+        默认调用generate_image后逐张解码保存,子类应覆盖为边接收边解码的流式实现
+        
+        Args:
+            prompt: 图像描述
+            path_for: 根据(图像序号, 扩展名)返回保存路径
+            width: 图像宽度
+            height: 图像高度
+            num_images: 生成数量
+            **kwargs: 其他参数
+        
+        Returns:
+            Dict: 生成结果 {"images": [{"local_path": str, "file_size": int}]}
+        """
+        result = self.generate_image(prompt, width=width, height=height, num_images=num_images, **kwargs)
+        return self._save_image_result(result, path_for)
+    
+    def _save_image_result(self, result: Dict[str, Any], path_for: Callable[[int, str], str]) -> Dict[str, Any]:
+        """把结果中的base64图像逐张解码保存"""
+        if not result.get("success"):
+            return result
+        
+        saved = []
+        try:
+            for idx, image in enumerate(result.get("images", [])):
+                data = image.get("b64") if isinstance(image, dict) else image
+                if not data:
+                    raise ValueError(f"第{idx + 1}张图像没有base64数据")
+                local_path, file_size = save_base64_image(data, idx, path_for)
+                saved.append({"local_path": local_path, "file_size": file_size})
+        except Exception as e:
+            for image in saved:
+                if os.path.exists(image["local_path"]):
+                    os.remove(image["local_path"])
+            return self.handle_error(e)
+        
+        return {"success": True, "images": saved}
+    
     def img2img(
         self,
         image_data: bytes,
@@ -145,11 +275,38 @@ class ImageModelAdapter(BaseModelAdapter):
             prompt: 修改描述
             strength: 变化强度
             **kwargs: 其他参数
-            
+        
         Returns:
             Dict: 生成结果
         """
         raise NotImplementedError("Image-to-image not supported")
+    
+    def img2img_to_disk(
+        self,
+        image: ImageSource,
+        prompt: str,
+        path_for: Callable[[int, str], str],
+        strength: float = 0.8,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """
+        图生图,参考图从文件或缓冲区读取,结果保存到磁盘
+        
+        默认读入整张参考图后调用img2img,子类应覆盖为multipart流式上传的实现
+        
+        Args:
+            image: 参考图(文件路径、二进制文件对象或内存缓冲区)
+            prompt: 修改描述
+            path_for: 根据(图像序号, 扩展名)返回保存路径
+            strength: 变化强度
+            **kwargs: 其他参数
+        
+        Returns:
+            Dict: 生成结果 {"images": [{"local_path": str, "file_size": int}]}
+        """
+        with open_image_source(image) as (_, f):
+            image_data = f.read()
+        return self._save_image_result(self.img2img(image_data, prompt, strength=strength, **kwargs), path_for)
 
 
 class VideoModelAdapter(BaseModelAdapter):
@@ -175,7 +332,7 @@ class VideoModelAdapter(BaseModelAdapter):
             width: 视频宽度
             height: 视频高度
             **kwargs: 其他参数
-            
+        
         Returns:
             Dict: 生成结果 {"task_id": str, "status": str}
         """
@@ -188,8 +345,22 @@ class VideoModelAdapter(BaseModelAdapter):
         
         Args:
             task_id: 任务ID
-            
+        
         Returns:
             Dict: 状态信息 {"status": str, "progress": int, "video_url": str}
         """
         pass
+    
+    async def acheck_status(self, task_id: str) -> Dict[str, Any]:
+        """
+        异步检查视频生成状态
+        
+        默认在线程池中执行check_status,子类应覆盖为基于共享异步HTTP客户端的原生实现
+        
+        Args:
+            task_id: 任务ID
+        
+        Returns:
+            Dict: 状态信息 {"status": str, "progress": int, "video_url": str}
+        """
+        return await asyncio.to_thread(self.check_status, task_id)
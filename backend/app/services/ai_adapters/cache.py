@@ -0,0 +1,115 @@
+"""
+大模型响应缓存
+
+对相同的(厂商, 模型, 系统提示词, 提示词, 温度, 最大长度)请求直接返回缓存结果,
+用于界面超时后的重试和temperature=0的重复生成,避免重复消耗厂商配额。
+缓存为显式开启:调用时传入use_cache=True,或在模型配置parameters中设置cache_enabled
+"""
+import functools
+import hashlib
+import inspect
+import json
+from typing import Any, Dict, Optional
+
+from app.core.cache import TwoTierCache
+from app.core.config import settings
+
+llm_response_cache = TwoTierCache(
+    namespace="llm_cache",
+    max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+    ttl=settings.LLM_CACHE_TTL
+)
+
+
+def make_cache_key(
+    vendor: str,
+    model_name: str,
+    prompt: str,
+    system_prompt: Optional[str],
+    temperature: float,
+    max_tokens: int,
+    **kwargs
+) -> str:
+    """计算请求的缓存键"""
+    raw = json.dumps(
+        [vendor, model_name, system_prompt, prompt, temperature, max_tokens, kwargs],
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str
+    )
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _resolve_cache_key(adapter, args: tuple, kwargs: Dict[str, Any]) -> Optional[str]:
+    """处理use_cache开关并返回缓存键,未开启缓存时返回None"""
+    use_cache = kwargs.pop("use_cache", None)
+    if use_cache is None:
+        use_cache = bool(adapter.config.get("cache_enabled", False))
+    if not use_cache:
+        return None
+    
+    params = dict(kwargs)
+    prompt = args[0] if args else params.pop("prompt")
+    return make_cache_key(
+        adapter.vendor,
+        adapter.model_name,
+        prompt,
+        params.pop("system_prompt", None),
+        params.pop("temperature", 0.7),
+        params.pop("max_tokens", 2000),
+        **params
+    )
+
+
+# 属于单次调用而不属于响应内容的字段,不写入缓存(路由信息由命中时的调用重新填写)
+_CALL_FIELDS = ("cached", "routing", "failovers")
+
+
+def _cacheable(result: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: value for key, value in result.items() if key not in _CALL_FIELDS}
+
+
+def _mark_cached(result: Dict[str, Any]) -> Dict[str, Any]:
+    return {**_cacheable(result), "cached": True}
+
+
+def cached_generation(func):
+    """
+    为generate_text/agenerate_text添加响应缓存
+    
+    只缓存成功的结果;命中时返回的结果带有"cached": True
+    """
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(self, *args, **kwargs):
+            cache_key = _resolve_cache_key(self, args, kwargs)
+            if cache_key is None:
+                return await func(self, *args, **kwargs)
+            
+            cached = await llm_response_cache.aget(cache_key)
+            if cached is not None:
+                return _mark_cached(cached)
+            
+            result = await func(self, *args, **kwargs)
+            if result.get("success"):
+                await llm_response_cache.aset(cache_key, _cacheable(result))
+            return result
+        
+        return async_wrapper
+    
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        cache_key = _resolve_cache_key(self, args, kwargs)
+        if cache_key is None:
+            return func(self, *args, **kwargs)
+        
+        cached = llm_response_cache.get(cache_key)
+        if cached is not None:
+            return _mark_cached(cached)
+        
+        result = func(self, *args, **kwargs)
+        if result.get("success"):
+            llm_response_cache.set(cache_key, _cacheable(result))
+        return result
+    
+    return wrapper
@@ -0,0 +1,138 @@
+"""
+AI厂商共享HTTP客户端
+
+每个事件循环持有一个长连接的httpx.AsyncClient,所有适配器共用同一个连接池;
+同步调用按厂商端点共享httpx.Client。避免每次调用都重新建立TCP+TLS连接
+"""
+import asyncio
+import json
+import threading
+import weakref
+from typing import Any, AsyncIterator, Dict, Optional
+
+import httpx
+
+from app.core.config import settings
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# 事件循环 -> 异步客户端(AsyncClient的连接绑定在创建它的事件循环上)
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+    weakref.WeakKeyDictionary()
+)
+
+# 端点 -> 同步客户端
+_sync_clients: Dict[str, httpx.Client] = {}
+_sync_lock = threading.Lock()
+
+
+def _use_http2() -> bool:
+    return settings.HTTP2_ENABLED and HTTP2_AVAILABLE
+
+
+def _build_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS
+    )
+
+
+def build_timeout(read_timeout: Optional[float] = None) -> httpx.Timeout:
+    """构建连接/读取分离的超时配置"""
+    return httpx.Timeout(
+        connect=settings.HTTP_CONNECT_TIMEOUT,
+        read=read_timeout or settings.LLM_READ_TIMEOUT,
+        write=settings.HTTP_CONNECT_TIMEOUT,
+        pool=None
+    )
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """
+    获取当前事件循环的共享异步HTTP客户端
+    
+    Returns:
+        httpx.AsyncClient: 进程内共享的异步客户端
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            limits=_build_limits(),
+            timeout=build_timeout(),
+            http2=_use_http2()
+        )
+        _async_clients[loop] = client
+    return client
+
+
+async def aclose_async_client():
+    """关闭当前事件循环的共享异步客户端(应用关闭时调用)"""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    client = _async_clients.pop(loop, None)
+    if client is not None and not client.is_closed:
+        await client.aclose()
+
+
+def get_sync_client(endpoint: str) -> httpx.Client:
+    """
+    获取指定厂商端点的共享同步HTTP客户端
+    
+    客户端不携带认证头,不同租户共用连接池,认证信息需按请求传入
+    
+    Args:
+        endpoint: 厂商API端点(如 https://api.example.com)
+    
+    Returns:
+        httpx.Client: 以该端点为base_url的共享客户端
+    """
+    key = endpoint.rstrip("/")
+    client = _sync_clients.get(key)
+    if client is None or client.is_closed:
+        with _sync_lock:
+            client = _sync_clients.get(key)
+            if client is None or client.is_closed:
+                client = httpx.Client(
+                    base_url=key,
+                    limits=_build_limits(),
+                    timeout=build_timeout(),
+                    http2=_use_http2()
+                )
+                _sync_clients[key] = client
+    return client
+
+
+def close_sync_clients():
+    """关闭所有同步客户端(worker进程退出或应用关闭时调用)"""
+    with _sync_lock:
+        clients = list(_sync_clients.values())
+        _sync_clients.clear()
+    for client in clients:
+        client.close()
+
+
+async def aiter_sse_data(response: httpx.Response) -> AsyncIterator[Dict[str, Any]]:
+    """
+    逐条解析Server-Sent Events响应中的data字段
+    
+    Args:
+        response: 以stream方式打开的响应
+    
+    Yields:
+        Dict: 每个事件data字段解析后的JSON对象
+    """
+    async for line in response.aiter_lines():
+        line = line.strip()
+        if not line.startswith("data:"):
+            continue
+        data = line[len("data:"):].strip()
+        if not data or data == "[DONE]":
+            continue
+        yield json.loads(data)
@@ -5,22 +5,35 @@ from typing import Dict, Any
 import httpx
 import time
 from app.services.ai_adapters.base import VideoModelAdapter
+from app.services.ai_adapters.http_client import get_sync_client, get_async_client, build_timeout
+from app.services.ai_adapters.rate_limit import rate_limited
 
 
 class KeLingAdapter(VideoModelAdapter):
     """可灵AI适配器"""
     
+    vendor = "keling"
+    
+    # 连接超时统一使用HTTP_CONNECT_TIMEOUT,这里只区分读取超时
+    SUBMIT_READ_TIMEOUT = 30.0
+    CHECK_READ_TIMEOUT = 10.0
+    
     def __init__(self, api_key: str, api_endpoint: str, **kwargs):
         super().__init__(api_key, api_endpoint, **kwargs)
         self.headers = {"Authorization": f"Bearer {api_key}"}
     
+    @property
+    def client(self) -> httpx.Client:
+        """当前端点的共享连接池(状态轮询复用长连接)"""
+        return get_sync_client(self.api_endpoint)
+    
     def validate_config(self) -> bool:
         """验证配置"""
         try:
-            response = httpx.get(
-                f"{self.api_endpoint}/api/v1/status",
+            response = self.client.get(
+                "/api/v1/status",
                 headers=self.headers,
-                timeout=10.0
+                timeout=build_timeout(self.CHECK_READ_TIMEOUT)
             )
             return response.status_code == 200
         except Exception:
@@ -30,6 +43,7 @@ class KeLingAdapter(VideoModelAdapter):
         """生成内容"""
         return self.generate_video(prompt, **params)
     
+    @rate_limited
     def generate_video(
         self,
         prompt: str,
@@ -51,11 +65,11 @@ class KeLingAdapter(VideoModelAdapter):
                 "seed": kwargs.get("seed", -1)
             }
             
-            response = httpx.post(
-                f"{self.api_endpoint}/api/v1/videos/generate",
+            response = self.client.post(
+                "/api/v1/videos/generate",
                 json=payload,
                 headers=self.headers,
-                timeout=30.0
+                timeout=build_timeout(self.SUBMIT_READ_TIMEOUT)
             )
             
             if response.status_code == 200:
@@ -68,48 +82,74 @@ class KeLingAdapter(VideoModelAdapter):
             else:
                 return {
                     "success": False,
-                    "error": f"API返回错误: {response.status_code}"
+                    "error": f"API返回错误: {response.status_code}",
+                    "status_code": response.status_code
                 }
                 
         except Exception as e:
             return self.handle_error(e)
     
+    def _status_url(self, task_id: str) -> str:
+        return f"{self.api_endpoint.rstrip('/')}/api/v1/videos/status/{task_id}"
+    
+    @staticmethod
+    def _parse_status(response: httpx.Response) -> Dict[str, Any]:
+        """解析状态查询响应"""
+        if response.status_code != 200:
+            return {
+                "success": False,
+                "error": f"API返回错误: {response.status_code}",
+                "status_code": response.status_code
+            }
+        
+        data = response.json()
+        status = data.get("status")
+        
+        result = {
+            "success": True,
+            "status": status,
+            "progress": data.get("progress", 0)
+        }
+        
+        if status == "completed":
+            result["video_url"] = data.get("video_url")
+        elif status == "failed":
+            result["error"] = data.get("error", "未知错误")
+        
+        return result
+    
+    @rate_limited
     def check_status(self, task_id: str) -> Dict[str, Any]:
         """检查视频生成状态"""
         try:
-            response = httpx.get(
-                f"{self.api_endpoint}/api/v1/videos/status/{task_id}",
+            response = self.client.get(
+                f"/api/v1/videos/status/{task_id}",
                 headers=self.headers,
-                timeout=10.0
+                timeout=build_timeout(self.CHECK_READ_TIMEOUT)
             )
-            
-            if response.status_code == 200:
-                data = response.json()
-                status = data.get("status")
-                
-                result = {
-                    "success": True,
-                    "status": status,
-                    "progress": data.get("progress", 0)
-                }
-                
-                if status == "completed":
-                    result["video_url"] = data.get("video_url")
-                elif status == "failed":
-                    result["error"] = data.get("error", "未知错误")
-                
-                return result
-            else:
-                return {
-                    "success": False,
-                    "error": f"API返回错误: {response.status_code}"
-                }
-                
+            return self._parse_status(response)
+        except Exception as e:
+            return self.handle_error(e)
+    
+    @rate_limited
+    async def acheck_status(self, task_id: str) -> Dict[str, Any]:
+        """异步检查视频生成状态(供集中轮询器批量调用)"""
+        try:
+            response = await get_async_client().get(
+                self._status_url(task_id),
+                headers=self.headers,
+                timeout=build_timeout(self.CHECK_READ_TIMEOUT)
+            )
+            return self._parse_status(response)
         except Exception as e:
             return self.handle_error(e)
     
     def wait_for_completion(self, task_id: str, max_wait: int = 600, check_interval: int = 5) -> Dict[str, Any]:
-        """等待视频生成完成"""
+        """
+        阻塞等待视频生成完成
+        
+        会在整个等待期间占用调用线程,Celery任务中应改用VideoPoller集中轮询
+        """
         start_time = time.time()
         
         while time.time() - start_time < max_wait:
@@ -0,0 +1,561 @@
+"""
+AI厂商自适应限流
+
+厂商按API Key限流,突发的批量任务会直接收到429。这里在适配器调用外层加一层限流:
+- 令牌桶:按(厂商, API Key指纹)存放在Redis中,多个API进程和Celery worker共享同一个桶;
+  Redis不可用时降级为进程内令牌桶
+- 并发窗口:AIMD自适应,成功时加性增长,收到429/配额错误时乘性减半
+
+拿不到令牌或并发名额时调用方排队等待,而不是直接失败;排队超过RATE_LIMIT_MAX_WAIT才返回错误
+"""
+import asyncio
+import functools
+import hashlib
+import inspect
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional, Tuple
+
+import redis
+
+from app.core.cache import get_redis
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 厂商返回的限流/配额错误特征(HTTP状态码之外的业务错误码和关键字)
+THROTTLE_MARKERS = (
+    "429",
+    "throttl",
+    "rate limit",
+    "ratelimit",
+    "reachlimit",
+    "quota",
+    "qps",
+    "limit reached",
+    "too many requests",
+    "限流",
+    "并发",
+    "频率",
+    "配额",
+)
+
+
+def is_rate_limited(result: Dict[str, Any]) -> bool:
+    """
+    判断适配器返回结果是否为限流/配额错误
+    
+    Args:
+        result: 适配器返回的结果字典
+    
+    Returns:
+        bool: 是否被厂商限流
+    """
+    if not isinstance(result, dict) or result.get("success", True):
+        return False
+    if result.get("status_code") == 429:
+        return True
+    text = f"{result.get('error_type', '')} {result.get('error', '')}".lower()
+    return any(marker in text for marker in THROTTLE_MARKERS)
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """判断异常是否由厂商限流引起(流式接口以异常形式返回错误)"""
+    if getattr(error, "status_code", None) == 429:
+        return True
+    text = f"{type(error).__name__} {error}".lower()
+    return any(marker in text for marker in THROTTLE_MARKERS)
+
+
+# 可在模型配置parameters中覆盖的限流参数
+RATE_LIMIT_PARAMETERS = ("rate_limit_qps", "rate_limit_burst", "max_concurrency")
+
+
+class RateLimitTimeout(Exception):
+    """排队等待超过上限"""
+    pass
+
+
+# KEYS[1]=桶 ARGV: 速率(个/秒) 桶容量 最长等待(秒)
+# 预约一个令牌:令牌不足时允许透支,返回需要等待的秒数;等待超过上限时不扣减并返回-1
+_RESERVE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local max_wait = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens < 1 then
+    wait = (1 - tokens) / rate
+end
+if wait > max_wait then
+    return '-1'
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens - 1), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((burst / rate + max_wait) * 1000) + 1000)
+return tostring(wait)
+"""
+
+# 被限流时清空剩余令牌,让所有进程一起让出当前窗口
+_DRAIN_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+redis.call('HSET', KEYS[1], 'tokens', tostring(math.min(tokens, 0)), 'ts', tostring(now))
+return 1
+"""
+
+
+class TokenBucket:
+    """基于Redis的共享令牌桶,Redis不可用时使用进程内令牌桶"""
+    
+    # Redis出错后改用进程内令牌桶的时长(秒)
+    REDIS_RETRY_INTERVAL = 30.0
+    
+    def __init__(self, key: str, rate: float, burst: int):
+        """
+        初始化令牌桶
+        
+        Args:
+            key: Redis键
+            rate: 每秒补充的令牌数
+            burst: 桶容量(允许的突发请求数)
+        """
+        self.key = key
+        self.rate = rate
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._redis_retry_at = 0.0
+    
+    def _reserve_local(self, max_wait: float) -> float:
+        with self._lock:
+            now = time.monotonic()
+            tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+            wait = (1 - tokens) / self.rate if tokens < 1 else 0.0
+            self._updated_at = now
+            if wait > max_wait:
+                self._tokens = tokens
+                return -1.0
+            self._tokens = tokens - 1
+            return wait
+    
+    def reserve(self, max_wait: float) -> float:
+        """
+        预约一个令牌
+        
+        Args:
+            max_wait: 最长等待时间(秒)
+        
+        Returns:
+            float: 拿到令牌前需要等待的秒数,超过max_wait时返回-1
+        """
+        if time.monotonic() < self._redis_retry_at:
+            return self._reserve_local(max_wait)
+        try:
+            return float(get_redis().eval(_RESERVE_SCRIPT, 1, self.key, self.rate, self.burst, max_wait))
+        except redis.RedisError as e:
+            # 短时间内不再尝试Redis,避免每次调用都等待连接超时
+            self._redis_retry_at = time.monotonic() + self.REDIS_RETRY_INTERVAL
+            logger.warning("Redis令牌桶不可用,使用进程内限流: %s", e)
+            return self._reserve_local(max_wait)
+    
+    def drain(self):
+        """清空剩余令牌"""
+        with self._lock:
+            self._tokens = min(self._tokens, 0.0)
+            self._updated_at = time.monotonic()
+        if time.monotonic() < self._redis_retry_at:
+            return
+        try:
+            get_redis().eval(_DRAIN_SCRIPT, 1, self.key, self.rate, self.burst)
+        except redis.RedisError as e:
+            self._redis_retry_at = time.monotonic() + self.REDIS_RETRY_INTERVAL
+            logger.warning("清空Redis令牌桶失败: %s", e)
+
+
+class AdaptiveConcurrencyLimit:
+    """
+    AIMD自适应并发窗口(进程内)
+    
+    同时支持线程和协程排队,按先到先得的顺序放行
+    """
+    
+    def __init__(self, max_limit: int, min_limit: int = 1, backoff: float = 0.5, cooldown: float = 1.0):
+        """
+        初始化并发窗口
+        
+        Args:
+            max_limit: 并发上限(初始值)
+            min_limit: 并发下限
+            backoff: 被限流时窗口的缩小倍数
+            cooldown: 两次缩小之间的最短间隔(秒),同一批请求的多个429只计一次
+        """
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.backoff = backoff
+        self.cooldown = cooldown
+        self.limit = float(max_limit)
+        self._in_flight = 0
+        self._waiters: deque = deque()
+        self._lock = threading.Lock()
+        self._last_decrease = 0.0
+        self.throttled_count = 0
+    
+    def _has_capacity(self) -> bool:
+        return self._in_flight < max(int(self.limit), self.min_limit)
+    
+    def _wake_waiters(self):
+        """放行排队的调用方(需持有锁)"""
+        while self._waiters and self._has_capacity():
+            waiter = self._waiters.popleft()
+            self._in_flight += 1
+            if isinstance(waiter, threading.Event):
+                waiter.set()
+            else:
+                loop, future = waiter
+                loop.call_soon_threadsafe(_resolve_future, future)
+    
+    def acquire(self, timeout: float) -> bool:
+        """
+        同步获取并发名额
+        
+        Args:
+            timeout: 最长等待时间(秒)
+        
+        Returns:
+            bool: 是否获取成功
+        """
+        with self._lock:
+            if not self._waiters and self._has_capacity():
+                self._in_flight += 1
+                return True
+            event = threading.Event()
+            self._waiters.append(event)
+        
+        if event.wait(timeout):
+            return True
+        with self._lock:
+            try:
+                self._waiters.remove(event)
+                return False
+            except ValueError:
+                # 超时的同时已被放行
+                return True
+    
+    async def aacquire(self, timeout: float) -> bool:
+        """异步获取并发名额"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if not self._waiters and self._has_capacity():
+                self._in_flight += 1
+                return True
+            future = loop.create_future()
+            waiter = (loop, future)
+            self._waiters.append(waiter)
+        
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+            return True
+        except asyncio.TimeoutError:
+            with self._lock:
+                try:
+                    self._waiters.remove(waiter)
+                    return False
+                except ValueError:
+                    return True
+        except asyncio.CancelledError:
+            with self._lock:
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    # 已被放行但调用方取消,归还名额
+                    self._in_flight -= 1
+                    self._wake_waiters()
+            raise
+    
+    def release(self):
+        """归还并发名额"""
+        with self._lock:
+            self._in_flight -= 1
+            self._wake_waiters()
+    
+    def on_success(self):
+        """请求成功:窗口加性增长(每个窗口周期约+1)"""
+        with self._lock:
+            if self.limit < self.max_limit:
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+                self._wake_waiters()
+    
+    def on_throttle(self) -> bool:
+        """
+        被厂商限流:窗口乘性减小
+        
+        Returns:
+            bool: 本次是否实际缩小了窗口(冷却期内不重复缩小)
+        """
+        with self._lock:
+            self.throttled_count += 1
+            now = time.monotonic()
+            if now - self._last_decrease < self.cooldown:
+                return False
+            self._last_decrease = now
+            self.limit = max(float(self.min_limit), self.limit * self.backoff)
+            return True
+    
+    def stats(self) -> Dict[str, Any]:
+        """当前窗口状态"""
+        with self._lock:
+            return {
+                "limit": round(self.limit, 2),
+                "max_limit": self.max_limit,
+                "in_flight": self._in_flight,
+                "waiting": len(self._waiters),
+                "throttled": self.throttled_count
+            }
+
+
+def _resolve_future(future: asyncio.Future):
+    if not future.done():
+        future.set_result(True)
+
+
+class VendorRateLimiter:
+    """单个(厂商, API Key)的限流器:共享令牌桶 + 进程内AIMD并发窗口"""
+    
+    def __init__(self, vendor: str, key_fingerprint: str, rate: float, burst: int, max_concurrency: int):
+        self.vendor = vendor
+        self.key_fingerprint = key_fingerprint
+        self.bucket = TokenBucket(f"rate_limit:{vendor}:{key_fingerprint}", rate, burst)
+        self.concurrency = AdaptiveConcurrencyLimit(
+            max_limit=max_concurrency,
+            min_limit=settings.RATE_LIMIT_MIN_CONCURRENCY
+        )
+    
+    def configure(self, rate: float, burst: int, max_concurrency: int):
+        """模型配置调整限流参数后同步更新"""
+        self.bucket.rate = rate
+        self.bucket.burst = burst
+        self.concurrency.max_limit = max_concurrency
+        self.concurrency.limit = min(self.concurrency.limit, float(max_concurrency))
+    
+    def _timeout_error(self) -> RateLimitTimeout:
+        return RateLimitTimeout(
+            f"{self.vendor}请求排队超过{settings.RATE_LIMIT_MAX_WAIT:.0f}秒,厂商限流中,请稍后重试"
+        )
+    
+    def acquire(self):
+        """同步排队获取令牌和并发名额,超时抛出RateLimitTimeout"""
+        deadline = time.monotonic() + settings.RATE_LIMIT_MAX_WAIT
+        if not self.concurrency.acquire(settings.RATE_LIMIT_MAX_WAIT):
+            raise self._timeout_error()
+        
+        wait = self.bucket.reserve(max(0.0, deadline - time.monotonic()))
+        if wait < 0:
+            self.concurrency.release()
+            raise self._timeout_error()
+        if wait > 0:
+            time.sleep(wait)
+    
+    async def aacquire(self):
+        """异步排队获取令牌和并发名额,超时抛出RateLimitTimeout"""
+        deadline = time.monotonic() + settings.RATE_LIMIT_MAX_WAIT
+        if not await self.concurrency.aacquire(settings.RATE_LIMIT_MAX_WAIT):
+            raise self._timeout_error()
+        
+        try:
+            wait = await asyncio.to_thread(self.bucket.reserve, max(0.0, deadline - time.monotonic()))
+            if wait < 0:
+                raise self._timeout_error()
+            if wait > 0:
+                await asyncio.sleep(wait)
+        except BaseException:
+            self.concurrency.release()
+            raise
+    
+    def release(self, throttled: bool = False, success: bool = False):
+        """
+        归还并发名额并反馈本次调用结果
+        
+        Args:
+            throttled: 是否被厂商限流
+            success: 是否调用成功
+        """
+        self.concurrency.release()
+        if throttled:
+            if self.concurrency.on_throttle():
+                logger.warning(
+                    "%s触发限流,并发窗口缩小至%.1f",
+                    self.vendor, self.concurrency.limit
+                )
+                self.bucket.drain()
+        elif success:
+            self.concurrency.on_success()
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "vendor": self.vendor,
+            "key_fingerprint": self.key_fingerprint,
+            "rate": self.bucket.rate,
+            "burst": self.bucket.burst,
+            **self.concurrency.stats()
+        }
+
+
+_limiters: Dict[Tuple[str, str], VendorRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def key_fingerprint(api_key: str) -> str:
+    """API Key指纹(不在Redis键中暴露明文)"""
+    return hashlib.sha256(api_key.encode()).hexdigest()[:16]
+
+
+def get_limiter(adapter) -> Optional[VendorRateLimiter]:
+    """
+    获取适配器对应的限流器
+    
+    限流参数可在模型配置parameters中通过rate_limit_qps、rate_limit_burst、max_concurrency覆盖
+    
+    Args:
+        adapter: 适配器实例
+    
+    Returns:
+        VendorRateLimiter: 限流器,未开启限流时返回None
+    """
+    if not settings.RATE_LIMIT_ENABLED or not adapter.api_key:
+        return None
+    
+    rate = float(adapter.config.get("rate_limit_qps") or settings.RATE_LIMIT_DEFAULT_QPS)
+    burst = int(adapter.config.get("rate_limit_burst") or settings.RATE_LIMIT_BURST)
+    max_concurrency = int(adapter.config.get("max_concurrency") or settings.RATE_LIMIT_MAX_CONCURRENCY)
+    
+    key = (adapter.vendor, key_fingerprint(adapter.api_key))
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = VendorRateLimiter(*key, rate=rate, burst=burst, max_concurrency=max_concurrency)
+            _limiters[key] = limiter
+        elif (limiter.bucket.rate, limiter.bucket.burst, limiter.concurrency.max_limit) != (
+            rate, burst, max_concurrency
+        ):
+            limiter.configure(rate, burst, max_concurrency)
+    return limiter
+
+
+def rate_limit_stats() -> list:
+    """所有限流器的当前状态"""
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return [limiter.stats() for limiter in limiters]
+
+
+def rate_limited(func):
+    """
+    为适配器的厂商调用添加限流
+    
+    支持同步/异步函数和同步/异步生成器;返回结果字典的函数排队超时时返回错误结果,
+    生成器排队超时时抛出RateLimitTimeout
+    """
+    if inspect.isasyncgenfunction(func):
+        @functools.wraps(func)
+        async def async_gen_wrapper(self, *args, **kwargs):
+            limiter = get_limiter(self)
+            if limiter is None:
+                async for item in func(self, *args, **kwargs):
+                    yield item
+                return
+            
+            await limiter.aacquire()
+            throttled = success = False
+            try:
+                async for item in func(self, *args, **kwargs):
+                    yield item
+                success = True
+            except Exception as e:
+                throttled = is_rate_limit_error(e)
+                raise
+            finally:
+                limiter.release(throttled=throttled, success=success)
+        
+        return async_gen_wrapper
+    
+    if inspect.isgeneratorfunction(func):
+        @functools.wraps(func)
+        def gen_wrapper(self, *args, **kwargs):
+            limiter = get_limiter(self)
+            if limiter is None:
+                yield from func(self, *args, **kwargs)
+                return
+            
+            limiter.acquire()
+            throttled = success = False
+            try:
+                yield from func(self, *args, **kwargs)
+                success = True
+            except Exception as e:
+                throttled = is_rate_limit_error(e)
+                raise
+            finally:
+                limiter.release(throttled=throttled, success=success)
+        
+        return gen_wrapper
+    
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(self, *args, **kwargs):
+            limiter = get_limiter(self)
+            if limiter is None:
+                return await func(self, *args, **kwargs)
+            
+            try:
+                await limiter.aacquire()
+            except RateLimitTimeout as e:
+                return self.handle_error(e)
+            
+            result = None
+            try:
+                result = await func(self, *args, **kwargs)
+                return result
+            finally:
+                limiter.release(
+                    throttled=is_rate_limited(result),
+                    success=bool(result and result.get("success"))
+                )
+        
+        return async_wrapper
+    
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        limiter = get_limiter(self)
+        if limiter is None:
+            return func(self, *args, **kwargs)
+        
+        try:
+            limiter.acquire()
+        except RateLimitTimeout as e:
+            return self.handle_error(e)
+        
+        result = None
+        try:
+            result = func(self, *args, **kwargs)
+            return result
+        finally:
+            limiter.release(
+                throttled=is_rate_limited(result),
+                success=bool(result and result.get("success"))
+            )
+    
+    return wrapper
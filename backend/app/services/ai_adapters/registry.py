@@ -0,0 +1,159 @@
+"""
+AI模型适配器注册表
+
+统一维护厂商到适配器类的映射,并按模型配置缓存已构建的适配器实例,
+避免每次请求都解密API Key、重新创建SDK客户端和TLS连接
+"""
+import hashlib
+import json
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple, Type
+
+from app.core.config import settings
+from app.models.ai_model import AIModelConfig
+from app.services.ai_adapters.base import BaseModelAdapter, TextModelAdapter
+from app.services.ai_adapters.tongyi import TongyiAdapter
+from app.services.ai_adapters.zhipu import ZhipuAdapter
+from app.services.ai_adapters.baidu import BaiduAdapter
+from app.services.ai_adapters.stable_diffusion import StableDiffusionAdapter
+from app.services.ai_adapters.keling import KeLingAdapter
+from app.services.ai_adapters.rate_limit import RATE_LIMIT_PARAMETERS
+from app.services.ai_adapters.retry import RETRY_PARAMETERS
+from app.utils.encryption import decrypt_string
+
+
+# 厂商 -> 适配器类
+ADAPTER_CLASSES: Dict[str, Type[BaseModelAdapter]] = {
+    "tongyi": TongyiAdapter,
+    "zhipu": ZhipuAdapter,
+    "baidu": BaiduAdapter,
+    "stable_diffusion": StableDiffusionAdapter,
+    "keling": KeLingAdapter,
+}
+
+
+def is_text_vendor(vendor: str) -> bool:
+    """厂商是否为文本生成模型"""
+    adapter_cls = ADAPTER_CLASSES.get(vendor)
+    return adapter_cls is not None and issubclass(adapter_cls, TextModelAdapter)
+
+
+def build_adapter(config: AIModelConfig) -> BaseModelAdapter:
+    """
+    根据模型配置创建适配器(不经过缓存)
+    
+    Args:
+        config: 模型配置
+    
+    Returns:
+        BaseModelAdapter: 适配器实例
+    """
+    adapter_cls = ADAPTER_CLASSES.get(config.vendor)
+    if adapter_cls is None:
+        raise ValueError(f"不支持的厂商: {config.vendor}")
+    
+    api_key = decrypt_string(config.api_key)
+    parameters = config.parameters or {}
+    
+    # 限流与重试参数覆盖(见rate_limit.get_limiter、retry.with_retry)
+    kwargs = {
+        key: parameters[key]
+        for key in RATE_LIMIT_PARAMETERS + RETRY_PARAMETERS
+        if parameters.get(key) is not None
+    }
+    
+    if issubclass(adapter_cls, TextModelAdapter):
+        kwargs.update({
+            "model_name": config.model_name,
+            "api_endpoint": config.api_endpoint,
+            "cache_enabled": bool(parameters.get("cache_enabled", False))
+        })
+        if config.vendor == "baidu":
+            # 百度需要secret_key，从parameters中获取
+            kwargs["secret_key"] = parameters.get("secret_key", "")
+        return adapter_cls(api_key=api_key, **kwargs)
+    
+    return adapter_cls(api_key=api_key, api_endpoint=config.api_endpoint, **kwargs)
+
+
+def config_fingerprint(config: AIModelConfig) -> str:
+    """
+    计算模型配置的指纹
+    
+    使用加密后的API Key参与计算,无需解密;配置任一关键字段变化都会使缓存失效
+    """
+    raw = json.dumps(
+        [
+            config.vendor,
+            config.model_name,
+            config.api_endpoint,
+            config.api_key,
+            config.parameters or {},
+            config.updated_at.isoformat() if config.updated_at else None,
+        ],
+        sort_keys=True,
+        default=str
+    )
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class AdapterRegistry:
+    """进程级适配器实例池(LRU淘汰)"""
+    
+    def __init__(self, max_size: int = 256):
+        self.max_size = max_size
+        self._adapters: "OrderedDict[uuid.UUID, Tuple[str, BaseModelAdapter]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get_adapter(self, config: AIModelConfig) -> BaseModelAdapter:
+        """
+        获取模型配置对应的适配器,命中缓存时直接复用
+        
+        Args:
+            config: 模型配置
+        
+        Returns:
+            BaseModelAdapter: 适配器实例
+        """
+        fingerprint = config_fingerprint(config)
+        
+        with self._lock:
+            cached = self._adapters.get(config.config_id)
+            if cached is not None and cached[0] == fingerprint:
+                self._adapters.move_to_end(config.config_id)
+                return cached[1]
+        
+        # 构建适配器可能涉及SDK初始化,不在锁内进行
+        adapter = build_adapter(config)
+        
+        with self._lock:
+            self._adapters[config.config_id] = (fingerprint, adapter)
+            self._adapters.move_to_end(config.config_id)
+            while len(self._adapters) > self.max_size:
+                self._adapters.popitem(last=False)
+        
+        return adapter
+    
+    def get_text_adapter(self, config: AIModelConfig) -> TextModelAdapter:
+        """获取文本生成适配器,配置不是文本模型时抛出ValueError"""
+        adapter = self.get_adapter(config)
+        if not isinstance(adapter, TextModelAdapter):
+            raise ValueError(f"不支持的厂商: {config.vendor}")
+        return adapter
+    
+    def invalidate(self, config_id: uuid.UUID) -> Optional[BaseModelAdapter]:
+        """移除指定配置的缓存适配器(配置更新或删除时调用)"""
+        with self._lock:
+            cached = self._adapters.pop(config_id, None)
+        return cached[1] if cached else None
+    
+    def clear(self):
+        """清空所有缓存的适配器"""
+        with self._lock:
+            self._adapters.clear()
+
+
+# 全局适配器注册表
+adapter_registry = AdapterRegistry(max_size=settings.ADAPTER_CACHE_SIZE)
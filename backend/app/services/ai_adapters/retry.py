@@ -0,0 +1,274 @@
+"""
+文本生成重试与对冲请求
+
+适配器把所有异常都转换成{"success": False}返回,这里按错误类型区分可重试与不可重试:
+网络错误、超时、429和5xx按带抖动的指数退避重试;鉴权失败、参数错误等直接返回。
+
+开启对冲后,请求耗时超过该模型近期的p95延迟仍未返回时再发出一个相同请求,取先成功的结果。
+重试次数和是否发生对冲记录在结果的usage中
+"""
+import asyncio
+import functools
+import inspect
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout, as_completed
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.services.ai_adapters.rate_limit import is_rate_limited
+
+logger = logging.getLogger(__name__)
+
+# 可在模型配置parameters中覆盖的重试参数
+RETRY_PARAMETERS = ("max_retries", "hedge_enabled")
+
+RETRYABLE_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+# 网络层异常(httpx、requests及各厂商SDK)
+RETRYABLE_ERROR_TYPES = {
+    "TimeoutException",
+    "ConnectTimeout",
+    "ReadTimeout",
+    "WriteTimeout",
+    "PoolTimeout",
+    "ConnectError",
+    "ReadError",
+    "WriteError",
+    "RemoteProtocolError",
+    "ConnectionError",
+    "Timeout",
+    "TimeoutError",
+    "APITimeoutError",
+    "APIConnectionError",
+    "APIInternalError",
+    "ServiceUnavailableError",
+}
+
+# 排队已超时的请求不再重试
+FATAL_ERROR_TYPES = {"RateLimitTimeout"}
+
+
+def is_retryable(result: Dict[str, Any]) -> bool:
+    """
+    判断失败结果是否值得重试
+    
+    Args:
+        result: 适配器返回的结果字典
+    
+    Returns:
+        bool: 是否可重试
+    """
+    if result.get("success"):
+        return False
+    error_type = result.get("error_type")
+    if error_type in FATAL_ERROR_TYPES:
+        return False
+    # 部分厂商(如百度)以HTTP 200和错误码返回限流,先按限流判断
+    if is_rate_limited(result):
+        return True
+    status_code = result.get("status_code")
+    if status_code is not None:
+        return status_code in RETRYABLE_STATUS_CODES
+    return error_type in RETRYABLE_ERROR_TYPES
+
+
+def backoff_delay(attempt: int) -> float:
+    """
+    第attempt次重试前的等待时间(full jitter指数退避)
+    
+    Args:
+        attempt: 重试序号,从1开始
+    
+    Returns:
+        float: 等待秒数
+    """
+    ceiling = min(settings.LLM_RETRY_MAX_DELAY, settings.LLM_RETRY_BASE_DELAY * (2 ** (attempt - 1)))
+    return random.uniform(0, ceiling)
+
+
+class LatencyTracker:
+    """按(厂商, 模型)统计近期成功请求的延迟,用于确定对冲时机"""
+    
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples: Dict[Tuple[str, str], deque] = {}
+        self._lock = threading.Lock()
+    
+    def record(self, key: Tuple[str, str], latency: float):
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self.window)
+            samples.append(latency)
+    
+    def percentile(self, key: Tuple[str, str], pct: float = 0.95) -> Optional[float]:
+        """
+        获取延迟分位数
+        
+        Returns:
+            float: 分位数(秒),样本不足LLM_HEDGE_MIN_SAMPLES时返回None
+        """
+        with self._lock:
+            samples = list(self._samples.get(key, ()))
+        if len(samples) < settings.LLM_HEDGE_MIN_SAMPLES:
+            return None
+        samples.sort()
+        return samples[min(len(samples) - 1, int(len(samples) * pct))]
+
+
+latency_tracker = LatencyTracker()
+
+# 同步对冲请求使用的线程池(同步调用无法取消,落后的请求在后台跑完后丢弃)
+_hedge_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-hedge")
+
+
+def _hedge_delay(adapter) -> Optional[float]:
+    """对冲等待时间,未开启对冲或样本不足时返回None"""
+    enabled = adapter.config.get("hedge_enabled")
+    if enabled is None:
+        enabled = settings.LLM_HEDGE_ENABLED
+    if not enabled:
+        return None
+    p95 = latency_tracker.percentile((adapter.vendor, adapter.model_name))
+    if p95 is None:
+        return None
+    return max(settings.LLM_HEDGE_MIN_DELAY, p95)
+
+
+def _max_attempts(adapter) -> int:
+    max_retries = adapter.config.get("max_retries")
+    if max_retries is None:
+        return settings.LLM_RETRY_MAX_ATTEMPTS
+    return int(max_retries) + 1
+
+
+def _timed(call: Callable[[], Dict[str, Any]]) -> Tuple[Dict[str, Any], float]:
+    started = time.monotonic()
+    result = call()
+    return result, time.monotonic() - started
+
+
+def _call_hedged(call: Callable[[], Dict[str, Any]], delay: float) -> Tuple[Dict[str, Any], float, bool]:
+    """同步对冲:主请求超过delay未返回时再发一个,返回(结果, 耗时, 是否发生对冲)"""
+    primary = _hedge_executor.submit(_timed, call)
+    try:
+        return (*primary.result(timeout=delay), False)
+    except FutureTimeout:
+        pass
+    
+    hedge = _hedge_executor.submit(_timed, call)
+    outcome = None
+    for future in as_completed([primary, hedge]):
+        outcome = future.result()
+        if outcome[0].get("success"):
+            break
+    return (*outcome, True)
+
+
+async def _acall_hedged(call: Callable, delay: float) -> Tuple[Dict[str, Any], float, bool]:
+    """异步对冲:取先成功的结果并取消另一个请求"""
+    async def timed():
+        started = time.monotonic()
+        result = await call()
+        return result, time.monotonic() - started
+    
+    primary = asyncio.ensure_future(timed())
+    done, _ = await asyncio.wait({primary}, timeout=delay)
+    if done:
+        return (*primary.result(), False)
+    
+    hedge = asyncio.ensure_future(timed())
+    pending = {primary, hedge}
+    outcome = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                outcome = task.result()
+                if outcome[0].get("success"):
+                    return (*outcome, True)
+        return (*outcome, True)
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def _annotate(result: Dict[str, Any], retries: int, hedged: bool) -> Dict[str, Any]:
+    """在usage中记录重试次数和是否对冲"""
+    return {**result, "usage": {**result.get("usage", {}), "retries": retries, "hedged": hedged}}
+
+
+def with_retry(func):
+    """
+    为generate_text/agenerate_text添加重试和对冲
+    
+    应放在cached_generation之内、rate_limited之外,每次重试和对冲请求都会重新经过限流
+    """
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(self, *args, **kwargs):
+            key = (self.vendor, self.model_name)
+            max_attempts = _max_attempts(self)
+            hedged = False
+            attempt = 0
+            
+            while True:
+                attempt += 1
+                delay = _hedge_delay(self)
+                if delay is None:
+                    started = time.monotonic()
+                    result = await func(self, *args, **kwargs)
+                    latency = time.monotonic() - started
+                else:
+                    result, latency, was_hedged = await _acall_hedged(
+                        lambda: func(self, *args, **kwargs), delay
+                    )
+                    hedged = hedged or was_hedged
+                
+                if result.get("success"):
+                    latency_tracker.record(key, latency)
+                if attempt >= max_attempts or not is_retryable(result):
+                    return _annotate(result, attempt - 1, hedged)
+                
+                wait = backoff_delay(attempt)
+                logger.warning(
+                    "%s调用失败(%s),%.1f秒后第%d次重试",
+                    self.vendor, result.get("error"), wait, attempt
+                )
+                await asyncio.sleep(wait)
+        
+        return async_wrapper
+    
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        key = (self.vendor, self.model_name)
+        max_attempts = _max_attempts(self)
+        hedged = False
+        attempt = 0
+        
+        while True:
+            attempt += 1
+            delay = _hedge_delay(self)
+            if delay is None:
+                result, latency = _timed(lambda: func(self, *args, **kwargs))
+            else:
+                result, latency, was_hedged = _call_hedged(lambda: func(self, *args, **kwargs), delay)
+                hedged = hedged or was_hedged
+            
+            if result.get("success"):
+                latency_tracker.record(key, latency)
+            if attempt >= max_attempts or not is_retryable(result):
+                return _annotate(result, attempt - 1, hedged)
+            
+            wait = backoff_delay(attempt)
+            logger.warning(
+                "%s调用失败(%s),%.1f秒后第%d次重试",
+                self.vendor, result.get("error"), wait, attempt
+            )
+            time.sleep(wait)
+    
+    return wrapper
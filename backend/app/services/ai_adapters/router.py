@@ -0,0 +1,359 @@
+"""
+多厂商路由
+
+路由组由多个模型配置组成。路由器按配置统计近期延迟和错误率,每次调用选择最健康、最快的成员;
+成员调用失败或超时后立即切换到下一个成员。连续失败的成员会被短暂熔断。
+统计数据保存在进程内
+"""
+import asyncio
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, AsyncIterator, Dict, Iterator, List, NamedTuple, Optional
+
+from app.core.config import settings
+from app.services.ai_adapters.base import TextModelAdapter
+
+
+class RouteMember(NamedTuple):
+    """路由组成员(不持有数据库会话中的对象)"""
+    config_id: uuid.UUID
+    config_name: str
+    vendor: str
+    model_name: str
+    adapter: TextModelAdapter
+
+
+class RouteStats:
+    """单个模型配置的滚动统计"""
+    
+    def __init__(self, window: int):
+        self.latencies: deque = deque(maxlen=window)
+        self.outcomes: deque = deque(maxlen=window)
+        self.ewma_latency: Optional[float] = None
+        self.consecutive_failures = 0
+        self.circuit_open_until = 0.0
+        self.in_flight = 0
+        self.last_error: Optional[str] = None
+    
+    @property
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return 1 - sum(self.outcomes) / len(self.outcomes)
+    
+    @property
+    def p95_latency(self) -> Optional[float]:
+        if not self.latencies:
+            return None
+        samples = sorted(self.latencies)
+        return samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    
+    def circuit_open(self, now: float) -> bool:
+        return now < self.circuit_open_until
+    
+    def score(self) -> float:
+        """预估代价:延迟 × 错误率惩罚,并发中的请求按排队计入"""
+        latency = self.ewma_latency if self.ewma_latency is not None else settings.ROUTER_DEFAULT_LATENCY
+        return latency * (1 + settings.ROUTER_ERROR_PENALTY * self.error_rate) * (1 + 0.1 * self.in_flight)
+
+
+class ModelRouter:
+    """按配置维护统计并对路由组成员排序"""
+    
+    def __init__(self, window: int = 100, ewma_alpha: float = 0.2):
+        self.window = window
+        self.ewma_alpha = ewma_alpha
+        self._stats: Dict[uuid.UUID, RouteStats] = {}
+        self._lock = threading.Lock()
+    
+    def _get_stats(self, config_id: uuid.UUID) -> RouteStats:
+        stats = self._stats.get(config_id)
+        if stats is None:
+            stats = self._stats[config_id] = RouteStats(self.window)
+        return stats
+    
+    def rank(self, members: List[RouteMember]) -> List[RouteMember]:
+        """
+        按健康度排序路由组成员
+        
+        未熔断的成员按预估代价升序(代价相同时保持组内顺序),熔断中的成员排在最后作为兜底
+        """
+        now = time.monotonic()
+        with self._lock:
+            keyed = [
+                (self._get_stats(m.config_id).circuit_open(now), self._get_stats(m.config_id).score(), idx, m)
+                for idx, m in enumerate(members)
+            ]
+        keyed.sort(key=lambda item: item[:3])
+        return [item[3] for item in keyed]
+    
+    def begin(self, config_id: uuid.UUID):
+        """开始一次调用"""
+        with self._lock:
+            self._get_stats(config_id).in_flight += 1
+    
+    def cancel(self, config_id: uuid.UUID):
+        """调用被调用方取消,不计入成功或失败"""
+        with self._lock:
+            stats = self._get_stats(config_id)
+            stats.in_flight = max(0, stats.in_flight - 1)
+    
+    def record(
+        self,
+        config_id: uuid.UUID,
+        success: bool,
+        latency: Optional[float] = None,
+        error: Optional[str] = None
+    ):
+        """
+        记录一次调用结果
+        
+        Args:
+            config_id: 模型配置ID
+            success: 是否成功
+            latency: 成功调用的耗时(秒),流式调用不记录
+            error: 失败原因
+        """
+        with self._lock:
+            stats = self._get_stats(config_id)
+            stats.in_flight = max(0, stats.in_flight - 1)
+            stats.outcomes.append(success)
+            if success:
+                stats.consecutive_failures = 0
+                if latency is not None:
+                    stats.latencies.append(latency)
+                    stats.ewma_latency = (
+                        latency if stats.ewma_latency is None
+                        else self.ewma_alpha * latency + (1 - self.ewma_alpha) * stats.ewma_latency
+                    )
+            else:
+                stats.consecutive_failures += 1
+                stats.last_error = error
+                if stats.consecutive_failures >= settings.ROUTER_FAILURE_THRESHOLD:
+                    stats.circuit_open_until = time.monotonic() + settings.ROUTER_CIRCUIT_COOLDOWN
+    
+    def explain(self, members: List[RouteMember]) -> List[Dict[str, Any]]:
+        """
+        返回成员的排序结果和统计数据,用于查看路由选择原因
+        """
+        ranked = self.rank(members)
+        now = time.monotonic()
+        explained = []
+        with self._lock:
+            for position, member in enumerate(ranked, 1):
+                stats = self._get_stats(member.config_id)
+                circuit_open = stats.circuit_open(now)
+                if circuit_open:
+                    reason = f"连续失败{stats.consecutive_failures}次,熔断中"
+                elif not stats.outcomes:
+                    reason = "暂无统计数据,按默认延迟估算"
+                else:
+                    reason = "按预估代价(延迟×错误率惩罚)排序"
+                explained.append({
+                    "rank": position,
+                    "config_id": str(member.config_id),
+                    "config_name": member.config_name,
+                    "vendor": member.vendor,
+                    "model_name": member.model_name,
+                    "score": round(stats.score(), 3),
+                    "ewma_latency": round(stats.ewma_latency, 3) if stats.ewma_latency is not None else None,
+                    "p95_latency": round(stats.p95_latency, 3) if stats.p95_latency is not None else None,
+                    "error_rate": round(stats.error_rate, 4),
+                    "samples": len(stats.outcomes),
+                    "in_flight": stats.in_flight,
+                    "consecutive_failures": stats.consecutive_failures,
+                    "circuit_open": circuit_open,
+                    "circuit_open_seconds": round(max(0.0, stats.circuit_open_until - now), 1),
+                    "last_error": stats.last_error,
+                    "reason": reason
+                })
+        return explained
+
+
+# 全局路由器
+model_router = ModelRouter()
+
+# 同步调用的超时控制(超时的调用无法中断,在后台跑完后丢弃)
+_route_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-route")
+
+
+def _routing_info(member: RouteMember, attempts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "config_id": str(member.config_id),
+        "config_name": member.config_name,
+        "vendor": member.vendor,
+        "model_name": member.model_name,
+        "failovers": attempts
+    }
+
+
+class RoutedTextAdapter(TextModelAdapter):
+    """
+    路由组适配器
+    
+    与普通文本适配器接口一致,按ModelRouter的排序依次尝试成员,
+    成功结果中的routing字段记录实际使用的成员和故障切换经过;
+    流式生成没有结果字典,完成后由last_routing记录(适配器按请求创建,不在请求间共享)
+    """
+    
+    vendor = "router"
+    
+    def __init__(self, group_name: str, members: List[RouteMember], router: ModelRouter = model_router):
+        super().__init__(api_key="")
+        self.model_name = group_name
+        self.members = members
+        self.router = router
+        self.last_routing: Optional[Dict[str, Any]] = None
+    
+    def validate_config(self) -> bool:
+        """至少一个成员可用即视为有效"""
+        return any(member.adapter.validate_config() for member in self.members)
+    
+    def generate(self, prompt: str, **params) -> Dict[str, Any]:
+        """生成内容"""
+        return self.generate_text(prompt, **params)
+    
+    def generate_text(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 2000,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """按路由顺序生成文本,失败或超时时切换到下一个成员"""
+        attempts = []
+        result: Dict[str, Any] = {"success": False, "error": "路由组没有可用的模型配置"}
+        
+        for member in self.router.rank(self.members):
+            self.router.begin(member.config_id)
+            started = time.monotonic()
+            future = _route_executor.submit(
+                member.adapter.generate_text,
+                prompt,
+                system_prompt=system_prompt,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                **kwargs
+            )
+            try:
+                result = future.result(timeout=settings.ROUTER_ATTEMPT_TIMEOUT)
+            except FutureTimeout:
+                result = {"success": False, "error": f"超过{settings.ROUTER_ATTEMPT_TIMEOUT:.0f}秒未返回"}
+            except Exception as e:
+                result = member.adapter.handle_error(e)
+            
+            if result.get("success"):
+                self.router.record(member.config_id, True, latency=time.monotonic() - started)
+                return {**result, "routing": _routing_info(member, attempts)}
+            
+            self.router.record(member.config_id, False, error=result.get("error"))
+            attempts.append({"config_id": str(member.config_id), "error": result.get("error")})
+        
+        return {**result, "failovers": attempts}
+    
+    async def agenerate_text(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 2000,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """异步按路由顺序生成文本,失败或超时时切换到下一个成员"""
+        attempts = []
+        result: Dict[str, Any] = {"success": False, "error": "路由组没有可用的模型配置"}
+        
+        for member in self.router.rank(self.members):
+            self.router.begin(member.config_id)
+            started = time.monotonic()
+            try:
+                result = await asyncio.wait_for(
+                    member.adapter.agenerate_text(
+                        prompt,
+                        system_prompt=system_prompt,
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                        **kwargs
+                    ),
+                    timeout=settings.ROUTER_ATTEMPT_TIMEOUT
+                )
+            except asyncio.TimeoutError:
+                result = {"success": False, "error": f"超过{settings.ROUTER_ATTEMPT_TIMEOUT:.0f}秒未返回"}
+            except asyncio.CancelledError:
+                self.router.cancel(member.config_id)
+                raise
+            except Exception as e:
+                result = member.adapter.handle_error(e)
+            
+            if result.get("success"):
+                self.router.record(member.config_id, True, latency=time.monotonic() - started)
+                return {**result, "routing": _routing_info(member, attempts)}
+            
+            self.router.record(member.config_id, False, error=result.get("error"))
+            attempts.append({"config_id": str(member.config_id), "error": result.get("error")})
+        
+        return {**result, "failovers": attempts}
+    
+    def stream_generate(self, prompt: str, **params) -> Iterator[str]:
+        """流式生成:输出第一个片段前失败时切换成员,之后的错误直接抛出"""
+        last_error: Optional[Exception] = None
+        attempts = []
+        for member in self.router.rank(self.members):
+            self.router.begin(member.config_id)
+            started = False
+            outcome = None
+            try:
+                for chunk in member.adapter.stream_generate(prompt, **params):
+                    started = True
+                    yield chunk
+                outcome = (True, None)
+            except Exception as e:
+                outcome = (False, str(e))
+                last_error = e
+                if started:
+                    raise
+            finally:
+                if outcome is None:
+                    # 调用方提前关闭了流
+                    self.router.cancel(member.config_id)
+                else:
+                    self.router.record(member.config_id, outcome[0], error=outcome[1])
+            if outcome[0]:
+                self.last_routing = _routing_info(member, attempts)
+                return
+            attempts.append({"config_id": str(member.config_id), "error": outcome[1]})
+        raise last_error or RuntimeError("路由组没有可用的模型配置")
+    
+    async def astream_generate(self, prompt: str, **params) -> AsyncIterator[str]:
+        """异步流式生成:输出第一个片段前失败时切换成员,之后的错误直接抛出"""
+        last_error: Optional[Exception] = None
+        attempts = []
+        for member in self.router.rank(self.members):
+            self.router.begin(member.config_id)
+            started = False
+            outcome = None
+            try:
+                async for chunk in member.adapter.astream_generate(prompt, **params):
+                    started = True
+                    yield chunk
+                outcome = (True, None)
+            except Exception as e:
+                outcome = (False, str(e))
+                last_error = e
+                if started:
+                    raise
+            finally:
+                if outcome is None:
+                    # 调用方提前关闭了流
+                    self.router.cancel(member.config_id)
+                else:
+                    self.router.record(member.config_id, outcome[0], error=outcome[1])
+            if outcome[0]:
+                self.last_routing = _routing_info(member, attempts)
+                return
+            attempts.append({"config_id": str(member.config_id), "error": outcome[1]})
+        raise last_error or RuntimeError("路由组没有可用的模型配置")
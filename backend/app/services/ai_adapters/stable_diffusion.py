@@ -1,26 +1,40 @@
 """
 Stable Diffusion图像生成适配器(通过API调用)
 """
-from typing import Dict, Any
+from typing import Dict, Any, Callable
 import httpx
 import base64
 from app.services.ai_adapters.base import ImageModelAdapter
+from app.services.ai_adapters.http_client import get_sync_client, build_timeout
+from app.services.ai_adapters.rate_limit import rate_limited
+from app.utils.image_stream import ImageSource, StreamingImageDecoder, open_image_source
 
 
 class StableDiffusionAdapter(ImageModelAdapter):
     """Stable Diffusion适配器"""
     
+    vendor = "stable_diffusion"
+    
+    # 图像生成耗时较长,读取超时单独放宽;连接超时统一使用HTTP_CONNECT_TIMEOUT
+    GENERATION_READ_TIMEOUT = 120.0
+    CHECK_READ_TIMEOUT = 10.0
+    
     def __init__(self, api_key: str, api_endpoint: str, **kwargs):
         super().__init__(api_key, api_endpoint, **kwargs)
         self.headers = {"Authorization": f"Bearer {api_key}"}
     
+    @property
+    def client(self) -> httpx.Client:
+        """当前端点的共享连接池"""
+        return get_sync_client(self.api_endpoint)
+    
     def validate_config(self) -> bool:
         """验证配置"""
         try:
-            response = httpx.get(
-                f"{self.api_endpoint}/health",
+            response = self.client.get(
+                "/health",
                 headers=self.headers,
-                timeout=10.0
+                timeout=build_timeout(self.CHECK_READ_TIMEOUT)
             )
             return response.status_code == 200
         except Exception:
@@ -30,6 +44,19 @@ class StableDiffusionAdapter(ImageModelAdapter):
         """生成内容"""
         return self.generate_image(prompt, **params)
     
+    @staticmethod
+    def _generation_payload(prompt: str, width: int, height: int, num_images: int, **kwargs) -> Dict[str, Any]:
+        return {
+            "prompt": prompt,
+            "width": width,
+            "height": height,
+            "num_images": num_images,
+            "steps": kwargs.get("steps", 50),
+            "guidance_scale": kwargs.get("guidance_scale", 7.5),
+            "seed": kwargs.get("seed", -1)
+        }
+    
+    @rate_limited
     def generate_image(
         self,
         prompt: str,
@@ -40,21 +67,13 @@ class StableDiffusionAdapter(ImageModelAdapter):
     ) -> Dict[str, Any]:
         """生成图像"""
         try:
-            payload = {
-                "prompt": prompt,
-                "width": width,
-                "height": height,
-                "num_images": num_images,
-                "steps": kwargs.get("steps", 50),
-                "guidance_scale": kwargs.get("guidance_scale", 7.5),
-                "seed": kwargs.get("seed", -1)
-            }
+            payload = self._generation_payload(prompt, width, height, num_images, **kwargs)
             
-            response = httpx.post(
-                f"{self.api_endpoint}/v1/generation",
+            response = self.client.post(
+                "/v1/generation",
                 json=payload,
                 headers=self.headers,
-                timeout=120.0
+                timeout=build_timeout(self.GENERATION_READ_TIMEOUT)
             )
             
             if response.status_code == 200:
@@ -66,12 +85,53 @@ class StableDiffusionAdapter(ImageModelAdapter):
             else:
                 return {
                     "success": False,
-                    "error": f"API返回错误: {response.status_code}"
+                    "error": f"API返回错误: {response.status_code}",
+                    "status_code": response.status_code
                 }
                 
         except Exception as e:
             return self.handle_error(e)
     
+    @rate_limited
+    def generate_images_to_disk(
+        self,
+        prompt: str,
+        path_for: Callable[[int, str], str],
+        width: int = 1024,
+        height: int = 1024,
+        num_images: int = 1,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """生成图像,边接收响应边解码写入磁盘"""
+        decoder = StreamingImageDecoder(path_for)
+        try:
+            with self.client.stream(
+                "POST",
+                "/v1/generation",
+                json=self._generation_payload(prompt, width, height, num_images, **kwargs),
+                headers=self.headers,
+                timeout=build_timeout(self.GENERATION_READ_TIMEOUT)
+            ) as response:
+                if response.status_code != 200:
+                    return {
+                        "success": False,
+                        "error": f"API返回错误: {response.status_code}",
+                        "status_code": response.status_code
+                    }
+                for chunk in response.iter_bytes():
+                    decoder.feed(chunk)
+            
+            images = decoder.close()
+            return {
+                "success": True,
+                "images": [{"local_path": path, "file_size": size} for path, size in images]
+            }
+        
+        except Exception as e:
+            decoder.abort()
+            return self.handle_error(e)
+    
+    @rate_limited
     def img2img(
         self,
         image_data: bytes,
@@ -92,11 +152,11 @@ class StableDiffusionAdapter(ImageModelAdapter):
                 "guidance_scale": kwargs.get("guidance_scale", 7.5)
             }
             
-            response = httpx.post(
-                f"{self.api_endpoint}/v1/img2img",
+            response = self.client.post(
+                "/v1/img2img",
                 json=payload,
                 headers=self.headers,
-                timeout=120.0
+                timeout=build_timeout(self.GENERATION_READ_TIMEOUT)
             )
             
             if response.status_code == 200:
@@ -108,8 +168,60 @@ class StableDiffusionAdapter(ImageModelAdapter):
             else:
                 return {
                     "success": False,
-                    "error": f"API返回错误: {response.status_code}"
+                    "error": f"API返回错误: {response.status_code}",
+                    "status_code": response.status_code
                 }
                 
         except Exception as e:
             return self.handle_error(e)
+    
+    @rate_limited
+    def img2img_to_disk(
+        self,
+        image: ImageSource,
+        prompt: str,
+        path_for: Callable[[int, str], str],
+        strength: float = 0.8,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """
+        图生图:参考图以multipart/form-data从文件流式上传,结果边接收边解码写入磁盘
+        
+        参考图不经过base64编码,内存中不保留整张图像
+        """
+        decoder = StreamingImageDecoder(path_for)
+        try:
+            form = {
+                "prompt": prompt,
+                "strength": str(strength),
+                "steps": str(kwargs.get("steps", 50)),
+                "guidance_scale": str(kwargs.get("guidance_scale", 7.5))
+            }
+            
+            with open_image_source(image) as (filename, f):
+                with self.client.stream(
+                    "POST",
+                    "/v1/img2img",
+                    data=form,
+                    files={"init_image": (filename, f, "application/octet-stream")},
+                    headers=self.headers,
+                    timeout=build_timeout(self.GENERATION_READ_TIMEOUT)
+                ) as response:
+                    if response.status_code != 200:
+                        return {
+                            "success": False,
+                            "error": f"API返回错误: {response.status_code}",
+                            "status_code": response.status_code
+                        }
+                    for chunk in response.iter_bytes():
+                        decoder.feed(chunk)
+            
+            images = decoder.close()
+            return {
+                "success": True,
+                "images": [{"local_path": path, "file_size": size} for path, size in images]
+            }
+        
+        except Exception as e:
+            decoder.abort()
+            return self.handle_error(e)
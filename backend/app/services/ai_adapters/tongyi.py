@@ -1,19 +1,35 @@
 """
 通义千问文本生成适配器
 """
-from typing import Dict, Any, Optional
-import dashscope
+from typing import Dict, Any, Optional, AsyncIterator, Iterator
 from dashscope import Generation
 from app.services.ai_adapters.base import TextModelAdapter
+from app.services.ai_adapters.cache import cached_generation
+from app.services.ai_adapters.http_client import get_async_client, aiter_sse_data
+from app.services.ai_adapters.rate_limit import rate_limited
+from app.services.ai_adapters.retry import with_retry
 
 
 class TongyiAdapter(TextModelAdapter):
-    """通义千问适配器"""
+    """
+    通义千问适配器
+    
+    API Key在每次调用时显式传入,不写入dashscope.api_key等进程级全局变量,
+    同一进程内(线程池、gevent或Celery threads池)并发处理不同用户的请求时不会串用密钥
+    """
+    
+    vendor = "tongyi"
+    
+    DEFAULT_API_BASE = "https://dashscope.aliyuncs.com/api/v1"
     
     def __init__(self, api_key: str, model_name: str = "qwen-turbo", **kwargs):
         super().__init__(api_key, **kwargs)
         self.model_name = model_name
-        dashscope.api_key = api_key
+    
+    @property
+    def _generation_url(self) -> str:
+        base = (self.api_endpoint or self.DEFAULT_API_BASE).rstrip("/")
+        return f"{base}/services/aigc/text-generation/generation"
     
     def validate_config(self) -> bool:
         """验证配置"""
@@ -22,6 +38,7 @@ class TongyiAdapter(TextModelAdapter):
             response = Generation.call(
                 model=self.model_name,
                 prompt="测试连接",
+                api_key=self.api_key,
                 max_tokens=10
             )
             return response.status_code == 200
@@ -32,6 +49,9 @@ class TongyiAdapter(TextModelAdapter):
         """生成内容"""
         return self.generate_text(prompt, **params)
     
+    @cached_generation
+    @with_retry
+    @rate_limited
     def generate_text(
         self,
         prompt: str,
@@ -42,15 +62,13 @@ class TongyiAdapter(TextModelAdapter):
     ) -> Dict[str, Any]:
         """生成文本"""
         try:
-            messages = []
-            if system_prompt:
-                messages.append({"role": "system", "content": system_prompt})
-            messages.append({"role": "user", "content": prompt})
+            messages = self._build_messages(prompt, system_prompt)
             
             response = Generation.call(
                 model=self.model_name,
                 messages=messages,
                 result_format='message',
+                api_key=self.api_key,
                 temperature=temperature,
                 max_tokens=max_tokens,
                 **kwargs
@@ -70,8 +88,134 @@ class TongyiAdapter(TextModelAdapter):
             else:
                 return {
                     "success": False,
-                    "error": f"API返回错误: {response.code} - {response.message}"
+                    "error": f"API返回错误: {response.code} - {response.message}",
+                    "status_code": response.status_code
+                }
+        
+        except Exception as e:
+            return self.handle_error(e)
+    
+    @rate_limited
+    def stream_generate(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 2000,
+        **kwargs
+    ) -> Iterator[str]:
+        """流式生成文本"""
+        responses = Generation.call(
+            model=self.model_name,
+            messages=self._build_messages(prompt, system_prompt),
+            result_format='message',
+            api_key=self.api_key,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+            incremental_output=True,
+            **kwargs
+        )
+        
+        for response in responses:
+            if response.status_code != 200:
+                raise RuntimeError(f"API返回错误: {response.code} - {response.message}")
+            content = response.output.choices[0].message.content
+            if content:
+                yield content
+    
+    def _build_payload(
+        self,
+        prompt: str,
+        system_prompt: Optional[str],
+        temperature: float,
+        max_tokens: int,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """构建DashScope HTTP请求体"""
+        return {
+            "model": self.model_name,
+            "input": {"messages": self._build_messages(prompt, system_prompt)},
+            "parameters": {
+                "result_format": "message",
+                "temperature": temperature,
+                "max_tokens": max_tokens,
+                **kwargs
+            }
+        }
+    
+    @cached_generation
+    @with_retry
+    @rate_limited
+    async def agenerate_text(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 2000,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """异步生成文本"""
+        try:
+            client = get_async_client()
+            response = await client.post(
+                self._generation_url,
+                json=self._build_payload(prompt, system_prompt, temperature, max_tokens, **kwargs),
+                headers={"Authorization": f"Bearer {self.api_key}"}
+            )
+            data = response.json()
+            
+            if response.status_code == 200:
+                usage = data.get("usage", {})
+                return {
+                    "success": True,
+                    "text": data["output"]["choices"][0]["message"]["content"],
+                    "usage": {
+                        "prompt_tokens": usage.get("input_tokens", 0),
+                        "completion_tokens": usage.get("output_tokens", 0),
+                        "total_tokens": usage.get("total_tokens", 0)
+                    }
+                }
+            else:
+                return {
+                    "success": False,
+                    "error": f"API返回错误: {data.get('code')} - {data.get('message')}",
+                    "status_code": response.status_code
                 }
-                
+        
         except Exception as e:
             return self.handle_error(e)
+    
+    @rate_limited
+    async def astream_generate(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 2000,
+        **kwargs
+    ) -> AsyncIterator[str]:
+        """异步流式生成文本"""
+        payload = self._build_payload(prompt, system_prompt, temperature, max_tokens, **kwargs)
+        payload["parameters"]["incremental_output"] = True
+        
+        client = get_async_client()
+        async with client.stream(
+            "POST",
+            self._generation_url,
+            json=payload,
+            headers={
+                "Authorization": f"Bearer {self.api_key}",
+                "X-DashScope-SSE": "enable"
+            }
+        ) as response:
+            if response.status_code != 200:
+                await response.aread()
+                raise RuntimeError(f"API返回错误: {response.status_code} - {response.text}")
+            
+            async for event in aiter_sse_data(response):
+                choices = event.get("output", {}).get("choices") or []
+                if choices:
+                    content = choices[0].get("message", {}).get("content")
+                    if content:
+                        yield content
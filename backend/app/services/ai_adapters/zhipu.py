@@ -1,19 +1,32 @@
 """
 智谱AI文本生成适配器
 """
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, AsyncIterator, Iterator
 from zhipuai import ZhipuAI
 from app.services.ai_adapters.base import TextModelAdapter
+from app.services.ai_adapters.cache import cached_generation
+from app.services.ai_adapters.http_client import get_async_client, aiter_sse_data
+from app.services.ai_adapters.rate_limit import rate_limited
+from app.services.ai_adapters.retry import with_retry
 
 
 class ZhipuAdapter(TextModelAdapter):
     """智谱AI适配器"""
     
+    vendor = "zhipu"
+    
+    DEFAULT_API_BASE = "https://open.bigmodel.cn/api/paas/v4"
+    
     def __init__(self, api_key: str, model_name: str = "glm-4", **kwargs):
         super().__init__(api_key, **kwargs)
         self.model_name = model_name
         self.client = ZhipuAI(api_key=api_key)
     
+    @property
+    def _completions_url(self) -> str:
+        base = (self.api_endpoint or self.DEFAULT_API_BASE).rstrip("/")
+        return f"{base}/chat/completions"
+    
     def validate_config(self) -> bool:
         """验证配置"""
         try:
@@ -30,6 +43,9 @@ class ZhipuAdapter(TextModelAdapter):
         """生成内容"""
         return self.generate_text(prompt, **params)
     
+    @cached_generation
+    @with_retry
+    @rate_limited
     def generate_text(
         self,
         prompt: str,
@@ -40,10 +56,7 @@ class ZhipuAdapter(TextModelAdapter):
     ) -> Dict[str, Any]:
         """生成文本"""
         try:
-            messages = []
-            if system_prompt:
-                messages.append({"role": "system", "content": system_prompt})
-            messages.append({"role": "user", "content": prompt})
+            messages = self._build_messages(prompt, system_prompt)
             
             response = self.client.chat.completions.create(
                 model=self.model_name,
@@ -62,6 +75,115 @@ class ZhipuAdapter(TextModelAdapter):
                     "total_tokens": response.usage.total_tokens
                 }
             }
-                
+        
+        except Exception as e:
+            return self.handle_error(e)
+    
+    @rate_limited
+    def stream_generate(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 2000,
+        **kwargs
+    ) -> Iterator[str]:
+        """流式生成文本"""
+        response = self.client.chat.completions.create(
+            model=self.model_name,
+            messages=self._build_messages(prompt, system_prompt),
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+            **kwargs
+        )
+        
+        for chunk in response:
+            if chunk.choices:
+                content = chunk.choices[0].delta.content
+                if content:
+                    yield content
+    
+    @cached_generation
+    @with_retry
+    @rate_limited
+    async def agenerate_text(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 2000,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """异步生成文本"""
+        try:
+            client = get_async_client()
+            response = await client.post(
+                self._completions_url,
+                json={
+                    "model": self.model_name,
+                    "messages": self._build_messages(prompt, system_prompt),
+                    "temperature": temperature,
+                    "max_tokens": max_tokens,
+                    **kwargs
+                },
+                headers={"Authorization": f"Bearer {self.api_key}"}
+            )
+            data = response.json()
+            
+            if response.status_code == 200:
+                usage = data.get("usage", {})
+                return {
+                    "success": True,
+                    "text": data["choices"][0]["message"]["content"],
+                    "usage": {
+                        "prompt_tokens": usage.get("prompt_tokens", 0),
+                        "completion_tokens": usage.get("completion_tokens", 0),
+                        "total_tokens": usage.get("total_tokens", 0)
+                    }
+                }
+            else:
+                error = data.get("error", {})
+                return {
+                    "success": False,
+                    "error": f"API返回错误: {error.get('code')} - {error.get('message')}",
+                    "status_code": response.status_code
+                }
+        
         except Exception as e:
             return self.handle_error(e)
+    
+    @rate_limited
+    async def astream_generate(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 2000,
+        **kwargs
+    ) -> AsyncIterator[str]:
+        """异步流式生成文本"""
+        client = get_async_client()
+        async with client.stream(
+            "POST",
+            self._completions_url,
+            json={
+                "model": self.model_name,
+                "messages": self._build_messages(prompt, system_prompt),
+                "temperature": temperature,
+                "max_tokens": max_tokens,
+                "stream": True,
+                **kwargs
+            },
+            headers={"Authorization": f"Bearer {self.api_key}"}
+        ) as response:
+            if response.status_code != 200:
+                await response.aread()
+                raise RuntimeError(f"API返回错误: {response.status_code} - {response.text}")
+            
+            async for event in aiter_sse_data(response):
+                choices = event.get("choices") or []
+                if choices:
+                    content = choices[0].get("delta", {}).get("content")
+                    if content:
+                        yield content
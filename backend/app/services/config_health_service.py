@@ -0,0 +1,196 @@
+"""
+模型配置健康检查服务
+
+验证模型配置需要向厂商发起真实请求,既慢又消耗配额。验证结果按配置缓存在两级缓存中
+(成功CONFIG_HEALTH_TTL秒,失败CONFIG_HEALTH_FAILURE_TTL秒),缓存值带配置指纹,配置修改后自动失效。
+后台探测任务定期刷新活跃配置的健康状态,设置页批量读取时通常直接命中缓存
+"""
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+import redis
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from app.core.cache import TwoTierCache, get_redis
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.ai_model import AIModelConfig
+from app.models.usage import UsageRecord
+from app.services.ai_adapters.registry import config_fingerprint
+from app.services.model_config_service import ModelConfigService
+
+logger = logging.getLogger(__name__)
+
+_PROBE_LOCK_KEY = "config_health:probe_lock"
+
+# 验证结果缓存(键为config_id,值中的expires_at决定是否新鲜)
+config_health_cache = TwoTierCache(
+    "config_health",
+    max_entries=4096,
+    ttl=max(settings.CONFIG_HEALTH_TTL, settings.CONFIG_HEALTH_FAILURE_TTL)
+)
+
+
+class ConfigHealthService:
+    """模型配置健康检查服务"""
+    
+    @staticmethod
+    def _fresh_state(config: AIModelConfig, state: Optional[Dict[str, Any]], now: float) -> Optional[Dict[str, Any]]:
+        """缓存状态属于当前配置且未过期时返回,否则返回None"""
+        if not state or state.get("fingerprint") != config_fingerprint(config):
+            return None
+        if state.get("expires_at", 0) <= now:
+            return None
+        return state
+    
+    @staticmethod
+    def _response(config: AIModelConfig, state: Dict[str, Any], cached: bool) -> Dict[str, Any]:
+        response = {key: value for key, value in state.items() if key not in ("fingerprint", "expires_at")}
+        response.update(config_id=config.config_id, config_name=config.config_name, cached=cached)
+        return response
+    
+    @staticmethod
+    def get_cached_state(config: AIModelConfig) -> Optional[Dict[str, Any]]:
+        """
+        读取配置的缓存验证结果
+        
+        Args:
+            config: 模型配置
+        
+        Returns:
+            Dict: 新鲜的验证结果,没有时返回None
+        """
+        state = ConfigHealthService._fresh_state(config, config_health_cache.get(str(config.config_id)), time.time())
+        return ConfigHealthService._response(config, state, cached=True) if state else None
+    
+    @staticmethod
+    async def _acheck_one(
+        config: AIModelConfig,
+        force: bool,
+        timeout: float,
+        semaphore: asyncio.Semaphore
+    ) -> Dict[str, Any]:
+        key = str(config.config_id)
+        if not force:
+            state = ConfigHealthService._fresh_state(config, await config_health_cache.aget(key), time.time())
+            if state:
+                return ConfigHealthService._response(config, state, cached=True)
+        
+        fingerprint = config_fingerprint(config)
+        async with semaphore:
+            try:
+                result = await asyncio.wait_for(asyncio.to_thread(ModelConfigService.test_config, config), timeout)
+            except asyncio.TimeoutError:
+                result = {
+                    "success": False,
+                    "error": f"验证超时({timeout:.0f}秒)",
+                    "vendor": config.vendor,
+                    "model": config.model_name
+                }
+        
+        now = time.time()
+        ttl = settings.CONFIG_HEALTH_TTL if result.get("success") else settings.CONFIG_HEALTH_FAILURE_TTL
+        state = {
+            **result,
+            "checked_at": datetime.fromtimestamp(now, timezone.utc).isoformat(),
+            "fingerprint": fingerprint,
+            "expires_at": now + ttl
+        }
+        await config_health_cache.aset(key, state, ttl)
+        return ConfigHealthService._response(config, state, cached=False)
+    
+    @staticmethod
+    async def acheck_configs(
+        configs: List[AIModelConfig],
+        force: bool = False,
+        timeout: Optional[float] = None,
+        concurrency: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        并发验证多个模型配置,缓存中有新鲜结果的配置直接返回缓存
+        
+        Args:
+            configs: 模型配置列表
+            force: 是否忽略缓存重新验证
+            timeout: 单个配置的验证超时(秒),默认CONFIG_HEALTH_TIMEOUT
+            concurrency: 同时进行的验证数,默认CONFIG_HEALTH_CONCURRENCY
+        
+        Returns:
+            List[Dict]: 与configs顺序一致的验证结果
+        """
+        timeout = timeout or settings.CONFIG_HEALTH_TIMEOUT
+        semaphore = asyncio.Semaphore(concurrency or settings.CONFIG_HEALTH_CONCURRENCY)
+        return list(await asyncio.gather(
+            *(ConfigHealthService._acheck_one(config, force, timeout, semaphore) for config in configs)
+        ))
+    
+    @staticmethod
+    def _active_configs(db: Session, now: datetime) -> List[AIModelConfig]:
+        """近期有用量或修改过的配置"""
+        since = now - timedelta(days=settings.CONFIG_HEALTH_ACTIVE_DAYS)
+        used_config_ids = db.query(UsageRecord.config_id).filter(
+            UsageRecord.usage_date >= since.date(),
+            UsageRecord.config_id.isnot(None)
+        ).distinct()
+        return db.query(AIModelConfig).filter(
+            or_(
+                AIModelConfig.config_id.in_(used_config_ids),
+                AIModelConfig.updated_at >= since
+            )
+        ).all()
+    
+    @staticmethod
+    def probe_active_configs() -> Dict[str, int]:
+        """
+        刷新活跃配置的健康状态(由Celery beat定时调用)
+        
+        只验证没有缓存结果或缓存结果会在下一轮探测前过期的配置,最早过期的优先,
+        每轮最多CONFIG_HEALTH_PROBE_BATCH个,并发度CONFIG_HEALTH_PROBE_CONCURRENCY;
+        验证请求同样经过厂商限流。多个worker同时触发时只有一个执行
+        
+        Returns:
+            Dict: {"active": 活跃配置数, "probed": 本轮验证数, "healthy": 验证通过数}
+        """
+        try:
+            if not get_redis().set(_PROBE_LOCK_KEY, 1, nx=True, ex=max(1, settings.CONFIG_HEALTH_PROBE_INTERVAL - 1)):
+                return {"active": 0, "probed": 0, "healthy": 0}
+        except redis.RedisError as e:
+            logger.warning("获取健康探测锁失败,继续执行: %s", e)
+        
+        db = SessionLocal()
+        try:
+            configs = ConfigHealthService._active_configs(db, datetime.now(timezone.utc))
+            
+            now = time.time()
+            refresh_before = now + settings.CONFIG_HEALTH_PROBE_INTERVAL
+            due = []
+            for config in configs:
+                state = ConfigHealthService._fresh_state(config, config_health_cache.get(str(config.config_id)), now)
+                expires_at = state["expires_at"] if state else 0.0
+                if expires_at < refresh_before:
+                    due.append((expires_at, config))
+            due.sort(key=lambda item: item[0])
+            due = [config for _, config in due[:settings.CONFIG_HEALTH_PROBE_BATCH]]
+            
+            results = asyncio.run(ConfigHealthService.acheck_configs(
+                due,
+                force=True,
+                concurrency=settings.CONFIG_HEALTH_PROBE_CONCURRENCY
+            )) if due else []
+        finally:
+            db.close()
+        
+        healthy = sum(1 for result in results if result.get("success"))
+        if len(results) > healthy:
+            logger.warning("健康探测: %d个配置中%d个验证失败", len(results), len(results) - healthy)
+        return {"active": len(configs), "probed": len(results), "healthy": healthy}
+    
+    @staticmethod
+    def invalidate(config_id: uuid.UUID):
+        """删除配置的缓存验证结果"""
+        config_health_cache.delete(str(config_id))
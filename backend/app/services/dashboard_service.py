@@ -0,0 +1,293 @@
+"""
+项目看板统计服务
+
+看板数据(各状态项目数、排队/执行中/失败任务数、分镜总数和时长、素材占用空间)由一条UNION ALL分组查询得到,
+按用户缓存在两级缓存中。缓存键带有用户的数据版本号(Redis计数器):会话提交时若写入了项目、任务、脚本、
+分镜或素材,对应用户的版本号加一,所有API进程和worker随即读到新版本,旧缓存不再命中
+"""
+import logging
+import uuid
+from typing import Any, Dict, Iterable, Optional, Set
+
+import redis
+from sqlalchemy import Float, String, event, func, inspect, literal, select, union_all
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.core.cache import TwoTierCache, get_redis
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.project import (
+    Character,
+    CharacterImage,
+    Scene,
+    SceneImage,
+    Script,
+    Storyboard,
+    Task,
+    VideoProject,
+    VideoSegment,
+)
+
+logger = logging.getLogger(__name__)
+
+_VERSION_KEY = "dashboard:version:{}"
+# 版本号须比缓存活得久,否则计数器过期归零后可能命中旧版本号的缓存
+_VERSION_TTL = settings.DASHBOARD_CACHE_TTL * 2
+
+# 会话中待失效的用户(提交后处理)
+_PENDING_KEY = "dashboard_stale_users"
+
+PENDING_TASK_STATUSES = ("pending",)
+RUNNING_TASK_STATUSES = ("processing", "running")
+FAILED_TASK_STATUSES = ("failed",)
+
+dashboard_cache = TwoTierCache(
+    "dashboard",
+    max_entries=4096,
+    ttl=settings.DASHBOARD_CACHE_TTL
+)
+
+
+class DashboardService:
+    """项目看板统计服务类"""
+    
+    @staticmethod
+    def _aggregate_query(user_id: uuid.UUID):
+        """看板统计的UNION ALL查询,每行为(类别, 状态, 数量, 合计值)"""
+        owned = select(VideoProject.project_id).where(VideoProject.user_id == user_id)
+        no_status = literal(None, String)
+        zero = literal(0.0, Float)
+        
+        projects = select(
+            literal("project"), VideoProject.status, func.count(), zero
+        ).where(VideoProject.user_id == user_id).group_by(VideoProject.status)
+        
+        tasks = select(
+            literal("task"), Task.status, func.count(), zero
+        ).where(
+            Task.project_id.in_(owned),
+            Task.status.in_(PENDING_TASK_STATUSES + RUNNING_TASK_STATUSES + FAILED_TASK_STATUSES)
+        ).group_by(Task.status)
+        
+        storyboards = select(
+            literal("storyboard"), no_status, func.count(), func.coalesce(func.sum(Storyboard.duration), 0)
+        ).join(Script, Script.script_id == Storyboard.script_id).where(Script.project_id.in_(owned))
+        
+        character_images = select(
+            literal("storage"), no_status, func.count(), func.coalesce(func.sum(CharacterImage.file_size), 0)
+        ).join(Character, Character.character_id == CharacterImage.character_id).where(Character.project_id.in_(owned))
+        
+        scene_images = select(
+            literal("storage"), no_status, func.count(), func.coalesce(func.sum(SceneImage.file_size), 0)
+        ).join(Scene, Scene.scene_id == SceneImage.scene_id).where(Scene.project_id.in_(owned))
+        
+        video_segments = select(
+            literal("storage"), no_status, func.count(), func.coalesce(func.sum(VideoSegment.file_size), 0)
+        ).join(
+            Storyboard, Storyboard.storyboard_id == VideoSegment.storyboard_id
+        ).join(Script, Script.script_id == Storyboard.script_id).where(Script.project_id.in_(owned))
+        
+        return union_all(projects, tasks, storyboards, character_images, scene_images, video_segments)
+    
+    @staticmethod
+    def compute_dashboard(db: Session, user_id: uuid.UUID) -> Dict[str, Any]:
+        """
+        查询看板统计(不经过缓存)
+        
+        Args:
+            db: 数据库会话
+            user_id: 用户ID
+        
+        Returns:
+            Dict: 看板统计,字段同get_dashboard
+        """
+        projects_by_status: Dict[str, int] = {}
+        tasks = {"pending": 0, "running": 0, "failed": 0}
+        storyboards_total = 0
+        storyboards_duration = 0.0
+        storage_bytes = 0
+        
+        for kind, item_status, count, amount in db.execute(DashboardService._aggregate_query(user_id)):
+            if kind == "project":
+                projects_by_status[item_status] = count
+            elif kind == "task":
+                if item_status in PENDING_TASK_STATUSES:
+                    tasks["pending"] += count
+                elif item_status in RUNNING_TASK_STATUSES:
+                    tasks["running"] += count
+                else:
+                    tasks["failed"] += count
+            elif kind == "storyboard":
+                storyboards_total = count
+                storyboards_duration = float(amount or 0)
+            else:
+                storage_bytes += int(amount or 0)
+        
+        return {
+            "projects_total": sum(projects_by_status.values()),
+            "projects_by_status": projects_by_status,
+            "tasks_pending": tasks["pending"],
+            "tasks_running": tasks["running"],
+            "tasks_failed": tasks["failed"],
+            "storyboards_total": storyboards_total,
+            "storyboards_duration": round(storyboards_duration, 2),
+            "storage_bytes": storage_bytes
+        }
+    
+    @staticmethod
+    def _data_version(user_id: uuid.UUID) -> Optional[str]:
+        """用户数据版本号,Redis不可用时返回None"""
+        try:
+            version = get_redis().get(_VERSION_KEY.format(user_id))
+        except redis.RedisError as e:
+            logger.warning("读取看板数据版本失败,不使用缓存: %s", e)
+            return None
+        return version.decode() if version else "0"
+    
+    @staticmethod
+    def get_dashboard(db: Session, user_id: uuid.UUID) -> Dict[str, Any]:
+        """
+        获取项目看板统计(按用户缓存)
+        
+        Redis不可用时无法跨进程失效缓存,直接查询数据库
+        
+        Args:
+            db: 数据库会话
+            user_id: 用户ID
+        
+        Returns:
+            Dict: {"projects_total", "projects_by_status", "tasks_pending", "tasks_running", "tasks_failed",
+                   "storyboards_total", "storyboards_duration", "storage_bytes"}
+        """
+        version = DashboardService._data_version(user_id)
+        if version is None:
+            return DashboardService.compute_dashboard(db, user_id)
+        
+        cache_key = f"{user_id}:{version}"
+        dashboard = dashboard_cache.get(cache_key)
+        if dashboard is None:
+            dashboard = DashboardService.compute_dashboard(db, user_id)
+            dashboard_cache.set(cache_key, dashboard)
+        return dashboard
+    
+    @staticmethod
+    def invalidate(user_ids: Iterable[uuid.UUID]):
+        """使用户的看板缓存失效(数据版本号加一)"""
+        user_ids = set(user_ids)
+        if not user_ids:
+            return
+        try:
+            pipe = get_redis().pipeline()
+            for user_id in user_ids:
+                key = _VERSION_KEY.format(user_id)
+                pipe.incr(key)
+                pipe.expire(key, _VERSION_TTL)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning("更新看板数据版本失败,缓存将在过期后刷新: %s", e)
+    
+    @staticmethod
+    def mark_stale(
+        db: Session,
+        user_ids: Iterable[uuid.UUID] = (),
+        script_ids: Iterable[uuid.UUID] = ()
+    ):
+        """
+        登记会话提交后需要失效的看板缓存
+        
+        ORM写入由会话事件自动登记;绕过工作单元的批量INSERT/UPDATE/DELETE需要调用方登记
+        
+        Args:
+            db: 数据库会话
+            user_ids: 用户ID
+            script_ids: 脚本ID(数据属于脚本所在项目的用户)
+        """
+        users = _resolve_users(db.connection(), user_ids=set(user_ids), script_ids=set(script_ids))
+        db.info.setdefault(_PENDING_KEY, set()).update(users)
+
+
+def _resolve_users(
+    connection: Connection,
+    user_ids: Set[uuid.UUID] = frozenset(),
+    project_ids: Set[uuid.UUID] = frozenset(),
+    script_ids: Set[uuid.UUID] = frozenset(),
+    storyboard_ids: Set[uuid.UUID] = frozenset(),
+    character_ids: Set[uuid.UUID] = frozenset(),
+    scene_ids: Set[uuid.UUID] = frozenset()
+) -> Set[uuid.UUID]:
+    """把写入涉及的各级ID归并为用户ID"""
+    project_ids = set(project_ids)
+    owner_queries = (
+        (script_ids, select(Script.project_id).where(Script.script_id.in_(script_ids))),
+        (storyboard_ids, select(Script.project_id).join(
+            Storyboard, Storyboard.script_id == Script.script_id
+        ).where(Storyboard.storyboard_id.in_(storyboard_ids))),
+        (character_ids, select(Character.project_id).where(Character.character_id.in_(character_ids))),
+        (scene_ids, select(Scene.project_id).where(Scene.scene_id.in_(scene_ids))),
+    )
+    for ids, query in owner_queries:
+        if ids:
+            project_ids.update(connection.execute(query).scalars())
+    
+    users = set(user_ids)
+    if project_ids:
+        users.update(connection.execute(
+            select(VideoProject.user_id).where(VideoProject.project_id.in_(project_ids))
+        ).scalars())
+    return users
+
+
+def _changed(instance: Any, *attributes: str) -> bool:
+    state = inspect(instance)
+    return any(state.attrs[name].history.has_changes() for name in attributes)
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _collect_stale_users(session: Session, flush_context):
+    """收集本次flush中影响看板统计的写入"""
+    ids = {
+        "user_ids": set(),
+        "project_ids": set(),
+        "script_ids": set(),
+        "storyboard_ids": set(),
+        "character_ids": set(),
+        "scene_ids": set()
+    }
+    for instance in session.new | session.deleted:
+        if isinstance(instance, VideoProject):
+            ids["user_ids"].add(instance.user_id)
+        elif isinstance(instance, (Task, Script)):
+            ids["project_ids"].add(instance.project_id)
+        elif isinstance(instance, Storyboard):
+            ids["script_ids"].add(instance.script_id)
+        elif isinstance(instance, VideoSegment):
+            ids["storyboard_ids"].add(instance.storyboard_id)
+        elif isinstance(instance, CharacterImage):
+            ids["character_ids"].add(instance.character_id)
+        elif isinstance(instance, SceneImage):
+            ids["scene_ids"].add(instance.scene_id)
+    # 修改只关心参与统计的字段(任务进度等频繁更新不失效缓存)
+    for instance in session.dirty:
+        if isinstance(instance, VideoProject) and _changed(instance, "status"):
+            ids["user_ids"].add(instance.user_id)
+        elif isinstance(instance, Task) and _changed(instance, "status"):
+            ids["project_ids"].add(instance.project_id)
+        elif isinstance(instance, Storyboard) and _changed(instance, "duration", "script_id"):
+            ids["script_ids"].add(instance.script_id)
+        elif isinstance(instance, VideoSegment) and _changed(instance, "file_size"):
+            ids["storyboard_ids"].add(instance.storyboard_id)
+    
+    if any(ids.values()):
+        users = _resolve_users(session.connection(), **ids)
+        session.info.setdefault(_PENDING_KEY, set()).update(users)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _invalidate_stale_users(session: Session):
+    DashboardService.invalidate(session.info.pop(_PENDING_KEY, ()))
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_stale_users(session: Session):
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,379 @@
+"""
+人物形象和场景图批量生成服务
+"""
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.ai_model import AIModelConfig
+from app.models.project import Character, CharacterImage, Scene, SceneImage, VideoProject
+from app.services.ai_adapters.base import ImageModelAdapter
+from app.services.ai_adapters.registry import adapter_registry
+
+
+class ImageRequest(NamedTuple):
+    """一个视角需要生成的图像"""
+    view: str
+    prompt: str
+    count: int
+    width: int
+    height: int
+
+
+class ImageBatch(NamedTuple):
+    """一次厂商调用:相同提示词和尺寸的图像通过num_images合并生成"""
+    prompt: str
+    width: int
+    height: int
+    views: List[str]  # 每张图像对应的视角,长度即num_images
+
+
+def plan_image_batches(requests: List[ImageRequest], max_batch: int) -> List[ImageBatch]:
+    """
+    把图像请求合并为尽量少的厂商调用
+    
+    提示词和尺寸都相同的请求合并到同一次调用,单次调用最多生成max_batch张
+    
+    Args:
+        requests: 图像请求列表
+        max_batch: 单次调用的最大图像数
+    
+    Returns:
+        List[ImageBatch]: 调用计划
+    """
+    groups: Dict[Tuple[str, int, int], List[str]] = {}
+    for request in requests:
+        groups.setdefault((request.prompt, request.width, request.height), []).extend(
+            [request.view] * request.count
+        )
+    
+    batches = []
+    for (prompt, width, height), views in groups.items():
+        for start in range(0, len(views), max_batch):
+            batches.append(ImageBatch(prompt, width, height, views[start:start + max_batch]))
+    return batches
+
+
+class ImageService:
+    """图像生成服务类"""
+    
+    CHARACTER_VIEWS = {
+        "front": "正面全身像,站立姿势,纯色背景",
+        "back": "背面全身像,站立姿势,纯色背景",
+        "closeup": "面部特写,表情自然"
+    }
+    
+    SCENE_ANGLES = {
+        "front": "正面视角,全景",
+        "side": "侧面视角,全景",
+        "top": "俯视视角,鸟瞰全景"
+    }
+    
+    @staticmethod
+    def _get_image_adapter(db: Session, user_id: uuid.UUID, model_config_id: uuid.UUID) -> Tuple[AIModelConfig, ImageModelAdapter]:
+        config = db.query(AIModelConfig).filter(
+            AIModelConfig.config_id == model_config_id,
+            AIModelConfig.user_id == user_id
+        ).first()
+        
+        if not config:
+            raise ValueError("模型配置不存在或无权访问")
+        
+        adapter = adapter_registry.get_adapter(config)
+        if not isinstance(adapter, ImageModelAdapter):
+            raise ValueError(f"模型配置不是图像模型: {config.vendor}")
+        
+        return config, adapter
+    
+    @staticmethod
+    def _run_batch(adapter: ImageModelAdapter, batch: ImageBatch, directory: str) -> Dict[str, Any]:
+        """执行一次厂商调用,图像直接写入directory"""
+        def path_for(index: int, ext: str) -> str:
+            view = batch.views[index] if index < len(batch.views) else "extra"
+            return os.path.join(directory, f"{view}_{uuid.uuid4().hex}.{ext}")
+        
+        result = adapter.generate_images_to_disk(
+            batch.prompt,
+            path_for,
+            width=batch.width,
+            height=batch.height,
+            num_images=len(batch.views)
+        )
+        if not result.get("success"):
+            return result
+        
+        images = result.get("images", [])
+        # 厂商多返回的图像不保存
+        for image in images[len(batch.views):]:
+            if os.path.exists(image["local_path"]):
+                os.remove(image["local_path"])
+        
+        return {
+            "success": True,
+            "images": [
+                {"view": view, **image}
+                for view, image in zip(batch.views, images)
+            ],
+            "missing": max(0, len(batch.views) - len(images))
+        }
+    
+    @staticmethod
+    def generate_batched(
+        adapter: ImageModelAdapter,
+        requests: List[ImageRequest],
+        directory: str
+    ) -> Dict[str, Any]:
+        """
+        按调用计划生成图像,各次调用并发执行
+        
+        Args:
+            adapter: 图像模型适配器
+            requests: 图像请求列表
+            directory: 保存目录
+        
+        Returns:
+            Dict: {"images": [{"view", "local_path", "file_size"}], "errors": [str], "calls": int}
+        """
+        batches = plan_image_batches(requests, settings.IMAGE_MAX_BATCH_SIZE)
+        os.makedirs(directory, exist_ok=True)
+        
+        workers = max(1, min(settings.IMAGE_BATCH_CONCURRENCY, len(batches)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(
+                lambda batch: ImageService._run_batch(adapter, batch, directory),
+                batches
+            ))
+        
+        images, errors = [], []
+        for batch, result in zip(batches, results):
+            if not result.get("success"):
+                errors.append(f"{'/'.join(sorted(set(batch.views)))}: {result.get('error', '未知错误')}")
+                continue
+            images.extend(result["images"])
+            if result["missing"]:
+                errors.append(f"{'/'.join(sorted(set(batch.views)))}: 厂商少返回了{result['missing']}张图像")
+        
+        return {"images": images, "errors": errors, "calls": len(batches)}
+    
+    @staticmethod
+    def _build_requests(
+        base_prompt: str,
+        views: Dict[str, str],
+        view_types: Optional[List[str]],
+        images_per_view: int,
+        width: int,
+        height: int
+    ) -> List[ImageRequest]:
+        view_types = view_types or list(views)
+        for view in view_types:
+            if view not in views:
+                raise ValueError(f"无效的视角: {view}. 有效值: {list(views)}")
+        if images_per_view < 1:
+            raise ValueError("每个视角至少生成1张图像")
+        
+        return [
+            ImageRequest(view, f"{base_prompt},{views[view]}", images_per_view, width, height)
+            for view in dict.fromkeys(view_types)
+        ]
+    
+    @staticmethod
+    def generate_character_images(
+        db: Session,
+        user_id: uuid.UUID,
+        character_id: uuid.UUID,
+        model_config_id: uuid.UUID,
+        view_types: Optional[List[str]] = None,
+        images_per_view: int = 1,
+        width: int = 768,
+        height: int = 1024
+    ) -> Dict[str, Any]:
+        """
+        批量生成人物形象
+        
+        Args:
+            db: 数据库会话
+            user_id: 用户ID
+            character_id: 人物ID
+            model_config_id: 图像模型配置ID
+            view_types: 视角列表(front/back/closeup),默认全部
+            images_per_view: 每个视角生成的数量
+            width: 图像宽度
+            height: 图像高度
+        
+        Returns:
+            Dict: {"images": [CharacterImage], "errors": [str], "calls": int}
+        """
+        character = db.query(Character).join(
+            VideoProject, VideoProject.project_id == Character.project_id
+        ).filter(
+            Character.character_id == character_id,
+            VideoProject.user_id == user_id
+        ).first()
+        
+        if not character:
+            raise ValueError("人物不存在或无权访问")
+        
+        config, adapter = ImageService._get_image_adapter(db, user_id, model_config_id)
+        
+        base_prompt = ",".join(part for part in (character.name, character.appearance) if part)
+        requests = ImageService._build_requests(
+            base_prompt, ImageService.CHARACTER_VIEWS, view_types, images_per_view, width, height
+        )
+        directory = os.path.join(settings.STORAGE_PATH, "images", "characters", str(character_id))
+        result = ImageService.generate_batched(adapter, requests, directory)
+        
+        images = [
+            CharacterImage(
+                character_id=character_id,
+                view_type=image["view"],
+                local_path=image["local_path"],
+                file_size=image["file_size"],
+                generated_by_config=config.config_id
+            )
+            for image in result["images"]
+        ]
+        if not images:
+            raise Exception(f"人物形象生成失败: {'; '.join(result['errors']) or '未返回图像'}")
+        
+        db.add_all(images)
+        db.commit()
+        
+        return {"images": images, "errors": result["errors"], "calls": result["calls"]}
+    
+    @staticmethod
+    def generate_scene_images(
+        db: Session,
+        user_id: uuid.UUID,
+        scene_id: uuid.UUID,
+        model_config_id: uuid.UUID,
+        angle_types: Optional[List[str]] = None,
+        images_per_angle: int = 1,
+        width: int = 1280,
+        height: int = 720
+    ) -> Dict[str, Any]:
+        """
+        批量生成场景图
+        
+        Args:
+            db: 数据库会话
+            user_id: 用户ID
+            scene_id: 场景ID
+            model_config_id: 图像模型配置ID
+            angle_types: 视角列表(front/side/top),默认全部
+            images_per_angle: 每个视角生成的数量
+            width: 图像宽度
+            height: 图像高度
+        
+        Returns:
+            Dict: {"images": [SceneImage], "errors": [str], "calls": int}
+        """
+        scene = db.query(Scene).join(
+            VideoProject, VideoProject.project_id == Scene.project_id
+        ).filter(
+            Scene.scene_id == scene_id,
+            VideoProject.user_id == user_id
+        ).first()
+        
+        if not scene:
+            raise ValueError("场景不存在或无权访问")
+        
+        config, adapter = ImageService._get_image_adapter(db, user_id, model_config_id)
+        
+        base_prompt = ",".join(
+            part for part in (scene.name, scene.environment_type, scene.description) if part
+        )
+        requests = ImageService._build_requests(
+            base_prompt, ImageService.SCENE_ANGLES, angle_types, images_per_angle, width, height
+        )
+        directory = os.path.join(settings.STORAGE_PATH, "images", "scenes", str(scene_id))
+        result = ImageService.generate_batched(adapter, requests, directory)
+        
+        images = [
+            SceneImage(
+                scene_id=scene_id,
+                angle_type=image["view"],
+                local_path=image["local_path"],
+                file_size=image["file_size"],
+                generated_by_config=config.config_id
+            )
+            for image in result["images"]
+        ]
+        if not images:
+            raise Exception(f"场景图生成失败: {'; '.join(result['errors']) or '未返回图像'}")
+        
+        db.add_all(images)
+        db.commit()
+        
+        return {"images": images, "errors": result["errors"], "calls": result["calls"]}
+    
+    @staticmethod
+    def regenerate_character_image(
+        db: Session,
+        user_id: uuid.UUID,
+        image_id: uuid.UUID,
+        model_config_id: uuid.UUID,
+        prompt: str,
+        strength: float = 0.6
+    ) -> List[CharacterImage]:
+        """
+        以已有人物形象为参考图进行图生图,生成同一视角的新形象
+        
+        参考图直接从CharacterImage.local_path流式上传
+        
+        Args:
+            db: 数据库会话
+            user_id: 用户ID
+            image_id: 参考人物形象ID
+            model_config_id: 图像模型配置ID
+            prompt: 修改描述
+            strength: 变化强度
+        
+        Returns:
+            List[CharacterImage]: 新生成的人物形象
+        """
+        reference = db.query(CharacterImage).join(
+            Character, Character.character_id == CharacterImage.character_id
+        ).join(
+            VideoProject, VideoProject.project_id == Character.project_id
+        ).filter(
+            CharacterImage.image_id == image_id,
+            VideoProject.user_id == user_id
+        ).first()
+        
+        if not reference:
+            raise ValueError("人物形象不存在或无权访问")
+        if not os.path.exists(reference.local_path):
+            raise ValueError("参考图文件不存在")
+        
+        config, adapter = ImageService._get_image_adapter(db, user_id, model_config_id)
+        
+        directory = os.path.dirname(reference.local_path)
+        result = adapter.img2img_to_disk(
+            reference.local_path,
+            prompt,
+            lambda index, ext: os.path.join(directory, f"{reference.view_type}_{uuid.uuid4().hex}.{ext}"),
+            strength=strength
+        )
+        if not result.get("success"):
+            raise Exception(f"图生图失败: {result.get('error', '未知错误')}")
+        
+        images = [
+            CharacterImage(
+                character_id=reference.character_id,
+                view_type=reference.view_type,
+                local_path=image["local_path"],
+                file_size=image["file_size"],
+                generated_by_config=config.config_id
+            )
+            for image in result.get("images", [])
+        ]
+        if not images:
+            raise Exception("图生图失败: 未返回图像")
+        
+        db.add_all(images)
+        db.commit()
+        
+        return images
@@ -1,9 +1,12 @@
 """
 模型配置管理服务
 """
+import time
 from typing import List, Optional
 from sqlalchemy.orm import Session
 from app.models.ai_model import AIModelConfig
+from app.services.ai_adapters.rate_limit import RateLimitTimeout, get_limiter
+from app.services.ai_adapters.registry import adapter_registry
 from app.utils.encryption import encrypt_string, decrypt_string
 import uuid
 
@@ -55,11 +58,14 @@ class ModelConfigService:
         ).first()
     
     @staticmethod
-    def get_configs(db: Session, user_id: uuid.UUID) -> List[AIModelConfig]:
-        """获取用户的所有配置"""
-        return db.query(AIModelConfig).filter(
+    def get_configs(db: Session, user_id: uuid.UUID, vendor: Optional[str] = None) -> List[AIModelConfig]:
+        """获取用户的所有配置(可按厂商筛选)"""
+        query = db.query(AIModelConfig).filter(
             AIModelConfig.user_id == user_id
-        ).all()
+        )
+        if vendor:
+            query = query.filter(AIModelConfig.vendor == vendor)
+        return query.all()
     
     @staticmethod
     def update_config(
@@ -84,6 +90,8 @@ class ModelConfigService:
         db.commit()
         db.refresh(config)
         
+        adapter_registry.invalidate(config_id)
+        
         return config
     
     @staticmethod
@@ -96,6 +104,8 @@ class ModelConfigService:
         db.delete(config)
         db.commit()
         
+        adapter_registry.invalidate(config_id)
+        
         return True
     
     @staticmethod
@@ -105,50 +115,53 @@ class ModelConfigService:
     
     @staticmethod
     def test_config(config: AIModelConfig, test_prompt: str = "测试") -> dict:
-        """测试模型配置"""
-        from app.services.ai_adapters.tongyi import TongyiAdapter
-        from app.services.ai_adapters.zhipu import ZhipuAdapter
-        from app.services.ai_adapters.baidu import BaiduAdapter
-        from app.services.ai_adapters.stable_diffusion import StableDiffusionAdapter
-        from app.services.ai_adapters.keling import KeLingAdapter
-        
+        """测试模型配置(向厂商发起真实请求,经过厂商限流)"""
         try:
-            # 解密API Key
-            api_key = decrypt_string(config.api_key)
-            
-            # 根据厂商创建适配器
-            if config.vendor == "tongyi":
-                adapter = TongyiAdapter(api_key=api_key, model_name=config.model_name)
-            elif config.vendor == "zhipu":
-                adapter = ZhipuAdapter(api_key=api_key, model_name=config.model_name)
-            elif config.vendor == "baidu":
-                # 百度需要secret_key，从parameters中获取
-                secret_key = config.parameters.get("secret_key", "")
-                adapter = BaiduAdapter(api_key=api_key, secret_key=secret_key, model_name=config.model_name)
-            elif config.vendor == "stable_diffusion":
-                adapter = StableDiffusionAdapter(api_key=api_key, api_endpoint=config.api_endpoint)
-            elif config.vendor == "keling":
-                adapter = KeLingAdapter(api_key=api_key, api_endpoint=config.api_endpoint)
-            else:
+            try:
+                adapter = adapter_registry.get_adapter(config)
+            except ValueError as e:
                 return {
                     "success": False,
-                    "error": f"不支持的厂商: {config.vendor}"
+                    "error": str(e)
                 }
             
+            limiter = get_limiter(adapter)
+            if limiter is not None:
+                try:
+                    limiter.acquire()
+                except RateLimitTimeout as e:
+                    return {
+                        "success": False,
+                        "error": str(e),
+                        "vendor": config.vendor,
+                        "model": config.model_name
+                    }
+            
             # 验证配置
-            is_valid = adapter.validate_config()
+            started = time.perf_counter()
+            is_valid = False
+            try:
+                is_valid = adapter.validate_config()
+            finally:
+                if limiter is not None:
+                    limiter.release(success=is_valid)
+            latency_ms = round((time.perf_counter() - started) * 1000, 1)
             
             if is_valid:
                 return {
                     "success": True,
                     "message": "配置有效，连接成功",
                     "vendor": config.vendor,
-                    "model": config.model_name
+                    "model": config.model_name,
+                    "latency_ms": latency_ms
                 }
             else:
                 return {
                     "success": False,
-                    "error": "配置验证失败，请检查API Key和端点"
+                    "error": "配置验证失败，请检查API Key和端点",
+                    "vendor": config.vendor,
+                    "model": config.model_name,
+                    "latency_ms": latency_ms
                 }
                 
         except Exception as e:
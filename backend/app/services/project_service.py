@@ -2,11 +2,16 @@
 项目管理服务
 """
 import uuid
-from typing import List, Optional
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
+from sqlalchemy import and_, case, exists, func, literal, or_
 
-from app.models.project import VideoProject
+from app.models.project import Script, VideoProject
+from app.utils.pagination import Page, keyset_paginate
+
+# LIKE模式中需要转义的字符
+_LIKE_ESCAPE = str.maketrans({"\\": "\\\\", "%": "\\%", "_": "\\_"})
 
 
 class ProjectService:
@@ -49,6 +54,39 @@ class ProjectService:
         
         return project
     
+    @staticmethod
+    def _search_clauses(db: Session, search: str) -> Tuple[Any, Any]:
+        """
+        构建项目搜索的筛选条件和相关度排序表达式
+        
+        匹配项目名称、故事梗概和任一版本的脚本文本(子串匹配,不区分大小写):快照匹配完整内容,
+        增量版本匹配其插入的文本,沿用的行由同一项目的快照匹配。PostgreSQL上
+        ILIKE '%词%'由pg_trgm GIN索引加速,相关度再叠加项目名称的word_similarity;
+        其他数据库(如SQLite测试库)退化为普通LIKE和按匹配字段排序
+        
+        Args:
+            db: 数据库会话
+            search: 搜索关键词
+        
+        Returns:
+            (筛选条件, 相关度表达式)
+        """
+        pattern = f"%{search.translate(_LIKE_ESCAPE)}%"
+        name_match = VideoProject.project_name.ilike(pattern, escape="\\")
+        synopsis_match = VideoProject.story_synopsis.ilike(pattern, escape="\\")
+        script_match = exists().where(
+            and_(
+                Script.project_id == VideoProject.project_id,
+                func.coalesce(Script.content, Script.delta_text).ilike(pattern, escape="\\")
+            )
+        )
+        
+        rank = case((name_match, 2.0), (synopsis_match, 1.0), else_=0.0)
+        if db.get_bind().dialect.name == "postgresql":
+            rank = rank + func.word_similarity(literal(search), VideoProject.project_name)
+        
+        return or_(name_match, synopsis_match, script_match), rank
+    
     @staticmethod
     def get_projects(
         db: Session,
@@ -56,21 +94,26 @@ class ProjectService:
         status: Optional[str] = None,
         search: Optional[str] = None,
         skip: int = 0,
-        limit: int = 50
-    ) -> List[VideoProject]:
+        limit: int = 50,
+        cursor: Optional[str] = None
+    ) -> Page:
         """
         获取用户的项目列表
         
+        不搜索时按(updated_at, project_id)倒序分页:传cursor时为游标分页,只传skip时按偏移分页
+        (同样返回下一页游标);搜索结果按相关度排序,只能使用skip分页
+        
         Args:
             db: 数据库会话
             user_id: 用户ID
             status: 按状态筛选(可选)
-            search: 搜索关键词(可选)
-            skip: 跳过条数
+            search: 搜索关键词(可选),匹配项目名称、故事梗概和脚本文本,结果按相关度排序
+            skip: 跳过条数(不能与cursor同时使用)
             limit: 限制条数
+            cursor: 上一页返回的游标(可选)
             
         Returns:
-            项目列表
+            Page: 项目列表和下一页游标
         """
         query = db.query(VideoProject).filter(VideoProject.user_id == user_id)
         
@@ -78,20 +121,31 @@ class ProjectService:
         if status:
             query = query.filter(VideoProject.status == status)
         
-        # 搜索
-        if search:
-            search_pattern = f"%{search}%"
-            query = query.filter(
-                or_(
-                    VideoProject.project_name.ilike(search_pattern),
-                    VideoProject.description.ilike(search_pattern)
-                )
+        if cursor and skip:
+            raise ValueError("cursor和skip不能同时使用")
+        
+        search = search.strip() if search else None
+        if not search:
+            return keyset_paginate(
+                query,
+                [VideoProject.updated_at, VideoProject.project_id],
+                [datetime.fromisoformat, uuid.UUID],
+                cursor=cursor,
+                limit=limit,
+                descending=True,
+                offset=skip
             )
         
-        # 排序和分页
-        projects = query.order_by(VideoProject.updated_at.desc()).offset(skip).limit(limit).all()
+        if cursor:
+            raise ValueError("搜索结果不支持游标分页,请使用skip")
+        
+        # 搜索(按相关度排序,相关度相同按更新时间)
+        condition, rank = ProjectService._search_clauses(db, search)
+        projects = query.filter(condition).order_by(
+            rank.desc(), VideoProject.updated_at.desc()
+        ).offset(skip).limit(limit).all()
         
-        return projects
+        return Page(projects, None)
     
     @staticmethod
     def update_project(
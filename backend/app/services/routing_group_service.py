@@ -0,0 +1,194 @@
+"""
+模型路由组管理服务
+"""
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from app.models.ai_model import AIModelConfig, ModelRoutingGroup
+from app.services.ai_adapters.base import TextModelAdapter
+from app.services.ai_adapters.registry import adapter_registry, is_text_vendor
+from app.services.ai_adapters.router import RoutedTextAdapter, RouteMember, model_router
+import uuid
+
+
+class RoutingGroupService:
+    """模型路由组管理服务"""
+    
+    @staticmethod
+    def _validate_members(
+        db: Session,
+        user_id: uuid.UUID,
+        member_config_ids: List[uuid.UUID]
+    ) -> List[str]:
+        """校验成员均为用户自己的文本模型配置,返回去重后的ID字符串列表"""
+        unique_ids = list(dict.fromkeys(member_config_ids))
+        if not unique_ids:
+            raise ValueError("路由组至少需要一个模型配置")
+        
+        configs = db.query(AIModelConfig).filter(
+            AIModelConfig.config_id.in_(unique_ids),
+            AIModelConfig.user_id == user_id
+        ).all()
+        found = {config.config_id: config for config in configs}
+        
+        for config_id in unique_ids:
+            config = found.get(config_id)
+            if config is None:
+                raise ValueError(f"模型配置不存在或无权访问: {config_id}")
+            if not is_text_vendor(config.vendor):
+                raise ValueError(f"路由组只支持文本模型: {config.config_name}")
+        
+        return [str(config_id) for config_id in unique_ids]
+    
+    @staticmethod
+    def create_group(
+        db: Session,
+        user_id: uuid.UUID,
+        group_name: str,
+        member_config_ids: List[uuid.UUID]
+    ) -> ModelRoutingGroup:
+        """创建路由组"""
+        members = RoutingGroupService._validate_members(db, user_id, member_config_ids)
+        
+        group = ModelRoutingGroup(
+            user_id=user_id,
+            group_name=group_name,
+            member_config_ids=members
+        )
+        
+        db.add(group)
+        db.commit()
+        db.refresh(group)
+        
+        return group
+    
+    @staticmethod
+    def get_group(db: Session, group_id: uuid.UUID, user_id: uuid.UUID) -> Optional[ModelRoutingGroup]:
+        """获取单个路由组"""
+        return db.query(ModelRoutingGroup).filter(
+            ModelRoutingGroup.group_id == group_id,
+            ModelRoutingGroup.user_id == user_id
+        ).first()
+    
+    @staticmethod
+    def get_groups(db: Session, user_id: uuid.UUID) -> List[ModelRoutingGroup]:
+        """获取用户的所有路由组"""
+        return db.query(ModelRoutingGroup).filter(
+            ModelRoutingGroup.user_id == user_id
+        ).all()
+    
+    @staticmethod
+    def update_group(
+        db: Session,
+        group_id: uuid.UUID,
+        user_id: uuid.UUID,
+        group_name: Optional[str] = None,
+        member_config_ids: Optional[List[uuid.UUID]] = None
+    ) -> Optional[ModelRoutingGroup]:
+        """更新路由组"""
+        group = RoutingGroupService.get_group(db, group_id, user_id)
+        if not group:
+            return None
+        
+        if group_name is not None:
+            group.group_name = group_name
+        
+        if member_config_ids is not None:
+            group.member_config_ids = RoutingGroupService._validate_members(db, user_id, member_config_ids)
+        
+        db.commit()
+        db.refresh(group)
+        
+        return group
+    
+    @staticmethod
+    def delete_group(db: Session, group_id: uuid.UUID, user_id: uuid.UUID) -> bool:
+        """删除路由组"""
+        group = RoutingGroupService.get_group(db, group_id, user_id)
+        if not group:
+            return False
+        
+        db.delete(group)
+        db.commit()
+        
+        return True
+    
+    @staticmethod
+    def get_member_configs(db: Session, group: ModelRoutingGroup) -> List[AIModelConfig]:
+        """按组内顺序获取成员配置(已删除的配置自动跳过)"""
+        member_ids = [uuid.UUID(config_id) for config_id in group.member_config_ids or []]
+        if not member_ids:
+            return []
+        
+        configs = db.query(AIModelConfig).filter(
+            AIModelConfig.config_id.in_(member_ids),
+            AIModelConfig.user_id == group.user_id
+        ).all()
+        found = {config.config_id: config for config in configs}
+        
+        return [found[config_id] for config_id in member_ids if config_id in found]
+    
+    @staticmethod
+    def _build_members(configs: List[AIModelConfig]) -> List[RouteMember]:
+        return [
+            RouteMember(
+                config_id=config.config_id,
+                config_name=config.config_name,
+                vendor=config.vendor,
+                model_name=config.model_name,
+                adapter=adapter_registry.get_text_adapter(config)
+            )
+            for config in configs
+        ]
+    
+    @staticmethod
+    def get_route_stats(db: Session, group: ModelRoutingGroup) -> List[Dict[str, Any]]:
+        """获取成员的当前排序和统计数据(当前进程)"""
+        members = RoutingGroupService._build_members(RoutingGroupService.get_member_configs(db, group))
+        return model_router.explain(members)
+    
+    @staticmethod
+    def resolve_text_target(
+        db: Session,
+        user_id: uuid.UUID,
+        model_config_id: Optional[uuid.UUID] = None,
+        routing_group_id: Optional[uuid.UUID] = None
+    ) -> Tuple[AIModelConfig, TextModelAdapter]:
+        """
+        解析文本生成的目标
+        
+        指定路由组时返回路由适配器,提示词相关设置取组内第一个成员的配置;
+        否则返回单个模型配置的适配器
+        
+        Args:
+            db: 数据库会话
+            user_id: 用户ID
+            model_config_id: 模型配置ID
+            routing_group_id: 路由组ID(优先)
+        
+        Returns:
+            (模型配置, 适配器)
+        """
+        if routing_group_id is not None:
+            group = RoutingGroupService.get_group(db, routing_group_id, user_id)
+            if not group:
+                raise ValueError("路由组不存在或无权访问")
+            
+            configs = RoutingGroupService.get_member_configs(db, group)
+            if not configs:
+                raise ValueError("路由组没有可用的模型配置")
+            
+            adapter = RoutedTextAdapter(group.group_name, RoutingGroupService._build_members(configs))
+            return configs[0], adapter
+        
+        if model_config_id is None:
+            raise ValueError("请指定模型配置或路由组")
+        
+        config = db.query(AIModelConfig).filter(
+            AIModelConfig.config_id == model_config_id,
+            AIModelConfig.user_id == user_id
+        ).first()
+        
+        if not config:
+            raise ValueError("模型配置不存在或无权访问")
+        
+        return config, adapter_registry.get_text_adapter(config)
@@ -0,0 +1,254 @@
+"""
+批量脚本生成服务
+
+一个批次对应一组Task记录(task_type=script,batch_id相同),以Celery group一次分派到generate_script_task。
+同一厂商(或路由组)同时执行的任务数由Redis中的执行名额限制:拿不到名额的任务延迟重新排队,不占用worker,
+批次总耗时取决于厂商并发而不是客户端逐个请求。批次进度由一次按状态分组的计数查询得到
+"""
+import logging
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+import redis
+from celery import group
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.cache import get_redis
+from app.core.celery_app import celery_app
+from app.core.config import settings
+from app.models.ai_model import AIModelConfig
+from app.models.project import Task as TaskModel, VideoProject
+from app.services.dashboard_service import DashboardService
+from app.services.routing_group_service import RoutingGroupService
+
+logger = logging.getLogger(__name__)
+
+_SLOT_KEY = "script_batch:slots:{}"
+
+
+class ScriptBatchService:
+    """批量脚本生成服务类"""
+    
+    @staticmethod
+    def concurrency_limit(concurrency_key: str) -> int:
+        """厂商(或路由组)的批量生成并发上限"""
+        return int(settings.SCRIPT_BATCH_VENDOR_LIMITS.get(concurrency_key, settings.SCRIPT_BATCH_VENDOR_CONCURRENCY))
+    
+    @staticmethod
+    def acquire_slot(concurrency_key: str, token: str) -> bool:
+        """
+        申请执行名额
+        
+        名额为Redis有序集合中的成员,分值为租约到期时间;先清理过期名额,加入后排名在上限内即成功,否则撤回。
+        Redis不可用时不限制并发
+        
+        Args:
+            concurrency_key: 厂商名或路由组键
+            token: 名额标识(释放时使用)
+        
+        Returns:
+            bool: 是否拿到名额
+        """
+        key = _SLOT_KEY.format(concurrency_key)
+        now = time.time()
+        try:
+            pipe = get_redis().pipeline()
+            pipe.zremrangebyscore(key, "-inf", now)
+            pipe.zadd(key, {token: now + settings.SCRIPT_BATCH_SLOT_LEASE})
+            pipe.zrank(key, token)
+            pipe.expire(key, settings.SCRIPT_BATCH_SLOT_LEASE)
+            rank = pipe.execute()[2]
+            if rank is not None and rank < ScriptBatchService.concurrency_limit(concurrency_key):
+                return True
+            get_redis().zrem(key, token)
+            return False
+        except redis.RedisError as e:
+            logger.warning("申请批量生成名额失败,不限制并发: %s", e)
+            return True
+    
+    @staticmethod
+    def release_slot(concurrency_key: str, token: str):
+        """释放执行名额"""
+        try:
+            get_redis().zrem(_SLOT_KEY.format(concurrency_key), token)
+        except redis.RedisError as e:
+            logger.warning("释放批量生成名额失败,等待租约到期: %s", e)
+    
+    @staticmethod
+    def _concurrency_keys(
+        db: Session,
+        user_id: uuid.UUID,
+        items: List[Dict[str, Any]]
+    ) -> List[str]:
+        """校验项目、模型配置和路由组的访问权限,返回每个条目的并发控制键"""
+        project_ids = {item["project_id"] for item in items}
+        owned = {
+            project_id for (project_id,) in db.query(VideoProject.project_id).filter(
+                VideoProject.project_id.in_(project_ids),
+                VideoProject.user_id == user_id
+            )
+        }
+        if owned != project_ids:
+            raise ValueError("项目不存在或无权访问")
+        
+        config_ids = {item["model_config_id"] for item in items if not item.get("routing_group_id") and item.get("model_config_id")}
+        vendors = dict(
+            db.query(AIModelConfig.config_id, AIModelConfig.vendor).filter(
+                AIModelConfig.config_id.in_(config_ids),
+                AIModelConfig.user_id == user_id
+            ).all()
+        ) if config_ids else {}
+        if len(vendors) != len(config_ids):
+            raise ValueError("模型配置不存在或无权访问")
+        
+        for group_id in {item["routing_group_id"] for item in items if item.get("routing_group_id")}:
+            if not RoutingGroupService.get_group(db, group_id, user_id):
+                raise ValueError("路由组不存在或无权访问")
+        
+        keys = []
+        for item in items:
+            if item.get("routing_group_id"):
+                keys.append(f"routing_group:{item['routing_group_id']}")
+            elif item.get("model_config_id"):
+                keys.append(vendors[item["model_config_id"]])
+            else:
+                raise ValueError("请指定模型配置或路由组")
+        return keys
+    
+    @staticmethod
+    def create_batch(
+        db: Session,
+        user_id: uuid.UUID,
+        items: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """
+        创建批次并分派生成任务
+        
+        Args:
+            db: 数据库会话
+            user_id: 用户ID
+            items: 生成条目,字段同ScriptService.generate_script(project_id、story_outline、model_config_id、
+                   routing_group_id、system_prompt、temperature、max_tokens、use_cache)
+        
+        Returns:
+            Dict: 批次进度,同get_batch
+        """
+        if not items:
+            raise ValueError("批次不能为空")
+        if len(items) > settings.SCRIPT_BATCH_MAX_ITEMS:
+            raise ValueError(f"单个批次最多{settings.SCRIPT_BATCH_MAX_ITEMS}条")
+        
+        concurrency_keys = ScriptBatchService._concurrency_keys(db, user_id, items)
+        
+        batch_id = uuid.uuid4()
+        task_ids = [str(uuid.uuid4()) for _ in items]
+        db.add_all([
+            TaskModel(
+                task_id=uuid.UUID(task_id),
+                project_id=item["project_id"],
+                task_type="script",
+                celery_task_id=task_id,
+                batch_id=batch_id,
+                status="pending",
+                progress=0,
+                result_data={}
+            )
+            for task_id, item in zip(task_ids, items)
+        ])
+        db.commit()
+        
+        signatures = []
+        for task_id, item, concurrency_key in zip(task_ids, items, concurrency_keys):
+            kwargs = {
+                "task_id": task_id,
+                "user_id": str(user_id),
+                "project_id": str(item["project_id"]),
+                "story_outline": item["story_outline"],
+                "model_config_id": str(item["model_config_id"]) if item.get("model_config_id") else None,
+                "system_prompt": item.get("system_prompt"),
+                "temperature": item.get("temperature", 0.7),
+                "max_tokens": item.get("max_tokens", 4000),
+                "use_cache": item.get("use_cache"),
+                "routing_group_id": str(item["routing_group_id"]) if item.get("routing_group_id") else None,
+                "concurrency_key": concurrency_key
+            }
+            # Celery任务ID与Task记录ID一致,便于对照
+            signatures.append(celery_app.signature("tasks.generate_script", kwargs=kwargs).set(task_id=task_id))
+        
+        try:
+            group(signatures).apply_async()
+        except Exception as e:
+            db.query(TaskModel).filter(TaskModel.batch_id == batch_id).update(
+                {"status": "failed", "error_message": f"任务分派失败: {e}"},
+                synchronize_session=False
+            )
+            DashboardService.mark_stale(db, user_ids=[user_id])
+            db.commit()
+            raise
+        
+        return ScriptBatchService.get_batch(db, batch_id, user_id)
+    
+    @staticmethod
+    def get_batch(
+        db: Session,
+        batch_id: uuid.UUID,
+        user_id: uuid.UUID,
+        include_items: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        """
+        获取批次进度
+        
+        Args:
+            db: 数据库会话
+            batch_id: 批次ID
+            user_id: 用户ID
+            include_items: 是否返回每个条目的状态
+        
+        Returns:
+            Dict: {"batch_id", "total", "pending", "processing", "completed", "failed", "progress", "done"[, "items"]},
+                  批次不存在或无权访问时返回None
+        """
+        rows = db.query(
+            TaskModel.status,
+            func.count(TaskModel.task_id),
+            func.sum(TaskModel.progress)
+        ).join(VideoProject, VideoProject.project_id == TaskModel.project_id).filter(
+            TaskModel.batch_id == batch_id,
+            VideoProject.user_id == user_id
+        ).group_by(TaskModel.status).all()
+        if not rows:
+            return None
+        
+        counts = {"pending": 0, "processing": 0, "completed": 0, "failed": 0}
+        total = progress = 0
+        for task_status, count, progress_sum in rows:
+            counts[task_status] = counts.get(task_status, 0) + count
+            total += count
+            # 结束的任务按100%计入
+            progress += count * 100 if task_status in ("completed", "failed") else int(progress_sum or 0)
+        
+        batch = {
+            "batch_id": batch_id,
+            "total": total,
+            **counts,
+            "progress": progress // total,
+            "done": counts["pending"] + counts["processing"] == 0
+        }
+        
+        if include_items:
+            tasks = db.query(TaskModel).filter(TaskModel.batch_id == batch_id).order_by(TaskModel.created_at).all()
+            batch["items"] = [
+                {
+                    "task_id": task.task_id,
+                    "project_id": task.project_id,
+                    "status": task.status,
+                    "progress": task.progress,
+                    "script_id": (task.result_data or {}).get("script_id"),
+                    "error_message": task.error_message
+                }
+                for task in tasks
+            ]
+        
+        return batch
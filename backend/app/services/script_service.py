@@ -1,18 +1,42 @@
 """
 脚本生成和管理服务
+
+脚本版本以"完整快照 + 行级增量"保存:新版本相对项目最新的快照计算增量,快照之后的增量版本
+达到SCRIPT_SNAPSHOT_INTERVAL个或增量过大时改存新的快照。读取时一次查询取回快照并还原,
+还原结果按(脚本ID, 增量摘要)缓存,内容修改后键自然变化,不需要跨进程失效
 """
+import asyncio
+import hashlib
 import uuid
-from typing import List, Optional
-from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy.orm import Session, defer
+from sqlalchemy.orm.attributes import flag_modified, set_committed_value
+from sqlalchemy import and_, case, func, select, update
 
+from app.core.cache import TwoTierCache
+from app.core.config import settings
 from app.models.project import Script, VideoProject
 from app.models.ai_model import AIModelConfig
 from app.services.ai_adapters.base import TextModelAdapter
-from app.services.ai_adapters.tongyi import TongyiAdapter
-from app.services.ai_adapters.zhipu import ZhipuAdapter
-from app.services.ai_adapters.baidu import BaiduAdapter
-from app.utils.encryption import decrypt_string
+from app.services.routing_group_service import RoutingGroupService
+from app.services.usage_service import UsageService
+from app.utils.text_delta import apply_delta, inserted_text, make_delta
+from app.utils.pagination import Page, keyset_paginate
+from app.utils.text_diff import diff_text
+
+# 增量版本还原后的完整内容
+script_content_cache = TwoTierCache(
+    "script_content",
+    max_entries=512,
+    ttl=settings.SCRIPT_CONTENT_CACHE_TTL
+)
+
+# 版本差异(键为两侧内容摘要,内容相同的任意两个版本共用结果)
+script_diff_cache = TwoTierCache(
+    "script_diff",
+    max_entries=256,
+    ttl=settings.SCRIPT_DIFF_CACHE_TTL
+)
 
 
 class ScriptService:
@@ -32,60 +56,16 @@ class ScriptService:
 请直接输出脚本内容,不要包含任何说明文字。"""
     
     @staticmethod
-    def _get_adapter(config: AIModelConfig) -> TextModelAdapter:
-        """根据配置获取对应的AI适配器"""
-        # 解密API Key
-        api_key = decrypt_string(config.api_key)
-        
-        # 根据厂商创建适配器
-        if config.vendor == "tongyi":
-            return TongyiAdapter(
-                api_key=api_key,
-                model_name=config.model_name,
-                api_endpoint=config.api_endpoint
-            )
-        elif config.vendor == "zhipu":
-            return ZhipuAdapter(
-                api_key=api_key,
-                model_name=config.model_name,
-                api_endpoint=config.api_endpoint
-            )
-        elif config.vendor == "baidu":
-            return BaiduAdapter(
-                api_key=api_key,
-                model_name=config.model_name,
-                api_endpoint=config.api_endpoint
-            )
-        else:
-            raise ValueError(f"不支持的厂商: {config.vendor}")
-    
-    @staticmethod
-    def generate_script(
+    def _prepare_generation(
         db: Session,
         user_id: uuid.UUID,
         project_id: uuid.UUID,
         story_outline: str,
-        model_config_id: uuid.UUID,
+        model_config_id: Optional[uuid.UUID],
         system_prompt: Optional[str] = None,
-        temperature: float = 0.7,
-        max_tokens: int = 4000
-    ) -> dict:
-        """
-        生成视频脚本
-        
-        Args:
-            db: 数据库会话
-            user_id: 用户ID
-            project_id: 项目ID
-            story_outline: 故事梗概
-            model_config_id: AI模型配置ID
-            system_prompt: 自定义系统提示词(可选)
-            temperature: 温度参数
-            max_tokens: 最大生成长度
-            
-        Returns:
-            包含脚本信息和使用统计的字典
-        """
+        routing_group_id: Optional[uuid.UUID] = None
+    ) -> Tuple[AIModelConfig, TextModelAdapter, str, str]:
+        """校验权限并构建提示词,返回(模型配置, 适配器, 系统提示词, 用户提示词)"""
         # 验证项目是否属于用户
         project = db.query(VideoProject).filter(
             and_(
@@ -97,16 +77,10 @@ class ScriptService:
         if not project:
             raise ValueError("项目不存在或无权访问")
         
-        # 获取模型配置
-        config = db.query(AIModelConfig).filter(
-            and_(
-                AIModelConfig.config_id == model_config_id,
-                AIModelConfig.user_id == user_id
-            )
-        ).first()
-        
-        if not config:
-            raise ValueError("模型配置不存在或无权访问")
+        # 获取模型配置和适配器(指定路由组时为路由适配器)
+        config, adapter = RoutingGroupService.resolve_text_target(
+            db, user_id, model_config_id, routing_group_id
+        )
         
         # 使用自定义系统提示词或配置中的提示词或默认提示词
         final_system_prompt = (
@@ -121,52 +95,271 @@ class ScriptService:
         else:
             user_prompt = f"故事梗概:\n{story_outline}\n\n请根据以上梗概创作完整的视频脚本。"
         
-        # 获取适配器并生成脚本
-        adapter = ScriptService._get_adapter(config)
+        return config, adapter, final_system_prompt, user_prompt
+    
+    @staticmethod
+    def _content_cache_key(script: Script) -> str:
+        return f"{script.script_id}:{hashlib.md5(script.delta.encode()).hexdigest()}"
+    
+    @staticmethod
+    def load_contents(db: Session, scripts: Iterable[Script]) -> List[Script]:
+        """
+        还原增量版本的完整内容
         
-        result = adapter.generate_text(
-            prompt=user_prompt,
-            system_prompt=final_system_prompt,
-            temperature=temperature,
-            max_tokens=max_tokens
-        )
+        还原结果写入script.content但不标记为修改;缓存未命中的版本所需的快照一次查询取回
         
-        if not result.get("success"):
-            raise Exception(f"脚本生成失败: {result.get('error', '未知错误')}")
+        Args:
+            db: 数据库会话
+            scripts: 脚本列表
+        
+        Returns:
+            List[Script]: 传入的脚本列表
+        """
+        scripts = list(scripts)
+        misses = []
+        for script in scripts:
+            if script.content is not None or script.delta is None:
+                continue
+            content = script_content_cache.get(ScriptService._content_cache_key(script))
+            if content is None:
+                misses.append(script)
+            else:
+                set_committed_value(script, "content", content)
+        
+        if misses:
+            base_ids = {script.base_script_id for script in misses}
+            bases = dict(
+                db.query(Script.script_id, Script.content).filter(Script.script_id.in_(base_ids)).all()
+            )
+            for script in misses:
+                content = apply_delta(bases[script.base_script_id], script.delta)
+                script_content_cache.set(ScriptService._content_cache_key(script), content)
+                set_committed_value(script, "content", content)
+        
+        return scripts
+    
+    @staticmethod
+    def _assign_content(
+        script: Script,
+        content: str,
+        base_id: Optional[uuid.UUID] = None,
+        base_content: Optional[str] = None
+    ):
+        """按快照或相对base的增量保存内容(增量过大时保存快照)"""
+        delta = make_delta(base_content, content) if base_content is not None else None
+        if delta is None or len(delta) > len(content) * settings.SCRIPT_DELTA_MAX_RATIO:
+            script.content, script.delta, script.base_script_id = content, None, None
+            script.delta_text = None
+        else:
+            script.content, script.delta, script.base_script_id = None, delta, base_id
+            script.delta_text = inserted_text(delta)
+        script.content_length = len(content)
+        # load_contents还原的内容不是数据库中的值,需要强制写入
+        flag_modified(script, "content")
+    
+    @staticmethod
+    def _assign_new_version_content(db: Session, project_id: uuid.UUID, script: Script, content: str):
+        """新版本相对项目最新的快照保存增量,快照之后的增量版本已满时保存新快照"""
+        snapshot = db.query(Script.script_id, Script.content).filter(
+            and_(
+                Script.project_id == project_id,
+                Script.delta.is_(None)
+            )
+        ).order_by(Script.version.desc()).first()
         
-        # 获取当前最大版本号
-        max_version = db.query(Script).filter(
+        if snapshot is not None:
+            dependents = db.query(func.count(Script.script_id)).filter(
+                Script.base_script_id == snapshot.script_id
+            ).scalar()
+            if dependents < settings.SCRIPT_SNAPSHOT_INTERVAL:
+                ScriptService._assign_content(script, content, snapshot.script_id, snapshot.content)
+                return
+        ScriptService._assign_content(script, content)
+    
+    @staticmethod
+    def _rebase_dependents(
+        db: Session,
+        snapshot: Script,
+        old_content: str,
+        new_content: Optional[str] = None
+    ):
+        """
+        快照内容修改或快照删除前,重新编码依赖它的增量版本
+        
+        Args:
+            db: 数据库会话(不提交)
+            snapshot: 快照版本
+            old_content: 快照原内容
+            new_content: 快照新内容;为None表示快照将被删除,最早的增量版本提升为新快照
+        """
+        dependents = db.query(Script).filter(
+            Script.base_script_id == snapshot.script_id
+        ).order_by(Script.version).all()
+        if not dependents:
+            return
+        
+        contents = [apply_delta(old_content, dependent.delta) for dependent in dependents]
+        if new_content is None:
+            ScriptService._assign_content(dependents[0], contents[0])
+            base, dependents, contents = dependents[0], dependents[1:], contents[1:]
+            new_content = base.content
+        else:
+            base = snapshot
+        for dependent, content in zip(dependents, contents):
+            ScriptService._assign_content(dependent, content, base.script_id, new_content)
+        # 先写入新快照,再删除旧快照
+        db.flush()
+    
+    @staticmethod
+    def _allocate_version(db: Session, project_id: uuid.UUID) -> int:
+        """
+        原子分配项目的下一个脚本版本号
+        
+        版本号计数器保存在项目行上,单条UPDATE ... RETURNING递增并持有行锁直到事务提交,
+        并发生成不会得到重复版本号;删除版本后也不会复用。计数器首次使用时从现有最大版本号开始。
+        updated_at显式保持原值,分配版本号不触发onupdate,不改变项目列表的排序
+        """
+        max_version = select(func.coalesce(func.max(Script.version), 0)).where(
             Script.project_id == project_id
-        ).count()
+        ).scalar_subquery()
+        current = case(
+            (VideoProject.script_version_seq >= max_version, VideoProject.script_version_seq),
+            else_=max_version
+        )
+        return db.execute(
+            update(VideoProject)
+            .where(VideoProject.project_id == project_id)
+            .values(script_version_seq=current + 1, updated_at=VideoProject.updated_at)
+            .returning(VideoProject.script_version_seq),
+            execution_options={"synchronize_session": False}
+        ).scalar_one()
+    
+    @staticmethod
+    def _save_generated_script(
+        db: Session,
+        project_id: uuid.UUID,
+        config: AIModelConfig,
+        result: dict
+    ) -> dict:
+        """保存生成结果为新的脚本版本"""
+        if not result.get("success"):
+            raise Exception(f"脚本生成失败: {result.get('error', '未知错误')}")
         
-        # 创建脚本记录
+        # 创建脚本记录(版本号原子分配,内容按增量保存)
         script = Script(
             project_id=project_id,
-            content=result["text"],
-            version=max_version + 1,
+            version=ScriptService._allocate_version(db, project_id),
             is_final=False
         )
+        ScriptService._assign_new_version_content(db, project_id, script, result["text"])
         
         db.add(script)
         db.commit()
         db.refresh(script)
+        if script.delta is not None:
+            script_content_cache.set(ScriptService._content_cache_key(script), result["text"])
+        ScriptService.load_contents(db, [script])
+        
+        UsageService.record_generation(config, result, "script", project_id=project_id)
         
         return {
             "script": script,
             "usage": result.get("usage", {}),
-            "model_info": {
+            "model_info": result.get("routing") or {
                 "vendor": config.vendor,
                 "model_name": config.model_name
             }
         }
     
+    @staticmethod
+    def generate_script(
+        db: Session,
+        user_id: uuid.UUID,
+        project_id: uuid.UUID,
+        story_outline: str,
+        model_config_id: Optional[uuid.UUID],
+        system_prompt: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 4000,
+        use_cache: Optional[bool] = None,
+        routing_group_id: Optional[uuid.UUID] = None
+    ) -> dict:
+        """
+        生成视频脚本
+        
+        Args:
+            db: 数据库会话
+            user_id: 用户ID
+            project_id: 项目ID
+            story_outline: 故事梗概
+            model_config_id: AI模型配置ID
+            system_prompt: 自定义系统提示词(可选)
+            temperature: 温度参数
+            max_tokens: 最大生成长度
+            use_cache: 是否使用响应缓存(默认取模型配置parameters.cache_enabled)
+            routing_group_id: 路由组ID(指定时在组内成员间自动选择和故障切换)
+        
+        Returns:
+            包含脚本信息和使用统计的字典
+        """
+        config, adapter, final_system_prompt, user_prompt = ScriptService._prepare_generation(
+            db, user_id, project_id, story_outline, model_config_id, system_prompt, routing_group_id
+        )
+        
+        # 生成脚本
+        result = adapter.generate_text(
+            prompt=user_prompt,
+            system_prompt=final_system_prompt,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            use_cache=use_cache
+        )
+        
+        return ScriptService._save_generated_script(db, project_id, config, result)
+    
+    @staticmethod
+    async def agenerate_script(
+        db: Session,
+        user_id: uuid.UUID,
+        project_id: uuid.UUID,
+        story_outline: str,
+        model_config_id: Optional[uuid.UUID],
+        system_prompt: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 4000,
+        use_cache: Optional[bool] = None,
+        routing_group_id: Optional[uuid.UUID] = None
+    ) -> dict:
+        """
+        异步生成视频脚本
+        
+        等待大模型返回期间不占用线程池;数据库操作仍为同步会话,放到线程中执行。
+        参数和返回值同generate_script
+        """
+        config, adapter, final_system_prompt, user_prompt = await asyncio.to_thread(
+            ScriptService._prepare_generation,
+            db, user_id, project_id, story_outline, model_config_id, system_prompt, routing_group_id
+        )
+        
+        result = await adapter.agenerate_text(
+            prompt=user_prompt,
+            system_prompt=final_system_prompt,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            use_cache=use_cache
+        )
+        
+        return await asyncio.to_thread(
+            ScriptService._save_generated_script, db, project_id, config, result
+        )
+    
     @staticmethod
     def get_script(
         db: Session,
         script_id: uuid.UUID,
         user_id: uuid.UUID
     ) -> Optional[Script]:
-        """获取脚本"""
+        """获取脚本(含还原后的完整内容)"""
         script = db.query(Script).join(VideoProject).filter(
             and_(
                 Script.script_id == script_id,
@@ -174,23 +367,106 @@ class ScriptService:
             )
         ).first()
         
+        if script:
+            ScriptService.load_contents(db, [script])
         return script
     
     @staticmethod
     def get_scripts_by_project(
         db: Session,
         project_id: uuid.UUID,
-        user_id: uuid.UUID
-    ) -> List[Script]:
-        """获取项目的所有脚本版本"""
-        scripts = db.query(Script).join(VideoProject).filter(
+        user_id: uuid.UUID,
+        include_content: bool = True,
+        cursor: Optional[str] = None,
+        limit: Optional[int] = None
+    ) -> Page:
+        """
+        获取项目的脚本版本,按版本号倒序做游标分页
+        
+        Args:
+            db: 数据库会话
+            project_id: 项目ID
+            user_id: 用户ID
+            include_content: 是否还原完整内容;为False时不读取内容列,只返回版本元数据
+            cursor: 上一页返回的游标(可选)
+            limit: 每页条数,不指定时返回全部版本
+        
+        Returns:
+            Page: 按版本号倒序排列的脚本和下一页游标
+        """
+        query = db.query(Script).join(VideoProject).filter(
             and_(
                 Script.project_id == project_id,
                 VideoProject.user_id == user_id
             )
-        ).order_by(Script.version.desc()).all()
+        )
+        if not include_content:
+            query = query.options(defer(Script.content), defer(Script.delta), defer(Script.delta_text))
+        # 历史数据的版本号可能重复,以script_id保证排序键唯一
+        page = keyset_paginate(
+            query,
+            [Script.version, Script.script_id],
+            [int, uuid.UUID],
+            cursor=cursor,
+            limit=limit,
+            descending=True
+        )
         
-        return scripts
+        if include_content:
+            ScriptService.load_contents(db, page.items)
+        return page
+    
+    @staticmethod
+    def diff_scripts(
+        db: Session,
+        script_id: uuid.UUID,
+        other_script_id: uuid.UUID,
+        user_id: uuid.UUID
+    ) -> Optional[Dict[str, Any]]:
+        """
+        计算两个脚本版本的段落/行级差异
+        
+        Args:
+            db: 数据库会话
+            script_id: 原版本脚本ID
+            other_script_id: 新版本脚本ID
+            user_id: 用户ID
+        
+        Returns:
+            Dict: {"from", "to", "stats", "hunks", "cached"},hunks格式见app.utils.text_diff;
+                  任一脚本不存在或无权访问时返回None
+        """
+        scripts = {
+            script.script_id: script
+            for script in db.query(Script).join(VideoProject).filter(
+                and_(
+                    Script.script_id.in_([script_id, other_script_id]),
+                    VideoProject.user_id == user_id
+                )
+            ).all()
+        }
+        if script_id not in scripts or other_script_id not in scripts:
+            return None
+        
+        source, target = scripts[script_id], scripts[other_script_id]
+        ScriptService.load_contents(db, [source, target])
+        
+        key = ":".join(
+            hashlib.sha1(script.content.encode()).hexdigest()
+            for script in (source, target)
+        )
+        diff = script_diff_cache.get(key)
+        cached = diff is not None
+        if not cached:
+            diff = diff_text(source.content, target.content)
+            script_diff_cache.set(key, diff)
+        
+        return {
+            "from": {"script_id": source.script_id, "version": source.version},
+            "to": {"script_id": target.script_id, "version": target.version},
+            **diff,
+            "cached": cached
+        }
     
     @staticmethod
     def update_script(
@@ -206,8 +482,15 @@ class ScriptService:
         if not script:
             return None
         
-        if content is not None:
-            script.content = content
+        if content is not None and content != script.content:
+            if script.delta is not None:
+                base_content = db.query(Script.content).filter(
+                    Script.script_id == script.base_script_id
+                ).scalar()
+                ScriptService._assign_content(script, content, script.base_script_id, base_content)
+            else:
+                ScriptService._rebase_dependents(db, script, script.content, content)
+                ScriptService._assign_content(script, content)
         
         if is_final is not None:
             # 如果设置为最终版本,取消其他版本的最终标记
@@ -223,6 +506,7 @@ class ScriptService:
         
         db.commit()
         db.refresh(script)
+        ScriptService.load_contents(db, [script])
         
         return script
     
@@ -238,6 +522,8 @@ class ScriptService:
         if not script:
             return False
         
+        if script.delta is None:
+            ScriptService._rebase_dependents(db, script, script.content)
         db.delete(script)
         db.commit()
         
@@ -1,20 +1,54 @@
 """
 分镜头生成和管理服务
 """
+import asyncio
+import difflib
+import logging
 import uuid
 import re
-import json
-from typing import List, Optional, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Dict, Any, Set, Tuple, AsyncIterator, NamedTuple
+from sqlalchemy.engine import Row
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import and_, insert, select, update
 
+from app.core.config import settings
 from app.models.project import Storyboard, Script, VideoProject
 from app.models.ai_model import AIModelConfig
+from app.services.dashboard_service import DashboardService
 from app.services.ai_adapters.base import TextModelAdapter
-from app.services.ai_adapters.tongyi import TongyiAdapter
-from app.services.ai_adapters.zhipu import ZhipuAdapter
-from app.services.ai_adapters.baidu import BaiduAdapter
-from app.utils.encryption import decrypt_string
+from app.services.routing_group_service import RoutingGroupService
+from app.services.script_service import ScriptService
+from app.services.usage_service import UsageService
+from app.utils.json_stream import IncrementalJSONArrayParser, extract_json_objects
+from app.utils.pagination import Page, keyset_paginate
+from app.utils.scene_splitter import brief, chunk_units, span_hash, split_units, unit_hash
+
+logger = logging.getLogger(__name__)
+
+# 时长字段中的数字("5"、"5.5秒"等)
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+
+
+# 批量写入后RETURNING/查询的分镜字段(生成接口的返回值直接使用这些行)
+_RETURNED_COLUMNS = (
+    Storyboard.storyboard_id,
+    Storyboard.script_id,
+    Storyboard.sequence_number,
+    Storyboard.content,
+    Storyboard.duration,
+    Storyboard.created_at,
+)
+
+
+class IncrementalPlan(NamedTuple):
+    """增量生成计划"""
+    units: List[str]  # 当前脚本的场景单元
+    hashes: List[str]  # 各单元的指纹
+    kept: Dict[int, List[Storyboard]]  # 单元序号 -> 沿用的分镜
+    dirty: List[int]  # 需要重新生成分镜的单元序号
+    removed: List[uuid.UUID]  # 需要删除的分镜ID
+    carried: Dict[int, List[Storyboard]]  # 单元序号 -> 所在组被重新生成、改接到该单元分镜之后的手动分镜
 
 
 class StoryboardService:
@@ -41,119 +75,84 @@ class StoryboardService:
 请严格按照JSON格式输出,不要包含任何其他文字。"""
     
     @staticmethod
-    def _get_adapter(config: AIModelConfig) -> TextModelAdapter:
-        """根据配置获取对应的AI适配器"""
-        api_key = decrypt_string(config.api_key)
-        
-        if config.vendor == "tongyi":
-            return TongyiAdapter(
-                api_key=api_key,
-                model_name=config.model_name,
-                api_endpoint=config.api_endpoint
-            )
-        elif config.vendor == "zhipu":
-            return ZhipuAdapter(
-                api_key=api_key,
-                model_name=config.model_name,
-                api_endpoint=config.api_endpoint
-            )
-        elif config.vendor == "baidu":
-            return BaiduAdapter(
-                api_key=api_key,
-                model_name=config.model_name,
-                api_endpoint=config.api_endpoint
-            )
-        else:
-            raise ValueError(f"不支持的厂商: {config.vendor}")
+    def _normalize_storyboard(sb: Dict[str, Any], idx: int) -> Dict[str, Any]:
+        """规范化单个分镜的字段(序号或时长格式不对时使用默认值)"""
+        sequence_number = sb.get("sequence_number", idx)
+        if not isinstance(sequence_number, int) or isinstance(sequence_number, bool):
+            match = _NUMBER.search(str(sequence_number))
+            sequence_number = int(float(match.group())) if match else idx
+        
+        duration = sb.get("duration", 5.0)
+        if not isinstance(duration, (int, float)) or isinstance(duration, bool):
+            match = _NUMBER.search(str(duration))
+            duration = match.group() if match else 5.0
+        
+        return {
+            "sequence_number": sequence_number,
+            "content": str(sb.get("content", "")).strip(),
+            "duration": float(duration)
+        }
     
     @staticmethod
     def _parse_storyboards(text: str) -> List[Dict[str, Any]]:
-        """解析AI生成的分镜内容"""
-        try:
-            # 尝试直接解析JSON
-            # 移除可能的markdown代码块标记
-            text = re.sub(r'```json\s*', '', text)
-            text = re.sub(r'```\s*$', '', text)
-            text = text.strip()
-            
-            storyboards = json.loads(text)
-            
-            if not isinstance(storyboards, list):
-                raise ValueError("分镜数据应该是数组格式")
-            
-            # 验证每个分镜的字段
-            validated = []
-            for idx, sb in enumerate(storyboards, 1):
-                if not isinstance(sb, dict):
-                    continue
-                
-                validated.append({
-                    "sequence_number": sb.get("sequence_number", idx),
-                    "content": str(sb.get("content", "")).strip(),
-                    "duration": float(sb.get("duration", 5.0))
-                })
-            
-            return validated
-            
-        except json.JSONDecodeError:
-            # 如果JSON解析失败,尝试简单的文本解析
-            # 按行分割,寻找编号模式
-            lines = text.strip().split('\n')
-            storyboards = []
-            current_sb = None
+        """
+        解析AI生成的分镜内容
+        
+        JSON数组可以夹在说明文字或代码块中;输出被截断时保留所有完整的分镜。
+        找不到JSON数组时按编号行解析(此时没有时长信息)
+        """
+        objects, closed = extract_json_objects(text)
+        if objects:
+            if not closed:
+                logger.warning("分镜输出不完整,已恢复%d个完整分镜", len(objects))
+            return [
+                StoryboardService._normalize_storyboard(sb, idx)
+                for idx, sb in enumerate(objects, 1)
+            ]
+        
+        # 按行分割,寻找编号模式
+        text = re.sub(r'```\w*', '', text)
+        lines = text.strip().split('\n')
+        storyboards = []
+        current_sb = None
+        
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
             
-            for line in lines:
-                line = line.strip()
-                if not line:
-                    continue
+            # 检查是否是新的分镜(以数字开头)
+            match = re.match(r'^(\d+)[\.、]\s*(.+)', line)
+            if match:
+                if current_sb:
+                    storyboards.append(current_sb)
                 
-                # 检查是否是新的分镜(以数字开头)
-                match = re.match(r'^(\d+)[\.、]\s*(.+)', line)
-                if match:
-                    if current_sb:
-                        storyboards.append(current_sb)
-                    
-                    current_sb = {
-                        "sequence_number": int(match.group(1)),
-                        "content": match.group(2),
-                        "duration": 5.0
-                    }
-                elif current_sb:
-                    current_sb["content"] += " " + line
-            
-            if current_sb:
-                storyboards.append(current_sb)
-            
-            if not storyboards:
-                raise ValueError("无法解析分镜内容")
-            
-            return storyboards
+                current_sb = {
+                    "sequence_number": int(match.group(1)),
+                    "content": match.group(2),
+                    "duration": 5.0
+                }
+            elif current_sb:
+                current_sb["content"] += " " + line
+        
+        if current_sb:
+            storyboards.append(current_sb)
+        
+        if not storyboards:
+            raise ValueError("无法解析分镜内容")
+        
+        return storyboards
     
     @staticmethod
-    def generate_storyboards(
+    def _prepare_generation(
         db: Session,
         user_id: uuid.UUID,
         script_id: uuid.UUID,
-        model_config_id: uuid.UUID,
+        model_config_id: Optional[uuid.UUID],
         system_prompt: Optional[str] = None,
-        temperature: float = 0.7,
-        max_tokens: int = 3000
-    ) -> Dict[str, Any]:
-        """
-        生成分镜头剧本
-        
-        Args:
-            db: 数据库会话
-            user_id: 用户ID
-            script_id: 脚本ID
-            model_config_id: AI模型配置ID
-            system_prompt: 自定义系统提示词(可选)
-            temperature: 温度参数
-            max_tokens: 最大生成长度
-            
-        Returns:
-            包含分镜列表和使用统计的字典
-        """
+        routing_group_id: Optional[uuid.UUID] = None
+    ) -> Tuple[AIModelConfig, TextModelAdapter, str, str]:
+        """校验权限并确定系统提示词,返回(模型配置, 适配器, 系统提示词, 脚本内容)"""
         # 获取脚本
         script = db.query(Script).join(VideoProject).filter(
             and_(
@@ -164,17 +163,12 @@ class StoryboardService:
         
         if not script:
             raise ValueError("脚本不存在或无权访问")
+        ScriptService.load_contents(db, [script])
         
-        # 获取模型配置
-        config = db.query(AIModelConfig).filter(
-            and_(
-                AIModelConfig.config_id == model_config_id,
-                AIModelConfig.user_id == user_id
-            )
-        ).first()
-        
-        if not config:
-            raise ValueError("模型配置不存在或无权访问")
+        # 获取模型配置和适配器(指定路由组时为路由适配器)
+        config, adapter = RoutingGroupService.resolve_text_target(
+            db, user_id, model_config_id, routing_group_id
+        )
         
         # 使用自定义系统提示词或配置中的提示词或默认提示词
         final_system_prompt = (
@@ -183,56 +177,663 @@ class StoryboardService:
             StoryboardService.DEFAULT_SYSTEM_PROMPT
         )
         
-        # 构建用户提示词
-        user_prompt = f"视频脚本:\n{script.content}\n\n请将以上脚本拆分为详细的分镜头剧本。"
+        return config, adapter, final_system_prompt, script.content
+    
+    @staticmethod
+    def _build_user_prompt(script_content: str) -> str:
+        """构建整篇脚本的用户提示词"""
+        return f"视频脚本:\n{script_content}\n\n请将以上脚本拆分为详细的分镜头剧本。"
+    
+    @staticmethod
+    def _build_part_prompt(parts: List[str], idx: int) -> str:
+        """构建第idx个片段的用户提示词,附带前后片段的简短概要以保证镜头衔接连贯"""
+        context = []
+        if idx > 0:
+            context.append(f"前文概要: {brief(parts[idx - 1], from_end=True)}")
+        if idx < len(parts) - 1:
+            context.append(f"后文概要: {brief(parts[idx + 1])}")
+        context_text = "\n".join(context)
+        return (
+            f"视频脚本(第{idx + 1}/{len(parts)}部分):\n{parts[idx]}\n\n"
+            + (f"{context_text}\n\n" if context_text else "")
+            + "请只将本部分脚本拆分为详细的分镜头剧本,前后文仅用于保持衔接,分镜序号从1开始。"
+        )
+    
+    @staticmethod
+    def _script_units(script_content: str) -> Tuple[List[str], List[str]]:
+        """脚本的场景单元及各单元的指纹"""
+        units = split_units(script_content, settings.STORYBOARD_CHUNK_CHARS) or [script_content]
+        return units, [unit_hash(unit) for unit in units]
+    
+    @staticmethod
+    def _unit_source(hashes: List[str], start: int, end: int) -> Dict[str, Any]:
+        """由第start到end-1个单元生成的分镜的来源字段"""
+        return {
+            "source_index": start,
+            "source_hash": span_hash(hashes[start:end]),
+            "source_span": end - start
+        }
+    
+    @staticmethod
+    def _whole_script_source(script_content: str) -> Dict[str, Any]:
+        """由整篇脚本生成的分镜的来源字段(脚本任一单元变化时整组重新生成)"""
+        _, hashes = StoryboardService._script_units(script_content)
+        return StoryboardService._unit_source(hashes, 0, len(hashes))
+    
+    @staticmethod
+    def _build_chunk_prompts(script_content: str) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """按场景切分脚本,返回各片段的用户提示词和该片段分镜的来源字段"""
+        units, hashes = StoryboardService._script_units(script_content)
+        spans = chunk_units(units, settings.STORYBOARD_CHUNK_CHARS)
+        chunks = ["\n\n".join(units[start:end]) for start, end in spans]
+        prompts = [StoryboardService._build_part_prompt(chunks, idx) for idx in range(len(chunks))]
+        return prompts, [StoryboardService._unit_source(hashes, start, end) for start, end in spans]
+    
+    @staticmethod
+    def _add_usage(usage: Dict[str, Any], extra: Dict[str, Any]):
+        """把一次调用的usage累加到usage中"""
+        for key, value in extra.items():
+            if isinstance(value, bool):
+                usage[key] = usage.get(key, False) or value
+            elif isinstance(value, (int, float)):
+                usage[key] = usage.get(key, 0) + value
+    
+    @staticmethod
+    def _merge_chunk_results(
+        results: List[Dict[str, Any]],
+        sources: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """
+        合并各片段的生成结果
+        
+        按片段顺序拼接分镜并重新编号sequence_number,每个分镜带上所在片段的来源字段,usage按片段累加;
+        calls保留每个片段调用的usage和路由信息,用于按实际调用的配置逐次记账
+        """
+        storyboards_data = []
+        usage: Dict[str, Any] = {"chunks": len(results)}
+        for idx, result in enumerate(results, 1):
+            if not result.get("success"):
+                return {
+                    "success": False,
+                    "error": f"第{idx}/{len(results)}部分: {result.get('error', '未知错误')}"
+                }
+            for sb_data in StoryboardService._parse_storyboards(result["text"]):
+                storyboards_data.append({**sb_data, **sources[idx - 1]})
+            StoryboardService._add_usage(usage, result.get("usage", {}))
         
-        # 获取适配器并生成分镜
-        adapter = StoryboardService._get_adapter(config)
+        for idx, sb_data in enumerate(storyboards_data, 1):
+            sb_data["sequence_number"] = idx
         
-        result = adapter.generate_text(
-            prompt=user_prompt,
-            system_prompt=final_system_prompt,
-            temperature=temperature,
-            max_tokens=max_tokens
-        )
+        return {
+            "success": True,
+            "storyboards": storyboards_data,
+            "usage": usage,
+            "calls": StoryboardService._call_records(results)
+        }
+    
+    @staticmethod
+    def _call_records(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """各次调用的记账信息(不含生成文本)"""
+        return [
+            {key: result[key] for key in ("usage", "routing", "cached") if key in result}
+            for result in results
+        ]
+    
+    @staticmethod
+    def _model_info(config: AIModelConfig, calls: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """返回给调用方的模型信息:使用路由组时为实际调用的成员(取第一次调用)"""
+        for call in calls:
+            if call.get("routing"):
+                return call["routing"]
+        return {"vendor": config.vendor, "model_name": config.model_name}
+    
+    @staticmethod
+    def _bulk_insert_storyboards(db: Session, rows: List[Dict[str, Any]]) -> List[Row]:
+        """
+        批量插入分镜(单条INSERT ... RETURNING,不逐行刷新)
+        
+        Args:
+            db: 数据库会话(不提交)
+            rows: 分镜字段字典列表
+        
+        Returns:
+            List[Row]: 按rows顺序返回的分镜行
+        """
+        if not rows:
+            return []
+        return db.execute(
+            insert(Storyboard).returning(*_RETURNED_COLUMNS, sort_by_parameter_order=True),
+            rows
+        ).all()
+    
+    @staticmethod
+    def _save_generated_storyboards(
+        db: Session,
+        script_id: uuid.UUID,
+        config: AIModelConfig,
+        result: Dict[str, Any],
+        script_content: str
+    ) -> Dict[str, Any]:
+        """
+        解析生成结果并替换脚本的分镜(分段生成的结果已在合并时解析)
         
+        分镜记录来源单元供之后的增量生成比较:分段生成的分镜来源为所在片段,整篇生成的分镜来源为整篇脚本
+        """
         if not result.get("success"):
             raise Exception(f"分镜生成失败: {result.get('error', '未知错误')}")
         
         # 解析分镜内容
-        storyboards_data = StoryboardService._parse_storyboards(result["text"])
+        storyboards_data = result.get("storyboards")
+        if storyboards_data is None:
+            storyboards_data = StoryboardService._parse_storyboards(result["text"])
         
-        # 删除该脚本的旧分镜
-        db.query(Storyboard).filter(Storyboard.script_id == script_id).delete()
+        whole_script = StoryboardService._whole_script_source(script_content)
         
-        # 创建分镜记录
-        storyboards = []
-        for sb_data in storyboards_data:
-            storyboard = Storyboard(
-                script_id=script_id,
-                sequence_number=sb_data["sequence_number"],
-                content=sb_data["content"],
-                duration=sb_data["duration"]
-            )
-            db.add(storyboard)
-            storyboards.append(storyboard)
+        # 删除旧分镜和批量插入新分镜在同一事务中,插入结果由RETURNING直接返回
+        db.query(Storyboard).filter(Storyboard.script_id == script_id).delete(synchronize_session=False)
+        storyboards = StoryboardService._bulk_insert_storyboards(db, [
+            {
+                "script_id": script_id,
+                "sequence_number": sb_data["sequence_number"],
+                "content": sb_data["content"],
+                "duration": sb_data["duration"],
+                **{key: sb_data.get(key, value) for key, value in whole_script.items()}
+            }
+            for sb_data in storyboards_data
+        ])
+        project_id = db.query(Script.project_id).filter(Script.script_id == script_id).scalar()
+        DashboardService.mark_stale(db, script_ids=[script_id])
         
         db.commit()
         
-        # 刷新所有对象
-        for sb in storyboards:
-            db.refresh(sb)
+        calls = result.get("calls") or [result]
+        UsageService.record_generations(config, calls, "storyboard", project_id=project_id)
         
         return {
             "storyboards": storyboards,
             "count": len(storyboards),
             "usage": result.get("usage", {}),
-            "model_info": {
-                "vendor": config.vendor,
-                "model_name": config.model_name
+            "model_info": StoryboardService._model_info(config, calls)
+        }
+    
+    @staticmethod
+    def _plan_incremental(db: Session, script_id: uuid.UUID, script_content: str) -> IncrementalPlan:
+        """
+        比较脚本当前的场景单元与现有分镜的来源单元,确定沿用、重新生成和删除的分镜
+        
+        现有分镜按序号连续分组(同一来源的分镜为一组,分段或整篇生成的一组对应连续多个单元),
+        当前单元按现有各组的单元数切分后与各组按指纹做序列比对。手动添加的分镜(没有来源)归入前一组,
+        所在组重新生成时保留并改接到重新生成的分镜之后
+        
+        Raises:
+            ValueError: 现有分镜都没有来源记录,无法判断哪些分镜可以沿用
+        """
+        units, hashes = StoryboardService._script_units(script_content)
+        
+        existing = db.query(Storyboard).filter(
+            Storyboard.script_id == script_id
+        ).order_by(Storyboard.sequence_number).all()
+        if existing and not any(sb.source_hash for sb in existing):
+            raise ValueError("现有分镜没有来源记录,无法增量生成,请先完整生成一次分镜")
+        
+        # ((来源单元序号, 来源指纹, 来源单元数), 分镜列表)
+        groups: List[Tuple[Tuple[Optional[int], str, int], List[Storyboard]]] = []
+        leading: List[Storyboard] = []
+        for sb in existing:
+            key = (sb.source_index, sb.source_hash, sb.source_span or 1)
+            if not sb.source_hash:
+                (groups[-1][1] if groups else leading).append(sb)
+            elif groups and groups[-1][0] == key:
+                groups[-1][1].append(sb)
+            else:
+                groups.append((key, [sb]))
+        if groups:
+            groups[0][1][:0] = leading
+        
+        # 当前单元切分为(指纹, 起始单元, 结束单元):与现有某组的多个单元完全相同时合为一段
+        span_hashes: Dict[int, Set[str]] = {}
+        for (_, source_hash, span), _ in groups:
+            if span > 1:
+                span_hashes.setdefault(span, set()).add(source_hash)
+        tokens: List[Tuple[str, int, int]] = []
+        start = 0
+        while start < len(hashes):
+            end = start + 1
+            for span in sorted(span_hashes, reverse=True):
+                if start + span <= len(hashes) and span_hash(hashes[start:start + span]) in span_hashes[span]:
+                    end = start + span
+                    break
+            tokens.append((span_hash(hashes[start:end]), start, end))
+            start = end
+        
+        kept: Dict[int, List[Storyboard]] = {}
+        dirty: List[int] = []
+        removed: List[uuid.UUID] = []
+        carried: Dict[int, List[Storyboard]] = {}
+        matcher = difflib.SequenceMatcher(
+            None, [key[1] for key, _ in groups], [token[0] for token in tokens], autojunk=False
+        )
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == "equal":
+                for offset in range(i2 - i1):
+                    _, start, end = tokens[j1 + offset]
+                    kept[start] = groups[i1 + offset][1]
+                    kept.update((unit_idx, []) for unit_idx in range(start + 1, end))
+                continue
+            if j2 > j1:
+                dirty.extend(range(tokens[j1][1], tokens[j2 - 1][2]))
+            manual = []
+            for _, group in groups[i1:i2]:
+                for sb in group:
+                    if sb.source_hash:
+                        removed.append(sb.storyboard_id)
+                    else:
+                        manual.append(sb)
+            if manual:
+                # 接在替换该组的最后一个单元之后;该组对应的内容被删除时接在前一个单元之后
+                if j2 > j1:
+                    target = tokens[j2 - 1][2] - 1
+                else:
+                    target = tokens[j1 - 1][2] - 1 if j1 > 0 else 0
+                carried.setdefault(target, []).extend(manual)
+        
+        return IncrementalPlan(units, hashes, kept, dirty, removed, carried)
+    
+    @staticmethod
+    def _save_incremental_storyboards(
+        db: Session,
+        script_id: uuid.UUID,
+        config: AIModelConfig,
+        plan: IncrementalPlan,
+        results: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """
+        按增量计划更新分镜:删除变化单元的旧分镜,插入重新生成的分镜,沿用的分镜和手动分镜只更新序号
+        
+        沿用的分镜保留storyboard_id,关联的视频片段和场景不受影响。任一单元生成失败时不做任何修改
+        """
+        parsed: Dict[int, List[Dict[str, Any]]] = {}
+        usage: Dict[str, Any] = {"chunks": len(results)}
+        for unit_idx, result in zip(plan.dirty, results):
+            if not result.get("success"):
+                raise Exception(
+                    f"分镜生成失败: 第{unit_idx + 1}/{len(plan.units)}部分: {result.get('error', '未知错误')}"
+                )
+            parsed[unit_idx] = StoryboardService._parse_storyboards(result["text"])
+            StoryboardService._add_usage(usage, result.get("usage", {}))
+        
+        if plan.removed:
+            db.query(Storyboard).filter(
+                Storyboard.storyboard_id.in_(plan.removed)
+            ).delete(synchronize_session=False)
+        
+        renumbered: List[Dict[str, Any]] = []
+        created: List[Dict[str, Any]] = []
+        count = 0
+        for unit_idx, source_hash in enumerate(plan.hashes):
+            for sb_data in [] if unit_idx in plan.kept else parsed.get(unit_idx, []):
+                count += 1
+                created.append({
+                    "script_id": script_id,
+                    "sequence_number": count,
+                    "content": sb_data["content"],
+                    "duration": sb_data["duration"],
+                    "source_index": unit_idx,
+                    "source_hash": source_hash,
+                    "source_span": 1
+                })
+            for sb in plan.kept.get(unit_idx, []) + plan.carried.get(unit_idx, []):
+                count += 1
+                source_index = unit_idx if sb.source_hash else sb.source_index
+                if (sb.sequence_number, sb.source_index) != (count, source_index):
+                    renumbered.append({
+                        "storyboard_id": sb.storyboard_id,
+                        "sequence_number": count,
+                        "source_index": source_index
+                    })
+        
+        # 按主键批量更新沿用分镜的序号,批量插入新分镜,最后一次查询取回全部分镜
+        if renumbered:
+            db.execute(update(Storyboard), renumbered)
+        StoryboardService._bulk_insert_storyboards(db, created)
+        storyboards = db.execute(
+            select(*_RETURNED_COLUMNS).where(
+                Storyboard.script_id == script_id
+            ).order_by(Storyboard.sequence_number)
+        ).all()
+        DashboardService.mark_stale(db, script_ids=[script_id])
+        
+        db.commit()
+        
+        # 每个单元一次调用,使用路由组时分别计入实际调用的成员配置
+        calls = StoryboardService._call_records(results)
+        if calls:
+            project_id = db.query(Script.project_id).filter(Script.script_id == script_id).scalar()
+            UsageService.record_generations(config, calls, "storyboard", project_id=project_id)
+        
+        return {
+            "storyboards": storyboards,
+            "count": len(storyboards),
+            "usage": usage,
+            "model_info": StoryboardService._model_info(config, calls),
+            "incremental": {
+                "units": len(plan.units),
+                "regenerated_units": len(plan.dirty),
+                "kept": len(storyboards) - len(created),
+                "created": len(created),
+                "removed": len(plan.removed)
             }
         }
     
+    @staticmethod
+    def generate_storyboards(
+        db: Session,
+        user_id: uuid.UUID,
+        script_id: uuid.UUID,
+        model_config_id: Optional[uuid.UUID],
+        system_prompt: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 3000,
+        use_cache: Optional[bool] = None,
+        chunked: bool = False,
+        routing_group_id: Optional[uuid.UUID] = None,
+        incremental: bool = False
+    ) -> Dict[str, Any]:
+        """
+        生成分镜头剧本
+        
+        Args:
+            db: 数据库会话
+            user_id: 用户ID
+            script_id: 脚本ID
+            model_config_id: AI模型配置ID
+            system_prompt: 自定义系统提示词(可选)
+            temperature: 温度参数
+            max_tokens: 最大生成长度
+            use_cache: 是否使用响应缓存(默认取模型配置parameters.cache_enabled)
+            chunked: 是否按场景分段并发生成(长脚本使用,max_tokens作用于每个片段)
+            routing_group_id: 路由组ID(指定时在组内成员间自动选择和故障切换)
+            incremental: 增量生成,只为内容变化的场景单元重新生成分镜,其余分镜原样保留(忽略chunked);
+                现有分镜都没有来源记录时抛出ValueError
+        
+        Returns:
+            包含分镜列表和使用统计的字典(增量生成时另含incremental统计)
+        """
+        config, adapter, final_system_prompt, script_content = StoryboardService._prepare_generation(
+            db, user_id, script_id, model_config_id, system_prompt, routing_group_id
+        )
+        
+        # 生成分镜
+        def generate(prompt: str) -> Dict[str, Any]:
+            return adapter.generate_text(
+                prompt=prompt,
+                system_prompt=final_system_prompt,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                use_cache=use_cache
+            )
+        
+        if incremental:
+            plan = StoryboardService._plan_incremental(db, script_id, script_content)
+            prompts = [StoryboardService._build_part_prompt(plan.units, idx) for idx in plan.dirty]
+            results = []
+            if prompts:
+                workers = max(1, min(len(prompts), settings.STORYBOARD_CHUNK_CONCURRENCY))
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    results = list(executor.map(generate, prompts))
+            return StoryboardService._save_incremental_storyboards(db, script_id, config, plan, results)
+        
+        if chunked:
+            prompts, sources = StoryboardService._build_chunk_prompts(script_content)
+            workers = max(1, min(len(prompts), settings.STORYBOARD_CHUNK_CONCURRENCY))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                result = StoryboardService._merge_chunk_results(list(executor.map(generate, prompts)), sources)
+        else:
+            result = generate(StoryboardService._build_user_prompt(script_content))
+        
+        return StoryboardService._save_generated_storyboards(db, script_id, config, result, script_content)
+    
+    @staticmethod
+    async def agenerate_result(
+        adapter: TextModelAdapter,
+        system_prompt: str,
+        script_content: str,
+        temperature: float = 0.7,
+        max_tokens: int = 3000,
+        use_cache: Optional[bool] = None,
+        chunked: bool = False
+    ) -> Dict[str, Any]:
+        """
+        调用大模型生成分镜(不访问数据库),分段生成时返回合并后的结果
+        
+        Args:
+            adapter: 文本模型适配器
+            system_prompt: 系统提示词
+            script_content: 脚本内容
+            temperature: 温度参数
+            max_tokens: 最大生成长度
+            use_cache: 是否使用响应缓存
+            chunked: 是否按场景分段并发生成
+        
+        Returns:
+            Dict: 适配器返回结果(分段生成时带有已解析的storyboards)
+        """
+        async def agenerate(prompt: str) -> Dict[str, Any]:
+            return await adapter.agenerate_text(
+                prompt=prompt,
+                system_prompt=system_prompt,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                use_cache=use_cache
+            )
+        
+        if chunked:
+            prompts, sources = StoryboardService._build_chunk_prompts(script_content)
+            results = await asyncio.gather(*(agenerate(prompt) for prompt in prompts))
+            return StoryboardService._merge_chunk_results(results, sources)
+        
+        return await agenerate(StoryboardService._build_user_prompt(script_content))
+    
+    @staticmethod
+    async def agenerate_storyboards(
+        db: Session,
+        user_id: uuid.UUID,
+        script_id: uuid.UUID,
+        model_config_id: Optional[uuid.UUID],
+        system_prompt: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 3000,
+        use_cache: Optional[bool] = None,
+        chunked: bool = False,
+        routing_group_id: Optional[uuid.UUID] = None,
+        incremental: bool = False
+    ) -> Dict[str, Any]:
+        """
+        异步生成分镜头剧本
+        
+        等待大模型返回期间不占用线程池;数据库操作仍为同步会话,放到线程中执行。
+        分段生成时各片段同时请求(并发度由适配器限流控制)。
+        参数和返回值同generate_storyboards
+        """
+        config, adapter, final_system_prompt, script_content = await asyncio.to_thread(
+            StoryboardService._prepare_generation,
+            db, user_id, script_id, model_config_id, system_prompt, routing_group_id
+        )
+        
+        if incremental:
+            plan = await asyncio.to_thread(
+                StoryboardService._plan_incremental, db, script_id, script_content
+            )
+            results = await asyncio.gather(*(
+                adapter.agenerate_text(
+                    prompt=StoryboardService._build_part_prompt(plan.units, idx),
+                    system_prompt=final_system_prompt,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    use_cache=use_cache
+                )
+                for idx in plan.dirty
+            ))
+            return await asyncio.to_thread(
+                StoryboardService._save_incremental_storyboards, db, script_id, config, plan, list(results)
+            )
+        
+        result = await StoryboardService.agenerate_result(
+            adapter,
+            final_system_prompt,
+            script_content,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            use_cache=use_cache,
+            chunked=chunked
+        )
+        
+        return await asyncio.to_thread(
+            StoryboardService._save_generated_storyboards, db, script_id, config, result, script_content
+        )
+    
+    @staticmethod
+    def stream_generate_storyboards(
+        db: Session,
+        user_id: uuid.UUID,
+        script_id: uuid.UUID,
+        model_config_id: Optional[uuid.UUID],
+        system_prompt: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 3000,
+        routing_group_id: Optional[uuid.UUID] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        流式生成分镜头剧本
+        
+        权限校验在调用时立即执行(不合法时直接抛出ValueError),返回的异步迭代器
+        每解析出一个完整分镜就立即写入并产出一个事件(流正常结束时一并提交,失败或断开时保留原有分镜):
+        {"event": "storyboard", "data": {...}}、{"event": "done", "data": {"count": n}}
+        或{"event": "error", "data": {"error": str}}
+        
+        参数同generate_storyboards
+        """
+        config, adapter, final_system_prompt, script_content = StoryboardService._prepare_generation(
+            db, user_id, script_id, model_config_id, system_prompt, routing_group_id
+        )
+        
+        return StoryboardService._stream_storyboard_events(
+            db,
+            script_id,
+            config,
+            adapter,
+            adapter.astream_generate(
+                StoryboardService._build_user_prompt(script_content),
+                system_prompt=final_system_prompt,
+                temperature=temperature,
+                max_tokens=max_tokens
+            ),
+            StoryboardService._whole_script_source(script_content)
+        )
+    
+    @staticmethod
+    async def _stream_storyboard_events(
+        db: Session,
+        script_id: uuid.UUID,
+        config: AIModelConfig,
+        adapter: TextModelAdapter,
+        chunks: AsyncIterator[str],
+        source: Dict[str, Any]
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        消费文本流,增量解析并逐个保存分镜
+        
+        删除旧分镜和写入新分镜在同一事务中:每个分镜flush后即推送(带分镜ID),流正常结束才提交;
+        厂商报错、解析失败或客户端断开时回滚,原有分镜(及其视频片段)保持不变。
+        分镜的来源字段与非流式整篇生成相同;流式接口不返回token用量,完成后按请求次数记账,
+        使用路由组时计入实际输出的成员(adapter.last_routing)
+        """
+        parser = IncrementalJSONArrayParser()
+        count = 0
+        committed = False
+        
+        try:
+            async for chunk in chunks:
+                for sb in parser.feed(chunk):
+                    if count == 0:
+                        # 收到第一个分镜后才删除旧分镜(提交前其他会话仍读到旧分镜)
+                        await asyncio.to_thread(
+                            StoryboardService._delete_script_storyboards, db, script_id
+                        )
+                    count += 1
+                    sb_data = StoryboardService._normalize_storyboard(sb, count)
+                    storyboard_id = await asyncio.to_thread(
+                        StoryboardService._save_streamed_storyboard, db, script_id, sb_data, source
+                    )
+                    yield {
+                        "event": "storyboard",
+                        "data": {
+                            "storyboard_id": str(storyboard_id),
+                            **sb_data
+                        }
+                    }
+            
+            if count == 0:
+                yield {"event": "error", "data": {"error": "无法解析分镜内容", "count": 0}}
+                return
+            
+            await asyncio.to_thread(
+                StoryboardService._commit_streamed_storyboards,
+                db, script_id, config, getattr(adapter, "last_routing", None)
+            )
+            committed = True
+        except Exception as e:
+            await asyncio.to_thread(db.rollback)
+            yield {"event": "error", "data": {"error": f"分镜生成失败: {str(e)}", "count": count}}
+            return
+        finally:
+            if not committed and db.in_transaction():
+                # 客户端断开(GeneratorExit/CancelledError)时不能再等待线程,直接回滚
+                db.rollback()
+        
+        yield {"event": "done", "data": {"count": count}}
+    
+    @staticmethod
+    def _delete_script_storyboards(db: Session, script_id: uuid.UUID):
+        """删除脚本的所有分镜(不提交)"""
+        db.query(Storyboard).filter(Storyboard.script_id == script_id).delete(synchronize_session=False)
+        DashboardService.mark_stale(db, script_ids=[script_id])
+    
+    @staticmethod
+    def _save_streamed_storyboard(
+        db: Session,
+        script_id: uuid.UUID,
+        sb_data: Dict[str, Any],
+        source: Dict[str, Any]
+    ) -> uuid.UUID:
+        """写入流式解析出的单个分镜(flush不提交),返回分镜ID"""
+        storyboard_id = uuid.uuid4()
+        storyboard = Storyboard(
+            storyboard_id=storyboard_id,
+            script_id=script_id,
+            sequence_number=sb_data["sequence_number"],
+            content=sb_data["content"],
+            duration=sb_data["duration"],
+            **source
+        )
+        db.add(storyboard)
+        db.flush()
+        return storyboard_id
+    
+    @staticmethod
+    def _commit_streamed_storyboards(
+        db: Session,
+        script_id: uuid.UUID,
+        config: AIModelConfig,
+        routing: Optional[Dict[str, Any]]
+    ):
+        """提交流式生成的分镜并记录一次用量(没有token统计)"""
+        project_id = db.query(Script.project_id).filter(Script.script_id == script_id).scalar()
+        db.commit()
+        UsageService.record_generation(
+            config, {"usage": {}, "routing": routing}, "storyboard", project_id=project_id
+        )
+    
     @staticmethod
     def get_storyboard(
         db: Session,
@@ -253,17 +854,38 @@ class StoryboardService:
     def get_storyboards_by_script(
         db: Session,
         script_id: uuid.UUID,
-        user_id: uuid.UUID
-    ) -> List[Storyboard]:
-        """获取脚本的所有分镜"""
-        storyboards = db.query(Storyboard).join(Script).join(VideoProject).filter(
+        user_id: uuid.UUID,
+        cursor: Optional[str] = None,
+        limit: Optional[int] = None
+    ) -> Page:
+        """
+        获取脚本的分镜,按序号做游标分页
+        
+        Args:
+            db: 数据库会话
+            script_id: 脚本ID
+            user_id: 用户ID
+            cursor: 上一页返回的游标(可选)
+            limit: 每页条数,不指定时返回全部分镜
+        
+        Returns:
+            Page: 按序号排列的分镜和下一页游标
+        """
+        query = db.query(Storyboard).join(Script).join(VideoProject).filter(
             and_(
                 Storyboard.script_id == script_id,
                 VideoProject.user_id == user_id
             )
-        ).order_by(Storyboard.sequence_number).all()
+        )
         
-        return storyboards
+        # 手动创建的分镜序号可能重复,以storyboard_id保证排序键唯一
+        return keyset_paginate(
+            query,
+            [Storyboard.sequence_number, Storyboard.storyboard_id],
+            [int, uuid.UUID],
+            cursor=cursor,
+            limit=limit
+        )
     
     @staticmethod
     def create_storyboard(
@@ -0,0 +1,361 @@
+"""
+Token用量台账服务
+
+生成接口只把用量写入进程内缓冲区(加锁累加,不访问数据库),后台线程每USAGE_FLUSH_INTERVAL秒
+或累计USAGE_FLUSH_MAX_RECORDS条记录后,把按(日期, 用户, 模型配置, 项目, 操作)聚合的结果批量写入台账表
+"""
+import atexit
+import logging
+import os
+import threading
+import uuid
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.ai_model import AIModelConfig
+from app.models.project import VideoProject
+from app.models.usage import UsageRecord
+
+logger = logging.getLogger(__name__)
+
+# 聚合维度: (日期, 用户, 模型配置, 项目, 操作, 厂商, 模型)
+UsageKey = Tuple[date, uuid.UUID, Optional[uuid.UUID], Optional[uuid.UUID], str, str, str]
+
+_COUNTERS = ("request_count", "cached_count", "retry_count", "prompt_tokens", "completion_tokens", "total_tokens")
+
+
+class UsageLedger:
+    """进程内用量缓冲区(write-behind)"""
+    
+    def __init__(self, flush_interval: float, max_records: int):
+        """
+        初始化缓冲区
+        
+        Args:
+            flush_interval: 定时刷写间隔(秒)
+            max_records: 累计记录数达到该值时立即刷写
+        """
+        self.flush_interval = flush_interval
+        self.max_records = max_records
+        self._buffer: Dict[UsageKey, Dict[str, int]] = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+    
+    def _ensure_worker(self):
+        """按需启动后台刷写线程(fork出的子进程中重新启动)"""
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            if self._pid is not None and self._pid != os.getpid():
+                # 父进程缓冲区中的数据由父进程负责写入
+                self._buffer.clear()
+                self._pending = 0
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="usage-ledger", daemon=True)
+            self._thread.start()
+    
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+    
+    def record(
+        self,
+        user_id: uuid.UUID,
+        operation: str,
+        vendor: str,
+        model_name: str,
+        usage: Dict[str, Any],
+        config_id: Optional[uuid.UUID] = None,
+        project_id: Optional[uuid.UUID] = None,
+        cached: bool = False
+    ):
+        """
+        记录一次生成调用的用量
+        
+        Args:
+            user_id: 用户ID
+            operation: 操作类型(script/storyboard等)
+            vendor: 厂商
+            model_name: 模型名称
+            usage: 适配器返回的usage字典
+            config_id: 实际使用的模型配置ID
+            project_id: 所属项目ID
+            cached: 是否命中响应缓存(没有厂商调用,只计请求数和缓存命中数,不计token和重试)
+        """
+        if not settings.USAGE_LEDGER_ENABLED:
+            return
+        self._ensure_worker()
+        
+        key = (date.today(), user_id, config_id, project_id, operation, vendor, model_name)
+        with self._lock:
+            counters = self._buffer.get(key)
+            if counters is None:
+                counters = self._buffer[key] = dict.fromkeys(_COUNTERS, 0)
+            counters["request_count"] += 1
+            if cached:
+                # 缓存结果中的usage是原调用的用量,已在原调用时记账
+                counters["cached_count"] += 1
+            else:
+                counters["retry_count"] += int(usage.get("retries", 0) or 0)
+                for name in ("prompt_tokens", "completion_tokens", "total_tokens"):
+                    counters[name] += int(usage.get(name, 0) or 0)
+            self._pending += 1
+            full = self._pending >= self.max_records
+        
+        if full:
+            self._wakeup.set()
+    
+    def _merge_back(self, items: List[Tuple[UsageKey, Dict[str, int]]]):
+        """写入失败时把数据合并回缓冲区,等待下次刷写"""
+        with self._lock:
+            for key, counters in items:
+                current = self._buffer.get(key)
+                if current is None:
+                    self._buffer[key] = counters
+                else:
+                    for name, value in counters.items():
+                        current[name] += value
+    
+    def flush(self) -> int:
+        """
+        把缓冲区中的聚合用量批量写入数据库
+        
+        Returns:
+            int: 写入的行数
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._buffer:
+                    return 0
+                items = list(self._buffer.items())
+                self._buffer = {}
+                self._pending = 0
+            
+            rows = [
+                {
+                    "record_id": uuid.uuid4(),
+                    "usage_date": key[0],
+                    "user_id": key[1],
+                    "config_id": key[2],
+                    "project_id": key[3],
+                    "operation": key[4],
+                    "vendor": key[5],
+                    "model_name": key[6],
+                    **counters
+                }
+                for key, counters in items
+            ]
+            
+            db = SessionLocal()
+            try:
+                db.execute(insert(UsageRecord), rows)
+                db.commit()
+                return len(rows)
+            except Exception as e:
+                db.rollback()
+                self._merge_back(items)
+                logger.warning("用量台账写入失败,%d行将在下次刷写时重试: %s", len(rows), e)
+                return 0
+            finally:
+                db.close()
+
+
+usage_ledger = UsageLedger(
+    flush_interval=settings.USAGE_FLUSH_INTERVAL,
+    max_records=settings.USAGE_FLUSH_MAX_RECORDS
+)
+
+# 进程退出前写入剩余数据
+atexit.register(usage_ledger.flush)
+
+
+class UsageService:
+    """用量查询服务"""
+    
+    @staticmethod
+    def record_generation(
+        config: AIModelConfig,
+        result: Dict[str, Any],
+        operation: str,
+        project_id: Optional[uuid.UUID] = None
+    ):
+        """
+        记录一次成功生成的用量
+        
+        使用路由组时按实际调用的成员配置记账;命中响应缓存的结果只计请求数
+        
+        Args:
+            config: 请求使用的模型配置
+            result: 适配器返回结果
+            operation: 操作类型
+            project_id: 所属项目ID
+        """
+        routing = result.get("routing")
+        if routing:
+            config_id = uuid.UUID(routing["config_id"])
+            vendor, model_name = routing["vendor"], routing["model_name"]
+        else:
+            config_id, vendor, model_name = config.config_id, config.vendor, config.model_name
+        
+        usage_ledger.record(
+            user_id=config.user_id,
+            operation=operation,
+            vendor=vendor,
+            model_name=model_name,
+            usage=result.get("usage", {}),
+            config_id=config_id,
+            project_id=project_id,
+            cached=bool(result.get("cached"))
+        )
+    
+    @staticmethod
+    def record_generations(
+        config: AIModelConfig,
+        results: List[Dict[str, Any]],
+        operation: str,
+        project_id: Optional[uuid.UUID] = None
+    ):
+        """
+        记录多次调用的用量(分段或增量生成时每个片段一次厂商调用)
+        
+        每次调用单独记账,使用路由组时各自计入实际调用的成员配置
+        
+        Args:
+            config: 请求使用的模型配置
+            results: 各次调用的适配器返回结果
+            operation: 操作类型
+            project_id: 所属项目ID
+        """
+        for result in results:
+            UsageService.record_generation(config, result, operation, project_id=project_id)
+    
+    @staticmethod
+    def _sum_columns() -> list:
+        return [func.sum(getattr(UsageRecord, name)).label(name) for name in _COUNTERS]
+    
+    @staticmethod
+    def _date_filters(user_id: uuid.UUID, start_date: Optional[date], end_date: Optional[date]) -> list:
+        filters = [UsageRecord.user_id == user_id]
+        if start_date is not None:
+            filters.append(UsageRecord.usage_date >= start_date)
+        if end_date is not None:
+            filters.append(UsageRecord.usage_date <= end_date)
+        return filters
+    
+    @staticmethod
+    def _row_counters(row) -> Dict[str, int]:
+        return {name: int(getattr(row, name) or 0) for name in _COUNTERS}
+    
+    @staticmethod
+    def get_daily_usage_by_config(
+        db: Session,
+        user_id: uuid.UUID,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        config_id: Optional[uuid.UUID] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        按天汇总每个模型配置的用量
+        
+        Args:
+            db: 数据库会话
+            user_id: 用户ID
+            start_date: 开始日期(含)
+            end_date: 结束日期(含)
+            config_id: 只查询指定模型配置
+        
+        Returns:
+            List[Dict]: 按日期、配置排列的汇总行
+        """
+        filters = UsageService._date_filters(user_id, start_date, end_date)
+        if config_id is not None:
+            filters.append(UsageRecord.config_id == config_id)
+        
+        rows = db.query(
+            UsageRecord.usage_date,
+            UsageRecord.config_id,
+            AIModelConfig.config_name,
+            UsageRecord.vendor,
+            UsageRecord.model_name,
+            *UsageService._sum_columns()
+        ).outerjoin(
+            AIModelConfig, AIModelConfig.config_id == UsageRecord.config_id
+        ).filter(*filters).group_by(
+            UsageRecord.usage_date,
+            UsageRecord.config_id,
+            AIModelConfig.config_name,
+            UsageRecord.vendor,
+            UsageRecord.model_name
+        ).order_by(UsageRecord.usage_date, UsageRecord.config_id).all()
+        
+        return [
+            {
+                "usage_date": row.usage_date,
+                "config_id": row.config_id,
+                "config_name": row.config_name,
+                "vendor": row.vendor,
+                "model_name": row.model_name,
+                **UsageService._row_counters(row)
+            }
+            for row in rows
+        ]
+    
+    @staticmethod
+    def get_daily_usage_by_project(
+        db: Session,
+        user_id: uuid.UUID,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        project_id: Optional[uuid.UUID] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        按天汇总每个项目的用量
+        
+        Args:
+            db: 数据库会话
+            user_id: 用户ID
+            start_date: 开始日期(含)
+            end_date: 结束日期(含)
+            project_id: 只查询指定项目
+        
+        Returns:
+            List[Dict]: 按日期、项目排列的汇总行
+        """
+        filters = UsageService._date_filters(user_id, start_date, end_date)
+        if project_id is not None:
+            filters.append(UsageRecord.project_id == project_id)
+        
+        rows = db.query(
+            UsageRecord.usage_date,
+            UsageRecord.project_id,
+            VideoProject.project_name,
+            *UsageService._sum_columns()
+        ).outerjoin(
+            VideoProject, VideoProject.project_id == UsageRecord.project_id
+        ).filter(*filters).group_by(
+            UsageRecord.usage_date,
+            UsageRecord.project_id,
+            VideoProject.project_name
+        ).order_by(UsageRecord.usage_date, UsageRecord.project_id).all()
+        
+        return [
+            {
+                "usage_date": row.usage_date,
+                "project_id": row.project_id,
+                "project_name": row.project_name,
+                **UsageService._row_counters(row)
+            }
+            for row in rows
+        ]
@@ -0,0 +1,309 @@
+"""
+视频生成任务集中轮询器
+
+提交视频生成后Celery任务立即返回,厂商任务ID登记到Redis(有序集合按下次轮询时间排序,
+哈希表保存任务信息)。轮询器在单个事件循环中分批取出到期任务并发查询状态,
+完成或失败后投递completion续接任务,未完成的按预计完成时间重新安排下次轮询:
+刚提交时稀疏,接近预计完成时密集。事件循环中只等待厂商状态查询,Redis、数据库和
+Celery投递等同步调用放到线程中执行,单个慢调用不会阻塞其他任务的查询。
+
+独立进程运行:
+    python -m app.services.video_poller
+"""
+import asyncio
+import json
+import logging
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from app.core.cache import get_redis
+from app.core.celery_app import celery_app
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.ai_model import AIModelConfig
+from app.models.project import Task
+from app.services.ai_adapters.base import VideoModelAdapter
+from app.services.ai_adapters.registry import adapter_registry
+
+logger = logging.getLogger(__name__)
+
+# 取出到期任务并把它们的下次轮询时间推迟为租约到期时间,多个轮询器不会重复处理,
+# 轮询器中途退出时任务在租约到期后被重新取出
+_CLAIM_SCRIPT = """
+local ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+for _, id in ipairs(ids) do
+    redis.call('ZADD', KEYS[1], ARGV[3], id)
+end
+return ids
+"""
+
+TERMINAL_STATUSES = {"completed", "failed"}
+
+
+def next_poll_delay(job: Dict[str, Any], now: float) -> float:
+    """
+    计算下次轮询前的等待时间
+    
+    厂商返回进度时按已用时间/进度估算总耗时,否则使用登记时的预计耗时;
+    距预计完成时间越近间隔越短,超过预计时间后间隔随超时时长逐渐放宽
+    
+    Args:
+        job: 轮询任务信息
+        now: 当前时间戳
+    
+    Returns:
+        float: 等待秒数,介于VIDEO_POLL_MIN_INTERVAL和VIDEO_POLL_MAX_INTERVAL之间
+    """
+    elapsed = max(0.0, now - job["submitted_at"])
+    expected = job["expected_seconds"]
+    progress = job.get("progress") or 0
+    if 0 < progress < 100 and elapsed > 0:
+        expected = elapsed * 100 / progress
+    
+    remaining = expected - elapsed
+    if remaining > 0:
+        delay = remaining / 2
+    else:
+        delay = settings.VIDEO_POLL_MIN_INTERVAL + (-remaining) / 4
+    return min(settings.VIDEO_POLL_MAX_INTERVAL, max(settings.VIDEO_POLL_MIN_INTERVAL, delay))
+
+
+class VideoPoller:
+    """视频生成任务集中轮询器"""
+    
+    def __init__(self, namespace: str = "video_poll"):
+        self.due_key = f"{namespace}:due"
+        self.jobs_key = f"{namespace}:jobs"
+        self._claim = None
+    
+    def register(
+        self,
+        task_id: uuid.UUID,
+        vendor_task_id: str,
+        config_id: uuid.UUID,
+        storyboard_id: uuid.UUID,
+        duration: float
+    ):
+        """
+        登记待轮询的厂商任务(由提交视频生成的Celery任务调用)
+        
+        Args:
+            task_id: 任务表中的任务ID
+            vendor_task_id: 厂商返回的任务ID
+            config_id: 模型配置ID
+            storyboard_id: 分镜ID
+            duration: 视频时长(秒),用于估算生成耗时
+        """
+        now = time.time()
+        job = {
+            "task_id": str(task_id),
+            "vendor_task_id": vendor_task_id,
+            "config_id": str(config_id),
+            "storyboard_id": str(storyboard_id),
+            "submitted_at": now,
+            "expected_seconds": settings.VIDEO_POLL_EXPECTED_SECONDS * max(1.0, duration / 5),
+            "deadline": now + settings.VIDEO_POLL_MAX_WAIT,
+            "progress": 0,
+            "polls": 0
+        }
+        self._save(job, now + next_poll_delay(job, now))
+    
+    def _save(self, job: Dict[str, Any], due_at: float):
+        pipe = get_redis().pipeline()
+        pipe.hset(self.jobs_key, job["task_id"], json.dumps(job))
+        pipe.zadd(self.due_key, {job["task_id"]: due_at})
+        pipe.execute()
+    
+    def _remove(self, task_id: str):
+        pipe = get_redis().pipeline()
+        pipe.zrem(self.due_key, task_id)
+        pipe.hdel(self.jobs_key, task_id)
+        pipe.execute()
+    
+    def pending_count(self) -> int:
+        """当前登记的任务数"""
+        return get_redis().zcard(self.due_key)
+    
+    def claim_due(self, limit: int) -> List[Dict[str, Any]]:
+        """
+        取出已到轮询时间的任务
+        
+        Args:
+            limit: 单批最大数量
+        
+        Returns:
+            List[Dict]: 任务信息列表
+        """
+        redis_client = get_redis()
+        if self._claim is None:
+            self._claim = redis_client.register_script(_CLAIM_SCRIPT)
+        now = time.time()
+        ids = self._claim(
+            keys=[self.due_key],
+            args=[now, limit, now + settings.VIDEO_POLL_CLAIM_LEASE]
+        )
+        if not ids:
+            return []
+        
+        jobs = []
+        for task_id, raw in zip(ids, redis_client.hmget(self.jobs_key, ids)):
+            if raw is None:
+                # 任务信息已丢失,不再轮询
+                redis_client.zrem(self.due_key, task_id)
+                continue
+            jobs.append(json.loads(raw))
+        return jobs
+    
+    def recover(self) -> int:
+        """
+        从任务表恢复Redis中缺失的轮询任务(Redis数据丢失后启动轮询器时调用)
+        
+        Returns:
+            int: 恢复的任务数
+        """
+        db = SessionLocal()
+        try:
+            tasks = db.query(Task).filter(
+                Task.task_type == "video",
+                Task.status == "processing"
+            ).all()
+            
+            redis_client = get_redis()
+            recovered = 0
+            for task in tasks:
+                data = task.result_data or {}
+                if not data.get("vendor_task_id") or redis_client.hexists(self.jobs_key, str(task.task_id)):
+                    continue
+                submitted_at = task.created_at.timestamp() if task.created_at else time.time()
+                job = {
+                    "task_id": str(task.task_id),
+                    "vendor_task_id": data["vendor_task_id"],
+                    "config_id": data["config_id"],
+                    "storyboard_id": data["storyboard_id"],
+                    "submitted_at": submitted_at,
+                    "expected_seconds": settings.VIDEO_POLL_EXPECTED_SECONDS,
+                    "deadline": submitted_at + settings.VIDEO_POLL_MAX_WAIT,
+                    "progress": task.progress or 0,
+                    "polls": 0
+                }
+                self._save(job, time.time())
+                recovered += 1
+            return recovered
+        finally:
+            db.close()
+    
+    @staticmethod
+    def _load_adapters(config_ids: List[str]) -> Dict[str, VideoModelAdapter]:
+        """一次查询本批任务涉及的模型配置"""
+        db = SessionLocal()
+        try:
+            configs = db.query(AIModelConfig).filter(
+                AIModelConfig.config_id.in_([uuid.UUID(config_id) for config_id in set(config_ids)])
+            ).all()
+            adapters = {}
+            for config in configs:
+                adapter = adapter_registry.get_adapter(config)
+                if isinstance(adapter, VideoModelAdapter):
+                    adapters[str(config.config_id)] = adapter
+            return adapters
+        finally:
+            db.close()
+    
+    def _complete(self, job: Dict[str, Any], result: Dict[str, Any]):
+        """投递续接任务并移除轮询登记(续接任务是幂等的,投递后进程退出最多重复一次)"""
+        celery_app.send_task("tasks.complete_video_segment", args=[job["task_id"], result])
+        self._remove(job["task_id"])
+    
+    async def _poll_one(
+        self,
+        job: Dict[str, Any],
+        adapter: Optional[VideoModelAdapter],
+        semaphore: asyncio.Semaphore
+    ):
+        now = time.time()
+        if adapter is None:
+            await asyncio.to_thread(
+                self._complete, job, {"success": False, "status": "failed", "error": "模型配置不存在或不是视频模型"}
+            )
+            return
+        if now >= job["deadline"]:
+            await asyncio.to_thread(
+                self._complete, job, {"success": False, "status": "timeout", "error": "等待超时"}
+            )
+            return
+        
+        async with semaphore:
+            result = await adapter.acheck_status(job["vendor_task_id"])
+        
+        job["polls"] += 1
+        if result.get("success") and result.get("status") in TERMINAL_STATUSES:
+            await asyncio.to_thread(self._complete, job, result)
+            return
+        
+        if result.get("success"):
+            job["progress"] = result.get("progress") or job["progress"]
+        else:
+            # 查询失败不影响厂商侧的生成,按正常节奏继续轮询
+            logger.warning("查询视频任务%s状态失败: %s", job["vendor_task_id"], result.get("error"))
+        
+        now = time.time()
+        await asyncio.to_thread(self._save, job, now + next_poll_delay(job, now))
+    
+    async def poll_once(self, semaphore: asyncio.Semaphore) -> int:
+        """
+        处理一批到期任务
+        
+        Returns:
+            int: 本批处理的任务数
+        """
+        jobs = await asyncio.to_thread(self.claim_due, settings.VIDEO_POLL_BATCH_SIZE)
+        if not jobs:
+            return 0
+        
+        adapters = await asyncio.to_thread(self._load_adapters, [job["config_id"] for job in jobs])
+        outcomes = await asyncio.gather(
+            *(self._poll_one(job, adapters.get(job["config_id"]), semaphore) for job in jobs),
+            return_exceptions=True
+        )
+        for job, outcome in zip(jobs, outcomes):
+            if isinstance(outcome, Exception):
+                # 任务仍在租约中,租约到期后会被重新取出
+                logger.error("轮询视频任务%s失败: %s", job["task_id"], outcome)
+        return len(jobs)
+    
+    def _idle_seconds(self) -> float:
+        """距离最早到期任务的时间"""
+        head = get_redis().zrange(self.due_key, 0, 0, withscores=True)
+        if not head:
+            return settings.VIDEO_POLL_TICK
+        return min(settings.VIDEO_POLL_TICK, max(0.0, head[0][1] - time.time()))
+    
+    async def run_forever(self):
+        """轮询主循环"""
+        try:
+            recovered = await asyncio.to_thread(self.recover)
+            if recovered:
+                logger.info("从任务表恢复了%d个视频轮询任务", recovered)
+        except Exception as e:
+            logger.warning("恢复视频轮询任务失败: %s", e)
+        
+        semaphore = asyncio.Semaphore(settings.VIDEO_POLL_CONCURRENCY)
+        while True:
+            try:
+                # 单批处理满时立即处理下一批
+                if await self.poll_once(semaphore) >= settings.VIDEO_POLL_BATCH_SIZE:
+                    continue
+                await asyncio.sleep(await asyncio.to_thread(self._idle_seconds))
+            except Exception as e:
+                logger.error("视频轮询出错: %s", e)
+                await asyncio.sleep(settings.VIDEO_POLL_TICK)
+
+
+# 全局轮询器
+video_poller = VideoPoller()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(video_poller.run_forever())
@@ -9,6 +9,7 @@ from app.tasks.video_tasks import (
     generate_video_segment_task,
     merge_video_segments_task
 )
+from app.tasks.model_config_tasks import probe_model_configs_task
 
 __all__ = [
     "generate_script_task",
@@ -16,5 +17,6 @@ __all__ = [
     "generate_character_images_task",
     "generate_scene_images_task",
     "generate_video_segment_task",
-    "merge_video_segments_task"
+    "merge_video_segments_task",
+    "probe_model_configs_task"
 ]
@@ -0,0 +1,18 @@
+"""
+模型配置相关的定时任务
+"""
+from typing import Dict
+
+from app.core.celery_app import celery_app
+from app.services.config_health_service import ConfigHealthService
+
+
+@celery_app.task(name="tasks.probe_model_configs", ignore_result=True)
+def probe_model_configs_task() -> Dict[str, int]:
+    """
+    刷新活跃模型配置的健康状态(由Celery beat按CONFIG_HEALTH_PROBE_INTERVAL调度)
+    
+    Returns:
+        Dict: 本轮探测统计
+    """
+    return ConfigHealthService.probe_active_configs()
@@ -1,16 +1,28 @@
 """
 视频制作相关的异步任务
 """
+import os
+import random
 import uuid
-from typing import Optional
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+import httpx
 from celery import Task
 from sqlalchemy.orm import Session
 
 from app.core.celery_app import celery_app
+from app.core.config import settings
 from app.core.database import SessionLocal
-from app.models.project import Task as TaskModel
+from app.models.ai_model import AIModelConfig
+from app.models.project import Task as TaskModel, Storyboard, VideoSegment
+from app.services.ai_adapters.base import VideoModelAdapter
+from app.services.ai_adapters.http_client import build_timeout
+from app.services.ai_adapters.registry import adapter_registry
+from app.services.image_service import ImageService
+from app.services.script_batch_service import ScriptBatchService
 from app.services.script_service import ScriptService
 from app.services.storyboard_service import StoryboardService
+from app.services.video_poller import video_poller
 
 
 class DatabaseTask(Task):
@@ -35,7 +47,8 @@ def update_task_status(
     status: str,
     progress: Optional[int] = None,
     result: Optional[str] = None,
-    error_message: Optional[str] = None
+    error_message: Optional[str] = None,
+    result_data: Optional[Dict[str, Any]] = None
 ):
     """更新任务状态"""
     task = db.query(TaskModel).filter(TaskModel.task_id == task_id).first()
@@ -47,6 +60,8 @@ def update_task_status(
             task.result = result
         if error_message is not None:
             task.error_message = error_message
+        if result_data is not None:
+            task.result_data = {**(task.result_data or {}), **result_data}
         db.commit()
 
 
@@ -57,10 +72,13 @@ def generate_script_task(
     user_id: str,
     project_id: str,
     story_outline: str,
-    model_config_id: str,
+    model_config_id: Optional[str],
     system_prompt: Optional[str] = None,
     temperature: float = 0.7,
-    max_tokens: int = 4000
+    max_tokens: int = 4000,
+    use_cache: Optional[bool] = None,
+    routing_group_id: Optional[str] = None,
+    concurrency_key: Optional[str] = None
 ):
     """
     异步生成脚本任务
@@ -74,10 +92,20 @@ def generate_script_task(
         system_prompt: 系统提示词
         temperature: 温度
         max_tokens: 最大令牌数
+        use_cache: 是否使用响应缓存
+        routing_group_id: 路由组ID(指定时忽略model_config_id)
+        concurrency_key: 批量生成的并发控制键(厂商名或路由组),拿不到执行名额时延迟重新排队
     """
     db = self.db
     task_uuid = uuid.UUID(task_id)
     
+    slot_token = self.request.id or task_id
+    if concurrency_key and not ScriptBatchService.acquire_slot(concurrency_key, slot_token):
+        raise self.retry(
+            countdown=settings.SCRIPT_BATCH_RETRY_DELAY * (1 + random.random()),
+            max_retries=None
+        )
+    
     try:
         # 更新任务状态为进行中
         update_task_status(db, task_uuid, "processing", progress=10)
@@ -88,10 +116,12 @@ def generate_script_task(
             user_id=uuid.UUID(user_id),
             project_id=uuid.UUID(project_id),
             story_outline=story_outline,
-            model_config_id=uuid.UUID(model_config_id),
+            model_config_id=uuid.UUID(model_config_id) if model_config_id else None,
             system_prompt=system_prompt,
             temperature=temperature,
-            max_tokens=max_tokens
+            max_tokens=max_tokens,
+            use_cache=use_cache,
+            routing_group_id=uuid.UUID(routing_group_id) if routing_group_id else None
         )
         
         # 更新任务状态为完成
@@ -100,7 +130,11 @@ def generate_script_task(
             task_uuid,
             "completed",
             progress=100,
-            result=str(result["script"].script_id)
+            result=str(result["script"].script_id),
+            result_data={
+                "script_id": str(result["script"].script_id),
+                "version": result["script"].version
+            }
         )
         
         return {
@@ -117,6 +151,9 @@ def generate_script_task(
             error_message=str(e)
         )
         raise
+    finally:
+        if concurrency_key:
+            ScriptBatchService.release_slot(concurrency_key, slot_token)
 
 
 @celery_app.task(base=DatabaseTask, bind=True, name="tasks.generate_storyboard")
@@ -125,10 +162,14 @@ def generate_storyboard_task(
     task_id: str,
     user_id: str,
     script_id: str,
-    model_config_id: str,
+    model_config_id: Optional[str],
     system_prompt: Optional[str] = None,
     temperature: float = 0.7,
-    max_tokens: int = 3000
+    max_tokens: int = 3000,
+    use_cache: Optional[bool] = None,
+    chunked: bool = False,
+    routing_group_id: Optional[str] = None,
+    incremental: bool = False
 ):
     """
     异步生成分镜任务
@@ -141,6 +182,10 @@ def generate_storyboard_task(
         system_prompt: 系统提示词
         temperature: 温度
         max_tokens: 最大令牌数
+        use_cache: 是否使用响应缓存
+        chunked: 是否按场景分段并发生成
+        routing_group_id: 路由组ID(指定时忽略model_config_id)
+        incremental: 是否只为内容变化的场景重新生成分镜
     """
     db = self.db
     task_uuid = uuid.UUID(task_id)
@@ -154,10 +199,14 @@ def generate_storyboard_task(
             db=db,
             user_id=uuid.UUID(user_id),
             script_id=uuid.UUID(script_id),
-            model_config_id=uuid.UUID(model_config_id),
+            model_config_id=uuid.UUID(model_config_id) if model_config_id else None,
             system_prompt=system_prompt,
             temperature=temperature,
-            max_tokens=max_tokens
+            max_tokens=max_tokens,
+            use_cache=use_cache,
+            chunked=chunked,
+            routing_group_id=uuid.UUID(routing_group_id) if routing_group_id else None,
+            incremental=incremental
         )
         
         # 更新任务状态
@@ -185,7 +234,9 @@ def generate_character_images_task(
     task_id: str,
     user_id: str,
     character_id: str,
-    model_config_id: str
+    model_config_id: str,
+    view_types: Optional[List[str]] = None,
+    images_per_view: int = 1
 ):
     """
     异步生成人物形象任务
@@ -195,6 +246,8 @@ def generate_character_images_task(
         user_id: 用户ID
         character_id: 人物ID
         model_config_id: 模型配置ID
+        view_types: 视角列表(front/back/closeup),默认全部
+        images_per_view: 每个视角生成的数量
     """
     db = self.db
     task_uuid = uuid.UUID(task_id)
@@ -202,12 +255,28 @@ def generate_character_images_task(
     try:
         update_task_status(db, task_uuid, "processing", progress=10)
         
-        # TODO: 实现人物形象生成逻辑
-        # 这里需要调用图像生成服务
+        result = ImageService.generate_character_images(
+            db=db,
+            user_id=uuid.UUID(user_id),
+            character_id=uuid.UUID(character_id),
+            model_config_id=uuid.UUID(model_config_id),
+            view_types=view_types,
+            images_per_view=images_per_view
+        )
         
-        update_task_status(db, task_uuid, "completed", progress=100)
+        update_task_status(
+            db,
+            task_uuid,
+            "completed",
+            progress=100,
+            error_message="; ".join(result["errors"]) or None
+        )
         
-        return {"character_id": character_id}
+        return {
+            "character_id": character_id,
+            "images": [str(image.image_id) for image in result["images"]],
+            "calls": result["calls"]
+        }
         
     except Exception as e:
         update_task_status(db, task_uuid, "failed", error_message=str(e))
@@ -220,7 +289,9 @@ def generate_scene_images_task(
     task_id: str,
     user_id: str,
     scene_id: str,
-    model_config_id: str
+    model_config_id: str,
+    angle_types: Optional[List[str]] = None,
+    images_per_angle: int = 1
 ):
     """
     异步生成场景图任务
@@ -230,6 +301,8 @@ def generate_scene_images_task(
         user_id: 用户ID
         scene_id: 场景ID
         model_config_id: 模型配置ID
+        angle_types: 视角列表(front/side/top),默认全部
+        images_per_angle: 每个视角生成的数量
     """
     db = self.db
     task_uuid = uuid.UUID(task_id)
@@ -237,11 +310,28 @@ def generate_scene_images_task(
     try:
         update_task_status(db, task_uuid, "processing", progress=10)
         
-        # TODO: 实现场景图生成逻辑
+        result = ImageService.generate_scene_images(
+            db=db,
+            user_id=uuid.UUID(user_id),
+            scene_id=uuid.UUID(scene_id),
+            model_config_id=uuid.UUID(model_config_id),
+            angle_types=angle_types,
+            images_per_angle=images_per_angle
+        )
         
-        update_task_status(db, task_uuid, "completed", progress=100)
+        update_task_status(
+            db,
+            task_uuid,
+            "completed",
+            progress=100,
+            error_message="; ".join(result["errors"]) or None
+        )
         
-        return {"scene_id": scene_id}
+        return {
+            "scene_id": scene_id,
+            "images": [str(image.image_id) for image in result["images"]],
+            "calls": result["calls"]
+        }
         
     except Exception as e:
         update_task_status(db, task_uuid, "failed", error_message=str(e))
@@ -259,6 +349,9 @@ def generate_video_segment_task(
     """
     异步生成视频片段任务
     
+    只负责提交生成请求,厂商任务ID登记到VideoPoller后立即返回,不在worker中等待生成完成;
+    生成结束后由轮询器投递tasks.complete_video_segment保存结果
+    
     Args:
         task_id: 任务ID
         user_id: 用户ID
@@ -271,17 +364,126 @@ def generate_video_segment_task(
     try:
         update_task_status(db, task_uuid, "processing", progress=10)
         
-        # TODO: 实现视频片段生成逻辑
+        storyboard = db.query(Storyboard).filter(
+            Storyboard.storyboard_id == uuid.UUID(storyboard_id)
+        ).first()
+        if not storyboard:
+            raise ValueError("分镜不存在")
         
-        update_task_status(db, task_uuid, "completed", progress=100)
+        config = db.query(AIModelConfig).filter(
+            AIModelConfig.config_id == uuid.UUID(model_config_id),
+            AIModelConfig.user_id == uuid.UUID(user_id)
+        ).first()
+        if not config:
+            raise ValueError("模型配置不存在或无权访问")
+        
+        adapter = adapter_registry.get_adapter(config)
+        if not isinstance(adapter, VideoModelAdapter):
+            raise ValueError(f"模型配置不是视频模型: {config.vendor}")
+        
+        result = adapter.generate_video(storyboard.content, duration=storyboard.duration)
+        if not result.get("success"):
+            raise Exception(f"视频生成提交失败: {result.get('error', '未知错误')}")
         
-        return {"storyboard_id": storyboard_id}
+        # 厂商任务ID同时写入任务表,Redis数据丢失时轮询器可据此恢复
+        task = db.query(TaskModel).filter(TaskModel.task_id == task_uuid).first()
+        if task:
+            task.progress = 20
+            task.result_data = {
+                "vendor_task_id": result["task_id"],
+                "config_id": str(config.config_id),
+                "storyboard_id": storyboard_id
+            }
+            db.commit()
+        
+        video_poller.register(
+            task_id=task_uuid,
+            vendor_task_id=result["task_id"],
+            config_id=config.config_id,
+            storyboard_id=storyboard.storyboard_id,
+            duration=storyboard.duration
+        )
+        
+        return {"storyboard_id": storyboard_id, "vendor_task_id": result["task_id"], "status": "submitted"}
         
     except Exception as e:
         update_task_status(db, task_uuid, "failed", error_message=str(e))
         raise
 
 
+def _download_video(url: str, storyboard_id: str) -> str:
+    """流式下载生成的视频到存储目录,返回本地路径"""
+    directory = os.path.join(settings.STORAGE_PATH, "videos")
+    os.makedirs(directory, exist_ok=True)
+    local_path = os.path.join(directory, f"{storyboard_id}.mp4")
+    tmp_path = f"{local_path}.part"
+    
+    with httpx.stream("GET", url, timeout=build_timeout(60.0), follow_redirects=True) as response:
+        response.raise_for_status()
+        with open(tmp_path, "wb") as f:
+            for chunk in response.iter_bytes():
+                f.write(chunk)
+    
+    os.replace(tmp_path, local_path)
+    return local_path
+
+
+@celery_app.task(base=DatabaseTask, bind=True, name="tasks.complete_video_segment")
+def complete_video_segment_task(self, task_id: str, result: Dict[str, Any]):
+    """
+    视频生成结束后的续接任务(由VideoPoller投递)
+    
+    任务已结束时直接返回,重复投递不会重复保存
+    
+    Args:
+        task_id: 任务ID
+        result: 厂商最后一次状态查询结果
+    """
+    db = self.db
+    task = db.query(TaskModel).filter(TaskModel.task_id == uuid.UUID(task_id)).first()
+    if not task or task.status in ("completed", "failed"):
+        return {"task_id": task_id, "skipped": True}
+    
+    data = task.result_data or {}
+    
+    try:
+        if not result.get("success") or result.get("status") != "completed":
+            raise Exception(f"视频生成失败: {result.get('error', '未知错误')}")
+        
+        storyboard = db.query(Storyboard).filter(
+            Storyboard.storyboard_id == uuid.UUID(data["storyboard_id"])
+        ).first()
+        if not storyboard:
+            raise ValueError("分镜已删除")
+        
+        local_path = _download_video(result["video_url"], data["storyboard_id"])
+        
+        segment = VideoSegment(
+            storyboard_id=storyboard.storyboard_id,
+            sequence_order=storyboard.sequence_number,
+            duration=storyboard.duration,
+            local_path=local_path,
+            file_size=os.path.getsize(local_path),
+            status="completed",
+            generated_by_config=uuid.UUID(data["config_id"])
+        )
+        db.add(segment)
+        db.flush()
+        
+        task.status = "completed"
+        task.progress = 100
+        task.result_data = {**data, "video_url": result["video_url"], "segment_id": str(segment.segment_id)}
+        task.completed_at = datetime.now(timezone.utc)
+        db.commit()
+        
+        return {"task_id": task_id, "segment_id": str(segment.segment_id)}
+    
+    except Exception as e:
+        db.rollback()
+        update_task_status(db, task.task_id, "failed", error_message=str(e))
+        raise
+
+
 @celery_app.task(base=DatabaseTask, bind=True, name="tasks.merge_video_segments")
 def merge_video_segments_task(
     self,
@@ -1,13 +1,15 @@
 """
 数据加密工具(用于加密API Key等敏感信息)
 """
+from functools import lru_cache
 from cryptography.fernet import Fernet
 from app.core.config import settings
 import base64
 
 
+@lru_cache(maxsize=1)
 def get_cipher():
-    """获取加密器"""
+    """获取加密器(进程内复用)"""
     # 将密钥转换为32字节
     key = settings.ENCRYPTION_KEY.encode()
     if len(key) < 32:
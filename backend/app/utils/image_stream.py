@@ -0,0 +1,369 @@
+"""
+图像流式读写工具
+
+图像生成接口以JSON返回base64编码的图像({"images": ["iVBOR...", ...], ...})。
+这里按字节流扫描响应,"images"数组中的每个字符串边到达边解码写入文件,
+内存中只保留未对齐的几个字节,不需要持有整个JSON文档和解码后的图像
+
+上传参考图时按文件流发送multipart请求,避免base64编码和整图复制
+"""
+import binascii
+import contextlib
+import os
+import re
+from typing import IO, Callable, Iterator, List, Optional, Tuple, Union
+
+# 参考图来源:文件路径、已打开的二进制文件或内存缓冲区
+ImageSource = Union[str, os.PathLike, IO[bytes], bytes, bytearray, memoryview]
+
+# 字符串内需要特殊处理的字符
+_STRING_SPECIAL = re.compile(rb'["\\]')
+# 字符串外的结构字符
+_STRUCTURAL = re.compile(rb'["\[\]{},]')
+
+# 文件头 -> 扩展名
+_MAGIC_EXTENSIONS = (
+    (b"\x89PNG", "png"),
+    (b"\xff\xd8\xff", "jpg"),
+    (b"GIF8", "gif"),
+)
+
+_KEY_MAX_LEN = 64
+
+
+def sniff_extension(head: bytes) -> str:
+    """根据文件头判断图像扩展名,无法识别时返回png"""
+    for magic, ext in _MAGIC_EXTENSIONS:
+        if head.startswith(magic):
+            return ext
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    return "png"
+
+
+class _ImageSink:
+    """单张图像的增量base64解码和写入"""
+    
+    HEAD_BYTES = 12
+    
+    def __init__(self, index: int, path_for: Callable[[int, str], str]):
+        self.index = index
+        self.path_for = path_for
+        self.prefix_checked = False
+        self.pending = b""  # 未满4字节对齐的base64字符
+        self.head = b""  # 打开文件前暂存的解码数据(用于识别格式)
+        self.file = None
+        self.path: Optional[str] = None
+        self.tmp_path: Optional[str] = None
+        self.size = 0
+    
+    def _write(self, data: bytes):
+        if not data:
+            return
+        if self.file is None:
+            self.head += data
+            if len(self.head) < self.HEAD_BYTES:
+                return
+            self._open()
+            data, self.head = self.head, b""
+        self.file.write(data)
+        self.size += len(data)
+    
+    def _open(self):
+        self.path = self.path_for(self.index, sniff_extension(self.head))
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.tmp_path = f"{self.path}.part"
+        self.file = open(self.tmp_path, "wb")
+    
+    def feed(self, text: bytes):
+        """输入一段base64字符(已去除JSON转义)"""
+        data = self.pending + text
+        if not self.prefix_checked:
+            # 兼容data URL: data:image/png;base64,....
+            if len(data) < 5 and b"," not in data:
+                self.pending = data
+                return
+            if data.startswith(b"data:"):
+                comma = data.find(b",")
+                if comma < 0:
+                    self.pending = data
+                    return
+                data = data[comma + 1:]
+            self.prefix_checked = True
+        
+        aligned = len(data) - len(data) % 4
+        self._write(binascii.a2b_base64(data[:aligned]))
+        self.pending = data[aligned:]
+    
+    def finish(self) -> Tuple[str, int]:
+        """字符串结束,写入剩余数据并返回(文件路径, 字节数)"""
+        if self.pending:
+            self.prefix_checked = True
+            padded = self.pending + b"=" * (-len(self.pending) % 4)
+            self.pending = b""
+            self._write(binascii.a2b_base64(padded))
+        if self.file is None:
+            if not self.head:
+                raise ValueError(f"第{self.index + 1}张图像数据为空")
+            self._open()
+            data, self.head = self.head, b""
+            self.file.write(data)
+            self.size += len(data)
+        self.file.close()
+        os.replace(self.tmp_path, self.path)
+        self.file = None
+        return self.path, self.size
+    
+    def abort(self):
+        """删除未完成的临时文件"""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        if self.tmp_path and os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+def save_base64_image(data: str, index: int, path_for: Callable[[int, str], str]) -> Tuple[str, int]:
+    """
+    解码单张已在内存中的base64图像并保存
+    
+    Args:
+        data: base64字符串(可带data URL前缀)
+        index: 图像序号
+        path_for: 根据(图像序号, 扩展名)返回保存路径
+    
+    Returns:
+        Tuple[str, int]: (文件路径, 字节数)
+    """
+    sink = _ImageSink(index, path_for)
+    try:
+        sink.feed(data.encode() if isinstance(data, str) else data)
+        return sink.finish()
+    except Exception:
+        sink.abort()
+        raise
+
+
+class StreamingImageDecoder:
+    """
+    从JSON响应字节流中提取顶层"images"数组里的base64图像并写入文件
+    
+    用法:
+        decoder = StreamingImageDecoder(path_for)
+        for chunk in response.iter_bytes():
+            decoder.feed(chunk)
+        images = decoder.close()
+    """
+    
+    def __init__(self, path_for: Callable[[int, str], str], field: str = "images"):
+        """
+        初始化解码器
+        
+        Args:
+            path_for: 根据(图像序号, 扩展名)返回保存路径
+            field: 顶层图像数组的字段名
+        """
+        self.path_for = path_for
+        self.field = field.encode()
+        self.images: List[Tuple[str, int]] = []
+        self._depth = 0
+        self._in_string = False
+        self._string_kind = None  # key/image/other
+        self._escape = False
+        self._key = b""
+        self._expect_key = False
+        self._pending_key: Optional[bytes] = None
+        self._images_depth: Optional[int] = None
+        self._sink: Optional[_ImageSink] = None
+        self._image_count = 0
+    
+    def feed(self, chunk: bytes):
+        """
+        输入一段响应字节
+        
+        Args:
+            chunk: 新到达的字节
+        """
+        buffer = chunk
+        pos = 0
+        size = len(buffer)
+        
+        while pos < size:
+            if self._in_string:
+                pos = self._scan_string(buffer, pos)
+                continue
+            
+            match = _STRUCTURAL.search(buffer, pos)
+            if match is None:
+                break
+            ch = buffer[match.start():match.start() + 1]
+            pos = match.end()
+            
+            if ch == b'"':
+                self._start_string()
+            elif ch in (b"{", b"["):
+                self._depth += 1
+                if ch == b"[" and self._depth == 2 and self._pending_key == self.field:
+                    self._images_depth = 2
+                self._expect_key = ch == b"{" and self._depth == 1
+            elif ch in (b"}", b"]"):
+                if self._images_depth is not None and self._depth == self._images_depth:
+                    self._images_depth = None
+                self._depth -= 1
+            elif ch == b"," and self._depth == 1:
+                self._expect_key = True
+                self._pending_key = None
+    
+    def _start_string(self):
+        self._in_string = True
+        if self._images_depth is not None and self._depth == self._images_depth:
+            self._string_kind = "image"
+            self._sink = _ImageSink(self._image_count, self.path_for)
+            self._image_count += 1
+        elif self._depth == 1 and self._expect_key:
+            self._string_kind = "key"
+            self._key = b""
+        else:
+            self._string_kind = "other"
+    
+    def _consume(self, text: bytes):
+        if not text:
+            return
+        if self._string_kind == "image":
+            self._sink.feed(text)
+        elif self._string_kind == "key" and len(self._key) <= _KEY_MAX_LEN:
+            self._key += text
+    
+    def _scan_image(self, buffer: bytes, pos: int) -> int:
+        """
+        处理图像字符串内容,返回新的扫描位置
+        
+        base64中不会出现引号,第一个引号即字符串结尾;斜杠和换行转义整段批量去除
+        """
+        end = buffer.find(b'"', pos)
+        segment = buffer[pos:] if end < 0 else buffer[pos:end]
+        if self._escape:
+            segment = b"\\" + segment
+            self._escape = False
+        if segment.endswith(b"\\") and (len(segment) - len(segment.rstrip(b"\\"))) % 2:
+            # 转义符被切在片段末尾,留到下一段处理
+            segment = segment[:-1]
+            self._escape = True
+        if b"\\" in segment:
+            segment = (
+                segment.replace(b"\\/", b"/")
+                .replace(b"\\n", b"")
+                .replace(b"\\r", b"")
+                .replace(b"\\t", b"")
+            )
+        self._consume(segment)
+        
+        if end < 0:
+            return len(buffer)
+        self._end_string()
+        return end + 1
+    
+    def _scan_string(self, buffer: bytes, pos: int) -> int:
+        """处理字符串内容,返回新的扫描位置"""
+        if self._string_kind == "image":
+            return self._scan_image(buffer, pos)
+        if self._escape:
+            escaped = buffer[pos:pos + 1]
+            self._escape = False
+            # base64中只可能出现\/;\n等空白转义直接丢弃
+            if escaped not in (b"n", b"r", b"t"):
+                self._consume(escaped)
+            return pos + 1
+        
+        match = _STRING_SPECIAL.search(buffer, pos)
+        if match is None:
+            self._consume(buffer[pos:])
+            return len(buffer)
+        
+        self._consume(buffer[pos:match.start()])
+        if buffer[match.start():match.end()] == b"\\":
+            self._escape = True
+            return match.end()
+        
+        self._end_string()
+        return match.end()
+    
+    def _end_string(self):
+        self._in_string = False
+        if self._string_kind == "image":
+            self.images.append(self._sink.finish())
+            self._sink = None
+        elif self._string_kind == "key":
+            self._pending_key = self._key
+            self._expect_key = False
+        self._string_kind = None
+    
+    def abort(self):
+        """放弃解码,删除已写入的文件"""
+        if self._sink is not None:
+            self._sink.abort()
+            self._sink = None
+        for path, _ in self.images:
+            if os.path.exists(path):
+                os.remove(path)
+        self.images = []
+    
+    def close(self) -> List[Tuple[str, int]]:
+        """
+        结束解码
+        
+        Returns:
+            List[Tuple[str, int]]: 按数组顺序排列的(文件路径, 字节数)
+        
+        Raises:
+            ValueError: 响应不完整
+        """
+        if self._in_string or self._depth != 0:
+            self.abort()
+            raise ValueError("图像响应不完整")
+        return self.images
+
+
+class BufferReader:
+    """以文件接口按块读取内存缓冲区,每次只复制读取的部分"""
+    
+    def __init__(self, buffer: Union[bytes, bytearray, memoryview], name: str = "image"):
+        self._view = memoryview(buffer).cast("B")
+        self._pos = 0
+        self.name = name
+    
+    def read(self, size: int = -1) -> bytes:
+        end = len(self._view) if size is None or size < 0 else min(len(self._view), self._pos + size)
+        data = self._view[self._pos:end].tobytes()
+        self._pos = end
+        return data
+    
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        base = {os.SEEK_SET: 0, os.SEEK_CUR: self._pos, os.SEEK_END: len(self._view)}[whence]
+        self._pos = max(0, min(len(self._view), base + offset))
+        return self._pos
+    
+    def tell(self) -> int:
+        return self._pos
+
+
+@contextlib.contextmanager
+def open_image_source(source: ImageSource) -> Iterator[Tuple[str, IO[bytes]]]:
+    """
+    把参考图来源统一为可流式读取的文件对象
+    
+    路径在退出时关闭;调用方传入的文件对象不关闭
+    
+    Args:
+        source: 文件路径、二进制文件对象或内存缓冲区
+    
+    Yields:
+        Tuple[str, IO[bytes]]: (文件名, 文件对象)
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            yield os.path.basename(os.fspath(source)), f
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        yield "image", BufferReader(source)
+    else:
+        yield os.path.basename(getattr(source, "name", "image") or "image"), source
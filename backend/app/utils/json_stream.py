@@ -0,0 +1,207 @@
+"""
+大模型输出中的JSON数组解析工具
+
+- IncrementalJSONArrayParser: 流式生成场景,大模型逐段输出一个JSON数组时,每当数组中的一个对象完整闭合,
+  立即解析并返回,无需等待整个数组输出完毕
+- extract_json_objects: 完整输出的容错解析,数组前后夹杂说明文字或因max_tokens被截断时,
+  一次扫描找出数组并恢复其中所有完整的对象
+
+安装orjson时使用orjson解析,未安装时使用标准库json
+"""
+import json
+import re
+from typing import Any, Callable, Dict, List, Tuple
+
+try:
+    import orjson
+    
+    fast_loads: Callable[[str], Any] = orjson.loads
+    JSON_BACKEND = "orjson"
+except ImportError:
+    fast_loads = json.loads
+    JSON_BACKEND = "json"
+
+# 对象数组的起始位置("[" 后紧跟 "{" 或 "]"),跳过说明文字中的 "[注]" 等方括号
+_ARRAY_START = re.compile(r"\[\s*(?=[{\]])")
+# 字符串外的结构字符
+_STRUCTURAL = re.compile(r'["{}\[\]]')
+# 字符串内需要处理的字符
+_STRING_SPECIAL = re.compile(r'["\\]')
+
+
+class IncrementalJSONArrayParser:
+    """
+    增量解析顶层JSON数组中的对象元素
+    
+    数组开始前的文字(如markdown代码块标记)会被忽略;数组闭合后的内容不再处理
+    """
+    
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._object_start = -1
+        self.started = False
+        self.finished = False
+    
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """
+        输入一段文本
+        
+        Args:
+            chunk: 新到达的文本片段
+        
+        Returns:
+            List[Dict]: 本次新闭合的对象列表
+        """
+        if self.finished or not chunk:
+            return []
+        
+        self._buffer += chunk
+        objects = []
+        buffer = self._buffer
+        i = self._pos
+        
+        while i < len(buffer):
+            ch = buffer[i]
+            
+            if not self.started:
+                if ch == "[":
+                    self.started = True
+                    self._depth = 1
+                i += 1
+                continue
+            
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                if ch == "{" and self._depth == 1:
+                    self._object_start = i
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if ch == "}" and self._depth == 1 and self._object_start >= 0:
+                    obj = self._decode(buffer[self._object_start:i + 1])
+                    if obj is not None:
+                        objects.append(obj)
+                    self._object_start = -1
+                elif self._depth == 0:
+                    self.finished = True
+                    i += 1
+                    break
+            i += 1
+        
+        # 丢弃已处理的内容,只保留未闭合对象的部分
+        if self._object_start >= 0:
+            self._buffer = buffer[self._object_start:]
+            self._pos = i - self._object_start
+            self._object_start = 0
+        else:
+            self._buffer = ""
+            self._pos = 0
+        
+        return objects
+    
+    @staticmethod
+    def _decode(text: str):
+        """解析单个对象,格式错误的元素直接跳过"""
+        try:
+            obj = fast_loads(text)
+        except ValueError:
+            return None
+        return obj if isinstance(obj, dict) else None
+
+
+def _object_spans(text: str, pos: int) -> Tuple[List[str], bool]:
+    """
+    从数组内部的pos处开始扫描,返回(顶层对象的原文列表, 数组是否闭合)
+    
+    按正则跳到下一个结构字符或字符串结束位置,不逐字符处理
+    """
+    spans = []
+    depth = 1
+    object_start = -1
+    while True:
+        match = _STRUCTURAL.search(text, pos)
+        if match is None:
+            return spans, False
+        ch = match.group()
+        pos = match.end()
+        
+        if ch == '"':
+            while True:
+                match = _STRING_SPECIAL.search(text, pos)
+                if match is None:
+                    return spans, False
+                if match.group() == "\\":
+                    pos = match.end() + 1
+                    continue
+                pos = match.end()
+                break
+        elif ch in "{[":
+            if ch == "{" and depth == 1:
+                object_start = match.start()
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                return spans, True
+            if ch == "}" and depth == 1 and object_start >= 0:
+                spans.append(text[object_start:pos])
+                object_start = -1
+
+
+def _decode_objects(spans: List[str]) -> List[Dict[str, Any]]:
+    """整体解析所有对象,其中有格式错误的对象时再逐个解析并跳过错误的对象"""
+    if not spans:
+        return []
+    try:
+        items = fast_loads("[" + ",".join(spans) + "]")
+    except ValueError:
+        items = []
+        for span in spans:
+            try:
+                items.append(fast_loads(span))
+            except ValueError:
+                continue
+    return [item for item in items if isinstance(item, dict)]
+
+
+def extract_json_objects(text: str) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    从大模型输出中提取JSON对象数组
+    
+    数组完整且格式正确时直接整体解析;否则扫描一遍,恢复数组中所有完整闭合的对象
+    (截断的最后一个对象和格式错误的对象被丢弃)。数组可以被markdown代码块、说明文字或外层对象包裹
+    
+    Args:
+        text: 大模型输出的文本
+    
+    Returns:
+        Tuple[List[Dict], bool]: (对象列表, 数组是否完整闭合);找不到数组时返回([], False)
+    """
+    match = _ARRAY_START.search(text)
+    if match is None:
+        return [], False
+    
+    start = match.start()
+    end = text.rfind("]")
+    if end > start:
+        try:
+            items = fast_loads(text[start:end + 1])
+        except ValueError:
+            items = None
+        if isinstance(items, list):
+            return [item for item in items if isinstance(item, dict)], True
+    
+    spans, closed = _object_spans(text, match.end())
+    return _decode_objects(spans), closed
@@ -0,0 +1,104 @@
+"""
+游标(keyset)分页
+
+按排序键的最后一行生成不透明游标,下一页以"(排序键) < / > (游标值)"的行比较取数据,
+配合对应的组合索引时第N页和第一页的代价相同,翻页期间插入或更新的行也不会导致重复或遗漏。
+列表接口在响应头X-Next-Cursor中返回下一页游标,没有更多数据时不返回
+"""
+import base64
+import binascii
+import json
+import uuid
+from datetime import datetime
+from typing import Any, Callable, List, NamedTuple, Optional, Sequence
+
+from sqlalchemy import literal, tuple_
+from sqlalchemy.orm import Query
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class Page(NamedTuple):
+    """一页数据"""
+    items: List[Any]
+    next_cursor: Optional[str]
+
+
+def _dump(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """把排序键的值编码为游标"""
+    payload = json.dumps([_dump(value) for value in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, parsers: Sequence[Callable[[Any], Any]]) -> List[Any]:
+    """
+    解码游标
+    
+    Args:
+        cursor: encode_cursor生成的游标
+        parsers: 每个排序键的值转换函数
+    
+    Returns:
+        List: 排序键的值
+    
+    Raises:
+        ValueError: 游标无效
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(parsers):
+            raise ValueError(cursor)
+        return [parse(value) for parse, value in zip(parsers, values)]
+    except (ValueError, TypeError, binascii.Error):
+        raise ValueError("无效的分页游标")
+
+
+def keyset_paginate(
+    query: Query,
+    columns: Sequence[Any],
+    parsers: Sequence[Callable[[Any], Any]],
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    descending: bool = False,
+    offset: int = 0
+) -> Page:
+    """
+    按排序键做游标分页
+    
+    Args:
+        query: 已加筛选条件的查询
+        columns: 排序键(模型属性),最后一个应唯一
+        parsers: 每个排序键的游标值转换函数
+        cursor: 上一页返回的游标
+        limit: 每页条数,为None时返回全部
+        descending: 是否倒序
+        offset: 跳过条数(兼容偏移分页的客户端,返回的游标可继续翻页)
+    
+    Returns:
+        Page: 本页数据和下一页游标
+    """
+    query = query.order_by(*(column.desc() if descending else column.asc() for column in columns))
+    if cursor:
+        values = decode_cursor(cursor, parsers)
+        row = tuple_(*columns)
+        bound = tuple_(*(literal(value, column.type) for column, value in zip(columns, values)))
+        query = query.filter(row < bound if descending else row > bound)
+    if offset:
+        query = query.offset(offset)
+    
+    if limit is None:
+        return Page(query.all(), None)
+    
+    items = query.limit(limit + 1).all()
+    if len(items) <= limit:
+        return Page(items, None)
+    items = items[:limit]
+    return Page(items, encode_cursor([getattr(items[-1], column.key) for column in columns]))
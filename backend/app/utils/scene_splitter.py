@@ -0,0 +1,163 @@
+"""
+脚本分场景切分工具
+
+用于长脚本的分段生成:先按场景标题切分,再把相邻场景合并成不超过指定长度的片段,
+单个场景超长时按段落继续切分。增量生成分镜时以场景单元为粒度比较脚本前后的变化
+"""
+import hashlib
+import re
+from typing import List, Tuple
+
+# 场景标题:场景1 / 第一场 / 【场景二】 / 第3幕 / Scene 4 / INT. / EXT. / markdown标题
+SCENE_HEADING = re.compile(
+    r"^\s*(?:"
+    r"#{1,6}\s+"
+    r"|[【\[]?\s*(?:场景|场次|镜头组)\s*[0-9一二三四五六七八九十百零〇]+"
+    r"|第\s*[0-9一二三四五六七八九十百零〇]+\s*[场幕章节集]"
+    r"|scene\s*\d+"
+    r"|(?:int|ext)\.\s"
+    r")",
+    re.IGNORECASE
+)
+
+
+def split_scenes(text: str) -> List[str]:
+    """
+    按场景标题切分脚本
+    
+    Args:
+        text: 脚本全文
+    
+    Returns:
+        List[str]: 场景列表(第一个场景标题之前的内容单独成段);没有场景标题时返回整篇
+    """
+    scenes = []
+    current: List[str] = []
+    for line in text.splitlines():
+        if SCENE_HEADING.match(line) and any(part.strip() for part in current):
+            scenes.append("\n".join(current).strip())
+            current = []
+        current.append(line)
+    if any(part.strip() for part in current):
+        scenes.append("\n".join(current).strip())
+    return scenes
+
+
+def _split_long_scene(scene: str, max_chars: int) -> List[str]:
+    """按段落(空行或换行)切分超长场景,单个段落超长时按长度硬切"""
+    pieces: List[str] = []
+    current = ""
+    for paragraph in re.split(r"\n\s*\n|\n", scene):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        while len(paragraph) > max_chars:
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(paragraph[:max_chars])
+            paragraph = paragraph[max_chars:]
+        if current and len(current) + len(paragraph) + 1 > max_chars:
+            pieces.append(current)
+            current = ""
+        current = f"{current}\n{paragraph}" if current else paragraph
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_units(text: str, max_chars: int) -> List[str]:
+    """
+    将脚本切分为场景单元,超长场景按段落继续切分
+    
+    单元边界只取决于所在场景的内容,修改一处只影响该处所在的单元
+    
+    Args:
+        text: 脚本全文
+        max_chars: 单个单元的最大字符数
+    
+    Returns:
+        List[str]: 按原文顺序排列的单元
+    """
+    units: List[str] = []
+    for scene in split_scenes(text):
+        units.extend(_split_long_scene(scene, max_chars) if len(scene) > max_chars else [scene])
+    return units
+
+
+def unit_hash(text: str) -> str:
+    """单元内容的指纹(忽略空白差异)"""
+    return hashlib.sha256(re.sub(r"\s+", " ", text).strip().encode()).hexdigest()
+
+
+def span_hash(hashes: List[str]) -> str:
+    """
+    连续若干单元的指纹(分段生成时一个片段的分镜对应多个单元)
+    
+    Args:
+        hashes: 各单元的指纹(unit_hash)
+    
+    Returns:
+        str: 只有一个单元时即该单元的指纹
+    """
+    if len(hashes) == 1:
+        return hashes[0]
+    return hashlib.sha256("\n".join(hashes).encode()).hexdigest()
+
+
+def chunk_units(units: List[str], max_chars: int) -> List[Tuple[int, int]]:
+    """
+    把相邻单元合并为不超过指定长度的片段
+    
+    Args:
+        units: split_units切分出的单元
+        max_chars: 单个片段的最大字符数
+    
+    Returns:
+        List[Tuple[int, int]]: 各片段包含的单元序号范围[start, end)
+    """
+    spans: List[Tuple[int, int]] = []
+    start = 0
+    length = 0
+    for idx, unit in enumerate(units):
+        if idx > start and length + len(unit) + 2 > max_chars:
+            spans.append((start, idx))
+            start = idx
+            length = 0
+        length = length + len(unit) + 2 if idx > start else len(unit)
+    if units:
+        spans.append((start, len(units)))
+    return spans
+
+
+def chunk_script(text: str, max_chars: int) -> List[str]:
+    """
+    将脚本切分为若干片段,片段边界尽量落在场景边界上
+    
+    Args:
+        text: 脚本全文
+        max_chars: 单个片段的最大字符数
+    
+    Returns:
+        List[str]: 按原文顺序排列的片段
+    """
+    units = split_units(text, max_chars)
+    return ["\n\n".join(units[start:end]) for start, end in chunk_units(units, max_chars)]
+
+
+def brief(text: str, max_chars: int = 150, from_end: bool = False) -> str:
+    """
+    截取片段的简短概要(首尾若干字符),用于给相邻片段提供上下文
+    
+    Args:
+        text: 片段内容
+        max_chars: 概要最大长度
+        from_end: 是否从结尾截取(前文概要取结尾,后文概要取开头)
+    
+    Returns:
+        str: 概要文本
+    """
+    flat = re.sub(r"\s+", " ", text).strip()
+    if len(flat) <= max_chars:
+        return flat
+    return "…" + flat[-max_chars:] if from_end else flat[:max_chars] + "…"
@@ -0,0 +1,85 @@
+"""
+文本行级增量
+
+脚本的相邻版本通常只改动少数段落,按行比较后只保存改动部分。增量为JSON数组,元素依次作用于基准文本:
+    正整数n: 复制基准文本接下来的n行
+    负整数-n: 跳过基准文本接下来的n行
+    字符串s: 插入s(可包含多行)
+"""
+import difflib
+import json
+from typing import List, Union
+
+DeltaOp = Union[int, str]
+
+
+def make_delta(base: str, target: str) -> str:
+    """
+    计算从base到target的增量
+    
+    Args:
+        base: 基准文本
+        target: 目标文本
+    
+    Returns:
+        str: JSON编码的增量
+    """
+    base_lines = base.splitlines(keepends=True)
+    target_lines = target.splitlines(keepends=True)
+    matcher = difflib.SequenceMatcher(None, base_lines, target_lines, autojunk=False)
+    
+    ops: List[DeltaOp] = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append(i2 - i1)
+            continue
+        if i2 > i1:
+            ops.append(i1 - i2)
+        if j2 > j1:
+            ops.append("".join(target_lines[j1:j2]))
+    return json.dumps(ops, ensure_ascii=False, separators=(",", ":"))
+
+
+def apply_delta(base: str, delta: str) -> str:
+    """
+    把增量应用到基准文本
+    
+    Args:
+        base: 基准文本
+        delta: make_delta生成的增量
+    
+    Returns:
+        str: 目标文本
+    
+    Raises:
+        ValueError: 增量与基准文本不匹配
+    """
+    base_lines = base.splitlines(keepends=True)
+    parts: List[str] = []
+    pos = 0
+    for op in json.loads(delta):
+        if isinstance(op, str):
+            parts.append(op)
+        elif op > 0:
+            if pos + op > len(base_lines):
+                raise ValueError("增量与基准文本不匹配")
+            parts.extend(base_lines[pos:pos + op])
+            pos += op
+        else:
+            pos -= op
+    if pos != len(base_lines):
+        raise ValueError("增量与基准文本不匹配")
+    return "".join(parts)
+
+
+def inserted_text(delta: str) -> str:
+    """
+    增量中插入的文本(不含复制的基准行),用于全文搜索
+    
+    Args:
+        delta: make_delta生成的增量
+    
+    Returns:
+        str: 各处插入的文本按顺序拼接
+    """
+    return "".join(op for op in json.loads(delta) if isinstance(op, str))
@@ -0,0 +1,88 @@
+"""
+文本段落/行级差异
+
+先按段落(空行分隔)比较,未改动的段落只记录下标范围;改动的段落块再按行比较。
+结果为紧凑补丁:
+    {"op": "equal", "a": [i1, i2], "b": [j1, j2]}
+    {"op": "insert", "a": [i, i], "b": [j1, j2], "paragraphs": [新增段落, ...]}
+    {"op": "delete", "a": [i1, i2], "b": [j, j], "paragraphs": [删除段落, ...]}
+    {"op": "replace", "a": [i1, i2], "b": [j1, j2], "lines": [["=", 行数], ["-", [删除行]], ["+", [新增行]], ...]}
+其中a/b为两侧的段落下标范围(左闭右开)
+"""
+import difflib
+import re
+from typing import Any, Dict, List
+
+_PARAGRAPH_BREAK = re.compile(r"\n[ \t　]*\n")
+
+
+def split_paragraphs(text: str) -> List[str]:
+    """按空行切分段落,去除段落首尾换行和空段落"""
+    return [p.strip("\r\n") for p in _PARAGRAPH_BREAK.split(text) if p.strip()]
+
+
+def _line_ops(a_lines: List[str], b_lines: List[str]) -> List[List[Any]]:
+    ops = []
+    matcher = difflib.SequenceMatcher(None, a_lines, b_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append(["=", i2 - i1])
+            continue
+        if i2 > i1:
+            ops.append(["-", a_lines[i1:i2]])
+        if j2 > j1:
+            ops.append(["+", b_lines[j1:j2]])
+    return ops
+
+
+def _count_lines(paragraphs: List[str]) -> int:
+    return sum(len(p.splitlines()) for p in paragraphs)
+
+
+def diff_text(a: str, b: str) -> Dict[str, Any]:
+    """
+    计算两段文本的段落/行级差异
+    
+    Args:
+        a: 原文本
+        b: 新文本
+    
+    Returns:
+        Dict: {"stats": 统计, "hunks": 补丁块列表}
+    """
+    a_paragraphs = split_paragraphs(a)
+    b_paragraphs = split_paragraphs(b)
+    stats = {
+        "paragraphs_added": 0,
+        "paragraphs_removed": 0,
+        "paragraphs_changed": 0,
+        "lines_added": 0,
+        "lines_removed": 0
+    }
+    
+    hunks = []
+    matcher = difflib.SequenceMatcher(None, a_paragraphs, b_paragraphs, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        hunk = {"op": tag, "a": [i1, i2], "b": [j1, j2]}
+        if tag == "insert":
+            hunk["paragraphs"] = b_paragraphs[j1:j2]
+            stats["paragraphs_added"] += j2 - j1
+            stats["lines_added"] += _count_lines(hunk["paragraphs"])
+        elif tag == "delete":
+            hunk["paragraphs"] = a_paragraphs[i1:i2]
+            stats["paragraphs_removed"] += i2 - i1
+            stats["lines_removed"] += _count_lines(hunk["paragraphs"])
+        elif tag == "replace":
+            hunk["lines"] = _line_ops(
+                "\n".join(a_paragraphs[i1:i2]).splitlines(),
+                "\n".join(b_paragraphs[j1:j2]).splitlines()
+            )
+            stats["paragraphs_changed"] += max(i2 - i1, j2 - j1)
+            for op, payload in hunk["lines"]:
+                if op == "-":
+                    stats["lines_removed"] += len(payload)
+                elif op == "+":
+                    stats["lines_added"] += len(payload)
+        hunks.append(hunk)
+    
+    return {"stats": stats, "hunks": hunks}
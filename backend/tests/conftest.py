@@ -0,0 +1,93 @@
+"""
+测试公共夹具
+
+数据库测试使用内存SQLite(JSONB按JSON建表),每个测试独立建库
+"""
+import uuid
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+import app.models  # noqa: F401 注册所有模型
+from app.core.config import settings
+from app.core.database import Base
+from app.models.ai_model import AIModelConfig
+from app.models.project import Script, VideoProject
+from app.models.user import User
+
+
+@compiles(JSONB, "sqlite")
+def _compile_jsonb_sqlite(type_, compiler, **kw):
+    return "JSON"
+
+
+@pytest.fixture(autouse=True)
+def no_usage_ledger(monkeypatch):
+    """用量台账使用独立会话写库,测试中关闭"""
+    monkeypatch.setattr(settings, "USAGE_LEDGER_ENABLED", False)
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    
+    @event.listens_for(engine, "connect")
+    def _enable_foreign_keys(dbapi_connection, connection_record):
+        dbapi_connection.execute("PRAGMA foreign_keys=ON")
+    
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    session = Session(bind=engine, autoflush=False)
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def user(db):
+    user = User(username=f"user_{uuid.uuid4().hex[:8]}", password_hash="x")
+    db.add(user)
+    db.commit()
+    return user
+
+
+@pytest.fixture
+def model_config(db, user):
+    config = AIModelConfig(
+        user_id=user.user_id,
+        config_name="测试模型",
+        vendor="tongyi",
+        model_name="qwen-turbo",
+        api_key="sk-test"
+    )
+    db.add(config)
+    db.commit()
+    return config
+
+
+@pytest.fixture
+def project(db, user):
+    project = VideoProject(user_id=user.user_id, project_name="测试项目")
+    db.add(project)
+    db.commit()
+    return project
+
+
+@pytest.fixture
+def script(db, project):
+    script = Script(project_id=project.project_id, version=1, content="第一场\n主角登场", content_length=9)
+    db.add(script)
+    db.commit()
+    return script
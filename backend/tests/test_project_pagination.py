@@ -0,0 +1,52 @@
+"""
+项目列表分页测试
+
+不搜索时按(updated_at, project_id)倒序:cursor为游标分页,只传skip时按偏移取页并返回下一页游标
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.models.project import VideoProject
+from app.services.project_service import ProjectService
+
+
+@pytest.fixture
+def projects(db, user):
+    """按updated_at从新到旧排列的5个项目"""
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    items = [
+        VideoProject(user_id=user.user_id, project_name=f"项目{idx}", updated_at=start - timedelta(hours=idx))
+        for idx in range(5)
+    ]
+    db.add_all(items)
+    db.commit()
+    return [project.project_id for project in items]
+
+
+def _ids(page):
+    return [project.project_id for project in page.items]
+
+
+def test_cursor_pages_cover_all_projects(db, user, projects):
+    first = ProjectService.get_projects(db, user.user_id, limit=2)
+    second = ProjectService.get_projects(db, user.user_id, limit=2, cursor=first.next_cursor)
+    third = ProjectService.get_projects(db, user.user_id, limit=2, cursor=second.next_cursor)
+    
+    assert _ids(first) + _ids(second) + _ids(third) == projects
+    assert third.next_cursor is None
+
+
+def test_skip_without_cursor_uses_offset(db, user, projects):
+    page = ProjectService.get_projects(db, user.user_id, skip=2, limit=2)
+    
+    assert _ids(page) == projects[2:4]
+    rest = ProjectService.get_projects(db, user.user_id, limit=2, cursor=page.next_cursor)
+    assert _ids(rest) == projects[4:]
+
+
+def test_skip_with_cursor_is_rejected(db, user, projects):
+    first = ProjectService.get_projects(db, user.user_id, limit=2)
+    
+    with pytest.raises(ValueError):
+        ProjectService.get_projects(db, user.user_id, skip=2, limit=2, cursor=first.next_cursor)
@@ -0,0 +1,48 @@
+"""
+项目搜索测试
+
+脚本文本的匹配使用快照内容和增量版本插入的纯文本,不匹配增量的JSON编码
+"""
+import pytest
+
+from app.models.project import Script
+from app.services.project_service import ProjectService
+from app.services.script_service import ScriptService
+
+BASE = "".join(f"第{idx}场\n清晨的车站,主角等车,广播播报列车晚点{idx}分钟\n" for idx in range(1, 9))
+REVISED = BASE + "朋友带来一封信\n"
+
+
+@pytest.fixture
+def versions(db, project):
+    """快照版本和相对它保存增量的新版本"""
+    scripts = []
+    for version, content in ((1, BASE), (2, REVISED)):
+        script = Script(project_id=project.project_id, version=version)
+        ScriptService._assign_new_version_content(db, project.project_id, script, content)
+        db.add(script)
+        db.commit()
+        scripts.append(script)
+    assert scripts[1].delta is not None
+    return scripts
+
+
+def _search(db, user, keyword: str):
+    return ProjectService.get_projects(db, user.user_id, search=keyword).items
+
+
+def test_delta_version_stores_inserted_plain_text(versions):
+    assert versions[1].delta_text == "朋友带来一封信\n"
+
+
+def test_matches_text_inserted_by_delta_version(db, user, project, versions):
+    assert [p.project_id for p in _search(db, user, "一封信")] == [project.project_id]
+
+
+def test_matches_lines_carried_from_snapshot(db, user, project, versions):
+    assert [p.project_id for p in _search(db, user, "列车晚点")] == [project.project_id]
+
+
+@pytest.mark.parametrize("keyword", ["16", "[", "16,", '"'])
+def test_delta_encoding_does_not_match(db, user, versions, keyword):
+    assert _search(db, user, keyword) == []
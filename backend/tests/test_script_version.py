@@ -0,0 +1,42 @@
+"""
+脚本版本号分配测试
+
+版本号由项目行上的计数器原子分配:首次使用时从现有最大版本号开始,删除版本后不复用,
+分配版本号不改变项目的updated_at(项目列表按updated_at游标分页)
+"""
+from datetime import datetime, timezone
+
+from app.models.project import Script, VideoProject
+from app.services.script_service import ScriptService
+
+
+def _project_row(db, project) -> VideoProject:
+    db.expire_all()
+    return db.get(VideoProject, project.project_id)
+
+
+def test_counter_starts_after_existing_versions(db, project, script):
+    db.add(Script(project_id=project.project_id, version=5, content="旧版本", content_length=3))
+    db.commit()
+    
+    assert ScriptService._allocate_version(db, project.project_id) == 6
+    assert ScriptService._allocate_version(db, project.project_id) == 7
+
+
+def test_deleted_versions_are_not_reused(db, project, script):
+    assert ScriptService._allocate_version(db, project.project_id) == 2
+    db.delete(script)
+    db.commit()
+    
+    assert ScriptService._allocate_version(db, project.project_id) == 3
+
+
+def test_allocation_keeps_project_updated_at(db, project):
+    updated_at = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    project.updated_at = updated_at
+    db.commit()
+    
+    ScriptService._allocate_version(db, project.project_id)
+    db.commit()
+    
+    assert _project_row(db, project).updated_at.replace(tzinfo=timezone.utc) == updated_at
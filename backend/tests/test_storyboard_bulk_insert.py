@@ -0,0 +1,63 @@
+"""
+分镜批量保存的数据库往返次数测试
+
+StoryboardService._save_generated_storyboards以一条INSERT ... RETURNING保存全部分镜,
+执行的SQL语句数应与分镜数量无关;语句数增长说明保存路径退化成了逐行插入或刷新
+"""
+import json
+from typing import Any, Dict, List
+
+import pytest
+from sqlalchemy import event
+
+from app.models.project import Storyboard
+from app.services.storyboard_service import StoryboardService
+
+
+def _fake_result(count: int) -> Dict[str, Any]:
+    storyboards = [
+        {"sequence_number": idx, "content": f"分镜{idx}", "duration": 3.0}
+        for idx in range(1, count + 1)
+    ]
+    return {"success": True, "text": json.dumps(storyboards, ensure_ascii=False), "usage": {}}
+
+
+@pytest.fixture
+def statements(engine):
+    """记录执行的SQL语句"""
+    executed: List[str] = []
+    
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+    
+    event.listen(engine, "before_cursor_execute", on_execute)
+    yield executed
+    event.remove(engine, "before_cursor_execute", on_execute)
+
+
+def _save(db, script, model_config, statements, count: int) -> int:
+    db.expire_all()
+    statements.clear()
+    result = StoryboardService._save_generated_storyboards(
+        db, script.script_id, model_config, _fake_result(count), script.content
+    )
+    assert result["count"] == count
+    return len(statements)
+
+
+def test_statement_count_independent_of_shot_count(db, script, model_config, statements):
+    small = _save(db, script, model_config, statements, 10)
+    large = _save(db, script, model_config, statements, 100)
+    
+    assert small == large
+    assert db.query(Storyboard).filter(Storyboard.script_id == script.script_id).count() == 100
+
+
+def test_returning_rows_build_response(db, script, model_config):
+    result = StoryboardService._save_generated_storyboards(
+        db, script.script_id, model_config, _fake_result(3), script.content
+    )
+    
+    assert [row.sequence_number for row in result["storyboards"]] == [1, 2, 3]
+    assert [row.content for row in result["storyboards"]] == ["分镜1", "分镜2", "分镜3"]
+    assert all(row.storyboard_id is not None for row in result["storyboards"])
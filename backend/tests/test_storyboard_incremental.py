@@ -0,0 +1,123 @@
+"""
+增量生成分镜的计划和保存测试
+
+完整生成(整篇或分段)的分镜记录来源单元,之后的增量生成只替换内容变化部分的分镜,
+沿用的分镜保留storyboard_id;手动添加的分镜不会因所在组重新生成而被删除
+"""
+import json
+from typing import Any, Dict, List
+
+import pytest
+
+from app.core.config import settings
+from app.models.project import Storyboard
+from app.services.storyboard_service import StoryboardService
+
+SCENES = [
+    "第一场\n主角在清晨出门",
+    "第二场\n主角在街口遇见朋友",
+    "第三场\n两人走进咖啡馆",
+    "第四场\n朋友讲起往事",
+]
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    """每个片段容纳两个场景"""
+    monkeypatch.setattr(settings, "STORYBOARD_CHUNK_CHARS", 30)
+
+
+def _script_text(scenes: List[str]) -> str:
+    return "\n\n".join(scenes)
+
+
+def _result(label: str, shots: int = 2) -> Dict[str, Any]:
+    storyboards = [{"sequence_number": idx, "content": f"{label}-{idx}", "duration": 2.0} for idx in range(1, shots + 1)]
+    return {"success": True, "text": json.dumps(storyboards, ensure_ascii=False), "usage": {}}
+
+
+def _generate_chunked(db, script, model_config, content: str):
+    prompts, sources = StoryboardService._build_chunk_prompts(content)
+    merged = StoryboardService._merge_chunk_results(
+        [_result(f"片段{idx}") for idx in range(len(prompts))], sources
+    )
+    StoryboardService._save_generated_storyboards(db, script.script_id, model_config, merged, content)
+
+
+def _generate_incremental(db, script, model_config, content: str) -> Dict[str, Any]:
+    plan = StoryboardService._plan_incremental(db, script.script_id, content)
+    results = [_result(f"单元{idx}", shots=1) for idx in plan.dirty]
+    return StoryboardService._save_incremental_storyboards(db, script.script_id, model_config, plan, results)
+
+
+def _storyboards(db, script) -> List[Storyboard]:
+    db.expire_all()
+    return db.query(Storyboard).filter(
+        Storyboard.script_id == script.script_id
+    ).order_by(Storyboard.sequence_number).all()
+
+
+def test_chunked_baseline_keeps_unchanged_chunks(db, script, model_config):
+    _generate_chunked(db, script, model_config, _script_text(SCENES))
+    before = _storyboards(db, script)
+    assert [sb.content for sb in before] == ["片段0-1", "片段0-2", "片段1-1", "片段1-2"]
+    assert {sb.source_span for sb in before} == {2}
+    
+    edited = SCENES[:2] + ["第三场\n两人走进书店", SCENES[3]]
+    result = _generate_incremental(db, script, model_config, _script_text(edited))
+    after = _storyboards(db, script)
+    
+    assert result["incremental"]["regenerated_units"] == 2
+    assert [sb.storyboard_id for sb in after[:2]] == [sb.storyboard_id for sb in before[:2]]
+    assert [sb.content for sb in after] == ["片段0-1", "片段0-2", "单元2-1", "单元3-1"]
+    assert [sb.sequence_number for sb in after] == [1, 2, 3, 4]
+
+
+def test_unchanged_script_keeps_everything(db, script, model_config):
+    content = _script_text(SCENES)
+    result = StoryboardService._save_generated_storyboards(
+        db, script.script_id, model_config, _result("整篇", shots=3), content
+    )
+    before = [row.storyboard_id for row in result["storyboards"]]
+    
+    result = _generate_incremental(db, script, model_config, content)
+    
+    assert result["incremental"]["regenerated_units"] == 0
+    assert result["incremental"]["removed"] == 0
+    assert [sb.storyboard_id for sb in _storyboards(db, script)] == before
+
+
+def test_manual_storyboard_survives_regenerated_group(db, script, model_config):
+    _generate_chunked(db, script, model_config, _script_text(SCENES))
+    manual = Storyboard(script_id=script.script_id, sequence_number=5, content="手动镜头", duration=1.0)
+    db.add(manual)
+    db.commit()
+    
+    edited = SCENES[:2] + ["第三场\n两人走进书店", SCENES[3]]
+    _generate_incremental(db, script, model_config, _script_text(edited))
+    
+    after = _storyboards(db, script)
+    assert after[-1].storyboard_id == manual.storyboard_id
+    assert [sb.sequence_number for sb in after] == list(range(1, len(after) + 1))
+
+
+def test_manual_storyboard_moves_when_its_scenes_are_deleted(db, script, model_config):
+    _generate_chunked(db, script, model_config, _script_text(SCENES))
+    manual = Storyboard(script_id=script.script_id, sequence_number=5, content="手动镜头", duration=1.0)
+    db.add(manual)
+    db.commit()
+    
+    result = _generate_incremental(db, script, model_config, _script_text(SCENES[:2]))
+    
+    after = _storyboards(db, script)
+    assert result["incremental"]["removed"] == 2
+    assert [sb.content for sb in after] == ["片段0-1", "片段0-2", "手动镜头"]
+
+
+def test_refuses_without_source_baseline(db, script, model_config):
+    db.add(Storyboard(script_id=script.script_id, sequence_number=1, content="旧分镜", duration=1.0))
+    db.commit()
+    
+    with pytest.raises(ValueError):
+        StoryboardService._plan_incremental(db, script.script_id, _script_text(SCENES))
+    assert len(_storyboards(db, script)) == 1
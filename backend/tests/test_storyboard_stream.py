@@ -0,0 +1,76 @@
+"""
+流式生成分镜的事务测试
+
+删除旧分镜和写入新分镜在同一事务中,只有流正常结束才提交;
+厂商中途报错或客户端断开时回滚,原有分镜保持不变
+"""
+import json
+from typing import List
+
+import pytest
+
+from app.models.project import Storyboard
+from app.services.storyboard_service import StoryboardService
+
+SHOTS = json.dumps([{"content": f"新镜头{idx}", "duration": 2.0} for idx in range(1, 4)], ensure_ascii=False)
+
+
+@pytest.fixture
+def old_storyboards(db, script):
+    storyboards = [
+        Storyboard(script_id=script.script_id, sequence_number=idx, content=f"旧镜头{idx}", duration=1.0)
+        for idx in (1, 2)
+    ]
+    db.add_all(storyboards)
+    db.commit()
+    return [sb.storyboard_id for sb in storyboards]
+
+
+async def _chunks(fail_after: int = None):
+    """按分镜边界输出JSON,fail_after个分镜后模拟厂商报错"""
+    shots = json.loads(SHOTS)
+    yield "["
+    for idx, shot in enumerate(shots):
+        if fail_after is not None and idx == fail_after:
+            raise RuntimeError("厂商连接中断")
+        yield ("," if idx else "") + json.dumps(shot, ensure_ascii=False)
+    yield "]"
+
+
+def _events(db, script, model_config, chunks):
+    return StoryboardService._stream_storyboard_events(
+        db, script.script_id, model_config, object(), chunks,
+        StoryboardService._whole_script_source(script.content)
+    )
+
+
+def _contents(db, script) -> List[str]:
+    db.expire_all()
+    return [
+        sb.content for sb in db.query(Storyboard).filter(
+            Storyboard.script_id == script.script_id
+        ).order_by(Storyboard.sequence_number)
+    ]
+
+
+async def test_completed_stream_replaces_storyboards(db, script, model_config, old_storyboards):
+    events = [event async for event in _events(db, script, model_config, _chunks())]
+    
+    assert events[-1]["event"] == "done"
+    assert _contents(db, script) == ["新镜头1", "新镜头2", "新镜头3"]
+
+
+async def test_vendor_error_keeps_old_storyboards(db, script, model_config, old_storyboards):
+    events = [event async for event in _events(db, script, model_config, _chunks(fail_after=2))]
+    
+    assert [event["event"] for event in events] == ["storyboard", "storyboard", "error"]
+    assert _contents(db, script) == ["旧镜头1", "旧镜头2"]
+
+
+async def test_client_disconnect_keeps_old_storyboards(db, script, model_config, old_storyboards):
+    events = _events(db, script, model_config, _chunks())
+    first = await events.__anext__()
+    await events.aclose()
+    
+    assert first["event"] == "storyboard"
+    assert _contents(db, script) == ["旧镜头1", "旧镜头2"]
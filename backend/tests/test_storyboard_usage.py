@@ -0,0 +1,124 @@
+"""
+分镜生成的用量记账测试
+
+分段生成的每个片段是一次独立的厂商调用,应各自记账并计入实际服务该片段的路由组成员
+"""
+import json
+import uuid
+from typing import Any, Dict, List
+
+import pytest
+
+from app.models.project import Storyboard
+from app.services import usage_service
+from app.services.dashboard_service import DashboardService
+from app.services.storyboard_service import IncrementalPlan, StoryboardService
+
+
+@pytest.fixture
+def ledger(monkeypatch):
+    """记录写入用量台账的调用"""
+    records: List[Dict[str, Any]] = []
+    monkeypatch.setattr(usage_service.usage_ledger, "record", lambda **kwargs: records.append(kwargs))
+    return records
+
+
+def _routing(config_id: uuid.UUID, vendor: str) -> Dict[str, Any]:
+    return {"config_id": str(config_id), "config_name": vendor, "vendor": vendor, "model_name": f"{vendor}-m", "failovers": []}
+
+
+def _chunk_result(idx: int, routing: Dict[str, Any]) -> Dict[str, Any]:
+    text = json.dumps([{"sequence_number": 1, "content": f"片段{idx}", "duration": 2.0}], ensure_ascii=False)
+    return {
+        "success": True,
+        "text": text,
+        "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+        "routing": routing
+    }
+
+
+def test_chunked_generation_books_each_call_to_serving_member(db, script, model_config, ledger):
+    members = [uuid.uuid4(), uuid.uuid4()]
+    results = [
+        _chunk_result(0, _routing(members[0], "tongyi")),
+        _chunk_result(1, _routing(members[1], "zhipu")),
+        _chunk_result(2, _routing(members[1], "zhipu")),
+    ]
+    sources = [{"source_index": idx, "source_hash": f"h{idx}", "source_span": 1} for idx in range(3)]
+    merged = StoryboardService._merge_chunk_results(results, sources)
+    
+    saved = StoryboardService._save_generated_storyboards(db, script.script_id, model_config, merged, script.content)
+    
+    assert saved["count"] == 3
+    assert len(ledger) == 3
+    assert [record["config_id"] for record in ledger] == [members[0], members[1], members[1]]
+    assert [record["vendor"] for record in ledger] == ["tongyi", "zhipu", "zhipu"]
+    assert all(record["usage"]["total_tokens"] == 15 for record in ledger)
+    assert saved["model_info"]["config_id"] == str(members[0])
+
+
+def test_single_call_books_request_config(db, script, model_config, ledger):
+    result = _chunk_result(0, None)
+    del result["routing"]
+    
+    saved = StoryboardService._save_generated_storyboards(db, script.script_id, model_config, result, script.content)
+    
+    assert len(ledger) == 1
+    assert ledger[0]["config_id"] == model_config.config_id
+    assert saved["model_info"] == {"vendor": "tongyi", "model_name": "qwen-turbo"}
+
+
+def test_incremental_generation_books_each_unit_to_serving_member(db, script, model_config, ledger):
+    members = [uuid.uuid4(), uuid.uuid4()]
+    plan = IncrementalPlan(units=["第一场", "第二场"], hashes=["h0", "h1"], kept={}, dirty=[0, 1], removed=[], carried={})
+    results = [_chunk_result(0, _routing(members[1], "zhipu")), _chunk_result(1, _routing(members[0], "tongyi"))]
+    
+    saved = StoryboardService._save_incremental_storyboards(db, script.script_id, model_config, plan, results)
+    
+    assert saved["count"] == 2
+    assert [record["config_id"] for record in ledger] == [members[1], members[0]]
+    assert saved["model_info"]["vendor"] == "zhipu"
+
+
+class _StreamingAdapter:
+    """按片段输出分镜JSON,结束后记录实际输出的路由组成员"""
+    
+    def __init__(self, text: str, routing: Dict[str, Any]):
+        self.text = text
+        self.routing = routing
+        self.last_routing = None
+    
+    async def astream_generate(self, prompt: str, **params):
+        for start in range(0, len(self.text), 7):
+            yield self.text[start:start + 7]
+        self.last_routing = self.routing
+
+
+async def test_streamed_generation_saves_sources_and_books_serving_member(
+    db, script, model_config, ledger, monkeypatch
+):
+    stale = []
+    monkeypatch.setattr(
+        DashboardService, "mark_stale", staticmethod(lambda db, **kwargs: stale.append(kwargs))
+    )
+    member = uuid.uuid4()
+    text = json.dumps([{"content": f"镜头{idx}", "duration": 2.0} for idx in range(1, 4)], ensure_ascii=False)
+    adapter = _StreamingAdapter(text, _routing(member, "zhipu"))
+    
+    events = [
+        event async for event in StoryboardService._stream_storyboard_events(
+            db,
+            script.script_id,
+            model_config,
+            adapter,
+            adapter.astream_generate("prompt"),
+            StoryboardService._whole_script_source(script.content)
+        )
+    ]
+    
+    assert events[-1] == {"event": "done", "data": {"count": 3}}
+    assert stale == [{"script_ids": [script.script_id]}]
+    assert [record["config_id"] for record in ledger] == [member]
+    saved = db.query(Storyboard).filter(Storyboard.script_id == script.script_id).all()
+    assert len(saved) == 3
+    assert all(sb.source_hash and sb.source_index == 0 for sb in saved)
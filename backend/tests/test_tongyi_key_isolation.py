@@ -0,0 +1,153 @@
+"""
+通义适配器并发密钥隔离测试
+
+多个租户(各自的API Key)的同步、流式和异步调用在同一进程内并发执行,
+断言每个发出的请求都携带发起调用的租户自己的密钥,且不写入dashscope.api_key
+"""
+import asyncio
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import dashscope
+import httpx
+import pytest
+
+from app.services.ai_adapters import tongyi
+from app.services.ai_adapters.tongyi import TongyiAdapter
+
+TENANTS = 16
+CALLS_PER_TENANT = 8
+
+
+def _tenant_key(tenant: int) -> str:
+    return f"sk-tenant-{tenant:02d}"
+
+
+def _tenant_of(prompt: str) -> int:
+    return int(prompt.split(":", 1)[1])
+
+
+def _message_response(content: str):
+    return SimpleNamespace(
+        status_code=200,
+        output=SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=SimpleNamespace(input_tokens=1, output_tokens=1, total_tokens=2)
+        )
+    )
+
+
+@pytest.fixture
+def fake_generation(monkeypatch):
+    """替换Generation.call,记录每个请求的(发起租户, 携带的密钥)"""
+    seen = []
+    lock = threading.Lock()
+    
+    def call(model, messages=None, prompt=None, api_key=None, stream=False, **kwargs):
+        tenant = _tenant_of(messages[-1]["content"])
+        # 让不同线程的调用交错执行
+        time.sleep(random.uniform(0, 0.003))
+        with lock:
+            seen.append((tenant, api_key))
+        if stream:
+            return iter([_message_response(api_key[:5]), _message_response(api_key[5:])])
+        return _message_response(api_key)
+    
+    monkeypatch.setattr(tongyi.Generation, "call", staticmethod(call))
+    monkeypatch.setattr(dashscope, "api_key", None)
+    return seen
+
+
+@pytest.fixture
+def fake_transport(monkeypatch):
+    """替换异步HTTP客户端,记录每个请求的(发起租户, Authorization头中的密钥)"""
+    seen = []
+    
+    async def handler(request: httpx.Request) -> httpx.Response:
+        payload = json.loads(request.content)
+        tenant = _tenant_of(payload["input"]["messages"][-1]["content"])
+        api_key = request.headers["Authorization"].removeprefix("Bearer ")
+        await asyncio.sleep(random.uniform(0, 0.003))
+        seen.append((tenant, api_key))
+        if request.headers.get("X-DashScope-SSE") == "enable":
+            body = "".join(
+                "data:" + json.dumps({"output": {"choices": [{"message": {"content": part}}]}}) + "\n\n"
+                for part in (api_key[:5], api_key[5:])
+            )
+            return httpx.Response(200, text=body, headers={"Content-Type": "text/event-stream"})
+        return httpx.Response(200, json={
+            "output": {"choices": [{"message": {"content": api_key}}]},
+            "usage": {"input_tokens": 1, "output_tokens": 1, "total_tokens": 2}
+        })
+    
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(tongyi, "get_async_client", lambda: client)
+    monkeypatch.setattr(dashscope, "api_key", None)
+    return seen
+
+
+def _adapter(tenant: int) -> TongyiAdapter:
+    return TongyiAdapter(api_key=_tenant_key(tenant), model_name="qwen-turbo")
+
+
+def _assert_isolated(seen):
+    assert len(seen) == TENANTS * CALLS_PER_TENANT
+    leaked = [(tenant, key) for tenant, key in seen if key != _tenant_key(tenant)]
+    assert not leaked
+    assert dashscope.api_key is None
+
+
+def test_sync_calls_use_own_key(fake_generation):
+    def run(job):
+        tenant, call = job
+        adapter = _adapter(tenant)
+        if call % 2:
+            return tenant, "".join(adapter.stream_generate(f"tenant:{tenant}"))
+        return tenant, adapter.generate_text(f"tenant:{tenant}", use_cache=False)["text"]
+    
+    jobs = [(tenant, call) for call in range(CALLS_PER_TENANT) for tenant in range(TENANTS)]
+    random.shuffle(jobs)
+    with ThreadPoolExecutor(max_workers=32) as executor:
+        results = list(executor.map(run, jobs))
+    
+    assert all(text == _tenant_key(tenant) for tenant, text in results)
+    _assert_isolated(fake_generation)
+
+
+async def test_async_calls_use_own_key(fake_transport):
+    async def run(tenant: int, call: int):
+        adapter = _adapter(tenant)
+        if call % 2:
+            chunks = [chunk async for chunk in adapter.astream_generate(f"tenant:{tenant}")]
+            return tenant, "".join(chunks)
+        result = await adapter.agenerate_text(f"tenant:{tenant}", use_cache=False)
+        return tenant, result["text"]
+    
+    jobs = [(tenant, call) for call in range(CALLS_PER_TENANT) for tenant in range(TENANTS)]
+    random.shuffle(jobs)
+    results = await asyncio.gather(*(run(tenant, call) for tenant, call in jobs))
+    
+    assert all(text == _tenant_key(tenant) for tenant, text in results)
+    _assert_isolated(fake_transport)
+
+
+async def test_mixed_sync_and_async_calls_use_own_key(fake_generation, fake_transport):
+    """线程池中的同步调用与事件循环中的异步调用同时进行"""
+    def run_sync(tenant: int):
+        return _adapter(tenant).generate_text(f"tenant:{tenant}", use_cache=False)["text"]
+    
+    async def run_async(tenant: int):
+        return (await _adapter(tenant).agenerate_text(f"tenant:{tenant}", use_cache=False))["text"]
+    
+    tenants = [tenant for _ in range(CALLS_PER_TENANT // 2) for tenant in range(TENANTS)]
+    results = await asyncio.gather(
+        *(asyncio.to_thread(run_sync, tenant) for tenant in tenants),
+        *(run_async(tenant) for tenant in tenants)
+    )
+    
+    assert results == [_tenant_key(tenant) for tenant in tenants] * 2
+    _assert_isolated(fake_generation + fake_transport)
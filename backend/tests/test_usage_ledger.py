@@ -0,0 +1,85 @@
+"""
+用量台账记账测试
+
+命中响应缓存的结果没有厂商调用:只计请求数和缓存命中数,不计缓存中原调用的token和重试,
+记账的配置为本次实际返回缓存结果的路由组成员
+"""
+import uuid
+
+import pytest
+
+from app.core.config import settings
+from app.services.ai_adapters import cache
+from app.services.usage_service import UsageLedger
+
+USAGE = {"prompt_tokens": 100, "completion_tokens": 50, "total_tokens": 150, "retries": 2}
+
+
+@pytest.fixture
+def ledger(monkeypatch):
+    """不启动后台刷写线程的台账"""
+    monkeypatch.setattr(settings, "USAGE_LEDGER_ENABLED", True)
+    ledger = UsageLedger(flush_interval=3600, max_records=1000)
+    monkeypatch.setattr(ledger, "_ensure_worker", lambda: None)
+    return ledger
+
+
+def _counters(ledger: UsageLedger):
+    assert len(ledger._buffer) == 1
+    return next(iter(ledger._buffer.values()))
+
+
+def test_vendor_call_books_tokens_and_retries(ledger):
+    ledger.record(uuid.uuid4(), "script", "tongyi", "qwen-turbo", USAGE)
+    
+    counters = _counters(ledger)
+    assert counters["request_count"] == 1
+    assert counters["cached_count"] == 0
+    assert counters["total_tokens"] == 150
+    assert counters["retry_count"] == 2
+
+
+def test_cache_hit_books_only_request(ledger):
+    ledger.record(uuid.uuid4(), "script", "tongyi", "qwen-turbo", USAGE, cached=True)
+    
+    counters = _counters(ledger)
+    assert counters["request_count"] == 1
+    assert counters["cached_count"] == 1
+    assert counters["prompt_tokens"] == counters["completion_tokens"] == counters["total_tokens"] == 0
+    assert counters["retry_count"] == 0
+
+
+class _DictCache:
+    def __init__(self):
+        self.entries = {}
+    
+    def get(self, key):
+        return self.entries.get(key)
+    
+    def set(self, key, value):
+        self.entries[key] = value
+
+
+class _Adapter:
+    vendor = "tongyi"
+    model_name = "qwen-turbo"
+    config = {"cache_enabled": True}
+    
+    @cache.cached_generation
+    def generate_text(self, prompt, **kwargs):
+        return {"success": True, "text": "ok", "usage": USAGE, "routing": {"config_id": "stale"}}
+
+
+def test_cached_results_do_not_carry_call_routing(monkeypatch):
+    store = _DictCache()
+    monkeypatch.setattr(cache, "llm_response_cache", store)
+    adapter = _Adapter()
+    
+    first = adapter.generate_text("prompt")
+    hit = adapter.generate_text("prompt")
+    
+    assert "cached" not in first
+    assert all("routing" not in entry for entry in store.entries.values())
+    assert hit["cached"] is True
+    assert "routing" not in hit
+    assert hit["usage"] == USAGE
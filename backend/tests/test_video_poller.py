@@ -0,0 +1,121 @@
+"""
+视频轮询器测试
+
+Redis、数据库和Celery投递是同步调用,轮询器把它们放到线程中执行:
+单个慢调用期间事件循环仍能推进其他任务的状态查询
+"""
+import asyncio
+import json
+import time
+
+import pytest
+
+from app.services import video_poller as poller_module
+from app.services.video_poller import VideoPoller
+
+# 模拟慢Redis/数据库的单次阻塞时长
+BLOCK = 0.2
+
+
+class _SlowPipeline:
+    def __init__(self, client):
+        self.client = client
+    
+    def hset(self, key, field, value):
+        self.client.jobs[field] = value
+    
+    def zadd(self, key, mapping):
+        self.client.due.update(mapping)
+    
+    def zrem(self, key, member):
+        self.client.due.pop(member, None)
+    
+    def hdel(self, key, field):
+        self.client.jobs.pop(field, None)
+    
+    def execute(self):
+        time.sleep(BLOCK)
+
+
+class _SlowRedis:
+    """每次调用都阻塞BLOCK秒的Redis替身"""
+    
+    def __init__(self, jobs):
+        self.jobs = {job["task_id"]: json.dumps(job) for job in jobs}
+        self.due = {job["task_id"]: 0 for job in jobs}
+    
+    def register_script(self, script):
+        def claim(keys, args):
+            time.sleep(BLOCK)
+            return list(self.due)
+        return claim
+    
+    def hmget(self, key, ids):
+        time.sleep(BLOCK)
+        return [self.jobs.get(task_id) for task_id in ids]
+    
+    def pipeline(self):
+        return _SlowPipeline(self)
+
+
+class _Adapter:
+    async def acheck_status(self, vendor_task_id):
+        await asyncio.sleep(0.01)
+        if vendor_task_id == "done":
+            return {"success": True, "status": "completed", "video_url": "http://example/v.mp4"}
+        return {"success": True, "status": "processing", "progress": 40}
+
+
+def _job(task_id: str, vendor_task_id: str):
+    now = time.time()
+    return {
+        "task_id": task_id,
+        "vendor_task_id": vendor_task_id,
+        "config_id": "config",
+        "storyboard_id": "storyboard",
+        "submitted_at": now,
+        "expected_seconds": 60,
+        "deadline": now + 600,
+        "progress": 0,
+        "polls": 0
+    }
+
+
+@pytest.fixture
+def slow_backends(monkeypatch):
+    client = _SlowRedis([_job("t1", "done"), _job("t2", "running")])
+    sent = []
+    
+    def load_adapters(config_ids):
+        time.sleep(BLOCK)
+        return {"config": _Adapter()}
+    
+    monkeypatch.setattr(poller_module, "get_redis", lambda: client)
+    monkeypatch.setattr(VideoPoller, "_load_adapters", staticmethod(load_adapters))
+    monkeypatch.setattr(poller_module.celery_app, "send_task", lambda name, args: sent.append((name, args)))
+    return client, sent
+
+
+async def test_poll_once_does_not_block_event_loop(slow_backends):
+    client, sent = slow_backends
+    gaps = []
+    stop = asyncio.Event()
+    
+    async def heartbeat():
+        last = time.monotonic()
+        while not stop.is_set():
+            await asyncio.sleep(0.01)
+            now = time.monotonic()
+            gaps.append(now - last)
+            last = now
+    
+    ticker = asyncio.create_task(heartbeat())
+    processed = await VideoPoller().poll_once(asyncio.Semaphore(4))
+    stop.set()
+    await ticker
+    
+    assert processed == 2
+    assert max(gaps) < BLOCK / 2
+    assert [args[0] for _, args in sent] == ["t1"]
+    assert "t1" not in client.jobs
+    assert json.loads(client.jobs["t2"])["progress"] == 40
@@ -0,0 +1,5 @@
+"""
+厂商接口离线替身和适配器基准测试
+
+不消耗真实配额,在本机对适配器和生成服务做压测
+"""
@@ -0,0 +1,140 @@
+"""
+项目搜索基准
+
+在回滚的事务中为一个临时用户批量生成项目(默认10万个)和部分项目的脚本,然后对若干关键词
+执行ProjectService.get_projects搜索,报告耗时分位数、命中数和查询计划中是否使用了pg_trgm索引。
+需要PostgreSQL并已执行alembic迁移(pg_trgm扩展和索引);数据库中的数据不会被修改
+
+示例:
+    python -m tools.benchmarks.bench_project_search
+    python -m tools.benchmarks.bench_project_search --projects 20000 --repeat 50 --term 彗星计划 --explain
+"""
+import argparse
+import json
+import time
+import uuid
+from typing import Any, Dict, List
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.database import engine
+from app.models.project import VideoProject
+from app.models.user import User
+from app.services.project_service import ProjectService
+
+NAME_WORDS = ["星际", "旅行", "都市", "悬疑", "喜剧", "校园", "古风", "科幻", "Alpha", "Nova", "Echo", "日常", "冒险", "回忆"]
+SYNOPSIS_WORDS = ["少年", "侦探", "宇航员", "咖啡馆", "雨夜", "港口", "实验室", "旧照片", "列车", "告别", "重逢", "秘密"]
+# 稀有关键词(约千分之一的项目名称包含)和只出现在脚本中的关键词
+RARE_TERM = "彗星计划"
+SCRIPT_TERM = "灯塔守望者"
+DEFAULT_TERMS = [RARE_TERM, "侦探", "Nova", SCRIPT_TERM, "不存在的关键词"]
+
+
+def seed(db: Session, user_id: uuid.UUID, projects: int, script_ratio: float):
+    """生成测试数据(在调用方的事务中)"""
+    db.add(User(user_id=user_id, username=f"bench_{user_id.hex[:8]}", password_hash="x"))
+    db.flush()
+    db.execute(
+        text(
+            "INSERT INTO video_projects (project_id, user_id, project_name, story_synopsis, status, "
+            "workflow_graph, script_version_seq, created_at, updated_at) "
+            "SELECT gen_random_uuid(), :user_id, "
+            "  CASE WHEN g % 1000 = 0 THEN :rare || ' ' ELSE '' END "
+            "  || (:names)[1 + (g * 7) % cardinality(:names)] || (:names)[1 + (g * 13) % cardinality(:names)] || ' #' || g, "
+            "  (:words)[1 + (g * 5) % cardinality(:words)] || '和' || (:words)[1 + (g * 11) % cardinality(:words)] || '的故事', "
+            "  'draft', '{}'::jsonb, 1, now() - g * interval '1 second', now() - g * interval '1 second' "
+            "FROM generate_series(1, :projects) AS g"
+        ),
+        {"user_id": user_id, "rare": RARE_TERM, "names": NAME_WORDS, "words": SYNOPSIS_WORDS, "projects": projects}
+    )
+    db.execute(
+        text(
+            "INSERT INTO scripts (script_id, project_id, version, content, content_length, is_approved, created_at) "
+            "SELECT gen_random_uuid(), project_id, 1, content, length(content), false, now() FROM ("
+            "  SELECT project_id, repeat(story_synopsis || E'\\n', 30) "
+            "    || CASE WHEN random() < 0.001 THEN :script_term ELSE '' END AS content "
+            "  FROM video_projects WHERE user_id = :user_id AND random() < :ratio"
+            ") AS s"
+        ),
+        {"user_id": user_id, "script_term": SCRIPT_TERM, "ratio": script_ratio}
+    )
+    db.execute(text("ANALYZE video_projects"))
+    db.execute(text("ANALYZE scripts"))
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def explain(db: Session, user_id: uuid.UUID, term: str) -> str:
+    condition, rank = ProjectService._search_clauses(db, term)
+    query = db.query(VideoProject).filter(VideoProject.user_id == user_id, condition).order_by(
+        rank.desc(), VideoProject.updated_at.desc()
+    ).limit(50)
+    compiled = query.statement.compile(dialect=db.get_bind().dialect)
+    params = {key: str(value) if isinstance(value, uuid.UUID) else value for key, value in compiled.params.items()}
+    rows = db.connection().exec_driver_sql(f"EXPLAIN (ANALYZE, BUFFERS) {compiled}", params).all()
+    return "\n".join(row[0] for row in rows)
+
+
+def run(projects: int, script_ratio: float, terms: List[str], repeat: int, show_plan: bool) -> List[Dict[str, Any]]:
+    results = []
+    with engine.connect() as connection:
+        if connection.dialect.name != "postgresql":
+            raise SystemExit("项目搜索基准需要PostgreSQL")
+        transaction = connection.begin()
+        try:
+            db = Session(bind=connection, join_transaction_mode="create_savepoint")
+            user_id = uuid.uuid4()
+            started = time.perf_counter()
+            seed(db, user_id, projects, script_ratio)
+            print(f"生成{projects}个项目耗时 {time.perf_counter() - started:.1f}s")
+            
+            for term in terms:
+                ProjectService.get_projects(db, user_id, search=term)  # 预热
+                latencies = []
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    found = ProjectService.get_projects(db, user_id, search=term).items
+                    latencies.append((time.perf_counter() - started) * 1000)
+                plan = explain(db, user_id, term)
+                results.append({
+                    "term": term,
+                    "hits": len(found),
+                    "p50_ms": round(percentile(latencies, 50), 2),
+                    "p95_ms": round(percentile(latencies, 95), 2),
+                    "trgm_index": "_trgm" in plan,
+                    "plan": plan if show_plan else None
+                })
+            db.close()
+        finally:
+            transaction.rollback()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="项目搜索基准")
+    parser.add_argument("--projects", type=int, default=100000)
+    parser.add_argument("--script-ratio", type=float, default=0.2, help="带脚本的项目比例")
+    parser.add_argument("--term", action="append", help="搜索关键词,可重复;默认内置一组")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--explain", action="store_true", help="输出查询计划")
+    parser.add_argument("--json", action="store_true", help="以JSON输出结果")
+    args = parser.parse_args()
+    
+    results = run(args.projects, args.script_ratio, args.term or DEFAULT_TERMS, args.repeat, args.explain)
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return
+    
+    print(f"{'关键词':<16}{'命中':>6}{'p50(ms)':>10}{'p95(ms)':>10}{'trgm索引':>10}")
+    for row in results:
+        print(f"{row['term']:<16}{row['hits']:>6}{row['p50_ms']:>10}{row['p95_ms']:>10}{str(row['trgm_index']):>10}")
+        if row["plan"]:
+            print(row["plan"])
+
+
+if __name__ == "__main__":
+    main()
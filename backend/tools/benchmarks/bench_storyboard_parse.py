@@ -0,0 +1,161 @@
+"""
+分镜解析微基准
+
+对语料库(corpus/storyboard_outputs.jsonl)中的每条大模型输出,比较旧解析逻辑
+(去除代码块标记后整体json.loads,失败时按编号行解析)与当前StoryboardService._parse_storyboards
+恢复的分镜数和单次解析耗时;当前解析器分别使用orjson(已安装时)和标准库json测试
+
+示例:
+    python -m tools.benchmarks.bench_storyboard_parse
+    python -m tools.benchmarks.bench_storyboard_parse --case long_200 --number 2000
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from app.services.storyboard_service import StoryboardService
+from app.utils import json_stream
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), "corpus", "storyboard_outputs.jsonl")
+
+
+def legacy_parse(text: str) -> List[Dict[str, Any]]:
+    """旧版解析逻辑,用于对比"""
+    try:
+        text = re.sub(r'```json\s*', '', text)
+        text = re.sub(r'```\s*$', '', text)
+        text = text.strip()
+        storyboards = json.loads(text)
+        if not isinstance(storyboards, list):
+            raise ValueError("分镜数据应该是数组格式")
+        return [
+            {
+                "sequence_number": sb.get("sequence_number", idx),
+                "content": str(sb.get("content", "")).strip(),
+                "duration": float(sb.get("duration", 5.0))
+            }
+            for idx, sb in enumerate(storyboards, 1)
+            if isinstance(sb, dict)
+        ]
+    except json.JSONDecodeError:
+        storyboards = []
+        current_sb = None
+        for line in text.strip().split('\n'):
+            line = line.strip()
+            if not line:
+                continue
+            match = re.match(r'^(\d+)[\.、]\s*(.+)', line)
+            if match:
+                if current_sb:
+                    storyboards.append(current_sb)
+                current_sb = {"sequence_number": int(match.group(1)), "content": match.group(2), "duration": 5.0}
+            elif current_sb:
+                current_sb["content"] += " " + line
+        if current_sb:
+            storyboards.append(current_sb)
+        if not storyboards:
+            raise ValueError("无法解析分镜内容")
+        return storyboards
+
+
+def load_corpus(path: str, case: Optional[str] = None) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        cases = [json.loads(line) for line in f if line.strip()]
+    if case:
+        cases = [c for c in cases if c["id"] == case]
+        if not cases:
+            raise SystemExit(f"语料库中没有 {case}")
+    return cases
+
+
+def measure(parse: Callable[[str], List[Dict[str, Any]]], text: str, number: int) -> Dict[str, Any]:
+    """返回恢复的分镜数、是否保留了时长以及单次耗时(微秒)"""
+    try:
+        storyboards = parse(text)
+    except ValueError:
+        return {"count": 0, "durations": False, "us": None}
+    
+    started = time.perf_counter()
+    for _ in range(number):
+        try:
+            parse(text)
+        except ValueError:
+            pass
+    elapsed = time.perf_counter() - started
+    return {
+        "count": len(storyboards),
+        "durations": any(sb["duration"] != 5.0 for sb in storyboards),
+        "us": round(elapsed / number * 1e6, 1)
+    }
+
+
+def run(cases: List[Dict[str, Any]], number: int) -> List[Dict[str, Any]]:
+    backends = [("stdlib", json.loads)]
+    if json_stream.JSON_BACKEND != "json":
+        backends.append((json_stream.JSON_BACKEND, json_stream.fast_loads))
+    default_loads = json_stream.fast_loads
+    
+    rows = []
+    try:
+        for case in cases:
+            # 长输出减少重复次数,使每条用例耗时相近
+            repeat = max(1, number * 2000 // max(2000, len(case["text"])))
+            row = {
+                "id": case["id"],
+                "vendor": case["vendor"],
+                "chars": len(case["text"]),
+                "expected": case["expected"],
+                "legacy": measure(legacy_parse, case["text"], repeat)
+            }
+            for name, loads in backends:
+                json_stream.fast_loads = loads
+                row[name] = measure(StoryboardService._parse_storyboards, case["text"], repeat)
+            rows.append(row)
+    finally:
+        json_stream.fast_loads = default_loads
+    return rows
+
+
+def print_rows(rows: List[Dict[str, Any]]):
+    columns = [key for key in rows[0] if isinstance(rows[0][key], dict)]
+    header = f"{'用例':<24}{'字符':>8}{'期望':>6}" + "".join(f"{name + ' 数量/耗时(us)':>26}" for name in columns)
+    print(header)
+    for row in rows:
+        cells = ""
+        for name in columns:
+            result = row[name]
+            mark = "" if result["count"] == row["expected"] else "!"
+            cells += f"{mark + str(result['count']):>12}{str(result['us']):>14}"
+        print(f"{row['id']:<24}{row['chars']:>8}{row['expected']:>6}{cells}")
+    
+    failed = sum(1 for row in rows if row["legacy"]["count"] < row["expected"])
+    recovered = sum(
+        1 for row in rows
+        if row["legacy"]["count"] < row["expected"] and row[columns[-1]]["count"] >= row["expected"]
+    )
+    print(f"\n旧解析器未能完整解析 {failed}/{len(rows)} 条,当前解析器恢复其中 {recovered} 条 (JSON后端: {json_stream.JSON_BACKEND})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分镜解析微基准")
+    parser.add_argument("--corpus", default=CORPUS_PATH)
+    parser.add_argument("--case", help="只运行指定用例")
+    parser.add_argument("--number", type=int, default=500, help="短输出的重复解析次数")
+    parser.add_argument("--json", action="store_true", help="以JSON输出结果")
+    args = parser.parse_args()
+    
+    # 截断用例每次解析都会记录警告
+    logging.getLogger("app.services.storyboard_service").setLevel(logging.ERROR)
+    rows = run(load_corpus(args.corpus, args.case), args.number)
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+    else:
+        print_rows(rows)
+
+
+if __name__ == "__main__":
+    main()
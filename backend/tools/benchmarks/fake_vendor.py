@@ -0,0 +1,446 @@
+"""
+厂商接口离线替身服务器
+
+模拟通义千问、智谱AI、百度千帆的对话接口(含SSE流式),Stable Diffusion的文生图/图生图接口,
+以及可灵的视频提交和状态查询接口。延迟按指定分布采样,可按比例注入429、500和超时。
+
+各厂商的api_endpoint指向对应前缀即可:
+    通义千问        http://127.0.0.1:9000/tongyi
+    智谱AI          http://127.0.0.1:9000/zhipu
+    百度千帆        http://127.0.0.1:9000/baidu
+    Stable Diffusion http://127.0.0.1:9000/sd
+    可灵            http://127.0.0.1:9000/keling
+
+文本适配器的同步接口经由厂商SDK,不经过api_endpoint,压测文本模型请使用异步接口。
+
+运行:
+    python -m tools.benchmarks.fake_vendor --port 9000 --latency lognormal:0.8,0.5 --error-429 0.05
+
+运行中可通过 POST /_control 修改配置,GET /_stats 查看各接口的请求计数
+"""
+import argparse
+import asyncio
+import base64
+import json
+import math
+import os
+import random
+import time
+import uuid
+from collections import Counter
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+DEFAULTS: Dict[str, Any] = {
+    "latency": "lognormal:0.8,0.5",  # 非流式响应/流式首包延迟
+    "stream_chunks": 20,  # 流式响应的片段数
+    "stream_chunk_delay": "fixed:0.03",  # 流式片段间隔
+    "error_429": 0.0,  # 返回429的比例
+    "error_500": 0.0,  # 返回500的比例
+    "timeout_rate": 0.0,  # 挂起不响应的比例
+    "timeout_seconds": 600.0,  # 挂起时长(应大于客户端读取超时)
+    "reply_chars": 800,  # 普通文本回复长度
+    "storyboards_per_reply": 8,  # 分镜回复中的分镜数
+    "image_bytes": 200_000,  # 单张生成图像的字节数
+    "video_seconds": 30.0,  # 视频任务从提交到完成的时长
+    "video_failure_rate": 0.0,  # 视频任务失败的比例
+    "video_bytes": 1_000_000,  # 生成视频文件的字节数
+}
+
+
+def sample_delay(spec: str) -> float:
+    """
+    按分布描述采样延迟(秒)
+    
+    支持 fixed:v / uniform:a,b / normal:mean,std / lognormal:median,sigma / exp:mean,
+    单独的数字等同于fixed
+    """
+    try:
+        return max(0.0, float(spec))
+    except ValueError:
+        pass
+    name, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",") if v.strip()] if params else []
+    if name == "fixed":
+        delay = values[0] if values else 0.0
+    elif name == "uniform":
+        delay = random.uniform(values[0], values[1])
+    elif name == "normal":
+        delay = random.gauss(values[0], values[1])
+    elif name == "lognormal":
+        delay = random.lognormvariate(math.log(values[0]), values[1])
+    elif name == "exp":
+        delay = random.expovariate(1 / values[0])
+    else:
+        raise ValueError(f"未知的延迟分布: {spec}")
+    return max(0.0, delay)
+
+
+class FakeVendorState:
+    """替身服务器的运行时配置、统计和视频任务"""
+    
+    def __init__(self, **overrides):
+        self.config = {**DEFAULTS, **overrides}
+        self.stats: Counter = Counter()
+        self.videos: Dict[str, Dict[str, Any]] = {}
+    
+    def count(self, route: str, status: int):
+        self.stats[f"{route} {status}"] += 1
+
+
+state = FakeVendorState()
+app = FastAPI(title="Fake AI vendor")
+
+
+# ---------------------------------------------------------------------------
+# 公共部分
+# ---------------------------------------------------------------------------
+
+_ERROR_BODIES = {
+    "tongyi": {
+        429: {"code": "Throttling.RateQuota", "message": "Requests rate limit exceeded"},
+        500: {"code": "InternalError", "message": "Internal server error"},
+    },
+    "zhipu": {
+        429: {"error": {"code": "1302", "message": "rate limit reached"}},
+        500: {"error": {"code": "500", "message": "internal error"}},
+    },
+    "baidu": {
+        429: {"error_code": 18, "error_msg": "Open api qps request limit reached"},
+        500: {"error_code": 336000, "error_msg": "Internal error"},
+    },
+}
+
+
+async def inject_fault(vendor: str, route: str) -> Optional[Response]:
+    """按配置的比例注入超时/429/500,返回None表示正常处理"""
+    config = state.config
+    roll = random.random()
+    if roll < config["timeout_rate"]:
+        await asyncio.sleep(config["timeout_seconds"])
+        state.count(route, 504)
+        return JSONResponse({"message": "gateway timeout"}, status_code=504)
+    roll -= config["timeout_rate"]
+    
+    for status in (429, 500):
+        rate = config[f"error_{status}"]
+        if roll < rate:
+            state.count(route, status)
+            body = _ERROR_BODIES.get(vendor, {}).get(status, {"message": f"injected {status}"})
+            # 千帆的业务错误通过HTTP 200返回
+            return JSONResponse(body, status_code=200 if vendor == "baidu" else status)
+        roll -= rate
+    return None
+
+
+def _prompt_text(messages: List[Dict[str, Any]]) -> str:
+    return "\n".join(str(m.get("content", "")) for m in messages or [])
+
+
+def fake_reply(prompt: str, system: str = "") -> str:
+    """分镜请求返回JSON数组,其他请求返回定长文本"""
+    if "分镜" in prompt or "分镜" in system:
+        count = state.config["storyboards_per_reply"]
+        return json.dumps(
+            [
+                {"sequence_number": i, "content": f"镜头{i}:人物在场景中行动,镜头缓慢推进。", "duration": 4.0}
+                for i in range(1, count + 1)
+            ],
+            ensure_ascii=False
+        )
+    unit = "清晨的街道上,主角推开咖啡馆的门,阳光洒在木质地板上。"
+    chars = state.config["reply_chars"]
+    return (unit * (chars // len(unit) + 1))[:chars]
+
+
+def _usage(prompt: str, reply: str) -> Dict[str, int]:
+    prompt_tokens, completion_tokens = len(prompt), len(reply)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens
+    }
+
+
+def _split(text: str, parts: int) -> List[str]:
+    size = max(1, math.ceil(len(text) / max(1, parts)))
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+async def _sse(events: List[Dict[str, Any]], done: bool = False) -> AsyncIterator[bytes]:
+    await asyncio.sleep(sample_delay(state.config["latency"]))
+    for idx, event in enumerate(events):
+        if idx:
+            await asyncio.sleep(sample_delay(state.config["stream_chunk_delay"]))
+        yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode()
+    if done:
+        yield b"data: [DONE]\n\n"
+
+
+# ---------------------------------------------------------------------------
+# 通义千问
+# ---------------------------------------------------------------------------
+
+@app.post("/tongyi/services/aigc/text-generation/generation")
+async def tongyi_generation(request: Request):
+    route = "tongyi.generation"
+    fault = await inject_fault("tongyi", route)
+    if fault:
+        return fault
+    
+    body = await request.json()
+    messages = body.get("input", {}).get("messages", [])
+    prompt = _prompt_text(messages)
+    reply = fake_reply(prompt)
+    usage = _usage(prompt, reply)
+    tongyi_usage = {
+        "input_tokens": usage["prompt_tokens"],
+        "output_tokens": usage["completion_tokens"],
+        "total_tokens": usage["total_tokens"]
+    }
+    state.count(route, 200)
+    
+    if request.headers.get("X-DashScope-SSE") == "enable":
+        events = [
+            {"output": {"choices": [{"message": {"role": "assistant", "content": piece}}]}, "usage": tongyi_usage}
+            for piece in _split(reply, state.config["stream_chunks"])
+        ]
+        return StreamingResponse(_sse(events), media_type="text/event-stream")
+    
+    await asyncio.sleep(sample_delay(state.config["latency"]))
+    return {
+        "output": {"choices": [{"finish_reason": "stop", "message": {"role": "assistant", "content": reply}}]},
+        "usage": tongyi_usage,
+        "request_id": uuid.uuid4().hex
+    }
+
+
+# ---------------------------------------------------------------------------
+# 智谱AI
+# ---------------------------------------------------------------------------
+
+@app.post("/zhipu/chat/completions")
+async def zhipu_completions(request: Request):
+    route = "zhipu.completions"
+    fault = await inject_fault("zhipu", route)
+    if fault:
+        return fault
+    
+    body = await request.json()
+    prompt = _prompt_text(body.get("messages"))
+    reply = fake_reply(prompt)
+    state.count(route, 200)
+    
+    if body.get("stream"):
+        events = [
+            {"choices": [{"index": 0, "delta": {"role": "assistant", "content": piece}}]}
+            for piece in _split(reply, state.config["stream_chunks"])
+        ]
+        return StreamingResponse(_sse(events, done=True), media_type="text/event-stream")
+    
+    await asyncio.sleep(sample_delay(state.config["latency"]))
+    return {
+        "id": uuid.uuid4().hex,
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": reply}}],
+        "usage": _usage(prompt, reply)
+    }
+
+
+# ---------------------------------------------------------------------------
+# 百度千帆
+# ---------------------------------------------------------------------------
+
+@app.post("/baidu/oauth/2.0/token")
+async def baidu_token():
+    state.count("baidu.token", 200)
+    return {"access_token": f"fake-{uuid.uuid4().hex}", "expires_in": 2592000}
+
+
+@app.post("/baidu/rpc/2.0/ai_custom/v1/wenxinworkshop/chat/{endpoint}")
+async def baidu_chat(endpoint: str, request: Request):
+    route = "baidu.chat"
+    fault = await inject_fault("baidu", route)
+    if fault:
+        return fault
+    
+    body = await request.json()
+    prompt = _prompt_text(body.get("messages"))
+    reply = fake_reply(prompt, body.get("system", ""))
+    usage = _usage(prompt, reply)
+    state.count(route, 200)
+    
+    if body.get("stream"):
+        pieces = _split(reply, state.config["stream_chunks"])
+        events = [
+            {"id": uuid.uuid4().hex, "result": piece, "is_end": idx == len(pieces) - 1, "usage": usage}
+            for idx, piece in enumerate(pieces)
+        ]
+        return StreamingResponse(_sse(events), media_type="text/event-stream")
+    
+    await asyncio.sleep(sample_delay(state.config["latency"]))
+    return {"id": uuid.uuid4().hex, "result": reply, "is_end": True, "usage": usage}
+
+
+# ---------------------------------------------------------------------------
+# Stable Diffusion
+# ---------------------------------------------------------------------------
+
+def _fake_image_b64() -> str:
+    size = max(16, int(state.config["image_bytes"]))
+    return base64.b64encode(b"\x89PNG\r\n\x1a\n" + os.urandom(size - 8)).decode()
+
+
+@app.get("/sd/health")
+async def sd_health():
+    return {"status": "ok"}
+
+
+@app.post("/sd/v1/generation")
+async def sd_generation(request: Request):
+    route = "sd.generation"
+    fault = await inject_fault("sd", route)
+    if fault:
+        return fault
+    
+    body = await request.json()
+    num_images = max(1, int(body.get("num_images", 1)))
+    # 批量生成的耗时按张数近似线性增长,但共享一次排队/加载开销
+    await asyncio.sleep(sample_delay(state.config["latency"]) * (1 + 0.5 * (num_images - 1)))
+    state.count(route, 200)
+    return {"images": [_fake_image_b64() for _ in range(num_images)], "parameters": body}
+
+
+@app.post("/sd/v1/img2img")
+async def sd_img2img(request: Request):
+    route = "sd.img2img"
+    fault = await inject_fault("sd", route)
+    if fault:
+        return fault
+    
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("init_image")
+        received = len(await upload.read()) if upload is not None else 0
+    else:
+        body = await request.json()
+        received = len(base64.b64decode(body.get("init_image", "")))
+    
+    await asyncio.sleep(sample_delay(state.config["latency"]))
+    state.count(route, 200)
+    return {"images": [_fake_image_b64()], "received_bytes": received}
+
+
+# ---------------------------------------------------------------------------
+# 可灵
+# ---------------------------------------------------------------------------
+
+@app.get("/keling/api/v1/status")
+async def keling_status():
+    return {"status": "ok"}
+
+
+@app.post("/keling/api/v1/videos/generate")
+async def keling_generate(request: Request):
+    route = "keling.generate"
+    fault = await inject_fault("keling", route)
+    if fault:
+        return fault
+    
+    await request.json()
+    await asyncio.sleep(sample_delay(state.config["latency"]))
+    task_id = uuid.uuid4().hex
+    state.videos[task_id] = {
+        "submitted_at": time.monotonic(),
+        "duration": sample_delay(f"normal:{state.config['video_seconds']},{state.config['video_seconds'] / 5}"),
+        "fails": random.random() < state.config["video_failure_rate"]
+    }
+    state.count(route, 200)
+    return {"task_id": task_id}
+
+
+@app.get("/keling/api/v1/videos/status/{task_id}")
+async def keling_task_status(task_id: str, request: Request):
+    route = "keling.status"
+    fault = await inject_fault("keling", route)
+    if fault:
+        return fault
+    
+    video = state.videos.get(task_id)
+    if video is None:
+        state.count(route, 404)
+        return JSONResponse({"message": "task not found"}, status_code=404)
+    
+    state.count(route, 200)
+    elapsed = time.monotonic() - video["submitted_at"]
+    if elapsed < video["duration"]:
+        return {"status": "processing", "progress": int(100 * elapsed / max(video["duration"], 0.001))}
+    if video["fails"]:
+        return {"status": "failed", "progress": 100, "error": "content moderation failed"}
+    return {
+        "status": "completed",
+        "progress": 100,
+        "video_url": str(request.base_url).rstrip("/") + f"/keling/files/{task_id}.mp4"
+    }
+
+
+@app.get("/keling/files/{name}")
+async def keling_file(name: str):
+    state.count("keling.file", 200)
+    return Response(os.urandom(int(state.config["video_bytes"])), media_type="video/mp4")
+
+
+# ---------------------------------------------------------------------------
+# 控制接口
+# ---------------------------------------------------------------------------
+
+@app.post("/_control")
+async def control(request: Request):
+    """修改运行时配置,只接受DEFAULTS中的字段"""
+    updates = await request.json()
+    unknown = set(updates) - set(DEFAULTS)
+    if unknown:
+        return JSONResponse({"error": f"未知配置项: {sorted(unknown)}"}, status_code=400)
+    state.config.update(updates)
+    return state.config
+
+
+@app.get("/_stats")
+async def stats():
+    return {"config": state.config, "requests": dict(state.stats), "videos": len(state.videos)}
+
+
+@app.post("/_reset")
+async def reset():
+    state.stats.clear()
+    state.videos.clear()
+    return {"ok": True}
+
+
+def add_config_arguments(parser: argparse.ArgumentParser):
+    """把DEFAULTS中的配置项注册为命令行参数(--error-429等)"""
+    for key, value in DEFAULTS.items():
+        parser.add_argument(f"--{key.replace('_', '-')}", dest=key, type=type(value), default=value)
+
+
+def configure(args: argparse.Namespace):
+    """用命令行参数覆盖运行时配置"""
+    state.config.update({key: getattr(args, key) for key in DEFAULTS})
+
+
+def main():
+    import uvicorn
+    
+    parser = argparse.ArgumentParser(description="AI厂商接口离线替身服务器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    configure(args)
+    
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
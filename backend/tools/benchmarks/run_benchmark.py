@@ -0,0 +1,341 @@
+"""
+适配器和生成服务基准测试
+
+针对离线替身服务器(fake_vendor)按指定并发驱动适配器或生成服务,输出吞吐量和p50/p95/p99延迟。
+
+场景:
+    text        适配器agenerate_text
+    stream      适配器astream_generate(额外统计首包延迟)
+    storyboard  StoryboardService.agenerate_result(--chunked 分段生成)
+    image       StableDiffusionAdapter.generate_images_to_disk
+    video       KeLingAdapter提交视频并按轮询器的间隔策略查询至完成
+
+示例:
+    # 在同一进程中启动替身服务器,20并发压测通义千问
+    python -m tools.benchmarks.run_benchmark text --vendor tongyi --spawn -n 500 -c 20
+    
+    # 注入5%的429,观察重试和限流的影响
+    python -m tools.benchmarks.run_benchmark text --vendor zhipu --spawn --error-429 0.05 --rate-limit
+    
+    # 只有10个不同提示词时开启响应缓存
+    python -m tools.benchmarks.run_benchmark text --spawn --cache --distinct-prompts 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.core.config import settings
+from app.services.ai_adapters.registry import ADAPTER_CLASSES
+from app.services.storyboard_service import StoryboardService
+from app.services.video_poller import next_poll_delay
+from tools.benchmarks import fake_vendor
+
+TEXT_VENDORS = ("tongyi", "zhipu", "baidu")
+
+VENDOR_PREFIXES = {
+    "tongyi": "tongyi",
+    "zhipu": "zhipu",
+    "baidu": "baidu",
+    "stable_diffusion": "sd",
+    "keling": "keling",
+}
+
+SAMPLE_SCENE = (
+    "场景{n}:清晨的咖啡馆\n"
+    "主角推门而入,环顾四周,在靠窗的位置坐下。服务员走来递上菜单,两人简短交谈。\n"
+    "窗外下起小雨,主角望着雨滴沿玻璃滑落,回忆起多年前的一次离别。\n"
+)
+
+
+def percentile(samples: List[float], pct: float) -> Optional[float]:
+    """最近秩法分位数"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+class Recorder:
+    """收集单次压测的延迟和结果"""
+    
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.first_chunk: List[float] = []
+        self.errors: Counter = Counter()
+        self.ok = 0
+        self.retries = 0
+        self.cached = 0
+        self.extra: Counter = Counter()
+    
+    def record(self, latency: float, result: Dict[str, Any]):
+        self.latencies.append(latency)
+        if result.get("success"):
+            self.ok += 1
+        else:
+            self.errors[str(result.get("error", "未知错误"))[:80]] += 1
+        usage = result.get("usage") or {}
+        self.retries += int(usage.get("retries", 0) or 0)
+        self.cached += int(bool(result.get("cached")))
+    
+    def summary(self, wall: float) -> Dict[str, Any]:
+        total = len(self.latencies)
+        
+        def ms(value: Optional[float]) -> Optional[float]:
+            return None if value is None else round(value * 1000, 1)
+        
+        report = {
+            "requests": total,
+            "ok": self.ok,
+            "failed": total - self.ok,
+            "wall_seconds": round(wall, 3),
+            "throughput_rps": round(total / wall, 2) if wall > 0 else None,
+            "latency_ms": {f"p{p}": ms(percentile(self.latencies, p)) for p in (50, 95, 99)},
+            "retries": self.retries,
+            "cached": self.cached,
+            "errors": dict(self.errors.most_common(5)),
+        }
+        if self.first_chunk:
+            report["first_chunk_ms"] = {f"p{p}": ms(percentile(self.first_chunk, p)) for p in (50, 95, 99)}
+        if self.extra:
+            report.update(self.extra)
+        return report
+
+
+def build_adapter(vendor: str, server: str, args: argparse.Namespace):
+    """按替身服务器地址构建适配器(不经过数据库配置)"""
+    adapter_cls = ADAPTER_CLASSES[vendor]
+    endpoint = f"{server.rstrip('/')}/{VENDOR_PREFIXES[vendor]}"
+    kwargs: Dict[str, Any] = {"api_key": "fake-key", "api_endpoint": endpoint}
+    if args.max_retries is not None:
+        kwargs["max_retries"] = args.max_retries
+    if vendor in TEXT_VENDORS:
+        kwargs["cache_enabled"] = args.cache
+        if vendor == "baidu":
+            kwargs["secret_key"] = "fake-secret"
+    return adapter_cls(**kwargs)
+
+
+def _prompt(i: int, args: argparse.Namespace) -> str:
+    n = i % args.distinct_prompts if args.distinct_prompts else i
+    return f"请写一段第{n}号故事的开场白。"
+
+
+def _script(args: argparse.Namespace) -> str:
+    scenes = max(1, args.script_chars // len(SAMPLE_SCENE.format(n=1)))
+    return "\n".join(SAMPLE_SCENE.format(n=n) for n in range(1, scenes + 1))
+
+
+async def scenario_text(adapter, i: int, args, recorder: Recorder):
+    started = time.perf_counter()
+    result = await adapter.agenerate_text(
+        _prompt(i, args), max_tokens=args.max_tokens, use_cache=args.cache
+    )
+    recorder.record(time.perf_counter() - started, result)
+
+
+async def scenario_stream(adapter, i: int, args, recorder: Recorder):
+    started = time.perf_counter()
+    first = None
+    chars = 0
+    try:
+        async for chunk in adapter.astream_generate(_prompt(i, args), max_tokens=args.max_tokens):
+            if first is None:
+                first = time.perf_counter() - started
+            chars += len(chunk)
+        result = {"success": True}
+    except Exception as e:
+        result = {"success": False, "error": f"{type(e).__name__}: {e}"}
+    if first is not None:
+        recorder.first_chunk.append(first)
+    recorder.extra["stream_chars"] += chars
+    recorder.record(time.perf_counter() - started, result)
+
+
+async def scenario_storyboard(adapter, i: int, args, recorder: Recorder):
+    script = _script(args)
+    if not args.distinct_prompts or i % args.distinct_prompts:
+        script = f"{script}\n(第{i}稿)"
+    started = time.perf_counter()
+    result = await StoryboardService.agenerate_result(
+        adapter,
+        StoryboardService.DEFAULT_SYSTEM_PROMPT,
+        script,
+        max_tokens=args.max_tokens,
+        use_cache=args.cache,
+        chunked=args.chunked
+    )
+    recorder.record(time.perf_counter() - started, result)
+    if result.get("success"):
+        storyboards = result.get("storyboards")
+        if storyboards is None:
+            storyboards = StoryboardService._parse_storyboards(result["text"])
+        recorder.extra["storyboards"] += len(storyboards)
+
+
+async def scenario_image(adapter, i: int, args, recorder: Recorder):
+    directory = os.path.join(args.output_dir, f"req{i}")
+    
+    def path_for(index: int, ext: str) -> str:
+        return os.path.join(directory, f"{index}.{ext}")
+    
+    started = time.perf_counter()
+    result = await asyncio.to_thread(
+        adapter.generate_images_to_disk,
+        f"benchmark image {i}",
+        path_for,
+        num_images=args.num_images
+    )
+    recorder.record(time.perf_counter() - started, result)
+    for image in result.get("images", []):
+        recorder.extra["image_bytes"] += image["file_size"]
+        os.remove(image["local_path"])
+
+
+async def scenario_video(adapter, i: int, args, recorder: Recorder):
+    started = time.perf_counter()
+    submitted = await asyncio.to_thread(adapter.generate_video, f"benchmark video {i}", duration=5.0)
+    if not submitted.get("success"):
+        recorder.record(time.perf_counter() - started, submitted)
+        return
+    
+    job = {
+        "submitted_at": time.time(),
+        "expected_seconds": args.expected_video_seconds,
+        "progress": 0
+    }
+    while True:
+        await asyncio.sleep(next_poll_delay(job, time.time()))
+        status = await adapter.acheck_status(submitted["task_id"])
+        recorder.extra["status_polls"] += 1
+        if status.get("success") and status.get("status") in ("completed", "failed"):
+            if status["status"] == "failed":
+                status = {"success": False, "error": status.get("error")}
+            break
+        if status.get("success"):
+            job["progress"] = status.get("progress") or job["progress"]
+        if time.time() - job["submitted_at"] > settings.VIDEO_POLL_MAX_WAIT:
+            status = {"success": False, "error": "等待超时"}
+            break
+    recorder.record(time.perf_counter() - started, status)
+
+
+SCENARIOS: Dict[str, Callable[..., Awaitable[None]]] = {
+    "text": scenario_text,
+    "stream": scenario_stream,
+    "storyboard": scenario_storyboard,
+    "image": scenario_image,
+    "video": scenario_video,
+}
+
+
+async def run(args: argparse.Namespace, server: str) -> Dict[str, Any]:
+    """按并发度执行args.requests次场景调用"""
+    if args.scenario == "image":
+        vendor = "stable_diffusion"
+    elif args.scenario == "video":
+        vendor = "keling"
+    else:
+        vendor = args.vendor
+    adapter = build_adapter(vendor, server, args)
+    scenario = SCENARIOS[args.scenario]
+    recorder = Recorder()
+    counter = iter(range(args.requests))
+    lock = asyncio.Lock()
+    
+    async def worker():
+        while True:
+            async with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            try:
+                await scenario(adapter, i, args, recorder)
+            except Exception as e:
+                recorder.record(0.0, {"success": False, "error": f"{type(e).__name__}: {e}"})
+    
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    report = recorder.summary(time.perf_counter() - started)
+    return {"scenario": args.scenario, "vendor": vendor, "concurrency": args.concurrency, **report}
+
+
+def spawn_server(args: argparse.Namespace) -> str:
+    """在后台线程中启动替身服务器,返回地址"""
+    import uvicorn
+    
+    fake_vendor.configure(args)
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    
+    server = uvicorn.Server(uvicorn.Config(fake_vendor.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    deadline = time.time() + 10
+    while not server.started:
+        if time.time() > deadline:
+            raise RuntimeError("替身服务器启动超时")
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+def print_report(report: Dict[str, Any]):
+    print(f"\n场景 {report['scenario']} ({report['vendor']}) 并发 {report['concurrency']}")
+    print(f"  请求数      {report['requests']} (成功 {report['ok']}, 失败 {report['failed']})")
+    print(f"  耗时        {report['wall_seconds']}s, 吞吐 {report['throughput_rps']} req/s")
+    latency = report["latency_ms"]
+    print(f"  延迟(ms)    p50={latency['p50']} p95={latency['p95']} p99={latency['p99']}")
+    if "first_chunk_ms" in report:
+        first = report["first_chunk_ms"]
+        print(f"  首包(ms)    p50={first['p50']} p95={first['p95']} p99={first['p99']}")
+    print(f"  重试次数    {report['retries']}, 缓存命中 {report['cached']}")
+    for key in ("storyboards", "image_bytes", "status_polls", "stream_chars"):
+        if key in report:
+            print(f"  {key:<11} {report[key]}")
+    for error, count in report["errors"].items():
+        print(f"  错误 x{count}: {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="适配器和生成服务基准测试")
+    parser.add_argument("scenario", choices=sorted(SCENARIOS))
+    parser.add_argument("--vendor", choices=TEXT_VENDORS, default="tongyi", help="文本场景使用的厂商")
+    parser.add_argument("--server", default="http://127.0.0.1:9000", help="替身服务器地址")
+    parser.add_argument("--spawn", action="store_true", help="在本进程中启动替身服务器")
+    parser.add_argument("-n", "--requests", type=int, default=200)
+    parser.add_argument("-c", "--concurrency", type=int, default=10)
+    parser.add_argument("--max-tokens", type=int, default=2000)
+    parser.add_argument("--max-retries", type=int, default=None, help="覆盖LLM_RETRY_MAX_ATTEMPTS")
+    parser.add_argument("--cache", action="store_true", help="开启响应缓存")
+    parser.add_argument("--distinct-prompts", type=int, default=0, help="不同提示词数量(0表示每次都不同)")
+    parser.add_argument("--rate-limit", action="store_true", help="启用厂商限流(需要Redis)")
+    parser.add_argument("--chunked", action="store_true", help="storyboard场景分段生成")
+    parser.add_argument("--script-chars", type=int, default=6000, help="storyboard场景的脚本长度")
+    parser.add_argument("--num-images", type=int, default=4, help="image场景每次调用的图像数")
+    parser.add_argument("--expected-video-seconds", type=float, default=30.0, help="video场景轮询使用的预计耗时")
+    parser.add_argument("--json", action="store_true", help="以JSON输出结果")
+    fake_vendor.add_config_arguments(parser)
+    args = parser.parse_args()
+    
+    settings.RATE_LIMIT_ENABLED = args.rate_limit
+    server = spawn_server(args) if args.spawn else args.server
+    
+    with tempfile.TemporaryDirectory() as output_dir:
+        args.output_dir = output_dir
+        report = asyncio.run(run(args, server))
+    
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()